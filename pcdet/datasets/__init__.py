@@ -1,3 +1,5 @@
+from functools import partial
+
 import torch
 from torch.utils.data import DataLoader
 from torch.utils.data import DistributedSampler as _DistributedSampler
@@ -67,9 +69,14 @@ def build_dataloader(dataset_cfg, class_names, batch_size, dist, root_path=None,
             sampler = DistributedSampler(dataset, world_size, rank, shuffle=False)
     else:
         sampler = None
+
+    collate_fn = dataset.collate_batch
+    if dataset_cfg.get('PREALLOCATED_COLLATE', False):
+        # batches of torch tensors, pinned by the DataLoader
+        collate_fn = partial(dataset.collate_batch_preallocated, to_torch=dataset_cfg.get('COLLATE_TO_TORCH', True))
     dataloader = DataLoader(
         dataset, batch_size=batch_size, pin_memory=True, num_workers=workers,
-        shuffle=(sampler is None) and training, collate_fn=dataset.collate_batch,
+        shuffle=(sampler is None) and training, collate_fn=collate_fn,
         drop_last=False, sampler=sampler, timeout=0
     )
 
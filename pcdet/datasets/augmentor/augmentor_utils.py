@@ -187,14 +187,14 @@ def random_local_translation_along_x(gt_boxes, points, offset_range):
         offset_range: [min max]]
     Returns:
     """
-    # augs = {}
-    for idx, box in enumerate(gt_boxes):
-        offset = np.random.uniform(offset_range[0], offset_range[1])
-        # augs[f'object_{idx}'] = offset
-        points_in_box, mask = get_points_in_box(points, box)
-        points[mask, 0] += offset
-        
-        gt_boxes[idx, 0] += offset
+    offsets = np.random.uniform(offset_range[0], offset_range[1], gt_boxes.shape[0])
+
+    def translate(box_points, box_indices):
+        box_points[:, 0] += offsets[box_indices].astype(box_points.dtype)
+        return box_points
+
+    points = transform_points_in_boxes(points, gt_boxes, translate)
+    gt_boxes[:, 0] += offsets.astype(gt_boxes.dtype)
     
         # if gt_boxes.shape[1] > 7:
         #     gt_boxes[idx, 7] += offset
@@ -210,14 +210,14 @@ def random_local_translation_along_y(gt_boxes, points, offset_range):
         offset_range: [min max]]
     Returns:
     """
-    # augs = {}
-    for idx, box in enumerate(gt_boxes):
-        offset = np.random.uniform(offset_range[0], offset_range[1])
-        # augs[f'object_{idx}'] = offset
-        points_in_box, mask = get_points_in_box(points, box)
-        points[mask, 1] += offset
-        
-        gt_boxes[idx, 1] += offset
+    offsets = np.random.uniform(offset_range[0], offset_range[1], gt_boxes.shape[0])
+
+    def translate(box_points, box_indices):
+        box_points[:, 1] += offsets[box_indices].astype(box_points.dtype)
+        return box_points
+
+    points = transform_points_in_boxes(points, gt_boxes, translate)
+    gt_boxes[:, 1] += offsets.astype(gt_boxes.dtype)
     
         # if gt_boxes.shape[1] > 8:
         #     gt_boxes[idx, 8] += offset
@@ -233,14 +233,14 @@ def random_local_translation_along_z(gt_boxes, points, offset_range):
         offset_range: [min max]]
     Returns:
     """
-    # augs = {}
-    for idx, box in enumerate(gt_boxes):
-        offset = np.random.uniform(offset_range[0], offset_range[1])
-        # augs[f'object_{idx}'] = offset
-        points_in_box, mask = get_points_in_box(points, box)
-        points[mask, 2] += offset
-        
-        gt_boxes[idx, 2] += offset
+    offsets = np.random.uniform(offset_range[0], offset_range[1], gt_boxes.shape[0])
+
+    def translate(box_points, box_indices):
+        box_points[:, 2] += offsets[box_indices].astype(box_points.dtype)
+        return box_points
+
+    points = transform_points_in_boxes(points, gt_boxes, translate)
+    gt_boxes[:, 2] += offsets.astype(gt_boxes.dtype)
     
     return gt_boxes, points
 
@@ -324,26 +324,21 @@ def local_scaling(gt_boxes, points, scale_range):
     if scale_range[1] - scale_range[0] < 1e-3:
         return gt_boxes, points
     
-    # augs = {}
-    for idx, box in enumerate(gt_boxes):
-        noise_scale = np.random.uniform(scale_range[0], scale_range[1])
-        # augs[f'object_{idx}'] = noise_scale
-        points_in_box, mask = get_points_in_box(points, box)
-        
+    noise_scale = np.random.uniform(scale_range[0], scale_range[1], gt_boxes.shape[0])
+
+    def scale(box_points, box_indices):
         # tranlation to axis center
-        points[mask, 0] -= box[0]
-        points[mask, 1] -= box[1]
-        points[mask, 2] -= box[2]
+        box_points[:, 0:3] -= gt_boxes[box_indices, 0:3]
         
         # apply scaling
-        points[mask, :3] *= noise_scale
+        box_points[:, 0:3] *= noise_scale[box_indices, np.newaxis].astype(box_points.dtype)
         
         # tranlation back to original position
-        points[mask, 0] += box[0]
-        points[mask, 1] += box[1]
-        points[mask, 2] += box[2]
-        
-        gt_boxes[idx, 3:6] *= noise_scale
+        box_points[:, 0:3] += gt_boxes[box_indices, 0:3]
+        return box_points
+
+    points = transform_points_in_boxes(points, gt_boxes, scale)
+    gt_boxes[:, 3:6] *= noise_scale[:, np.newaxis].astype(gt_boxes.dtype)
     return gt_boxes, points
 
 
@@ -355,42 +350,29 @@ def local_rotation(gt_boxes, points, rot_range):
         rot_range: [min, max]
     Returns:
     """
-    # augs = {}
-    for idx, box in enumerate(gt_boxes):
-        noise_rotation = np.random.uniform(rot_range[0], rot_range[1])
-        # augs[f'object_{idx}'] = noise_rotation
-        points_in_box, mask = get_points_in_box(points, box)
-        
-        centroid_x = box[0]
-        centroid_y = box[1]
-        centroid_z = box[2]
-        
+    noise_rotation = np.random.uniform(rot_range[0], rot_range[1], gt_boxes.shape[0])
+
+    def rotate(box_points, box_indices):
         # tranlation to axis center
-        points[mask, 0] -= centroid_x
-        points[mask, 1] -= centroid_y
-        points[mask, 2] -= centroid_z
-        box[0] -= centroid_x
-        box[1] -= centroid_y
-        box[2] -= centroid_z
+        box_points[:, 0:3] -= gt_boxes[box_indices, 0:3]
         
-        # apply rotation
-        points[mask, :] = common_utils.rotate_points_along_z(points[np.newaxis, mask, :], np.array([noise_rotation]))[0]
-        box[0:3] = common_utils.rotate_points_along_z(box[np.newaxis, np.newaxis, 0:3], np.array([noise_rotation]))[0][0]
+        # apply rotation, each point with the angle of its box
+        box_points = common_utils.rotate_points_along_z(
+            box_points[:, np.newaxis, :], noise_rotation[box_indices]
+        )[:, 0, :]
         
         # tranlation back to original position
-        points[mask, 0] += centroid_x
-        points[mask, 1] += centroid_y
-        points[mask, 2] += centroid_z
-        box[0] += centroid_x
-        box[1] += centroid_y
-        box[2] += centroid_z
-        
-        gt_boxes[idx, 6] += noise_rotation
-        if gt_boxes.shape[1] > 8:
-            gt_boxes[idx, 7:9] = common_utils.rotate_points_along_z(
-                np.hstack((gt_boxes[idx, 7:9], np.zeros((gt_boxes.shape[0], 1))))[np.newaxis, :, :],
-                np.array([noise_rotation])
-            )[0][:, 0:2]
+        box_points[:, 0:3] += gt_boxes[box_indices, 0:3]
+        return box_points
+
+    # the centers of the boxes do not move when rotating around themselves
+    points = transform_points_in_boxes(points, gt_boxes, rotate)
+    gt_boxes[:, 6] += noise_rotation.astype(gt_boxes.dtype)
+    if gt_boxes.shape[1] > 8:
+        gt_boxes[:, 7:9] = common_utils.rotate_points_along_z(
+            np.hstack((gt_boxes[:, 7:9], np.zeros((gt_boxes.shape[0], 1))))[:, np.newaxis, :],
+            noise_rotation
+        )[:, 0, 0:2]
     
     return gt_boxes, points
 
@@ -403,14 +385,17 @@ def local_frustum_dropout_top(gt_boxes, points, intensity_range):
         intensity: [min, max]
     Returns:
     """
-    for idx, box in enumerate(gt_boxes):
-        x, y, z, dx, dy, dz = box[0], box[1], box[2], box[3], box[4], box[5]
-        
-        intensity = np.random.uniform(intensity_range[0], intensity_range[1])
-        points_in_box, mask = get_points_in_box(points, box)
-        threshold = (z + dz / 2) - intensity * dz
-        
-        points = points[np.logical_not(np.logical_and(mask, points[:, 2] >= threshold))]
+    x, y, z, dx, dy, dz = gt_boxes[:, 0:6].astype(np.float64).T
+    
+    intensity = np.random.uniform(intensity_range[0], intensity_range[1], gt_boxes.shape[0])
+    threshold = (z + dz / 2) - intensity * dz
+    
+    # the points are only dropped, so the boxes do not depend on each other
+    point_indices, box_indices = get_points_in_boxes(points, gt_boxes)
+    drop_flag = points[point_indices, 2] >= threshold.astype(points.dtype)[box_indices]
+    drop_mask = np.zeros(points.shape[0], dtype=np.bool_)
+    drop_mask[point_indices[drop_flag]] = True
+    points = points[np.logical_not(drop_mask)]
     
     return gt_boxes, points
 
@@ -423,14 +408,17 @@ def local_frustum_dropout_bottom(gt_boxes, points, intensity_range):
         intensity: [min, max]
     Returns:
     """
-    for idx, box in enumerate(gt_boxes):
-        x, y, z, dx, dy, dz = box[0], box[1], box[2], box[3], box[4], box[5]
-        
-        intensity = np.random.uniform(intensity_range[0], intensity_range[1])
-        points_in_box, mask = get_points_in_box(points, box)
-        threshold = (z - dz / 2) + intensity * dz
-        
-        points = points[np.logical_not(np.logical_and(mask, points[:, 2] <= threshold))]
+    x, y, z, dx, dy, dz = gt_boxes[:, 0:6].astype(np.float64).T
+    
+    intensity = np.random.uniform(intensity_range[0], intensity_range[1], gt_boxes.shape[0])
+    threshold = (z - dz / 2) + intensity * dz
+    
+    # the points are only dropped, so the boxes do not depend on each other
+    point_indices, box_indices = get_points_in_boxes(points, gt_boxes)
+    drop_flag = points[point_indices, 2] <= threshold.astype(points.dtype)[box_indices]
+    drop_mask = np.zeros(points.shape[0], dtype=np.bool_)
+    drop_mask[point_indices[drop_flag]] = True
+    points = points[np.logical_not(drop_mask)]
     
     return gt_boxes, points
 
@@ -443,14 +431,17 @@ def local_frustum_dropout_left(gt_boxes, points, intensity_range):
         intensity: [min, max]
     Returns:
     """
-    for idx, box in enumerate(gt_boxes):
-        x, y, z, dx, dy, dz = box[0], box[1], box[2], box[3], box[4], box[5]
-        
-        intensity = np.random.uniform(intensity_range[0], intensity_range[1])
-        points_in_box, mask = get_points_in_box(points, box)
-        threshold = (y + dy / 2) - intensity * dy
-        
-        points = points[np.logical_not(np.logical_and(mask, points[:, 1] >= threshold))]
+    x, y, z, dx, dy, dz = gt_boxes[:, 0:6].astype(np.float64).T
+    
+    intensity = np.random.uniform(intensity_range[0], intensity_range[1], gt_boxes.shape[0])
+    threshold = (y + dy / 2) - intensity * dy
+    
+    # the points are only dropped, so the boxes do not depend on each other
+    point_indices, box_indices = get_points_in_boxes(points, gt_boxes)
+    drop_flag = points[point_indices, 1] >= threshold.astype(points.dtype)[box_indices]
+    drop_mask = np.zeros(points.shape[0], dtype=np.bool_)
+    drop_mask[point_indices[drop_flag]] = True
+    points = points[np.logical_not(drop_mask)]
     
     return gt_boxes, points
 
@@ -463,14 +454,17 @@ def local_frustum_dropout_right(gt_boxes, points, intensity_range):
         intensity: [min, max]
     Returns:
     """
-    for idx, box in enumerate(gt_boxes):
-        x, y, z, dx, dy, dz = box[0], box[1], box[2], box[3], box[4], box[5]
-        
-        intensity = np.random.uniform(intensity_range[0], intensity_range[1])
-        points_in_box, mask = get_points_in_box(points, box)
-        threshold = (y - dy / 2) + intensity * dy
-        
-        points = points[np.logical_not(np.logical_and(mask, points[:, 1] <= threshold))]
+    x, y, z, dx, dy, dz = gt_boxes[:, 0:6].astype(np.float64).T
+    
+    intensity = np.random.uniform(intensity_range[0], intensity_range[1], gt_boxes.shape[0])
+    threshold = (y - dy / 2) + intensity * dy
+    
+    # the points are only dropped, so the boxes do not depend on each other
+    point_indices, box_indices = get_points_in_boxes(points, gt_boxes)
+    drop_flag = points[point_indices, 1] <= threshold.astype(points.dtype)[box_indices]
+    drop_mask = np.zeros(points.shape[0], dtype=np.bool_)
+    drop_mask[point_indices[drop_flag]] = True
+    points = points[np.logical_not(drop_mask)]
     
     return gt_boxes, points
 
@@ -495,6 +489,75 @@ def get_points_in_box(points, gt_box):
     return points, mask
 
 
+def get_points_in_boxes(points, boxes):
+    """
+    Batched get_points_in_box. The candidates of each box are the points in the BEV square around its circumscribed
+    circle (box_utils.get_candidate_points_in_ranges), so only the candidates are checked in the local frame of the
+    boxes.
+
+    Args:
+        points: (M, 3 + C)
+        boxes: (N, 7 + C)
+    Returns:
+        point_indices: (K), a point in several boxes appears once for each box
+        box_indices: (K)
+    """
+    MARGIN = 1e-1
+    if points.shape[0] == 0 or boxes.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    radius = np.linalg.norm(boxes[:, 3:5].astype(np.float64), axis=1)[:, None] / 2
+    centers = boxes[:, 0:2].astype(np.float64)
+    point_indices, box_indices = box_utils.get_candidate_points_in_ranges(
+        points, centers - radius, centers + radius, margin=2 * MARGIN
+    )
+
+    # same arithmetic as get_points_in_box
+    cur_points, cur_boxes = points[point_indices], boxes[box_indices]
+    shift_x, shift_y = cur_points[:, 0] - cur_boxes[:, 0], cur_points[:, 1] - cur_boxes[:, 1]
+    shift_z = cur_points[:, 2] - cur_boxes[:, 2]
+    cosa = np.cos(-boxes[:, 6].astype(np.float64)).astype(shift_x.dtype)[box_indices]
+    sina = np.sin(-boxes[:, 6].astype(np.float64)).astype(shift_x.dtype)[box_indices]
+    local_x = shift_x * cosa + shift_y * (-sina)
+    local_y = shift_x * sina + shift_y * cosa
+
+    half_size = (cur_boxes[:, 3:6].astype(np.float64) / 2.0 + [MARGIN, MARGIN, 0]).astype(shift_x.dtype)
+    mask = np.logical_and(abs(shift_z) <= half_size[:, 2],
+                          np.logical_and(abs(local_x) <= half_size[:, 0],
+                                         abs(local_y) <= half_size[:, 1]))
+    return point_indices[mask], box_indices[mask]
+
+
+def transform_points_in_boxes(points, gt_boxes, transform):
+    """
+    Applies a transform of each box to the points in it, for all the boxes at once. The per-box loops this replaces
+    find the points of a box after the previous boxes are transformed, so when a point is in several boxes or is
+    moved into a later box, the loop is kept (on the points in the boxes only) to give the same result.
+
+    Args:
+        points: (M, 3 + C)
+        gt_boxes: (N, 7 + C), not changed by the transform
+        transform: function(box_points, box_indices) => box_points, box_points: (K, 3 + C), box_indices: (K)
+    Returns:
+        points: (M, 3 + C)
+    """
+    point_indices, box_indices = get_points_in_boxes(points, gt_boxes)
+    in_box_indices = np.unique(point_indices)
+    if in_box_indices.shape[0] == point_indices.shape[0]:
+        new_points = transform(points[point_indices], box_indices)
+        moved_indices, moved_box_indices = get_points_in_boxes(new_points, gt_boxes)
+        if not (moved_box_indices > box_indices[moved_indices]).any():
+            points[point_indices] = new_points
+            return points
+
+    in_box_points = points[in_box_indices]
+    for idx, box in enumerate(gt_boxes):
+        _, mask = get_points_in_box(in_box_points, box)
+        in_box_points[mask] = transform(in_box_points[mask], np.full(mask.sum(), idx))
+    points[in_box_indices] = in_box_points
+    return points
+
+
 def get_pyramids(boxes):
     pyramid_orders = np.array([
         [0, 1, 5, 4],
@@ -528,11 +591,56 @@ def one_hot(x, num_class=1):
     return ohx
 
 
+def points_in_pyramids(points, pyramids):
+    """
+    Half-space test of the points against all the pyramids at once: a point is in a pyramid if it is on the inner
+    side of its 4 side faces and of its base. The candidates of each pyramid are the points in its bounding box
+    (box_utils.get_candidate_points_in_ranges).
+
+    Args:
+        points: (M, 3 + C)
+        pyramids: (P, 15) or (..., 5, 3), the apex and the 4 corners of the base (in order) of each pyramid
+    Returns:
+        point_indices: (K), sorted by pyramid and then by point, a point in several pyramids appears several times
+        pyramid_indices: (K)
+    """
+    pyramids = pyramids.reshape(-1, 5, 3).astype(np.float64)
+    if points.shape[0] == 0 or pyramids.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # outward unit normals of the faces: (apex, corner i, corner i + 1) for the sides, then the base
+    apex, corners = pyramids[:, 0, :], pyramids[:, 1:, :]
+    side_normals = np.cross(corners - apex[:, None, :], np.roll(corners, -1, axis=1) - apex[:, None, :])
+    base_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 3] - corners[:, 0])
+    normals = np.concatenate([side_normals, base_normals[:, None, :]], axis=1)  # (P, 5, 3)
+    face_points = np.concatenate([np.repeat(apex[:, None, :], 4, axis=1), corners[:, 0:1, :]], axis=1)
+    normals_norm = np.linalg.norm(normals, axis=-1)
+    valid_pyramids = (normals_norm > 1e-8).all(axis=1)  # degenerated pyramids contain no point
+    normals = normals / np.maximum(normals_norm, 1e-8)[..., None]
+    centroids = pyramids.mean(axis=1)
+    flip = (normals * (centroids[:, None, :] - face_points)).sum(axis=-1) > 0
+    normals[flip] *= -1
+    plane_offsets = (normals * face_points).sum(axis=-1)  # (P, 5), inside: normals * p <= plane_offsets
+
+    valid_pyramid_indices = np.flatnonzero(valid_pyramids)
+    point_indices, pyramid_indices = box_utils.get_candidate_points_in_ranges(
+        points, pyramids[valid_pyramid_indices].min(axis=1), pyramids[valid_pyramid_indices].max(axis=1)
+    )
+    pyramid_indices = valid_pyramid_indices[pyramid_indices]
+    cur_points = points[point_indices, 0:3]
+
+    in_pyramid = (np.einsum('kj,kfj->kf', cur_points, normals[pyramid_indices]) <=
+                  plane_offsets[pyramid_indices] + 1e-6).all(axis=1)
+    point_indices, pyramid_indices = point_indices[in_pyramid], pyramid_indices[in_pyramid]
+    order = np.lexsort((point_indices, pyramid_indices))
+    return point_indices[order], pyramid_indices[order]
+
+
 def points_in_pyramids_mask(points, pyramids):
     pyramids = pyramids.reshape(-1, 5, 3)
     flags = np.zeros((points.shape[0], pyramids.shape[0]), dtype=np.bool)
-    for i, pyramid in enumerate(pyramids):
-        flags[:, i] = np.logical_or(flags[:, i], box_utils.in_hull(points[:, 0:3], pyramid))
+    point_indices, pyramid_indices = points_in_pyramids(points, pyramids)
+    flags[point_indices, pyramid_indices] = True
     return flags
 
 
@@ -545,8 +653,10 @@ def local_pyramid_dropout(gt_boxes, points, dropout_prob, pyramids=None):
     if np.sum(drop_box_mask) != 0:
         drop_pyramid_mask = (np.tile(drop_box_mask[:, None], [1, 6]) * drop_pyramid_one_hot) > 0
         drop_pyramids = pyramids[drop_pyramid_mask]
-        point_masks = points_in_pyramids_mask(points, drop_pyramids)
-        points = points[np.logical_not(point_masks.any(-1))]
+        point_indices, _ = points_in_pyramids(points, drop_pyramids)
+        keep_mask = np.ones(points.shape[0], dtype=np.bool_)
+        keep_mask[point_indices] = False
+        points = points[keep_mask]
     # print(drop_box_mask)
     pyramids = pyramids[np.logical_not(drop_box_mask)]
     return gt_boxes, points, pyramids
@@ -565,16 +675,20 @@ def local_pyramid_sparsify(gt_boxes, points, prob, max_num_pts, pyramids=None):
         
         pyramid_sampled = pyramids[sparsify_pyramid_mask]  # (-1,6,5,3)[(num_sample,6)]
         # print(pyramid_sampled.shape)
-        pyramid_sampled_point_masks = points_in_pyramids_mask(points, pyramid_sampled)
-        pyramid_sampled_points_num = pyramid_sampled_point_masks.sum(0)  # the number of points in each surface pyramid
+        point_indices, pyramid_indices = points_in_pyramids(points, pyramid_sampled)
+        # the number of points in each surface pyramid
+        pyramid_sampled_points_num = np.bincount(pyramid_indices, minlength=pyramid_sampled.shape[0])
         valid_pyramid_sampled_mask = pyramid_sampled_points_num > sparsity_num  # only much than sparsity_num should be sparse
         
         sparsify_pyramids = pyramid_sampled[valid_pyramid_sampled_mask]
         if sparsify_pyramids.shape[0] > 0:
-            point_masks = pyramid_sampled_point_masks[:, valid_pyramid_sampled_mask]
-            remain_points = points[
-                np.logical_not(point_masks.any(-1))]  # points which outside the down sampling pyramid
-            to_sparsify_points = [points[point_masks[:, i]] for i in range(point_masks.shape[1])]
+            remain_mask = np.ones(points.shape[0], dtype=np.bool_)
+            remain_mask[point_indices[valid_pyramid_sampled_mask[pyramid_indices]]] = False
+            remain_points = points[remain_mask]  # points which outside the down sampling pyramid
+            pyramid_ends = np.cumsum(pyramid_sampled_points_num)
+            pyramid_starts = pyramid_ends - pyramid_sampled_points_num
+            to_sparsify_points = [points[point_indices[pyramid_starts[i]:pyramid_ends[i]]]
+                                  for i in np.nonzero(valid_pyramid_sampled_mask)[0]]
             
             sparsified_points = []
             for sample in to_sparsify_points:
@@ -612,8 +726,11 @@ def local_pyramid_swap(gt_boxes, points, prob, max_num_pts, pyramids=None):
     swap_pyramid_mask = np.random.uniform(0, 1, (pyramids.shape[0])) <= swap_prob
     
     if swap_pyramid_mask.sum() > 0:
-        point_masks = points_in_pyramids_mask(points, pyramids)
-        point_nums = point_masks.sum(0).reshape(pyramids.shape[0], -1)  # [N, 6]
+        point_indices, pyramid_indices = points_in_pyramids(points, pyramids)
+        pyramid_points_num = np.bincount(pyramid_indices, minlength=pyramids.shape[0] * pyramids.shape[1])
+        pyramid_ends = np.cumsum(pyramid_points_num)
+        pyramid_starts = pyramid_ends - pyramid_points_num
+        point_nums = pyramid_points_num.reshape(pyramids.shape[0], -1)  # [N, 6]
         non_zero_pyramids_mask = point_nums > num_thres  # ingore dropout pyramids or highly occluded pyramids
         selected_pyramids = non_zero_pyramids_mask * swap_pyramid_mask[:,
                                                      None]  # selected boxes and all their valid pyramids
@@ -637,10 +754,13 @@ def local_pyramid_swap(gt_boxes, points, prob, max_num_pts, pyramids=None):
             swapped_pyramids = pyramids[
                 swapped_indicies[:, 0].astype(np.int32), swapped_indicies[:, 1].astype(np.int32)]
             
-            # concat to_swap&swapped pyramids
-            swap_pyramids = np.concatenate([to_swap_pyramids, swapped_pyramids], axis=0)
-            swap_point_masks = points_in_pyramids_mask(points, swap_pyramids)
-            remain_points = points[np.logical_not(swap_point_masks.any(-1))]
+            # concat to_swap&swapped pyramids, their points are known from the test of all the pyramids
+            to_swap_pyramid_ids = index_i * pyramids.shape[1] + index_j
+            swapped_pyramid_ids = swapped_indicies[:, 0].astype(np.int64) * pyramids.shape[1] + swapped_indicies[:, 1]
+            swap_pyramid_ids = np.concatenate([to_swap_pyramid_ids, swapped_pyramid_ids], axis=0)
+            remain_mask = np.ones(points.shape[0], dtype=np.bool_)
+            remain_mask[point_indices[np.isin(pyramid_indices, swap_pyramid_ids)]] = False
+            remain_points = points[remain_mask]
             
             # swap pyramids
             points_res = []
@@ -649,8 +769,9 @@ def local_pyramid_swap(gt_boxes, points, prob, max_num_pts, pyramids=None):
                 to_swap_pyramid = to_swap_pyramids[i]
                 swapped_pyramid = swapped_pyramids[i]
                 
-                to_swap_points = points[swap_point_masks[:, i]]
-                swapped_points = points[swap_point_masks[:, i + num_swapped_pyramids]]
+                to_swap_id, swapped_id = to_swap_pyramid_ids[i], swapped_pyramid_ids[i]
+                to_swap_points = points[point_indices[pyramid_starts[to_swap_id]:pyramid_ends[to_swap_id]]]
+                swapped_points = points[point_indices[pyramid_starts[swapped_id]:pyramid_ends[swapped_id]]]
                 # for intensity transform
                 to_swap_points_intensity_ratio = (to_swap_points[:, -1:] - to_swap_points[:, -1:].min()) / \
                                                  np.clip(
@@ -4,6 +4,8 @@ import cv2
 
 import os
 import copy
+import time
+from pathlib import Path
 import numpy as np
 from skimage import io
 import torch
@@ -32,18 +34,34 @@ class DataBaseSampler(object):
             self.db_infos[class_name] = []
             
         self.use_shared_memory = sampler_cfg.get('USE_SHARED_MEMORY', False)
+        # packed databases (DB_DATA_PATH, one for each DB_INFO_PATH) are read through np.memmap
+        self.use_packed_db = sampler_cfg.get('USE_PACKED_DB', False)
+        self.packed_db_data = None
         
-        for db_info_path in sampler_cfg.DB_INFO_PATH:
+        for db_idx, db_info_path in enumerate(sampler_cfg.DB_INFO_PATH):
             db_info_path = self.root_path.resolve() / db_info_path
             with open(str(db_info_path), 'rb') as f:
                 infos = pickle.load(f)
                 [self.db_infos[cur_class].extend(infos[cur_class]) for cur_class in class_names]
+            if not (self.use_packed_db or self.use_shared_memory):
+                first_info = next((infos[cur_class][0] for cur_class in class_names if len(infos[cur_class]) > 0), {})
+                assert 'path' in first_info or 'global_data_offset' not in first_info, \
+                    '%s describes a packed GT database (global_data_offset without path), ' \
+                    'set USE_PACKED_DB: True and DB_DATA_PATH to its packed .npy file' % db_info_path
+            if self.use_packed_db:
+                for cur_class in class_names:
+                    for info in infos[cur_class]:
+                        info['global_data_idx'] = db_idx
 
         for func_name, val in sampler_cfg.PREPARE.items():
             self.db_infos = getattr(self, func_name)(self.db_infos, val)
         
         self.gt_database_data_key = self.load_db_to_shared_memory() if self.use_shared_memory else None
 
+        # per-stage time of __call__, logged every TIME_REPORT_INTERVAL calls (0 to disable)
+        self.time_report_interval = sampler_cfg.get('TIME_REPORT_INTERVAL', 0)
+        self.stage_timer = common_utils.StageTimer(enabled=self.time_report_interval > 0)
+
         self.sample_groups = {}
         self.sample_class_num = {}
         self.limit_whole_scene = sampler_cfg.get('LIMIT_WHOLE_SCENE', False)
@@ -61,6 +79,8 @@ class DataBaseSampler(object):
     def __getstate__(self):
         d = dict(self.__dict__)
         del d['logger']
+        # the memmaps are opened again in each process instead of being pickled with the data
+        d['packed_db_data'] = None
         return d
 
     def __setstate__(self, d):
@@ -95,6 +115,15 @@ class DataBaseSampler(object):
         self.logger.info('GT database has been saved to shared memory')
         return sa_key
 
+    def get_packed_db_data(self):
+        if self.packed_db_data is None:
+            assert self.sampler_cfg.DB_DATA_PATH.__len__() == self.sampler_cfg.DB_INFO_PATH.__len__()
+            self.packed_db_data = [
+                np.load(str(self.root_path.resolve() / db_data_path), mmap_mode='r')
+                for db_data_path in self.sampler_cfg.DB_DATA_PATH
+            ]
+        return self.packed_db_data
+
     def filter_by_difficulty(self, db_infos, removed_difficulty):
         new_db_infos = {}
         for key, dinfos in db_infos.items():
@@ -143,6 +172,46 @@ class DataBaseSampler(object):
         sample_group['indices'] = indices
         return sampled_dict
 
+    def load_sampled_points(self, sampled_dict):
+        """
+        Args:
+            sampled_dict: list of db infos
+
+        Returns:
+            obj_points: (N1 + N2 + ..., C) points of all the objects, in the order of sampled_dict
+            obj_points_idx: (N1 + N2 + ...) index of the object of each point
+        """
+        if self.use_shared_memory or self.use_packed_db:
+            offsets = np.array([info['global_data_offset'] for info in sampled_dict], dtype=np.int64).reshape(-1, 2)
+            num_points = offsets[:, 1] - offsets[:, 0]
+            obj_points_idx = np.repeat(np.arange(len(sampled_dict)), num_points)
+            # one fancy-indexing gather copies all the objects out of the packed array at once
+            first_point_idx = np.cumsum(num_points) - num_points
+            point_idx = np.arange(num_points.sum()) + np.repeat(offsets[:, 0] - first_point_idx, num_points)
+            if self.use_shared_memory:
+                gt_database_data = SharedArray.attach(f"shm://{self.gt_database_data_key}")
+                gt_database_data.setflags(write=0)
+                obj_points = gt_database_data[point_idx]
+            else:
+                packed_db_data = self.get_packed_db_data()
+                if len(packed_db_data) == 1:
+                    obj_points = np.asarray(packed_db_data[0][point_idx])
+                else:
+                    db_idx = np.repeat([info['global_data_idx'] for info in sampled_dict], num_points)
+                    obj_points = np.zeros((point_idx.shape[0], packed_db_data[0].shape[1]), dtype=np.float32)
+                    for cur_db_idx, cur_db_data in enumerate(packed_db_data):
+                        cur_mask = db_idx == cur_db_idx
+                        if cur_mask.any():
+                            obj_points[cur_mask] = cur_db_data[point_idx[cur_mask]]
+        else:
+            obj_points_list = [
+                np.fromfile(str(self.root_path / info['path']), dtype=np.float32).reshape(
+                    [-1, self.sampler_cfg.NUM_POINT_FEATURES]) for info in sampled_dict
+            ]
+            obj_points_idx = np.repeat(np.arange(len(sampled_dict)), [len(x) for x in obj_points_list])
+            obj_points = np.concatenate(obj_points_list, axis=0)
+        return obj_points, obj_points_idx
+
     @staticmethod
     def put_boxes_on_road_planes(gt_boxes, road_planes, calib):
         """
@@ -241,62 +310,52 @@ class DataBaseSampler(object):
             data_dict.pop('calib')
             data_dict.pop('road_plane')
 
-        obj_points_list, obj_index_list, crop_boxes2d = [], [], []
+        crop_boxes2d = []
         # convert sampled 3D boxes to image plane
         if self.aug_with_img:
             gt_boxes2d = data_dict['gt_boxes2d'][gt_boxes_mask].astype(np.int)
             gt_crops2d = [data_dict['images'][_x[1]:_x[3],_x[0]:_x[2]] for _x in gt_boxes2d]
-        if self.use_shared_memory:
-            gt_database_data = SharedArray.attach(f"shm://{self.gt_database_data_key}")
-            gt_database_data.setflags(write=0)
-        else:
-            gt_database_data = None 
 
-        for idx, info in enumerate(total_valid_sampled_dict):
-            if self.use_shared_memory:
-                start_offset, end_offset = info['global_data_offset']
-                obj_points = copy.deepcopy(gt_database_data[start_offset:end_offset])
-            else:
-                file_path = self.root_path / info['path']
-
-                obj_points = np.fromfile(str(file_path), dtype=np.float32).reshape(
-                    [-1, self.sampler_cfg.NUM_POINT_FEATURES])
+        timer = self.stage_timer.time()
+        obj_points, obj_points_idx = self.load_sampled_points(total_valid_sampled_dict)
+        timer = self.stage_timer.update('load_points', timer)
 
-            obj_points[:, :3] += info['box3d_lidar'][:3]
+        sampled_centers = np.stack([info['box3d_lidar'][:3] for info in total_valid_sampled_dict], axis=0)
+        obj_points[:, :3] += sampled_centers[obj_points_idx]
+        if self.sampler_cfg.get('USE_ROAD_PLANE', False):
+            # mv height
+            obj_points[:, 2] -= np.asarray(mv_height)[obj_points_idx]
 
-            if self.sampler_cfg.get('USE_ROAD_PLANE', False):
-                # mv height
-                obj_points[:, 2] -= mv_height[idx]
+        if self.aug_with_img:
+            num_obj_points = np.bincount(obj_points_idx, minlength=len(total_valid_sampled_dict))
+            obj_points_end = np.cumsum(num_obj_points)
+            obj_points_start = obj_points_end - num_obj_points
+            for idx, info in enumerate(total_valid_sampled_dict):
+                # view of the points of this object, edited in place
+                obj_points_view = obj_points[obj_points_start[idx]:obj_points_end[idx]]
 
-            if self.aug_with_img:
                 calib_file = kitti_common.get_calib_path(int(info['image_idx']), self.root_path, relative_path=False)
-                sampled_calib = calibration_kitti.Calibration(calib_file)
-                points_2d, depth_2d = sampled_calib.lidar_to_img(obj_points[:,:3])
-
-            if self.point_refine:
-                # align calibration metrics for points
-                points_ract = data_dict['calib'].img_to_rect(points_2d[:,0], points_2d[:,1], depth_2d)
-                points_lidar = data_dict['calib'].rect_to_lidar(points_ract)
-                obj_points[:, :3] = points_lidar
-                # align calibration metrics for boxes
-                box3d_raw = sampled_gt_boxes[idx].reshape(1,-1)
-                box3d_coords = box_utils.boxes_to_corners_3d(box3d_raw)[0]
-                box3d_box, box3d_depth = sampled_calib.lidar_to_img(box3d_coords)
-                box3d_coord_rect = data_dict['calib'].img_to_rect(box3d_box[:,0], box3d_box[:,1], box3d_depth)
-                box3d_rect = box_utils.corners_rect_to_camera(box3d_coord_rect).reshape(1,-1)
-                box3d_lidar = box_utils.boxes3d_kitti_camera_to_lidar(box3d_rect, data_dict['calib'])
-                box2d = box_utils.boxes3d_kitti_camera_to_imageboxes(box3d_rect, data_dict['calib'], 
-                                                                     data_dict['images'].shape[:2])
-                sampled_gt_boxes[idx] = box3d_lidar[0]
-                sampled_gt_boxes2d[idx] = box2d[0]
-
-
-            obj_idx = idx * np.ones(len(obj_points), dtype=np.int)
-            obj_points_list.append(obj_points)
-            obj_index_list.append(obj_idx)
-
-            # copy crops from images
-            if self.aug_with_img:
+                sampled_calib = calibration_kitti.get_calib_cached(str(calib_file))
+                points_2d, depth_2d = sampled_calib.lidar_to_img(obj_points_view[:,:3])
+
+                if self.point_refine:
+                    # align calibration metrics for points
+                    points_ract = data_dict['calib'].img_to_rect(points_2d[:,0], points_2d[:,1], depth_2d)
+                    points_lidar = data_dict['calib'].rect_to_lidar(points_ract)
+                    obj_points_view[:, :3] = points_lidar
+                    # align calibration metrics for boxes
+                    box3d_raw = sampled_gt_boxes[idx].reshape(1,-1)
+                    box3d_coords = box_utils.boxes_to_corners_3d(box3d_raw)[0]
+                    box3d_box, box3d_depth = sampled_calib.lidar_to_img(box3d_coords)
+                    box3d_coord_rect = data_dict['calib'].img_to_rect(box3d_box[:,0], box3d_box[:,1], box3d_depth)
+                    box3d_rect = box_utils.corners_rect_to_camera(box3d_coord_rect).reshape(1,-1)
+                    box3d_lidar = box_utils.boxes3d_kitti_camera_to_lidar(box3d_rect, data_dict['calib'])
+                    box2d = box_utils.boxes3d_kitti_camera_to_imageboxes(box3d_rect, data_dict['calib'], 
+                                                                         data_dict['images'].shape[:2])
+                    sampled_gt_boxes[idx] = box3d_lidar[0]
+                    sampled_gt_boxes2d[idx] = box2d[0]
+
+                # copy crops from images
                 img_path = self.root_path / self.sampler_cfg.IMG_ROOT_PATH / (info['image_idx']+'.png')
                 raw_image = io.imread(img_path)
                 raw_image = raw_image.astype(np.float32)
@@ -315,10 +374,8 @@ class DataBaseSampler(object):
 
                 crop_boxes2d.append(new_box)
                 gt_crops2d.append(img_crop2d) 
+        timer = self.stage_timer.update('transform_points', timer)
 
-
-        obj_points = np.concatenate(obj_points_list, axis=0)
-        obj_points_idx = np.concatenate(obj_index_list, axis=0)
         sampled_gt_names = np.array([x['name'] for x in total_valid_sampled_dict])
 
         large_sampled_gt_boxes = box_utils.enlarge_box3d(
@@ -340,8 +397,73 @@ class DataBaseSampler(object):
         if self.sampler_cfg.get('USE_ROAD_PLANE', False) and self.aug_with_img:
             # data_dict.pop('calib')
             data_dict.pop('road_plane')
+        self.stage_timer.update('paste', timer)
         return data_dict
 
+    def filter_sampled_boxes(self, data_dict, sampled_boxes, sampled_class_idx):
+        """
+        Collision check of the sampled boxes of all the classes in one pass. A sampled box is kept if it does not
+        overlap (BEV) with the existing boxes, with the other sampled boxes of its class, and with the boxes kept
+        for the classes before it, which is the result of checking the classes one after another.
+
+        Args:
+            data_dict:
+            sampled_boxes: (M, 7 + C), boxes of all the classes in the order of self.sample_groups
+            sampled_class_idx: (M)
+
+        Returns:
+            valid_mask: (M)
+            sampled_boxes: (M, 7 + C), put on the road planes if USE_ROAD_PLANE
+            mv_height: (M) or None
+            sampled_boxes2d: (M, 4) or None
+        """
+        existed_boxes = data_dict['gt_boxes']
+        num_sampled = sampled_boxes.shape[0]
+        same_class = sampled_class_idx[:, None] == sampled_class_idx[None, :]
+
+        iou_sampled = iou3d_nms_utils.boxes_bev_iou_cpu(sampled_boxes[:, 0:7], sampled_boxes[:, 0:7])
+        iou_sampled[range(num_sampled), range(num_sampled)] = 0
+        # overlaps are looked up within the class first, as the classes are checked one by one
+        overlap_in_class = (iou_sampled * same_class).max(axis=1) > 0
+        if existed_boxes.shape[0] > 0:
+            iou_existed = iou3d_nms_utils.boxes_bev_iou_cpu(sampled_boxes[:, 0:7], existed_boxes[:, 0:7])
+            valid_mask = ~overlap_in_class & (iou_existed.max(axis=1) == 0)
+        else:
+            valid_mask = ~overlap_in_class
+
+        mv_height = None
+        if self.sampler_cfg.get('USE_ROAD_PLANE', False):
+            sampled_boxes, mv_height = self.put_boxes_on_road_planes(
+                sampled_boxes, data_dict['road_plane'], data_dict['calib']
+            )
+
+        sampled_boxes2d = None
+        if self.aug_with_img:
+            # filter out box2d iou > thres
+            boxes3d_camera = box_utils.boxes3d_lidar_to_kitti_camera(sampled_boxes, data_dict['calib'])
+            sampled_boxes2d = box_utils.boxes3d_kitti_camera_to_imageboxes(boxes3d_camera, data_dict['calib'], 
+                                                                           data_dict['images'].shape[:2])
+            sampled_boxes2d = torch.Tensor(sampled_boxes2d)
+            existed_boxes2d = torch.Tensor(data_dict['gt_boxes2d'])
+            iou2d_sampled = box2d_utils.pairwise_iou(sampled_boxes2d, sampled_boxes2d).cpu().numpy()
+            iou2d_sampled[range(num_sampled), range(num_sampled)] = 0
+            iou2d_sampled_max = (iou2d_sampled * same_class).max(axis=1)
+            if existed_boxes2d.shape[0] > 0:
+                iou2d_existed_max = box2d_utils.pairwise_iou(sampled_boxes2d, existed_boxes2d).cpu().numpy().max(axis=1)
+            else:
+                iou2d_existed_max = iou2d_sampled_max
+            valid_mask &= (iou2d_existed_max < self.box_iou_thres) & (iou2d_sampled_max < self.box_iou_thres)
+            sampled_boxes2d = sampled_boxes2d.cpu().numpy()
+
+        # the boxes kept for the previous classes are existing boxes for the next ones
+        overlap_sampled = iou_sampled > 0
+        kept_mask = np.zeros(num_sampled, dtype=np.bool_)
+        for class_idx in np.unique(sampled_class_idx):
+            cur_mask = valid_mask & (sampled_class_idx == class_idx)
+            cur_mask &= ~overlap_sampled[:, kept_mask].any(axis=1)
+            kept_mask |= cur_mask
+        return kept_mask, sampled_boxes, mv_height, sampled_boxes2d
+
     def __call__(self, data_dict):
         """
         Args:
@@ -351,74 +473,87 @@ class DataBaseSampler(object):
         Returns:
 
         """
-        gt_boxes = data_dict['gt_boxes']
+        timer = self.stage_timer.time()
         gt_names = data_dict['gt_names'].astype(str)
-        existed_boxes = gt_boxes
-        total_valid_sampled_dict = []
-        sampled_mv_height = []
-        sampled_gt_boxes2d = []
-        for class_name, sample_group in self.sample_groups.items():
+        sampled_dict, sampled_class_idx = [], []
+        for class_idx, (class_name, sample_group) in enumerate(self.sample_groups.items()):
             if self.limit_whole_scene:
                 num_gt = np.sum(class_name == gt_names)
                 sample_group['sample_num'] = str(int(self.sample_class_num[class_name]) - num_gt)
             if int(sample_group['sample_num']) > 0:
-                sampled_dict = self.sample_with_fixed_number(class_name, sample_group)
-
-                sampled_boxes = np.stack([x['box3d_lidar'] for x in sampled_dict], axis=0).astype(np.float32)
-
-                if self.sampler_cfg.get('DATABASE_WITH_FAKELIDAR', False):
-                    sampled_boxes = box_utils.boxes3d_kitti_fakelidar_to_lidar(sampled_boxes)
-
-                iou1 = iou3d_nms_utils.boxes_bev_iou_cpu(sampled_boxes[:, 0:7], existed_boxes[:, 0:7])
-                iou2 = iou3d_nms_utils.boxes_bev_iou_cpu(sampled_boxes[:, 0:7], sampled_boxes[:, 0:7])
-                iou2[range(sampled_boxes.shape[0]), range(sampled_boxes.shape[0])] = 0
-                iou1 = iou1 if iou1.shape[1] > 0 else iou2
-                valid_mask = ((iou1.max(axis=1) + iou2.max(axis=1)) == 0).nonzero()[0]
-                # filter out box2d iou > thres
-                if self.sampler_cfg.get('USE_ROAD_PLANE', False):
-                    sampled_boxes, mv_height = self.put_boxes_on_road_planes(
-                        sampled_boxes, data_dict['road_plane'], data_dict['calib']
-                    )
-                    
-                if self.aug_with_img:
-                    # sampled_boxes2d = np.stack([x['bbox'] for x in sampled_dict], axis=0).astype(np.float32)
-                    boxes3d_camera = box_utils.boxes3d_lidar_to_kitti_camera(sampled_boxes, data_dict['calib'])
-                    sampled_boxes2d = box_utils.boxes3d_kitti_camera_to_imageboxes(boxes3d_camera, data_dict['calib'], 
-                                                                                   data_dict['images'].shape[:2])
-                    sampled_boxes2d = torch.Tensor(sampled_boxes2d)
-                    existed_boxes2d = torch.Tensor(data_dict['gt_boxes2d'])
-                    iou2d1 = box2d_utils.pairwise_iou(sampled_boxes2d, existed_boxes2d).cpu().numpy()
-                    iou2d2 = box2d_utils.pairwise_iou(sampled_boxes2d, sampled_boxes2d).cpu().numpy()
-                    iou2d2[range(sampled_boxes2d.shape[0]), range(sampled_boxes2d.shape[0])] = 0
-                    iou2d1 = iou2d1 if iou2d1.shape[1] > 0 else iou2d2
-                    
-                    valid_mask = ((iou2d1.max(axis=1)<self.box_iou_thres) & 
-                                 (iou2d2.max(axis=1)<self.box_iou_thres) & 
-                                 ((iou1.max(axis=1) + iou2.max(axis=1)) == 0)).nonzero()[0]
-
-                    sampled_boxes2d = sampled_boxes2d[valid_mask].cpu().numpy()
-                    sampled_gt_boxes2d.append(sampled_boxes2d)
-                valid_sampled_dict = [sampled_dict[x] for x in valid_mask]
-                valid_sampled_boxes = sampled_boxes[valid_mask]
-                
-                if self.sampler_cfg.get('USE_ROAD_PLANE', False):
-                    mv_height = mv_height[valid_mask]
-                    sampled_mv_height = np.concatenate((sampled_mv_height, mv_height), axis=0)
-
-                existed_boxes = np.concatenate((existed_boxes, valid_sampled_boxes), axis=0)
-                #sampled_mv_height = np.concatenate((sampled_mv_height, mv_height), axis=0)
-                total_valid_sampled_dict.extend(valid_sampled_dict)
-
-        sampled_gt_boxes = existed_boxes[gt_boxes.shape[0]:, :]
-        if len(sampled_gt_boxes2d) > 0:
-            sampled_gt_boxes2d = np.concatenate(sampled_gt_boxes2d, axis=0)
-
-        if total_valid_sampled_dict.__len__() > 0:
-            data_dict = self.add_sampled_boxes_to_scene(data_dict, 
-                                                        sampled_gt_boxes, 
-                                                        sampled_mv_height, 
-                                                        sampled_gt_boxes2d,
-                                                        total_valid_sampled_dict)
+                cur_sampled_dict = self.sample_with_fixed_number(class_name, sample_group)
+                sampled_dict.extend(cur_sampled_dict)
+                sampled_class_idx.extend([class_idx] * len(cur_sampled_dict))
+        timer = self.stage_timer.update('sample', timer)
+
+        if sampled_dict.__len__() > 0:
+            sampled_boxes = np.stack([x['box3d_lidar'] for x in sampled_dict], axis=0).astype(np.float32)
+
+            if self.sampler_cfg.get('DATABASE_WITH_FAKELIDAR', False):
+                sampled_boxes = box_utils.boxes3d_kitti_fakelidar_to_lidar(sampled_boxes)
+
+            valid_mask, sampled_boxes, mv_height, sampled_boxes2d = self.filter_sampled_boxes(
+                data_dict, sampled_boxes, np.array(sampled_class_idx)
+            )
+            timer = self.stage_timer.update('collision_check', timer)
+
+            total_valid_sampled_dict = [sampled_dict[x] for x in valid_mask.nonzero()[0]]
+            if total_valid_sampled_dict.__len__() > 0:
+                data_dict = self.add_sampled_boxes_to_scene(
+                    data_dict,
+                    sampled_boxes[valid_mask],
+                    mv_height[valid_mask] if mv_height is not None else [],
+                    sampled_boxes2d[valid_mask] if sampled_boxes2d is not None else [],
+                    total_valid_sampled_dict
+                )
+
+        if self.time_report_interval > 0 and self.stage_timer.count('sample') % self.time_report_interval == 0 \
+                and self.logger is not None:
+            self.logger.info('DataBaseSampler stage time: %s' % self.stage_timer.report())
 
         data_dict.pop('gt_boxes_mask')
         return data_dict
+
+
+def pack_gt_database(root_path, db_info_path, db_data_path, num_point_features):
+    """
+    Packs a gt database of per-object .bin files into a single float32 (N, C) .npy file, which is read through
+    np.memmap with USE_PACKED_DB. The offsets of the objects are saved to the db infos as 'global_data_offset'.
+
+    Args:
+        root_path:
+        db_info_path: db infos of the per-object database, updated in place
+        db_data_path: the packed database to be created
+        num_point_features:
+
+    Returns:
+
+    """
+    root_path = Path(root_path)
+    with open(root_path / db_info_path, 'rb') as f:
+        all_db_infos = pickle.load(f)
+
+    # offsets come from the file sizes, then the objects are copied one by one without loading the whole database
+    point_offset_cnt = 0
+    for infos in all_db_infos.values():
+        for info in infos:
+            num_points = os.path.getsize(root_path / info['path']) // (np.dtype(np.float32).itemsize * num_point_features)
+            info['global_data_offset'] = [point_offset_cnt, point_offset_cnt + num_points]
+            point_offset_cnt += num_points
+
+    packed_db_data = np.lib.format.open_memmap(
+        str(root_path / db_data_path), mode='w+', dtype=np.float32, shape=(point_offset_cnt, num_point_features)
+    )
+    for infos in all_db_infos.values():
+        for info in infos:
+            start_offset, end_offset = info['global_data_offset']
+            packed_db_data[start_offset:end_offset] = np.fromfile(
+                str(root_path / info['path']), dtype=np.float32).reshape([-1, num_point_features])
+    packed_db_data.flush()
+    del packed_db_data
+
+    with open(root_path / db_info_path, 'wb') as f:
+        pickle.dump(all_db_infos, f)
+    for k, v in all_db_infos.items():
+        print('Database %s: %d' % (k, len(v)))
+    print('Packed database %s: %d points' % (db_data_path, point_offset_cnt))
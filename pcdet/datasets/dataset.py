@@ -2,13 +2,13 @@ from collections import defaultdict
 from pathlib import Path
 
 import numpy as np
+import torch
 import torch.utils.data as torch_data
 
 from ..utils import common_utils
 from .augmentor.data_augmentor import DataAugmentor
 from .processor.data_processor import DataProcessor
 from .processor.point_feature_encoder import PointFeatureEncoder
-import copy
 
 class DatasetTemplate(torch_data.Dataset):
     def __init__(self, dataset_cfg=None, class_names=None, training=True, root_path=None, logger=None):
@@ -124,18 +124,19 @@ class DatasetTemplate(torch_data.Dataset):
             assert 'gt_boxes' in data_dict, 'gt_boxes should be provided for training'
             gt_boxes_mask = np.array([n in self.class_names for n in data_dict['gt_names']], dtype=np.bool_)
 
-            calib = data_dict['calib']
-            points_before_aug = copy.deepcopy(data_dict['points'])
-            data_dict['points_before_aug'] = points_before_aug
+            calib = data_dict.get('calib', None)
+            if self.dataset_cfg.get('KEEP_POINTS_BEFORE_AUG', False):
+                # the loaded array is kept as it is, the augmentors (some of them work in place) get a copy
+                data_dict['points_before_aug'] = data_dict['points']
+                data_dict['points'] = data_dict['points'].copy()
             data_dict = self.data_augmentor.forward(
                 data_dict={
                     **data_dict,
                     'gt_boxes_mask': gt_boxes_mask
                 }
             )
-            data_dict['calib'] = calib
-            points_after_aug = copy.deepcopy(data_dict['points'])
-            points_before_aug = data_dict['points_before_aug']
+            if calib is not None:
+                data_dict['calib'] = calib
         if data_dict.get('gt_boxes', None) is not None:
             selected = common_utils.keep_arrays_by_name(data_dict['gt_names'], self.class_names)
             data_dict['gt_boxes'] = data_dict['gt_boxes'][selected]
@@ -162,6 +163,26 @@ class DatasetTemplate(torch_data.Dataset):
 
         return data_dict
 
+    @staticmethod
+    def collate_point_to_voxel(point_to_voxel_list, voxel_coords_list):
+        """
+        Args:
+            point_to_voxel_list: list of (N_i), voxel of each point of the samples, -1 out of the range
+            voxel_coords_list: list of (num_voxels_i, 3)
+
+        Returns:
+            point_to_voxel: (N), indices in the concatenated voxels of the batch, -1 is kept
+        """
+        voxel_offsets = np.cumsum([0] + [len(x) for x in voxel_coords_list[:-1]])
+        point_to_voxel = np.empty(sum([len(x) for x in point_to_voxel_list]), dtype=np.int64)
+        start = 0
+        for k, cur_point_to_voxel in enumerate(point_to_voxel_list):
+            point_to_voxel[start:start + len(cur_point_to_voxel)] = np.where(
+                cur_point_to_voxel >= 0, cur_point_to_voxel + voxel_offsets[k], -1
+            )
+            start += len(cur_point_to_voxel)
+        return point_to_voxel
+
     @staticmethod
     def collate_batch(batch_list, _unused=False):
         data_dict = defaultdict(list)
@@ -241,6 +262,8 @@ class DatasetTemplate(torch_data.Dataset):
                     ret[key] = np.stack(points, axis=0)
                 elif key in ["point2img"]:
                     ret[key] = np.concatenate(val, axis=0)
+                elif key in ['point_to_voxel']:
+                    ret[key] = DatasetTemplate.collate_point_to_voxel(val, data_dict['voxel_coords'])
                 else:
                     ret[key] = np.stack(val, axis=0)
             except:
@@ -249,3 +272,73 @@ class DatasetTemplate(torch_data.Dataset):
 
         ret['batch_size'] = batch_size
         return ret
+
+    @staticmethod
+    def collate_batch_preallocated(batch_list, _unused=False, to_torch=False):
+        """
+        Same outputs as collate_batch, but each batch array is allocated once with the dtype of the samples and
+        the samples are written into its slices, instead of padding every sample and concatenating the copies.
+
+        Args:
+            batch_list: list of data_dict
+            to_torch: return the numeric arrays as torch tensors sharing their memory, so that the DataLoader
+                pins them (pin_memory=True) and load_data_to_gpu only has one asynchronous copy per key
+
+        Returns:
+            batch_dict:
+        """
+        data_dict = defaultdict(list)
+        for cur_sample in batch_list:
+            for key, val in cur_sample.items():
+                data_dict[key].append(val)
+        batch_size = len(batch_list)
+        ret = {}
+
+        for key, val in data_dict.items():
+            try:
+                if key in ['voxels', 'voxel_num_points', 'point2img']:
+                    ret[key] = np.concatenate(val, axis=0)
+                elif key in ['points', 'voxel_coords', 'points_before_aug']:
+                    num_rows = [len(x) for x in val]
+                    batch_array = np.empty((sum(num_rows), val[0].shape[-1] + 1), dtype=np.result_type(*val))
+                    start = 0
+                    for i, coor in enumerate(val):
+                        batch_array[start:start + num_rows[i], 0] = i
+                        batch_array[start:start + num_rows[i], 1:] = coor
+                        start += num_rows[i]
+                    ret[key] = batch_array
+                elif key in ['gt_boxes', 'gt_boxes2d', 'points_2d']:
+                    max_len = max([len(x) for x in val])
+                    dtype = np.float32 if key in ['gt_boxes', 'gt_boxes2d'] else np.result_type(*val)
+                    batch_array = np.zeros((batch_size, max_len, val[0].shape[-1]), dtype=dtype)
+                    for k in range(batch_size):
+                        if val[k].size > 0:
+                            batch_array[k, :len(val[k])] = val[k]
+                    ret[key] = batch_array
+                elif key in ['images', 'depth_maps']:
+                    # padded with zeros at the bottom and right as in collate_batch, only the padding is zeroed
+                    max_h = max([image.shape[0] for image in val])
+                    max_w = max([image.shape[1] for image in val])
+                    batch_array = np.empty((batch_size, max_h, max_w) + val[0].shape[2:], dtype=np.result_type(*val))
+                    for k, image in enumerate(val):
+                        batch_array[k, :image.shape[0], :image.shape[1]] = image
+                        batch_array[k, image.shape[0]:] = 0
+                        batch_array[k, :image.shape[0], image.shape[1]:] = 0
+                    ret[key] = batch_array
+                elif key in ['calib']:
+                    ret[key] = val
+                elif key in ['point_to_voxel']:
+                    ret[key] = DatasetTemplate.collate_point_to_voxel(val, data_dict['voxel_coords'])
+                else:
+                    ret[key] = np.stack(val, axis=0)
+            except:
+                print('Error in collate_batch_preallocated: key=%s' % key)
+                raise TypeError
+
+        if to_torch:
+            for key, val in ret.items():
+                if isinstance(val, np.ndarray) and (val.dtype.kind in 'bif' or val.dtype == np.uint8):
+                    ret[key] = torch.from_numpy(val)
+
+        ret['batch_size'] = batch_size
+        return ret
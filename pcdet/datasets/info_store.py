@@ -0,0 +1,232 @@
+import copy
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+
+class InfoStore(object):
+    """
+    Columnar store of the per-sample info dicts (e.g. kitti_infos_train.pkl). Each leaf of the nested info dicts
+    is saved as one .npy column, so the infos are memory-mapped and shared by the dataloader workers instead of
+    being held as millions of python objects that get copied page by page as their refcounts change.
+
+    Kinds of columns:
+        fixed: arrays of the same shape in all the samples, stacked to (N, ...)
+        ragged: arrays with a variable first dim (e.g. annos), concatenated with (N + 1) offsets
+        scalar: python or numpy scalars (int, float, str, ...), stacked to (N)
+        object: anything else, saved as a pickled object array (not memory-mapped)
+    """
+    COLUMN_INFO_FILE = 'columns.pkl'
+
+    def __init__(self, store_paths, sample_indices=None):
+        """
+        Args:
+            store_paths: path or list of paths of the stores written by InfoStore.create, read as one
+            sample_indices: (M) the samples of the stores seen through this one (e.g. every k-th), all by default
+        """
+        if not isinstance(store_paths, (list, tuple)):
+            store_paths = [store_paths]
+
+        self.store_paths = store_paths
+        self.sample_indices = sample_indices
+        self.column_infos = None
+        self.parts = []
+        for store_path in store_paths:
+            store_path = Path(store_path)
+            with open(store_path / self.COLUMN_INFO_FILE, 'rb') as f:
+                meta = pickle.load(f)
+            assert self.column_infos is None or self.column_infos == meta['columns'], \
+                'Inconsistent columns in %s' % store_path
+            self.column_infos = meta['columns']
+
+            columns = {}
+            for key, kind, _ in self.column_infos:
+                column_file = store_path / ('%s.npy' % '.'.join(key))
+                if kind == 'object':
+                    columns[key] = np.load(column_file, allow_pickle=True)
+                else:
+                    columns[key] = np.load(column_file, mmap_mode='r')
+                if kind == 'ragged':
+                    columns[key + ('offsets',)] = np.load(store_path / ('%s.offsets.npy' % '.'.join(key)))
+            self.parts.append((meta['num_samples'], columns))
+
+        self.part_offsets = np.cumsum([0] + [num_samples for num_samples, _ in self.parts])
+
+    def __getstate__(self):
+        # the columns are memory-mapped again after unpickling instead of being copied with the store
+        return {'store_paths': self.store_paths, 'sample_indices': self.sample_indices}
+
+    def __setstate__(self, d):
+        self.__init__(d['store_paths'], sample_indices=d['sample_indices'])
+
+    def __len__(self):
+        if self.sample_indices is not None:
+            return len(self.sample_indices)
+        return int(self.part_offsets[-1])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        """
+        Args:
+            index: int, or a slice to get an InfoStore of a subset of the samples (e.g. infos[::interval])
+
+        Returns:
+            info: nested dict as in the source infos, the arrays are copies owned by the caller
+        """
+        if isinstance(index, slice):
+            return self.get_subset(np.arange(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('InfoStore index %d out of range' % index)
+        if self.sample_indices is not None:
+            index = int(self.sample_indices[index])
+        part_idx = np.searchsorted(self.part_offsets, index, side='right') - 1
+        columns = self.parts[part_idx][1]
+        index = index - self.part_offsets[part_idx]
+
+        info = {}
+        for key, kind, scalar_type in self.column_infos:
+            column = columns[key]
+            if kind == 'ragged':
+                offsets = columns[key + ('offsets',)]
+                value = np.array(column[offsets[index]:offsets[index + 1]])
+            elif kind == 'fixed':
+                value = np.array(column[index])
+            elif kind == 'scalar':
+                value = column[index]
+                # numpy scalars are kept as they are, python ones are converted back
+                value = value.item() if scalar_type is not None else value
+            else:
+                value = copy.deepcopy(column[index])
+
+            cur_dict = info
+            for sub_key in key[:-1]:
+                cur_dict = cur_dict.setdefault(sub_key, {})
+            cur_dict[key[-1]] = value
+        return info
+
+    def get_subset(self, indices):
+        """
+        Args:
+            indices: (M) indices of the samples of this store
+
+        Returns:
+            subset: InfoStore sharing the memory-mapped columns of this one
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        subset = copy.copy(self)
+        subset.sample_indices = self.sample_indices[indices] if self.sample_indices is not None else indices
+        return subset
+
+    @staticmethod
+    def flatten_info(info, prefix=()):
+        flat_info = {}
+        for key, value in info.items():
+            if isinstance(value, dict) and len(value) > 0:
+                flat_info.update(InfoStore.flatten_info(value, prefix + (key,)))
+            else:
+                flat_info[prefix + (key,)] = value
+        return flat_info
+
+    @staticmethod
+    def get_column_kind(values):
+        if all([isinstance(x, np.ndarray) for x in values]):
+            shapes = set([x.shape for x in values])
+            if len(shapes) == 1:
+                return 'fixed', None
+            # empty arrays (e.g. np.array([]) of a frame without objects) fit any trailing shape
+            non_empty_values = [x for x in values if x.ndim == 0 or x.shape[0] > 0]
+            if all([x.ndim > 0 for x in non_empty_values]) and len(set([x.shape[1:] for x in non_empty_values])) <= 1:
+                return 'ragged', None
+            return 'object', None
+
+        scalar_types = set([type(x) for x in values])
+        if len(scalar_types) == 1:
+            scalar_type = scalar_types.pop()
+            if issubclass(scalar_type, np.generic) and scalar_type is not np.object_:
+                return 'scalar', None
+            if scalar_type in (bool, int, float, str):
+                return 'scalar', scalar_type.__name__
+        return 'object', None
+
+    @staticmethod
+    def create(infos, save_path):
+        """
+        Args:
+            infos: list of nested info dicts, all with the same keys
+            save_path: directory of the store
+
+        Returns:
+
+        """
+        save_path = Path(save_path)
+        save_path.mkdir(parents=True, exist_ok=True)
+
+        flat_infos = [InfoStore.flatten_info(info) for info in infos]
+        keys = list(flat_infos[0].keys()) if len(flat_infos) > 0 else []
+        for flat_info in flat_infos:
+            if set(flat_info.keys()) != set(keys):
+                raise ValueError('InfoStore needs the same keys in all the infos, got %s and %s' % (
+                    sorted(keys), sorted(flat_info.keys())))
+
+        column_infos = []
+        for key in keys:
+            values = [flat_info[key] for flat_info in flat_infos]
+            kind, scalar_type = InfoStore.get_column_kind(values)
+            column_file = save_path / ('%s.npy' % '.'.join(key))
+
+            if kind == 'fixed':
+                np.save(column_file, np.stack(values, axis=0))
+            elif kind == 'ragged':
+                # empty arrays (e.g. frames without objects) may have a different dtype than the others
+                non_empty_values = [x for x in values if x.shape[0] > 0]
+                dtype = np.result_type(*non_empty_values) if len(non_empty_values) > 0 else values[0].dtype
+                trailing_shape = non_empty_values[0].shape[1:] if len(non_empty_values) > 0 else values[0].shape[1:]
+                offsets = np.cumsum([0] + [x.shape[0] for x in values]).astype(np.int64)
+                np.save(column_file, np.concatenate(
+                    [x.astype(dtype).reshape((x.shape[0],) + trailing_shape) for x in values], axis=0
+                ))
+                np.save(save_path / ('%s.offsets.npy' % '.'.join(key)), offsets)
+            elif kind == 'scalar':
+                np.save(column_file, np.array(values))
+            else:
+                object_values = np.empty(len(values), dtype=object)
+                for idx, value in enumerate(values):
+                    object_values[idx] = value
+                np.save(column_file, object_values, allow_pickle=True)
+            column_infos.append((key, kind, scalar_type))
+
+        with open(save_path / InfoStore.COLUMN_INFO_FILE, 'wb') as f:
+            pickle.dump({'columns': column_infos, 'num_samples': len(infos)}, f)
+
+
+def convert_info_file(info_path, save_path=None):
+    """
+    Converts an info file (list of info dicts in a .pkl) to an InfoStore, saved next to it without the suffix
+    by default, e.g. kitti_infos_train.pkl => kitti_infos_train/
+
+    Args:
+        info_path:
+        save_path:
+
+    Returns:
+        save_path:
+    """
+    info_path = Path(info_path)
+    save_path = Path(save_path) if save_path is not None else info_path.with_suffix('')
+    with open(info_path, 'rb') as f:
+        infos = pickle.load(f)
+    InfoStore.create(infos, save_path)
+    print('InfoStore of %d samples is saved to %s' % (len(infos), save_path))
+    return save_path
+
+
+if __name__ == '__main__':
+    import sys
+    for cur_info_path in sys.argv[1:]:
+        convert_info_file(cur_info_path)
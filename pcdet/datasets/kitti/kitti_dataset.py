@@ -1,13 +1,19 @@
 import copy
+import multiprocessing
+import os
 import pickle
+import time
+from functools import partial
+from pathlib import Path
 
 import numpy as np
 from skimage import io
+from tqdm import tqdm
 
 from . import kitti_utils
-from ...ops.roiaware_pool3d import roiaware_pool3d_utils
 from ...utils import box_utils, calibration_kitti, common_utils, object3d_kitti
 from ..dataset import DatasetTemplate
+from ..info_store import InfoStore
 
 
 class KittiDataset(DatasetTemplate):
@@ -37,15 +43,19 @@ class KittiDataset(DatasetTemplate):
             self.logger.info('Loading KITTI dataset')
         kitti_infos = []
 
-        for info_path in self.dataset_cfg.INFO_PATH[mode]:
-            info_path = self.root_path / info_path
-            if not info_path.exists():
-                continue
-            with open(info_path, 'rb') as f:
-                infos = pickle.load(f)
-                kitti_infos.extend(infos)
+        info_paths = [self.root_path / x for x in self.dataset_cfg.INFO_PATH[mode]]
+        info_paths = [x for x in info_paths if x.exists()]
+        if len(info_paths) > 0 and all([x.is_dir() for x in info_paths]):
+            # columnar infos (see info_store.py), memory-mapped instead of unpickled
+            kitti_infos = InfoStore(info_paths)
+            self.kitti_infos = kitti_infos
+        else:
+            for info_path in info_paths:
+                with open(info_path, 'rb') as f:
+                    infos = pickle.load(f)
+                    kitti_infos.extend(infos)
 
-        self.kitti_infos.extend(kitti_infos)
+            self.kitti_infos.extend(kitti_infos)
 
         if self.logger is not None:
             self.logger.info('Total samples for KITTI dataset: %d' % (len(kitti_infos)))
@@ -109,7 +119,7 @@ class KittiDataset(DatasetTemplate):
         calib_file = self.root_split_path / 'calib' / ('%s.txt' % idx)
         # print("calib_file ： ", calib_file)
         assert calib_file.exists()
-        return calibration_kitti.Calibration(calib_file)
+        return calibration_kitti.get_calib_cached(str(calib_file))
 
     def get_road_plane(self, idx):
         plane_file = self.root_split_path / 'planes' / ('%s.txt' % idx)
@@ -148,95 +158,156 @@ class KittiDataset(DatasetTemplate):
 
         return pts_valid_flag
 
-    def get_infos(self, num_workers=4, has_label=True, count_inside_pts=True, sample_id_list=None):
-        import concurrent.futures as futures
-
-        def process_single_scene(sample_idx):
-            print('%s sample_idx: %s' % (self.split, sample_idx))
-            info = {}
-            pc_info = {'num_features': 4, 'lidar_idx': sample_idx}
-            info['point_cloud'] = pc_info
-
-            image_info = {'image_idx': sample_idx, 'image_shape': self.get_image_shape(sample_idx)}
-            info['image'] = image_info
-            calib = self.get_calib(sample_idx)
-
-            P2 = np.concatenate([calib.P2, np.array([[0., 0., 0., 1.]])], axis=0)
-            R0_4x4 = np.zeros([4, 4], dtype=calib.R0.dtype)
-            R0_4x4[3, 3] = 1.
-            R0_4x4[:3, :3] = calib.R0
-            V2C_4x4 = np.concatenate([calib.V2C, np.array([[0., 0., 0., 1.]])], axis=0)
-            calib_info = {'P2': P2, 'R0_rect': R0_4x4, 'Tr_velo_to_cam': V2C_4x4}
-
-            info['calib'] = calib_info
-
-            if has_label:
-                obj_list = self.get_label(sample_idx)
-                annotations = {}
-                annotations['name'] = np.array([obj.cls_type for obj in obj_list])
-                annotations['truncated'] = np.array([obj.truncation for obj in obj_list])
-                annotations['occluded'] = np.array([obj.occlusion for obj in obj_list])
-                annotations['alpha'] = np.array([obj.alpha for obj in obj_list])
-                annotations['bbox'] = np.concatenate([obj.box2d.reshape(1, 4) for obj in obj_list], axis=0)
-                annotations['dimensions'] = np.array([[obj.l, obj.h, obj.w] for obj in obj_list])  # lhw(camera) format
-                annotations['location'] = np.concatenate([obj.loc.reshape(1, 3) for obj in obj_list], axis=0)
-                annotations['rotation_y'] = np.array([obj.ry for obj in obj_list])
-                annotations['score'] = np.array([obj.score for obj in obj_list])
-                annotations['difficulty'] = np.array([obj.level for obj in obj_list], np.int32)
-
-                num_objects = len([obj.cls_type for obj in obj_list if obj.cls_type != 'DontCare'])
-                num_gt = len(annotations['name'])
-                index = list(range(num_objects)) + [-1] * (num_gt - num_objects)
-                annotations['index'] = np.array(index, dtype=np.int32)
-
-                loc = annotations['location'][:num_objects]
-                dims = annotations['dimensions'][:num_objects]
-                rots = annotations['rotation_y'][:num_objects]
-                loc_lidar = calib.rect_to_lidar(loc)
-                l, h, w = dims[:, 0:1], dims[:, 1:2], dims[:, 2:3]
-                loc_lidar[:, 2] += h[:, 0] / 2
-                gt_boxes_lidar = np.concatenate([loc_lidar, l, w, h, -(np.pi / 2 + rots[..., np.newaxis])], axis=1)
-                annotations['gt_boxes_lidar'] = gt_boxes_lidar
-
-                info['annos'] = annotations
-
-                if count_inside_pts:
-                    points = self.get_lidar(sample_idx)
-                    calib = self.get_calib(sample_idx)
-                    pts_rect = calib.lidar_to_rect(points[:, 0:3])
-
-                    fov_flag = self.get_fov_flag(pts_rect, info['image']['image_shape'], calib)
-                    pts_fov = points[fov_flag]
-                    corners_lidar = box_utils.boxes_to_corners_3d(gt_boxes_lidar)
-                    num_points_in_gt = -np.ones(num_gt, dtype=np.int32)
-
-                    for k in range(num_objects):
-                        flag = box_utils.in_hull(pts_fov[:, 0:3], corners_lidar[k])
-                        num_points_in_gt[k] = flag.sum()
-                    annotations['num_points_in_gt'] = num_points_in_gt
-
-            return info
+    def get_single_info(self, sample_idx, has_label=True, count_inside_pts=True):
+        info = {}
+        pc_info = {'num_features': 4, 'lidar_idx': sample_idx}
+        info['point_cloud'] = pc_info
 
+        image_info = {'image_idx': sample_idx, 'image_shape': self.get_image_shape(sample_idx)}
+        info['image'] = image_info
+        calib = self.get_calib(sample_idx)
+
+        P2 = np.concatenate([calib.P2, np.array([[0., 0., 0., 1.]])], axis=0)
+        R0_4x4 = np.zeros([4, 4], dtype=calib.R0.dtype)
+        R0_4x4[3, 3] = 1.
+        R0_4x4[:3, :3] = calib.R0
+        V2C_4x4 = np.concatenate([calib.V2C, np.array([[0., 0., 0., 1.]])], axis=0)
+        calib_info = {'P2': P2, 'R0_rect': R0_4x4, 'Tr_velo_to_cam': V2C_4x4}
+
+        info['calib'] = calib_info
+
+        if has_label:
+            obj_list = self.get_label(sample_idx)
+            annotations = {}
+            annotations['name'] = np.array([obj.cls_type for obj in obj_list])
+            annotations['truncated'] = np.array([obj.truncation for obj in obj_list])
+            annotations['occluded'] = np.array([obj.occlusion for obj in obj_list])
+            annotations['alpha'] = np.array([obj.alpha for obj in obj_list])
+            annotations['bbox'] = np.concatenate([obj.box2d.reshape(1, 4) for obj in obj_list], axis=0)
+            annotations['dimensions'] = np.array([[obj.l, obj.h, obj.w] for obj in obj_list])  # lhw(camera) format
+            annotations['location'] = np.concatenate([obj.loc.reshape(1, 3) for obj in obj_list], axis=0)
+            annotations['rotation_y'] = np.array([obj.ry for obj in obj_list])
+            annotations['score'] = np.array([obj.score for obj in obj_list])
+            annotations['difficulty'] = np.array([obj.level for obj in obj_list], np.int32)
+
+            num_objects = len([obj.cls_type for obj in obj_list if obj.cls_type != 'DontCare'])
+            num_gt = len(annotations['name'])
+            index = list(range(num_objects)) + [-1] * (num_gt - num_objects)
+            annotations['index'] = np.array(index, dtype=np.int32)
+
+            loc = annotations['location'][:num_objects]
+            dims = annotations['dimensions'][:num_objects]
+            rots = annotations['rotation_y'][:num_objects]
+            loc_lidar = calib.rect_to_lidar(loc)
+            l, h, w = dims[:, 0:1], dims[:, 1:2], dims[:, 2:3]
+            loc_lidar[:, 2] += h[:, 0] / 2
+            gt_boxes_lidar = np.concatenate([loc_lidar, l, w, h, -(np.pi / 2 + rots[..., np.newaxis])], axis=1)
+            annotations['gt_boxes_lidar'] = gt_boxes_lidar
+
+            info['annos'] = annotations
+
+            if count_inside_pts:
+                points = self.get_lidar(sample_idx)
+                calib = self.get_calib(sample_idx)
+                pts_rect = calib.lidar_to_rect(points[:, 0:3])
+
+                fov_flag = self.get_fov_flag(pts_rect, info['image']['image_shape'], calib)
+                pts_fov = points[fov_flag]
+                num_points_in_gt = -np.ones(num_gt, dtype=np.int32)
+
+                _, box_idxs_of_pts = box_utils.points_in_boxes3d(pts_fov[:, 0:3], gt_boxes_lidar)
+                num_points_in_gt[:num_objects] = np.bincount(box_idxs_of_pts, minlength=num_objects)
+                annotations['num_points_in_gt'] = num_points_in_gt
+
+        return info
+
+    def get_chunk_infos(self, chunk, has_label=True, count_inside_pts=True, chunk_save_path=None, resume=False):
+        """
+        Args:
+            chunk: (chunk_idx, sample_id_list)
+            has_label:
+            count_inside_pts:
+            chunk_save_path: the infos of the chunk are saved to this directory if given
+            resume: load the infos of the chunk saved by a previous run instead of generating them again
+
+        Returns:
+            infos: list of the infos of the chunk
+        """
+        chunk_idx, sample_id_list = chunk
+        chunk_file = None
+        if chunk_save_path is not None:
+            chunk_file = Path(chunk_save_path) / ('%s_infos_chunk_%05d.pkl' % (self.split, chunk_idx))
+            if resume and chunk_file.exists():
+                with open(chunk_file, 'rb') as f:
+                    chunk_infos = pickle.load(f)
+                if chunk_infos['sample_id_list'] == sample_id_list:
+                    return chunk_infos['infos']
+
+        infos = [self.get_single_info(sample_idx, has_label, count_inside_pts) for sample_idx in sample_id_list]
+        if chunk_file is not None:
+            # written to a temporary file first, so that an interrupted write is never taken as a finished chunk
+            tmp_chunk_file = chunk_file.with_suffix('.tmp')
+            with open(tmp_chunk_file, 'wb') as f:
+                pickle.dump({'sample_id_list': sample_id_list, 'infos': infos}, f)
+            os.replace(str(tmp_chunk_file), str(chunk_file))
+        return infos
+
+    def get_infos(self, num_workers=4, has_label=True, count_inside_pts=True, sample_id_list=None,
+                  use_process_pool=False, chunk_size=100, chunk_save_path=None, resume=False):
+        """
+        Args:
+            num_workers:
+            has_label:
+            count_inside_pts:
+            sample_id_list:
+            use_process_pool: generate the infos in chunks of chunk_size samples with a process pool
+            chunk_size:
+            chunk_save_path: with use_process_pool, the infos of each chunk are saved to this directory
+            resume: with use_process_pool, reuse the chunks saved to chunk_save_path by a previous run
+
+        Returns:
+            infos:
+        """
         sample_id_list = sample_id_list if sample_id_list is not None else self.sample_id_list
-        with futures.ThreadPoolExecutor(num_workers) as executor:
-            infos = executor.map(process_single_scene, sample_id_list)
-        return list(infos)
 
-    def create_groundtruth_database(self, info_path=None, used_classes=None, split='train'):
-        import torch
+        if not use_process_pool:
+            import concurrent.futures as futures
 
-        database_save_path = Path(self.root_path) / ('gt_database' if split == 'train' else ('gt_database_%s' % split))
-        db_info_save_path = Path(self.root_path) / ('kitti_dbinfos_%s.pkl' % split)
+            def process_single_scene(sample_idx):
+                print('%s sample_idx: %s' % (self.split, sample_idx))
+                return self.get_single_info(sample_idx, has_label, count_inside_pts)
 
-        database_save_path.mkdir(parents=True, exist_ok=True)
-        all_db_infos = {}
+            with futures.ThreadPoolExecutor(num_workers) as executor:
+                infos = executor.map(process_single_scene, sample_id_list)
+            return list(infos)
 
-        with open(info_path, 'rb') as f:
-            infos = pickle.load(f)
+        if chunk_save_path is not None:
+            Path(chunk_save_path).mkdir(parents=True, exist_ok=True)
+        chunks = [(chunk_idx, sample_id_list[start:start + chunk_size])
+                  for chunk_idx, start in enumerate(range(0, len(sample_id_list), chunk_size))]
+        get_chunk_infos = partial(
+            _pool_get_chunk_infos, has_label=has_label, count_inside_pts=count_inside_pts,
+            chunk_save_path=chunk_save_path, resume=resume
+        )
+        with multiprocessing.Pool(num_workers, initializer=_init_pool_worker,
+                                  initargs=(self.dataset_cfg, self.class_names, self.root_path, self.split)) as p:
+            chunk_infos = list(tqdm(p.imap(get_chunk_infos, chunks), total=len(chunks),
+                                    desc='%s infos (%d samples per chunk)' % (self.split, chunk_size)))
+        return [info for infos in chunk_infos for info in infos]
 
-        for k in range(len(infos)):
-            print('gt_database sample: %d/%d' % (k + 1, len(infos)))
-            info = infos[k]
+    def get_gt_database_of_infos(self, infos, database_save_path, used_classes=None, save_packed_db=False):
+        """
+        Args:
+            infos: infos of the samples
+            database_save_path:
+            used_classes:
+            save_packed_db: return the points of the objects instead of saving them to files
+
+        Returns:
+            db_list: [(db_info, gt_points)] of the objects in order, gt_points is None if not save_packed_db
+        """
+        db_list = []
+        for info in infos:
             sample_idx = info['point_cloud']['lidar_idx']
             points = self.get_lidar(sample_idx)
             annos = info['annos']
@@ -246,9 +317,10 @@ class KittiDataset(DatasetTemplate):
             gt_boxes = annos['gt_boxes_lidar']
 
             num_obj = gt_boxes.shape[0]
-            point_indices = roiaware_pool3d_utils.points_in_boxes_cpu(
-                torch.from_numpy(points[:, 0:3]), torch.from_numpy(gt_boxes)
-            ).numpy()  # (nboxes, npoints)
+            # same margin as roiaware_pool3d_utils.points_in_boxes_cpu
+            point_idxs, box_idxs = box_utils.points_in_boxes3d(points[:, 0:3], gt_boxes, margin=1e-2)
+            point_indices = np.zeros((num_obj, points.shape[0]), dtype=bool)  # (nboxes, npoints)
+            point_indices[box_idxs, point_idxs] = True
 
             for i in range(num_obj):
                 filename = '%s_%s_%d.bin' % (sample_idx, names[i], i)
@@ -256,24 +328,81 @@ class KittiDataset(DatasetTemplate):
                 gt_points = points[point_indices[i] > 0]
 
                 gt_points[:, :3] -= gt_boxes[i, :3]
-                with open(filepath, 'w') as f:
-                    gt_points.tofile(f)
+                if not save_packed_db:
+                    with open(filepath, 'w') as f:
+                        gt_points.tofile(f)
 
                 if (used_classes is None) or names[i] in used_classes:
-                    db_path = str(filepath.relative_to(self.root_path))  # gt_database/xxxxx.bin
-                    db_info = {'name': names[i], 'path': db_path, 'image_idx': sample_idx, 'gt_idx': i,
+                    db_info = {'name': names[i], 'image_idx': sample_idx, 'gt_idx': i,
                                'box3d_lidar': gt_boxes[i], 'num_points_in_gt': gt_points.shape[0],
                                'difficulty': difficulty[i], 'bbox': bbox[i], 'score': annos['score'][i]}
-                    if names[i] in all_db_infos:
-                        all_db_infos[names[i]].append(db_info)
-                    else:
-                        all_db_infos[names[i]] = [db_info]
+                    if not save_packed_db:
+                        db_info['path'] = str(filepath.relative_to(self.root_path))  # gt_database/xxxxx.bin
+                    db_list.append((db_info, gt_points if save_packed_db else None))
+        return db_list
+
+    def create_groundtruth_database(self, info_path=None, used_classes=None, split='train', save_packed_db=False,
+                                    num_workers=1, chunk_size=100):
+        """
+        Args:
+            info_path:
+            used_classes:
+            split:
+            save_packed_db: save the points of all the objects to one packed .npy file (USE_PACKED_DB of
+                gt_sampling) instead of one .bin file per object
+            num_workers: the samples are processed in chunks of chunk_size by a process pool if num_workers > 1
+            chunk_size:
+
+        Returns:
+
+        """
+        database_save_path = Path(self.root_path) / ('gt_database' if split == 'train' else ('gt_database_%s' % split))
+        db_info_save_path = Path(self.root_path) / ('kitti_dbinfos_%s.pkl' % split)
+        db_data_save_path = Path(self.root_path) / ('%s_global.npy' % database_save_path.name)
+
+        if not save_packed_db:
+            database_save_path.mkdir(parents=True, exist_ok=True)
+        all_db_infos = {}
+        point_offset_cnt = 0
+        stacked_gt_points = []
+
+        with open(info_path, 'rb') as f:
+            infos = pickle.load(f)
+
+        db_args = dict(database_save_path=database_save_path, used_classes=used_classes, save_packed_db=save_packed_db)
+        if num_workers > 1:
+            chunks = [infos[start:start + chunk_size] for start in range(0, len(infos), chunk_size)]
+            with multiprocessing.Pool(num_workers, initializer=_init_pool_worker,
+                                      initargs=(self.dataset_cfg, self.class_names, self.root_path, self.split)) as p:
+                chunk_db_lists = list(tqdm(p.imap(partial(_pool_get_gt_database_of_infos, **db_args), chunks),
+                                           total=len(chunks), desc='gt_database (%d samples per chunk)' % chunk_size))
+        else:
+            chunk_db_lists = []
+            for k in range(len(infos)):
+                print('gt_database sample: %d/%d' % (k + 1, len(infos)))
+                chunk_db_lists.append(self.get_gt_database_of_infos(infos[k:k + 1], **db_args))
+
+        # the offsets in the packed database follow the order of the samples whatever the chunks
+        for db_list in chunk_db_lists:
+            for db_info, gt_points in db_list:
+                if save_packed_db:
+                    stacked_gt_points.append(gt_points)
+                    db_info['global_data_offset'] = [point_offset_cnt, point_offset_cnt + gt_points.shape[0]]
+                    point_offset_cnt += gt_points.shape[0]
+                if db_info['name'] in all_db_infos:
+                    all_db_infos[db_info['name']].append(db_info)
+                else:
+                    all_db_infos[db_info['name']] = [db_info]
         for k, v in all_db_infos.items():
             print('Database %s: %d' % (k, len(v)))
 
         with open(db_info_save_path, 'wb') as f:
             pickle.dump(all_db_infos, f)
 
+        if save_packed_db:
+            stacked_gt_points = np.concatenate(stacked_gt_points, axis=0).astype(np.float32)
+            np.save(db_data_save_path, stacked_gt_points)
+
     @staticmethod
     def generate_prediction_dicts(batch_dict, pred_dicts, class_names, output_path=None):
         """
@@ -374,7 +503,8 @@ class KittiDataset(DatasetTemplate):
         if self._merge_all_iters_to_one_epoch:
             index = index % len(self.kitti_infos)
 
-        info = copy.deepcopy(self.kitti_infos[index])
+        # not copied, the info is only read (drop_info_with_name returns new arrays)
+        info = self.kitti_infos[index]
 
         sample_idx = info['point_cloud']['lidar_idx']
         img_shape = info['image']['image_shape']
@@ -429,7 +559,34 @@ class KittiDataset(DatasetTemplate):
         return data_dict
 
 
-def create_kitti_infos(dataset_cfg, class_names, data_path, save_path, workers=4):
+# dataset of the workers of the process pools of get_infos and create_groundtruth_database, built once in each
+# worker by _init_pool_worker, so that the tasks only pickle their chunk and not the whole dataset
+_pool_dataset = None
+
+
+def _init_pool_worker(dataset_cfg, class_names, root_path, split):
+    global _pool_dataset
+    _pool_dataset = KittiDataset(dataset_cfg=dataset_cfg, class_names=class_names, root_path=root_path, training=False)
+    _pool_dataset.set_split(split)
+
+
+def _pool_get_chunk_infos(chunk, **kwargs):
+    return _pool_dataset.get_chunk_infos(chunk, **kwargs)
+
+
+def _pool_get_gt_database_of_infos(infos, **kwargs):
+    return _pool_dataset.get_gt_database_of_infos(infos, **kwargs)
+
+
+def create_kitti_infos(dataset_cfg, class_names, data_path, save_path, workers=4,
+                       use_process_pool=False, chunk_size=100, resume=False):
+    """
+    Args:
+        use_process_pool: generate the infos and the gt database with a pool of workers processes, in chunks
+            of chunk_size samples
+        chunk_size:
+        resume: with use_process_pool, reuse the info chunks of an interrupted run saved to kitti_info_chunks/
+    """
     dataset = KittiDataset(dataset_cfg=dataset_cfg, class_names=class_names, root_path=data_path, training=False)
     train_split, val_split = 'train', 'val'
 
@@ -437,34 +594,43 @@ def create_kitti_infos(dataset_cfg, class_names, data_path, save_path, workers=4
     val_filename = save_path / ('kitti_infos_%s.pkl' % val_split)
     trainval_filename = save_path / 'kitti_infos_trainval.pkl'
     test_filename = save_path / 'kitti_infos_test.pkl'
+    chunk_save_path = save_path / 'kitti_info_chunks' if use_process_pool else None
+    info_args = dict(num_workers=workers, use_process_pool=use_process_pool, chunk_size=chunk_size,
+                     chunk_save_path=chunk_save_path, resume=resume)
 
     print('---------------Start to generate data infos---------------')
 
     dataset.set_split(train_split)
-    kitti_infos_train = dataset.get_infos(num_workers=workers, has_label=True, count_inside_pts=True)
+    start_time = time.time()
+    kitti_infos_train = dataset.get_infos(has_label=True, count_inside_pts=True, **info_args)
     with open(train_filename, 'wb') as f:
         pickle.dump(kitti_infos_train, f)
-    print('Kitti info train file is saved to %s' % train_filename)
+    print('Kitti info train file is saved to %s (%.1fs)' % (train_filename, time.time() - start_time))
 
     dataset.set_split(val_split)
-    kitti_infos_val = dataset.get_infos(num_workers=workers, has_label=True, count_inside_pts=True)
+    start_time = time.time()
+    kitti_infos_val = dataset.get_infos(has_label=True, count_inside_pts=True, **info_args)
     with open(val_filename, 'wb') as f:
         pickle.dump(kitti_infos_val, f)
-    print('Kitti info val file is saved to %s' % val_filename)
+    print('Kitti info val file is saved to %s (%.1fs)' % (val_filename, time.time() - start_time))
 
     with open(trainval_filename, 'wb') as f:
         pickle.dump(kitti_infos_train + kitti_infos_val, f)
     print('Kitti info trainval file is saved to %s' % trainval_filename)
 
     dataset.set_split('test')
-    kitti_infos_test = dataset.get_infos(num_workers=workers, has_label=False, count_inside_pts=False)
+    start_time = time.time()
+    kitti_infos_test = dataset.get_infos(has_label=False, count_inside_pts=False, **info_args)
     with open(test_filename, 'wb') as f:
         pickle.dump(kitti_infos_test, f)
-    print('Kitti info test file is saved to %s' % test_filename)
+    print('Kitti info test file is saved to %s (%.1fs)' % (test_filename, time.time() - start_time))
 
     print('---------------Start create groundtruth database for data augmentation---------------')
     dataset.set_split(train_split)
-    dataset.create_groundtruth_database(train_filename, split=train_split)
+    dataset.create_groundtruth_database(
+        train_filename, split=train_split, save_packed_db=dataset_cfg.get('SAVE_PACKED_GT_DATABASE', False),
+        num_workers=workers if use_process_pool else 1, chunk_size=chunk_size
+    )
 
     print('---------------Data preparation Done---------------')
 
@@ -481,5 +647,17 @@ if __name__ == '__main__':
             dataset_cfg=dataset_cfg,
             class_names=['Car', 'Pedestrian', 'Cyclist'],
             data_path=ROOT_DIR / 'data' / 'kitti',
-            save_path=ROOT_DIR / 'data' / 'kitti'
+            save_path=ROOT_DIR / 'data' / 'kitti',
+            use_process_pool='--process_pool' in sys.argv,
+            resume='--resume' in sys.argv
+        )
+    elif sys.argv.__len__() > 1 and sys.argv[1] == 'pack_kitti_gt_database':
+        from pathlib import Path
+        from ..augmentor.database_sampler import pack_gt_database
+        ROOT_DIR = (Path(__file__).resolve().parent / '../../../').resolve()
+        pack_gt_database(
+            root_path=ROOT_DIR / 'data' / 'kitti',
+            db_info_path='kitti_dbinfos_train.pkl',
+            db_data_path='gt_database_global.npy',
+            num_point_features=4
         )
@@ -3,7 +3,14 @@ import io as sysio
 import numba
 import numpy as np
 
-from .rotate_iou import rotate_iou_gpu_eval
+from .rotate_iou_cpu import rotate_iou_cpu_eval
+
+try:
+    from numba import cuda
+    from .rotate_iou import rotate_iou_gpu_eval
+except Exception:  # the numba.cuda kernels cannot be compiled without CUDA driver/toolkit
+    cuda = None
+    rotate_iou_gpu_eval = None
 
 
 @numba.jit
@@ -113,8 +120,14 @@ def image_box_overlap(boxes, query_boxes, criterion=-1):
     return overlaps
 
 
+def rotate_iou_eval(boxes, qboxes, criterion=-1):
+    if rotate_iou_gpu_eval is not None and cuda.is_available():
+        return rotate_iou_gpu_eval(boxes, qboxes, criterion)
+    return rotate_iou_cpu_eval(boxes, qboxes, criterion)
+
+
 def bev_box_overlap(boxes, qboxes, criterion=-1):
-    riou = rotate_iou_gpu_eval(boxes, qboxes, criterion)
+    riou = rotate_iou_eval(boxes, qboxes, criterion)
     return riou
 
 
@@ -148,8 +161,8 @@ def d3_box_overlap_kernel(boxes, qboxes, rinc, criterion=-1):
 
 
 def d3_box_overlap(boxes, qboxes, criterion=-1):
-    rinc = rotate_iou_gpu_eval(boxes[:, [0, 2, 3, 5, 6]],
-                               qboxes[:, [0, 2, 3, 5, 6]], 2)
+    rinc = rotate_iou_eval(boxes[:, [0, 2, 3, 5, 6]],
+                           qboxes[:, [0, 2, 3, 5, 6]], 2)
     d3_box_overlap_kernel(boxes, qboxes, rinc, criterion)
     return rinc
 
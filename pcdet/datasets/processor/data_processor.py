@@ -1,5 +1,6 @@
 from functools import partial
 
+import numba
 import numpy as np
 from skimage import transform
 
@@ -60,6 +61,120 @@ class VoxelGeneratorWrapper():
         return voxels, coordinates, num_points
 
 
+@numba.jit(nopython=True)
+def _assign_points_to_voxels(points, voxel_size, coors_range, grid_size, max_voxels, coors, point_to_voxel):
+    """
+    Voxel of each point, the voxels are numbered by their first point and looked up in an open addressing
+    hash table of their linear (z, y, x) index, instead of a dense grid of the whole range.
+    Points out of the range or of new voxels beyond max_voxels get -1, as dropped by spconv.
+    """
+    num_points = points.shape[0]
+    table_size = 1
+    while table_size < 2 * num_points:
+        table_size *= 2
+    table_keys = np.full(table_size, -1, dtype=np.int64)
+    table_vals = np.empty(table_size, dtype=np.int32)
+    coor = np.zeros(3, dtype=np.int32)
+
+    voxel_num = 0
+    for i in range(num_points):
+        point_to_voxel[i] = -1
+        failed = False
+        for j in range(3):
+            c = np.floor((points[i, j] - coors_range[j]) / voxel_size[j])
+            if c < 0 or c >= grid_size[j]:
+                failed = True
+                break
+            coor[2 - j] = c
+        if failed:
+            continue
+
+        key = (np.int64(coor[0]) * grid_size[1] + coor[1]) * grid_size[0] + coor[2]
+        slot = (key * 2654435761) & (table_size - 1)
+        while table_keys[slot] != -1 and table_keys[slot] != key:
+            slot = (slot + 1) & (table_size - 1)
+        if table_keys[slot] == -1:
+            if voxel_num >= max_voxels:
+                continue
+            table_keys[slot] = key
+            table_vals[slot] = voxel_num
+            coors[voxel_num] = coor
+            voxel_num += 1
+        point_to_voxel[i] = table_vals[slot]
+    return voxel_num
+
+
+@numba.jit(nopython=True)
+def _fill_voxels(points, point_to_voxel, max_points, voxels, num_points_per_voxel):
+    for i in range(points.shape[0]):
+        voxel_idx = point_to_voxel[i]
+        if voxel_idx < 0:
+            continue
+        num = num_points_per_voxel[voxel_idx]
+        if num < max_points:
+            voxels[voxel_idx, num] = points[i]
+            num_points_per_voxel[voxel_idx] = num + 1
+
+
+class NumbaVoxelGenerator():
+    """
+    CPU voxelization with numba, without spconv. Same outputs as the spconv 1.x VoxelGenerator: the voxels are
+    ordered by their first point and keep the first max_num_points_per_voxel points, the points of new voxels
+    beyond max_num_voxels are dropped.
+    """
+    def __init__(self, vsize_xyz, coors_range_xyz, num_point_features, max_num_points_per_voxel, max_num_voxels):
+        self.vsize_xyz = np.array(vsize_xyz, dtype=np.float32)
+        self.coors_range_xyz = np.array(coors_range_xyz, dtype=np.float32)
+        grid_size = (self.coors_range_xyz[3:6] - self.coors_range_xyz[0:3]) / self.vsize_xyz
+        self.grid_size = np.round(grid_size).astype(np.int64)
+        self.num_point_features = num_point_features
+        self.max_num_points_per_voxel = max_num_points_per_voxel
+        self.max_num_voxels = max_num_voxels
+
+    def assign_points(self, points, max_num_voxels):
+        coordinates = np.empty((min(points.shape[0], max_num_voxels), 3), dtype=np.int32)
+        point_to_voxel = np.empty(points.shape[0], dtype=np.int32)
+        voxel_num = _assign_points_to_voxels(
+            points, self.vsize_xyz.astype(points.dtype), self.coors_range_xyz.astype(points.dtype), self.grid_size,
+            max_num_voxels, coordinates, point_to_voxel
+        )
+        return coordinates[:voxel_num], point_to_voxel
+
+    def generate(self, points):
+        """
+        Args:
+            points: (N, C)
+
+        Returns:
+            voxels: (num_voxels, max_num_points_per_voxel, C), zero padded
+            coordinates: (num_voxels, 3), [z_idx, y_idx, x_idx]
+            num_points: (num_voxels)
+        """
+        points = np.ascontiguousarray(points)
+        coordinates, point_to_voxel = self.assign_points(points, self.max_num_voxels)
+        voxels = np.zeros((coordinates.shape[0], self.max_num_points_per_voxel, points.shape[1]), dtype=points.dtype)
+        num_points = np.zeros(coordinates.shape[0], dtype=np.int32)
+        _fill_voxels(points, point_to_voxel, self.max_num_points_per_voxel, voxels, num_points)
+        return voxels, coordinates, num_points
+
+    def generate_dynamic(self, points):
+        """
+        Dynamic voxelization, all the voxels and points are kept and the points are not copied to voxels.
+
+        Args:
+            points: (N, C)
+
+        Returns:
+            coordinates: (num_voxels, 3), [z_idx, y_idx, x_idx]
+            num_points: (num_voxels)
+            point_to_voxel: (N), voxel of each point, -1 for the points out of the range
+        """
+        points = np.ascontiguousarray(points)
+        coordinates, point_to_voxel = self.assign_points(points, points.shape[0])
+        num_points = np.bincount(point_to_voxel[point_to_voxel >= 0], minlength=coordinates.shape[0]).astype(np.int32)
+        return coordinates, num_points, point_to_voxel
+
+
 class DataProcessor(object):
     def __init__(self, processor_configs, point_cloud_range, training, num_point_features):
         self.point_cloud_range = point_cloud_range
@@ -122,7 +237,14 @@ class DataProcessor(object):
             return partial(self.transform_points_to_voxels, config=config)
 
         if self.voxel_generator is None:
-            self.voxel_generator = VoxelGeneratorWrapper(
+            # VOXEL_GENERATOR: spconv (default) or numba, DYNAMIC_VOXELIZATION needs numba (its default then)
+            dynamic_voxelization = config.get('DYNAMIC_VOXELIZATION', False)
+            voxel_generator_name = config.get('VOXEL_GENERATOR', 'numba' if dynamic_voxelization else 'spconv')
+            assert voxel_generator_name in ['spconv', 'numba'], voxel_generator_name
+            assert not dynamic_voxelization or voxel_generator_name == 'numba', \
+                'DYNAMIC_VOXELIZATION needs VOXEL_GENERATOR: numba, got %s' % voxel_generator_name
+            voxel_generator_cls = NumbaVoxelGenerator if voxel_generator_name == 'numba' else VoxelGeneratorWrapper
+            self.voxel_generator = voxel_generator_cls(
                 vsize_xyz=config.VOXEL_SIZE,
                 coors_range_xyz=self.point_cloud_range,
                 num_point_features=self.num_point_features,
@@ -131,6 +253,14 @@ class DataProcessor(object):
             )
 
         points = data_dict['points']
+        if config.get('DYNAMIC_VOXELIZATION', False):
+            # points stay flat, with the voxel of each point (-1 out of the range)
+            coordinates, num_points, point_to_voxel = self.voxel_generator.generate_dynamic(points)
+            data_dict['voxel_coords'] = coordinates
+            data_dict['voxel_num_points'] = num_points
+            data_dict['point_to_voxel'] = point_to_voxel
+            return data_dict
+
         voxel_output = self.voxel_generator.generate(points)
         voxels, coordinates, num_points = voxel_output
 
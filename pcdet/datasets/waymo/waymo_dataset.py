@@ -16,6 +16,7 @@ from pathlib import Path
 from ...ops.roiaware_pool3d import roiaware_pool3d_utils
 from ...utils import box_utils, common_utils
 from ..dataset import DatasetTemplate
+from ..info_store import InfoStore
 
 
 class WaymoDataset(DatasetTemplate):
@@ -47,8 +48,14 @@ class WaymoDataset(DatasetTemplate):
         self.infos = []
         self.include_waymo_data(self.mode)
 
-    def include_waymo_data(self, mode):
-        self.logger.info('Loading Waymo dataset')
+    def get_info_store_path(self):
+        return self.root_path / ('%s_infos_%s' % (self.dataset_cfg.PROCESSED_DATA_TAG, self.split))
+
+    def load_sequence_infos(self):
+        """
+        Returns:
+            waymo_infos: list of the per-frame infos of all the sequences of the split
+        """
         waymo_infos = []
 
         num_skipped_infos = 0
@@ -63,15 +70,23 @@ class WaymoDataset(DatasetTemplate):
                 infos = pickle.load(f)
                 waymo_infos.extend(infos)
 
-        self.infos.extend(waymo_infos[:])
         self.logger.info('Total skipped info %s' % num_skipped_infos)
+        return waymo_infos
+
+    def include_waymo_data(self, mode):
+        self.logger.info('Loading Waymo dataset')
+        info_store_path = self.get_info_store_path()
+        if self.dataset_cfg.get('USE_INFO_STORE', False) and info_store_path.exists():
+            # columnar infos of the whole split (see create_waymo_info_store), memory-mapped instead of unpickled
+            waymo_infos = InfoStore(info_store_path)
+            self.infos = waymo_infos
+        else:
+            waymo_infos = self.load_sequence_infos()
+            self.infos.extend(waymo_infos[:])
         self.logger.info('Total samples for Waymo dataset: %d' % (len(waymo_infos)))
 
         if self.dataset_cfg.SAMPLED_INTERVAL[mode] > 1:
-            sampled_waymo_infos = []
-            for k in range(0, len(self.infos), self.dataset_cfg.SAMPLED_INTERVAL[mode]):
-                sampled_waymo_infos.append(self.infos[k])
-            self.infos = sampled_waymo_infos
+            self.infos = self.infos[::self.dataset_cfg.SAMPLED_INTERVAL[mode]]
             self.logger.info('Total sampled samples for Waymo dataset: %d' % len(self.infos))
 
     def load_data_to_shared_memory(self):
@@ -176,7 +191,8 @@ class WaymoDataset(DatasetTemplate):
         if self._merge_all_iters_to_one_epoch:
             index = index % len(self.infos)
 
-        info = copy.deepcopy(self.infos[index])
+        # not copied, the info is only read (drop_info_with_name returns new arrays)
+        info = self.infos[index]
         pc_info = info['point_cloud']
         sequence_name = pc_info['lidar_sequence']
         sample_idx = pc_info['sample_idx']
@@ -447,6 +463,23 @@ def create_waymo_infos(dataset_cfg, class_names, data_path, save_path,
     print('---------------Data preparation Done---------------')
 
 
+def create_waymo_info_store(dataset_cfg, class_names, data_path, splits=('train', 'val')):
+    """
+    Saves the per-frame infos of all the sequences of each split to one InfoStore, which is read instead of
+    the per-sequence .pkl files with USE_INFO_STORE.
+    """
+    dataset = WaymoDataset(
+        dataset_cfg=dataset_cfg, class_names=class_names, root_path=data_path,
+        training=False, logger=common_utils.create_logger()
+    )
+    for split in splits:
+        dataset.set_split(split)
+        waymo_infos = dataset.load_sequence_infos()
+        InfoStore.create(waymo_infos, dataset.get_info_store_path())
+        print('----------------Waymo info store of %d frames is saved to %s----------------' % (
+            len(waymo_infos), dataset.get_info_store_path()))
+
+
 if __name__ == '__main__':
     import argparse
 
@@ -474,3 +507,16 @@ if __name__ == '__main__':
             raw_data_tag='raw_data',
             processed_data_tag=args.processed_data_tag
         )
+
+    elif args.func == 'create_waymo_info_store':
+        import yaml
+        from easydict import EasyDict
+        dataset_cfg = EasyDict(yaml.safe_load(open(args.cfg_file)))
+        ROOT_DIR = (Path(__file__).resolve().parent / '../../../').resolve()
+        dataset_cfg.PROCESSED_DATA_TAG = args.processed_data_tag
+        dataset_cfg.USE_INFO_STORE = False
+        create_waymo_info_store(
+            dataset_cfg=dataset_cfg,
+            class_names=['Vehicle', 'Pedestrian', 'Cyclist'],
+            data_path=ROOT_DIR / 'data' / 'waymo'
+        )
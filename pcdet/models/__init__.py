@@ -1,3 +1,6 @@
+import queue
+import threading
+import weakref
 from collections import namedtuple
 
 import numpy as np
@@ -22,6 +25,22 @@ def build_network(model_cfg, num_class, dataset):
 
 def load_data_to_gpu(batch_dict):
     for key, val in batch_dict.items():
+        if isinstance(val, torch.Tensor):
+            if val.is_cuda:
+                # already loaded, e.g. by DevicePrefetcher
+                continue
+            # tensors of collate_batch_preallocated keep their dtype, they are cast on the device after one
+            # asynchronous copy from pinned memory
+            val = val.cuda(non_blocking=True)
+            if key in ['images']:
+                batch_dict[key] = val.permute(0, 3, 1, 2).float().contiguous()
+            elif key in ['image_shape']:
+                batch_dict[key] = val.int()
+            elif key in ['point_to_voxel']:
+                batch_dict[key] = val.long()
+            else:
+                batch_dict[key] = val.float()
+            continue
         if not isinstance(val, np.ndarray):
             continue
         elif key in ['frame_id', 'metadata', 'calib']:
@@ -30,10 +49,131 @@ def load_data_to_gpu(batch_dict):
             batch_dict[key] = kornia.image_to_tensor(val).float().cuda().contiguous()
         elif key in ['image_shape']:
             batch_dict[key] = torch.from_numpy(val).int().cuda()
+        elif key in ['point_to_voxel']:
+            batch_dict[key] = torch.from_numpy(val).long().cuda()
         else:
             batch_dict[key] = torch.from_numpy(val).float().cuda()
 
 
+class DevicePrefetcher(object):
+    """
+    Wraps a dataloader (or any iterable of batch dicts) to fetch the next num_prefetch batches in a background
+    thread and load them to the GPU with load_fn on a side CUDA stream, while the current step runs. Without CUDA
+    the batches are only fetched ahead. load_data_to_gpu is a no-op on the loaded batches, so the train and eval
+    loops are unchanged.
+    """
+    def __init__(self, loader, num_prefetch=2, load_fn=load_data_to_gpu):
+        self.loader = loader
+        self.num_prefetch = num_prefetch
+        self.load_fn = load_fn
+        self.last_iter = None
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __getattr__(self, name):
+        # dataset, sampler, ... of the wrapped dataloader
+        if name in ['loader', 'last_iter']:
+            raise AttributeError(name)
+        return getattr(self.loader, name)
+
+    def __iter__(self):
+        # a new epoch: the thread of the previous iterator is stopped even if the caller still holds it
+        last_iter = self.last_iter() if self.last_iter is not None else None
+        if last_iter is not None:
+            last_iter.close()
+        cur_iter = _PrefetchIterator(self.loader, self.num_prefetch, self.load_fn)
+        self.last_iter = weakref.ref(cur_iter)
+        return cur_iter
+
+
+class _PrefetchIterator(object):
+    def __init__(self, loader, num_prefetch, load_fn):
+        self.loader = loader
+        self.load_fn = load_fn
+        self.device = torch.cuda.current_device() if torch.cuda.is_available() else None
+        self.queue = queue.Queue(maxsize=max(num_prefetch, 1))
+        self.stop_event = threading.Event()
+        self.finished = False
+        # started by the first __next__, so an iterator that is never used starts neither the thread nor the loader
+        self.thread = None
+
+    def start(self):
+        # the thread does not hold the iterator, which stops it when garbage collected (e.g. iter() again)
+        self.thread = threading.Thread(
+            target=self.worker, args=(iter(self.loader), self.queue, self.stop_event, self.load_fn, self.device),
+            name='DevicePrefetcher', daemon=True
+        )
+        self.thread.start()
+
+    @staticmethod
+    def put(out_queue, stop_event, item):
+        while not stop_event.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def worker(loader_iter, out_queue, stop_event, load_fn, device):
+        stream = None
+        if device is not None:
+            torch.cuda.set_device(device)
+            stream = torch.cuda.Stream()
+        try:
+            for batch in loader_iter:
+                event = None
+                if stream is not None:
+                    with torch.cuda.stream(stream):
+                        if load_fn is not None:
+                            load_fn(batch)
+                        event = torch.cuda.Event()
+                        event.record(stream)
+                if not _PrefetchIterator.put(out_queue, stop_event, (batch, event, None)):
+                    return
+        except Exception as e:
+            _PrefetchIterator.put(out_queue, stop_event, (None, None, e))
+            return
+        _PrefetchIterator.put(out_queue, stop_event, (None, None, None))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.finished:
+            raise StopIteration
+        if self.thread is None:
+            self.start()
+        batch, event, error = self.queue.get()
+        if error is not None:
+            self.finished = True
+            raise error
+        if batch is None:
+            self.finished = True
+            raise StopIteration
+
+        if event is not None:
+            cur_stream = torch.cuda.current_stream()
+            cur_stream.wait_event(event)
+            # the memory of the tensors allocated on the side stream is not reused before the step is done
+            for val in batch.values():
+                tensors = [val] if isinstance(val, torch.Tensor) else \
+                    [x for x in getattr(val, '__dict__', {}).values() if isinstance(x, torch.Tensor)]
+                for tensor in tensors:
+                    if tensor.is_cuda:
+                        tensor.record_stream(cur_stream)
+        return batch
+
+    def close(self):
+        self.finished = True
+        self.stop_event.set()
+
+    def __del__(self):
+        self.close()
+
+
 def model_fn_decorator():
     ModelReturn = namedtuple('ModelReturn', ['loss', 'tb_dict', 'disp_dict'])
 
@@ -10,28 +10,39 @@ class PointPillarScatter(nn.Module):
         self.num_bev_features = self.model_cfg.NUM_BEV_FEATURES
         self.nx, self.ny, self.nz = grid_size
         assert self.nz == 1
+        # channels last spatial_features (same shape, NHWC memory) for a BaseBEVBackbone run in channels last
+        self.channels_last = self.model_cfg.get('CHANNELS_LAST', False)
 
     def forward(self, batch_dict, **kwargs):
-        pillar_features, coords = batch_dict['pillar_features'], batch_dict['voxel_coords']
-        batch_spatial_features = []
-        batch_size = coords[:, 0].max().int().item() + 1
-        for batch_idx in range(batch_size):
-            spatial_feature = torch.zeros(
-                self.num_bev_features,
-                self.nz * self.nx * self.ny,
-                dtype=pillar_features.dtype,
-                device=pillar_features.device)
+        """
+        Args:
+            batch_dict:
+                batch_size:
+                pillar_features: (num_pillars, C)
+                voxel_coords: (num_pillars, 4), [batch_idx, z_idx, y_idx, x_idx]
 
-            batch_mask = coords[:, 0] == batch_idx
-            this_coords = coords[batch_mask, :]
-            indices = this_coords[:, 1] + this_coords[:, 2] * self.nx + this_coords[:, 3]
-            indices = indices.type(torch.long)
-            pillars = pillar_features[batch_mask, :]
-            pillars = pillars.t()
-            spatial_feature[:, indices] = pillars
-            batch_spatial_features.append(spatial_feature)
+        Returns:
+            batch_dict:
+                spatial_features: (B, C, ny, nx)
+        """
+        pillar_features, coords = batch_dict['pillar_features'], batch_dict['voxel_coords']
+        batch_size = batch_dict['batch_size']
+        coords = coords.long()
+        # all the pillars of the batch are written at once with their batch index and flattened (y, x) index
+        batch_indices = coords[:, 0]
+        indices = coords[:, 1] + coords[:, 2] * self.nx + coords[:, 3]
 
-        batch_spatial_features = torch.stack(batch_spatial_features, 0)
-        batch_spatial_features = batch_spatial_features.view(batch_size, self.num_bev_features * self.nz, self.ny, self.nx)
+        if self.channels_last:
+            batch_spatial_features = pillar_features.new_zeros(
+                (batch_size, self.nz * self.ny * self.nx, self.num_bev_features))
+            batch_spatial_features[batch_indices, indices] = pillar_features
+            batch_spatial_features = batch_spatial_features.view(
+                batch_size, self.ny, self.nx, self.num_bev_features * self.nz).permute(0, 3, 1, 2)
+        else:
+            batch_spatial_features = pillar_features.new_zeros(
+                (batch_size, self.num_bev_features, self.nz * self.ny * self.nx))
+            batch_spatial_features[batch_indices, :, indices] = pillar_features
+            batch_spatial_features = batch_spatial_features.view(
+                batch_size, self.num_bev_features * self.nz, self.ny, self.nx)
         batch_dict['spatial_features'] = batch_spatial_features
         return batch_dict
@@ -2,29 +2,64 @@ import torch
 import torch.nn as nn
 import spconv.pytorch as spconv
 from pcdet.ops.roiaware_pool3d.roiaware_pool3d_utils import points_in_boxes_gpu
-from pcdet.models.backbones_3d.focal_sparse_conv.utils import split_voxels, check_repeat, FocalLoss
-from pcdet.utils import common_utils
+from pcdet.models.backbones_3d.focal_sparse_conv.utils import split_voxels, check_repeat, FocalLoss, \
+    split_voxels_batch, check_repeat_batch
+from pcdet.utils import common_utils, calibration_kitti
 import torch.nn.functional as F
 import numpy as np
 import pdb 
 import time
 
 def calculate_cosine(tensorA, tensorB):
-    # 计算点积  
-    dot_product = torch.matmul(tensorA, tensorB.t())  # 结果形状为 (N, N) 
-    dot = torch.diag(dot_product)
-
-    # 计算模长  
-    norm_A = torch.norm(tensorA, dim=1, keepdim=True) + 1e-6
-    norm_B = torch.norm(tensorB, dim=1, keepdim=True) + 1e-6
-    norm = torch.diag(norm_A * norm_B.t())
-    
+    """
+        Row-wise cosine similarity.
+        Args:
+            tensorA: [..., N, C]
+            tensorB: [..., N, C], broadcast with tensorA
+
+        Return:
+            cosine_similarities: [..., N]
+    """
+    dot = torch.sum(tensorA * tensorB, dim=-1)
+    norm = (torch.norm(tensorA, dim=-1) + 1e-6) * (torch.norm(tensorB, dim=-1) + 1e-6)
+
     cosine_similarities = dot / norm
     cosine_similarities = torch.clamp(cosine_similarities, min=-1.0, max=1.0)
-    
+
     return cosine_similarities
 
 
+# (du, dv) pixel offsets of the image features fused to each voxel. They are the running sums of the (j, i) steps
+# of the former 3x3 loop over (i, j) in [-1, 0, 1], which added every step in place to the same pixel tensor, and are
+# kept as they are since the models were trained with them. The features at index 4 are the reference of the
+# cosine weights.
+FUSION_PIXEL_OFFSETS = [[-1, -1], [-1, -2], [0, -3], [-1, -3], [-1, -3], [0, -3], [-1, -2], [-1, -1], [0, 0]]
+
+
+def gather_fused_image_features(x_rgb, batch_index, voxels_2d, pixel_offsets):
+    """
+        Cosine-weighted mean of the image features at the pixel offsets of every voxel, gathered in one op for the
+        whole batch. The pixels outside of the image give zero features.
+        Args:
+            x_rgb: [b, c, h, w] image features
+            batch_index: [N] long
+            voxels_2d: [N, 2] long (u, v) pixels of the voxels
+            pixel_offsets: [9, 2] long, FUSION_PIXEL_OFFSETS
+
+        Return:
+            image_features: [N, c]
+    """
+    h, w = x_rgb.shape[2:]
+    pixels = voxels_2d.unsqueeze(0) + pixel_offsets.unsqueeze(1)  # (9, N, 2)
+    in_image = (0 <= pixels[..., 0]) & (pixels[..., 0] < w) & (0 <= pixels[..., 1]) & (pixels[..., 1] < h)
+    pixel_index = torch.where(in_image, pixels[..., 1] * w + pixels[..., 0], torch.zeros_like(pixels[..., 0]))
+    kernel_point_features = x_rgb.flatten(2)[batch_index.unsqueeze(0), :, pixel_index]  # (9, N, C)
+    kernel_point_features = kernel_point_features.masked_fill(~in_image.unsqueeze(-1), 0)
+
+    similarity = calculate_cosine(kernel_point_features, kernel_point_features[4:5])  # (9, N)
+    return torch.mean(kernel_point_features * similarity.unsqueeze(-1), dim=0)
+
+
 class FocalSparseConv(spconv.SparseModule):
     expansion = 1
 
@@ -32,7 +67,7 @@ class FocalSparseConv(spconv.SparseModule):
                 image_channel=3, kernel_size=3, padding=1, mask_multi=False, use_img=False,
                 topk=False, threshold=0.5, skip_mask_kernel=False, enlarge_voxel_channels=-1, 
                 point_cloud_range=[-3, -40, 0, 1, 40, 70.4], fuse_sum=True,
-                voxel_size = [0.1, 0.05, 0.05]):
+                voxel_size = [0.1, 0.05, 0.05], batch_split=False):
         super(FocalSparseConv, self).__init__()
 
         self.conv = spconv.SubMConv3d(inplanes, planes, kernel_size=kernel_size, stride=1, bias=False, indice_key=indice_key)
@@ -48,6 +83,10 @@ class FocalSparseConv(spconv.SparseModule):
         self.skip_mask_kernel = skip_mask_kernel
         self.use_img = use_img
         self.fuse_sum = fuse_sum
+        # split, dilate and deduplicate the voxels of the whole batch at once instead of sample by sample
+        self.batch_split = batch_split
+        # per-stage time of forward, only measured if enabled (the device is synchronized)
+        self.stage_timer = common_utils.StageTimer(enabled=False, cuda_sync=True)
 
         voxel_channel = enlarge_voxel_channels if enlarge_voxel_channels>0 else inplanes
         in_channels = image_channel + voxel_channel if use_img else voxel_channel
@@ -66,6 +105,7 @@ class FocalSparseConv(spconv.SparseModule):
         self.inv_idx =  torch.Tensor([2, 1, 0]).long().cuda()
         self.point_cloud_range = torch.Tensor(point_cloud_range).cuda()
         self.voxel_size = torch.Tensor(voxel_size).cuda()
+        self.pixel_offsets = torch.Tensor(FUSION_PIXEL_OFFSETS).long().cuda()
 
     def construct_multimodal_features(self, x, x_rgb, batch_dict, fuse_sum=False):
         """
@@ -79,120 +119,56 @@ class FocalSparseConv(spconv.SparseModule):
             Return:
                 image_with_voxelfeatures: [N, C] fused multimodal features
         """
-        batch_index = x.indices[:, 0]
+        batch_index = x.indices[:, 0].long()
         spatial_indices = x.indices[:, 1:] * self.voxel_stride
         voxels_3d = spatial_indices * self.voxel_size + self.point_cloud_range[:3]
-        calibs = batch_dict['calib']
-        batch_size = batch_dict['batch_size']
         h, w = batch_dict['images'].shape[2:]
 
         if not x_rgb.shape == batch_dict['images'].shape:
             x_rgb = nn.functional.interpolate(x_rgb, (h, w), mode='bilinear')
 
-        image_with_voxelfeatures = []
-        voxels_2d_int_list = []
-        filter_idx_list = []
-        
-        for b in range(batch_size):
-            x_rgb_batch = x_rgb[b]
-
-            calib = calibs[b]
-            voxels_3d_batch = voxels_3d[batch_index==b]
-            voxel_features_sparse = x.features[batch_index==b]
-
-            # Reverse the point cloud transformations to the original coords.
-            if 'noise_scale' in batch_dict:
-                voxels_3d_batch[:, :3] /= batch_dict['noise_scale'][b]
-            if 'noise_rot' in batch_dict:
-                voxels_3d_batch = common_utils.rotate_points_along_z(voxels_3d_batch[:, self.inv_idx].unsqueeze(0), -batch_dict['noise_rot'][b].unsqueeze(0))[0, :, self.inv_idx]
-            if 'flip_x' in batch_dict:
-                voxels_3d_batch[:, 1] *= -1 if batch_dict['flip_x'][b] else 1
-            if 'flip_y' in batch_dict:
-                voxels_3d_batch[:, 2] *= -1 if batch_dict['flip_y'][b] else 1
-            
-            voxels_2d, _ = calib.lidar_to_img(voxels_3d_batch[:, self.inv_idx].cpu().numpy())
-        
-            #########################################################################################
-            # voxels_2d_int = torch.Tensor(voxels_2d).to(x_rgb_batch.device).long()
-            # filter_idx = (0<=voxels_2d_int[:, 1]) * (voxels_2d_int[:, 1] < h) * (0<=voxels_2d_int[:, 0]) * (voxels_2d_int[:, 0] < w)
-            # filter_idx_list.append(filter_idx)
-            # voxels_2d_int = voxels_2d_int[filter_idx]
-            # voxels_2d_int_list.append(voxels_2d_int)
-            # image_features_batch = torch.zeros((voxel_features_sparse.shape[0], x_rgb_batch.shape[0]), device=x_rgb_batch.device)
-            # image_features_batch[filter_idx] = x_rgb_batch[:, voxels_2d_int[:, 1], voxels_2d_int[:, 0]].permute(1, 0).contiguous()
-            
-            #########################################################################################
-            voxels_2d_tmp = torch.Tensor(voxels_2d).to(x_rgb_batch.device).long()
-            kernel_point_features = []
-            for i in range(-1, 2):
-                for j in range(-1, 2):
-                    voxels_2d_int = voxels_2d_tmp
-                    voxels_2d_int[:, 1] += i
-                    voxels_2d_int[:, 0] += j
-                    filter_idx = (0<=voxels_2d_int[:, 1]) * (voxels_2d_int[:, 1] < h) * (0<=voxels_2d_int[:, 0]) * (voxels_2d_int[:, 0] < w)
-                    voxels_2d_int = voxels_2d_int[filter_idx]
-                    image_features_batch = torch.zeros((voxel_features_sparse.shape[0], x_rgb_batch.shape[0]), device=x_rgb_batch.device)
-                    image_features_batch[filter_idx] = x_rgb_batch[:, voxels_2d_int[:, 1], voxels_2d_int[:, 0]].permute(1, 0)
-                    kernel_point_features.append(image_features_batch)
-                                
-            for i in range(9):
-                similarity = calculate_cosine(kernel_point_features[i], kernel_point_features[4])
-                kernel_point_features[i] = kernel_point_features[i] * similarity.unsqueeze(1)
-                
-            kernel_point_features = torch.stack(kernel_point_features).to(x_rgb_batch.device)
-            image_features_batch = torch.mean(kernel_point_features, dim=0)
-          
-            #########################################################################################
-#             x_rgb_batch = x_rgb[b].unsqueeze(0)
-#             voxels_2d_tmp = torch.Tensor(voxels_2d).to(x_rgb_batch.device).unsqueeze(0).unsqueeze(0)
-#             new_voxels_2d = []
-            
-#             for i in range(-1, 2):
-#                 for j in range(-1, 2):
-#                     voxels_2d_int = voxels_2d_tmp
-#                     voxels_2d_int[..., 1] += i
-#                     voxels_2d_int[..., 0] += j
-#                     voxels_2d_int[..., 0] = voxels_2d_int[..., 0] / w * 2 -1
-#                     voxels_2d_int[..., 1] = voxels_2d_int[..., 1] / h * 2 -1
-#                     new_voxels_2d.append(voxels_2d_int)
-#             new_voxels = torch.stack(new_voxels_2d)
-            
-#             kernel_point_features = []
-#             for i in range(new_voxels.shape[0]):
-#                 kernel_point_features.append(F.grid_sample(x_rgb_batch, new_voxels[i]))
-
-#             kernel_point_features = torch.stack(kernel_point_features).to(x_rgb_batch.device)
-#             kernel_point_features = kernel_point_features.squeeze(dim=1).squeeze(dim=2)  # (9, 16, N)[9, 1, 16, 1, 7563]
-
-#             # cosine_similarities = torch.nn.CosineSimilarity(dim=0, eps=1e-6)
-#             Weight_parameter = torch.tensor(np.zeros((9, kernel_point_features.shape[-1]))).to(x_rgb_batch.device)
-            
-#             for i in range(9):
-#                 similarity = calculate_cosine(kernel_point_features[i], kernel_point_features[4])
-#                 # similarity = cosine_similarities(kernel_point_features[i], kernel_point_features[4])
-#                 Weight_parameter[i] = similarity
-            
-#             # print("Weight_parameter:",Weight_parameter.shape) #torch.Size([9,16, N])
-            
-#             weight_features = kernel_point_features * Weight_parameter.unsqueeze(1)
-            
-#             # average_pool = torch.nn.AvgPool1d(9,1)
-#             # kernel_point_features = average_pool(weight_features.permute(2,1,0))
-#             kernel_point_features = torch.mean(weight_features, dim=0)
-#             image_features_batch = kernel_point_features.permute(1,0)
-            
-            #########################################################################################
-            
-            if fuse_sum:
-                image_with_voxelfeature = image_features_batch + voxel_features_sparse
-            else:
-                image_with_voxelfeature = torch.cat([image_features_batch, voxel_features_sparse], dim=1)
-
-            image_with_voxelfeatures.append(image_with_voxelfeature)
-
-        image_with_voxelfeatures = torch.cat(image_with_voxelfeatures)
+        # voxels of the whole batch are projected at once, without leaving the device
+        voxels_2d = self.project_voxels_to_img(voxels_3d, batch_index, batch_dict).long()
+
+        image_features = gather_fused_image_features(x_rgb, batch_index, voxels_2d, self.pixel_offsets)
+
+        if fuse_sum:
+            image_with_voxelfeatures = image_features + x.features
+        else:
+            image_with_voxelfeatures = torch.cat([image_features, x.features], dim=1)
         return image_with_voxelfeatures
 
+    def project_voxels_to_img(self, voxels_3d, batch_index, batch_dict):
+        """
+            Project the voxel centers of the whole batch to the image plane.
+            Args:
+                voxels_3d: [N, 3], the 3d positions of voxel centers (z, y, x) after the augmentations
+                batch_index: [N], sample of each voxel
+                batch_dict: input and output information during forward
+
+            Return:
+                voxels_2d: [N, 2] image coordinates (u, v) of the voxels
+        """
+        # Reverse the point cloud transformations to the original coords.
+        if 'noise_scale' in batch_dict:
+            voxels_3d = voxels_3d / batch_dict['noise_scale'][batch_index].unsqueeze(-1)
+        if 'noise_rot' in batch_dict:
+            # every voxel is rotated by the angle of its own sample
+            voxels_3d = common_utils.rotate_points_along_z(
+                voxels_3d[:, self.inv_idx].unsqueeze(1), -batch_dict['noise_rot'][batch_index]
+            )[:, 0, self.inv_idx]
+        flip_sign = voxels_3d.new_ones((voxels_3d.shape[0], 3))
+        if 'flip_x' in batch_dict:
+            flip_sign[:, 1] = torch.where(batch_dict['flip_x'][batch_index] != 0, -flip_sign[:, 1], flip_sign[:, 1])
+        if 'flip_y' in batch_dict:
+            flip_sign[:, 2] = torch.where(batch_dict['flip_y'][batch_index] != 0, -flip_sign[:, 2], flip_sign[:, 2])
+        voxels_3d = voxels_3d * flip_sign
+
+        if 'calib_torch' not in batch_dict:
+            batch_dict['calib_torch'] = calibration_kitti.CalibrationTorch(batch_dict['calib'], device=voxels_3d.device)
+        voxels_2d, _ = batch_dict['calib_torch'].lidar_to_img(voxels_3d[:, self.inv_idx], batch_index)
+        return voxels_2d
+
     def _gen_sparse_features(self, x, imps_3d, batch_dict, voxels_3d):
         """
             Generate the output sparse features from the focal sparse conv.
@@ -202,6 +178,9 @@ class FocalSparseConv(spconv.SparseModule):
                 batch_dict: input and output information during forward
                 voxels_3d: [N, 3], the 3d positions of voxel centers
         """
+        if self.batch_split:
+            return self._gen_sparse_features_batch(x, imps_3d, batch_dict, voxels_3d)
+
         batch_size = x.batch_size
         voxel_features_fore = []
         voxel_indices_fore = []
@@ -249,6 +228,35 @@ class FocalSparseConv(spconv.SparseModule):
 
         return x_fore, x_back, loss_box_of_pts, mask_kernel
 
+    def _gen_sparse_features_batch(self, x, imps_3d, batch_dict, voxels_3d):
+        """
+            _gen_sparse_features for the whole batch at once with split_voxels_batch.
+            Args:
+                x: [N, C], lidar sparse features
+                imps_3d: [N, kernelsize**3], the predicted importance values
+                batch_dict: input and output information during forward
+                voxels_3d: [N, 3], the 3d positions of voxel centers
+        """
+        voxel_features_fore, voxel_indices_fore, voxel_features_back, voxel_indices_back, mask_kernel = split_voxels_batch(
+            x, imps_3d, self.kernel_offsets, mask_multi=self.mask_multi, topk=self.topk, threshold=self.threshold
+        )
+        x_fore = spconv.SparseConvTensor(voxel_features_fore, voxel_indices_fore, x.spatial_shape, x.batch_size)
+        x_back = spconv.SparseConvTensor(voxel_features_back, voxel_indices_back, x.spatial_shape, x.batch_size)
+
+        loss_box_of_pts = 0
+        if self.training:
+            mask_voxels = imps_3d[:, -1].sigmoid()
+            box_of_pts_cls_targets = mask_voxels.new_zeros(mask_voxels.shape[0], dtype=torch.bool)
+            for b in range(x.batch_size):
+                batch_index = x.indices[:, 0] == b
+                gt_boxes = batch_dict['gt_boxes'][b, :, :-1].unsqueeze(0)
+                box_of_pts_batch = points_in_boxes_gpu(voxels_3d[batch_index][:, self.inv_idx].unsqueeze(0), gt_boxes).squeeze(0)
+                box_of_pts_cls_targets[batch_index] = box_of_pts_batch >= 0
+            mask_voxels_two_classes = torch.cat([1-mask_voxels.unsqueeze(-1), mask_voxels.unsqueeze(-1)], dim=1)
+            loss_box_of_pts = self.focal_loss(mask_voxels_two_classes, box_of_pts_cls_targets.long())
+
+        return x_fore, x_back, loss_box_of_pts, mask_kernel
+
     def combine_out(self, x_fore, x_back, remove_repeat=False):
         """
             Combine the foreground and background sparse features together.
@@ -260,7 +268,9 @@ class FocalSparseConv(spconv.SparseModule):
         x_fore_features = torch.cat([x_fore.features, x_back.features], dim=0)
         x_fore_indices = torch.cat([x_fore.indices, x_back.indices], dim=0)
 
-        if remove_repeat:
+        if remove_repeat and self.batch_split:
+            x_fore_features, x_fore_indices, _ = check_repeat_batch(x_fore_features, x_fore_indices, x_fore.spatial_shape)
+        elif remove_repeat:
             index = x_fore_indices[:, 0]
             features_out_list = []
             indices_coords_out_list = []
@@ -276,25 +286,30 @@ class FocalSparseConv(spconv.SparseModule):
         x_fore.indices = x_fore_indices
 
         return x_fore
-        
+
     def forward(self, x, batch_dict, x_rgb=None):
+        timer = self.stage_timer.time()
         spatial_indices = x.indices[:, 1:] * self.voxel_stride
         voxels_3d = spatial_indices * self.voxel_size + self.point_cloud_range[:3]
 
         if self.use_img:
             features_multimodal = self.construct_multimodal_features(x, x_rgb, batch_dict, self.fuse_sum)
             x_predict = spconv.SparseConvTensor(features_multimodal, x.indices, x.spatial_shape, x.batch_size)
+            self.stage_timer.update('fusion', timer)
             return x_predict, batch_dict
         else:
             x_predict = self.conv_enlarge(x) if self.conv_enlarge else x
         
         imps_3d = self.conv_imp(x_predict).features
+        timer = self.stage_timer.update('importance', timer)
     
         x_fore, x_back, loss_box_of_pts, mask_kernel = self._gen_sparse_features(x, imps_3d, batch_dict, voxels_3d)
+        timer = self.stage_timer.update('split_voxels', timer)
 
         if not self.skip_mask_kernel:
             x_fore = x_fore.replace_feature(x_fore.features * mask_kernel.unsqueeze(-1))
         out = self.combine_out(x_fore, x_back, remove_repeat=True)
+        timer = self.stage_timer.update('combine_out', timer)
         out = self.conv(out)
         
         if self.use_img:
@@ -303,6 +318,7 @@ class FocalSparseConv(spconv.SparseModule):
 
         out = out.replace_feature(self.bn1(out.features))
         out = out.replace_feature(self.relu(out.features))
+        self.stage_timer.update('conv', timer)
 
         batch_dict['loss_box_of_pts'] += loss_box_of_pts
         return out, batch_dict
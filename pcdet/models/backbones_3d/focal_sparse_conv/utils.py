@@ -199,3 +199,111 @@ def split_voxels(x, b, imps_3d, voxels_3d, kernel_offsets, mask_multi=True, topk
     coords_back = indices_ori[indices_back]
 
     return features_fore, coords_fore, features_back, coords_back, mask_kernel_fore
+
+def get_voxel_keys(indices, spatial_shape):
+    """
+        Pack the indices of the sparse features to one int64 key per voxel, ordered as (batch, z, y, x).
+        Args:
+            indices: [N, 4], indices of sparse features
+            spatial_shape: [3], spatial shape of the sparse tensor
+    """
+    indices = indices.long()
+    keys = indices[:, 0] * spatial_shape[0] + indices[:, 1]
+    keys = keys * spatial_shape[1] + indices[:, 2]
+    keys = keys * spatial_shape[2] + indices[:, 3]
+    return keys
+
+def check_repeat_batch(features, indices, spatial_shape, features_add=None):
+    """
+        Remove the replicate indices of the sparse features of the whole batch at once, the features of
+        the same voxel are summed and its features_add averaged as in check_repeat.
+        Args:
+            features: [N, C], sparse features
+            indices: [N, 4], indices of sparse features
+            spatial_shape: [3], spatial shape of the sparse tensor
+            features_add: [N], additional features to average
+
+        Return:
+            features, indices, features_add of the unique voxels, sorted by (batch, z, y, x)
+    """
+    keys = get_voxel_keys(indices, spatial_shape)
+    unique_keys, inverse, counts = torch.unique(keys, return_inverse=True, return_counts=True)
+
+    features_new = features.new_zeros((unique_keys.shape[0], features.shape[-1]))
+    features_new.index_add_(0, inverse, features)
+
+    perm = torch.arange(inverse.shape[0], dtype=inverse.dtype, device=inverse.device)
+    perm_ = inverse.new_empty(unique_keys.shape[0]).scatter_(0, inverse, perm)
+    indices_new = indices[perm_].int()
+
+    if features_add is not None:
+        features_add_new = features_add.new_zeros((unique_keys.shape[0],))
+        features_add_new.index_add_(0, inverse, features_add)
+        features_add = features_add_new / counts
+    return features_new, indices_new, features_add
+
+def split_voxels_batch(x, imps_3d, kernel_offsets, mask_multi=True, topk=True, threshold=0.5):
+    """
+        Batch-wide split_voxels, the voxels of all the samples are split, dilated and deduplicated in one pass.
+        Args:
+            x: [N, C], input sparse features
+            imps_3d: [N, kernelsize**3], the prediced importance values
+            kernel_offsets: [kernelsize**3, 3], the offset coords in an kernel
+            mask_multi: bool, whether to multiply the predicted mask to features
+            topk: bool, whether to use topk or threshold for selection
+            threshold: float, threshold value
+
+        Return:
+            features_fore, coords_fore, features_back, coords_back, mask_kernel_fore of the whole batch
+    """
+    batch_index = x.indices[:, 0].long()
+    features_ori = x.features
+    mask_voxel = imps_3d[:, -1].sigmoid()
+    mask_kernel = imps_3d[:, :-1].sigmoid()
+
+    if mask_multi:
+        features_ori = features_ori * mask_voxel.unsqueeze(-1)
+
+    if topk:
+        # sorted by batch, then by descending importance within each sample
+        order = torch.argsort(batch_index.double() * 2 + (1 - mask_voxel.double()))
+        num_voxels = torch.bincount(batch_index, minlength=x.batch_size)
+        num_fore = (num_voxels.double() * threshold).long()
+        batch_start = torch.cumsum(num_voxels, dim=0) - num_voxels
+        sorted_batch_index = batch_index[order]
+        rank = torch.arange(order.shape[0], device=order.device) - batch_start[sorted_batch_index]
+        is_fore = rank < num_fore[sorted_batch_index]
+        indices_fore = order[is_fore]
+        indices_back = order[~is_fore]
+    else:
+        indices_fore = mask_voxel > threshold
+        indices_back = mask_voxel <= threshold
+
+    features_fore = features_ori[indices_fore]
+    coords_fore = x.indices[indices_fore]
+
+    mask_kernel_fore = mask_kernel[indices_fore]
+    mask_kernel_bool = mask_kernel_fore >= threshold
+    selected_pair = mask_kernel_bool.nonzero()  # (voxel, kernel offset)
+    mask_kernel_fore = mask_kernel_fore[mask_kernel_bool]
+    selected_indices = coords_fore[selected_pair[:, 0]]
+    selected_indices[:, 1:] += kernel_offsets.int()[selected_pair[:, 1]]
+    spatial_indices = (selected_indices[:, 1] > 0) & (selected_indices[:, 2] > 0) & (selected_indices[:, 3] > 0) & \
+                      (selected_indices[:, 1] < x.spatial_shape[0]) & (selected_indices[:, 2] < x.spatial_shape[1]) & \
+                      (selected_indices[:, 3] < x.spatial_shape[2])
+    selected_indices = selected_indices[spatial_indices]
+    mask_kernel_fore = mask_kernel_fore[spatial_indices]
+
+    selected_features = features_fore.new_zeros((selected_indices.shape[0], features_ori.shape[1]))
+    features_fore_cat = torch.cat([features_fore, selected_features], dim=0)
+    coords_fore = torch.cat([coords_fore, selected_indices], dim=0)
+    mask_kernel_fore = torch.cat([features_fore.new_ones(features_fore.shape[0]), mask_kernel_fore], dim=0)
+
+    features_fore, coords_fore, mask_kernel_fore = check_repeat_batch(
+        features_fore_cat, coords_fore, x.spatial_shape, features_add=mask_kernel_fore
+    )
+
+    features_back = features_ori[indices_back]
+    coords_back = x.indices[indices_back]
+
+    return features_fore, coords_fore, features_back, coords_back, mask_kernel_fore
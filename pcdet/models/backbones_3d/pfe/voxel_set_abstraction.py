@@ -42,18 +42,89 @@ def bilinear_interpolate_torch(im, x, y):
     return ans
 
 
-def sample_points_with_roi(rois, points, sample_radius_with_roi, num_max_points_of_part=200000):
+def get_point_mask_with_roi_grid(rois, points, sample_radius_with_roi, num_max_points_of_part=200000):
+    """
+    Same mask as sample_points_with_roi without the (N, M) distance matrix: the roi centers are bucketed in a BEV
+    grid with the cell size of the largest sampling distance, so each point is only compared with the rois of the
+    3x3 cells around it, which contain its nearest roi whenever the point can be sampled. Among equally near rois
+    the one of the lowest index is used, as by the argmin of the dense path.
+
+    Args:
+        rois: (M, 7 + C)
+        points: (N, 3)
+        sample_radius_with_roi:
+        num_max_points_of_part:
+
+    Returns:
+        point_mask: (N)
+    """
+    point_mask = points.new_zeros(points.shape[0], dtype=torch.bool)
+    if rois.shape[0] == 0:
+        return point_mask
+
+    roi_max_dim = (rois[:, 3:6] / 2).norm(dim=-1)
+    cell_size = float(roi_max_dim.max()) + sample_radius_with_roi
+    origin = rois[:, 0:2].min(dim=0)[0]
+    roi_cells = torch.floor((rois[:, 0:2] - origin) / cell_size).long() + 1
+    num_cells_x, num_cells_y = int(roi_cells[:, 0].max()) + 2, int(roi_cells[:, 1].max()) + 2
+    roi_keys = roi_cells[:, 1] * num_cells_x + roi_cells[:, 0]
+    roi_order = torch.argsort(roi_keys)
+    # rois of each cell, padded by a row on both sides for the neighbouring keys of the border cells
+    key_padding = num_cells_x + 1
+    cell_counts = torch.bincount(roi_keys + key_padding, minlength=num_cells_x * num_cells_y + 2 * key_padding)
+    cell_starts = torch.cumsum(cell_counts, dim=0) - cell_counts
+    cell_offsets = torch.tensor(
+        [dy * num_cells_x + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1)], device=points.device
+    )
+
+    for start_idx in range(0, points.shape[0], num_max_points_of_part):
+        cur_points = points[start_idx:start_idx + num_max_points_of_part]
+        point_cells = torch.floor((cur_points[:, 0:2] - origin) / cell_size).long() + 1
+        point_cells[:, 0].clamp_(min=0, max=num_cells_x - 1)
+        point_cells[:, 1].clamp_(min=0, max=num_cells_y - 1)
+        point_keys = point_cells[:, 1] * num_cells_x + point_cells[:, 0]
+
+        # (point, roi in a neighbouring cell) pairs
+        neighbor_keys = (point_keys[:, None] + cell_offsets[None, :]).view(-1) + key_padding
+        starts, counts = cell_starts[neighbor_keys], cell_counts[neighbor_keys]
+        point_idx = torch.arange(cur_points.shape[0], device=points.device).repeat_interleave(
+            cell_offsets.shape[0]).repeat_interleave(counts)
+        pair_offsets = torch.arange(int(counts.sum()), device=points.device) - \
+            (torch.cumsum(counts, dim=0) - counts).repeat_interleave(counts)
+        roi_idx = roi_order[starts.repeat_interleave(counts) + pair_offsets]
+
+        distance = (cur_points[point_idx] - rois[roi_idx, 0:3]).norm(dim=-1)
+        # nearest roi of each point: the first pair of each point once sorted by (point, distance, roi)
+        distance_values, distance_rank = torch.unique(distance, return_inverse=True)
+        pair_keys = (point_idx * distance_values.shape[0] + distance_rank) * rois.shape[0] + roi_idx
+        pair_order = torch.argsort(pair_keys)
+        point_idx, roi_idx, distance = point_idx[pair_order], roi_idx[pair_order], distance[pair_order]
+        is_nearest = torch.ones_like(point_idx, dtype=torch.bool)
+        is_nearest[1:] = point_idx[1:] != point_idx[:-1]
+        point_idx, roi_idx, distance = point_idx[is_nearest], roi_idx[is_nearest], distance[is_nearest]
+        cur_point_mask = point_mask.new_zeros(cur_points.shape[0])
+        cur_point_mask[point_idx] = distance < roi_max_dim[roi_idx] + sample_radius_with_roi
+        point_mask[start_idx:start_idx + num_max_points_of_part] = cur_point_mask
+    return point_mask
+
+
+def sample_points_with_roi(rois, points, sample_radius_with_roi, num_max_points_of_part=200000, use_roi_grid=False):
     """
     Args:
         rois: (M, 7 + C)
         points: (N, 3)
         sample_radius_with_roi:
         num_max_points_of_part:
+        use_roi_grid: compare the points with the rois of the neighbouring BEV cells only
 
     Returns:
         sampled_points: (N_out, 3)
     """
-    if points.shape[0] < num_max_points_of_part:
+    if use_roi_grid:
+        point_mask = get_point_mask_with_roi_grid(
+            rois, points, sample_radius_with_roi, num_max_points_of_part=num_max_points_of_part
+        )
+    elif points.shape[0] < num_max_points_of_part:
         distance = (points[:, None, :] - rois[None, :, 0:3]).norm(dim=-1)
         min_dis, min_dis_roi_idx = distance.min(dim=-1)
         roi_max_dim = (rois[min_dis_roi_idx, 3:6] / 2).norm(dim=-1)
@@ -87,15 +158,17 @@ def sector_fps(points, num_sampled_points, num_sectors):
     """
     sector_size = np.pi * 2 / num_sectors
     point_angles = torch.atan2(points[:, 1], points[:, 0]) + np.pi
-    sector_idx = (point_angles / sector_size).floor().clamp(min=0, max=num_sectors)
-    xyz_points_list = []
+    sector_idx = (point_angles / sector_size).floor().clamp(min=0, max=num_sectors).long()
+
+    # the points of each sector in one pass, the ones with sector_idx == num_sectors are dropped,
+    # the unique keys keep the order of the points inside each sector (torch.sort(stable=True) needs torch>=1.9)
+    sort_idx = torch.argsort(sector_idx * points.shape[0] + torch.arange(points.shape[0], device=points.device))
+    sector_idx = sector_idx[sort_idx]
+    sector_cnt = torch.bincount(sector_idx, minlength=num_sectors + 1)[:num_sectors].tolist()
     xyz_batch_cnt = []
     num_sampled_points_list = []
-    for k in range(num_sectors):
-        mask = (sector_idx == k)
-        cur_num_points = mask.sum().item()
+    for cur_num_points in sector_cnt:
         if cur_num_points > 0:
-            xyz_points_list.append(points[mask])
             xyz_batch_cnt.append(cur_num_points)
             ratio = cur_num_points / points.shape[0]
             num_sampled_points_list.append(
@@ -103,12 +176,13 @@ def sector_fps(points, num_sampled_points, num_sectors):
             )
 
     if len(xyz_batch_cnt) == 0:
-        xyz_points_list.append(points)
+        xyz = points
         xyz_batch_cnt.append(len(points))
         num_sampled_points_list.append(num_sampled_points)
         print(f'Warning: empty sector points detected in SectorFPS: points.shape={points.shape}')
+    else:
+        xyz = points[sort_idx[:sum(xyz_batch_cnt)]]
 
-    xyz = torch.cat(xyz_points_list, dim=0)
     xyz_batch_cnt = torch.tensor(xyz_batch_cnt, device=points.device).int()
     sampled_points_batch_cnt = torch.tensor(num_sampled_points_list, device=points.device).int()
 
@@ -121,6 +195,93 @@ def sector_fps(points, num_sampled_points, num_sectors):
     return sampled_points
 
 
+def voxel_downsample_points(points, batch_indices, voxel_size):
+    """
+    Args:
+        points: (N1 + N2 + ..., 3)
+        batch_indices: (N1 + N2 + ...)
+        voxel_size: [x, y, z]
+
+    Returns:
+        point_idxs: (N_out), index of the first point of each non-empty voxel, in the order of the points
+    """
+    voxel_size = points.new_tensor(voxel_size)
+    coords = ((points - points.min(dim=0)[0]) / voxel_size).floor().long()
+    grid_size = coords.max(dim=0)[0] + 1
+    voxel_keys = ((batch_indices.long() * grid_size[2] + coords[:, 2]) * grid_size[1] + coords[:, 1]) \
+        * grid_size[0] + coords[:, 0]
+    _, voxel_idx = torch.unique(voxel_keys, return_inverse=True)
+
+    # sorted by voxel and then by point index, the first entry of each voxel is its first point
+    point_idxs = torch.argsort(voxel_idx * points.shape[0] + torch.arange(points.shape[0], device=points.device))
+    voxel_cnt = torch.bincount(voxel_idx)
+    first_point_idxs = point_idxs[torch.cumsum(voxel_cnt, dim=0) - voxel_cnt]
+    return first_point_idxs.sort()[0]
+
+
+def voxel_sector_fps(points, batch_indices, batch_size, num_sampled_points, voxel_size=None, num_sectors=1):
+    """
+    Approximate FPS for the keypoints: one point is kept per voxel, then the points of each sample are split into
+    angular sectors and the FPS of all the sectors of the batch is done by one stack_farthest_point_sample call.
+    Each sector gets its share of the num_sampled_points by its number of points (largest remainder).
+
+    Args:
+        points: (N1 + N2 + ..., 3)
+        batch_indices: (N1 + N2 + ...)
+        batch_size: int
+        num_sampled_points: int, number of keypoints of each sample
+        voxel_size: [x, y, z], None to sample from all the points
+        num_sectors: int
+
+    Returns:
+        keypoints: (batch_size * num_sampled_points, 4), [bs_idx, x, y, z]
+    """
+    if voxel_size is not None:
+        point_idxs = voxel_downsample_points(points, batch_indices, voxel_size)
+        points, batch_indices = points[point_idxs], batch_indices[point_idxs]
+
+    sector_size = np.pi * 2 / num_sectors
+    point_angles = torch.atan2(points[:, 1], points[:, 0]) + np.pi
+    sector_idx = (point_angles / sector_size).floor().long().clamp(min=0, max=num_sectors - 1)
+    segment_idx = batch_indices.long() * num_sectors + sector_idx
+    sort_idx = torch.argsort(segment_idx * points.shape[0] + torch.arange(points.shape[0], device=points.device))
+    segment_idx = segment_idx[sort_idx]
+    xyz = points[sort_idx]
+
+    # the sector sizes are needed on the host by the FPS kernel anyway, this is the only sync
+    segment_cnt = torch.bincount(segment_idx, minlength=batch_size * num_sectors).view(batch_size, num_sectors)
+    segment_cnt = segment_cnt.cpu().numpy()
+    num_points = segment_cnt.sum(axis=1, keepdims=True)
+    assert (num_points > 0).all(), 'Empty sample in VoxelSectorFPS: %s' % num_points.reshape(-1)
+
+    quota = segment_cnt * num_sampled_points / num_points
+    num_sampled = np.floor(quota).astype(np.int64)
+    num_left = num_sampled_points - num_sampled.sum(axis=1)
+    rank = np.argsort(np.argsort(num_sampled - quota, axis=1, kind='stable'), axis=1)
+    num_sampled += rank < num_left[:, None]
+    num_sampled = np.where(num_points >= num_sampled_points, num_sampled, segment_cnt).reshape(-1)
+
+    # the sectors without any sampled point are left out of the FPS
+    segment_mask = num_sampled > 0
+    point_mask = torch.from_numpy(segment_mask).to(points.device)[segment_idx]
+    sampled_pt_idxs = pointnet2_stack_utils.stack_farthest_point_sample(
+        xyz[point_mask].contiguous(),
+        torch.from_numpy(segment_cnt.reshape(-1)[segment_mask]).int().to(points.device),
+        torch.from_numpy(num_sampled[segment_mask]).int().to(points.device)
+    ).long()
+    sampled_points = xyz[point_mask][sampled_pt_idxs]
+
+    # the samples with less than num_sampled_points points repeat their points as in the FPS mode
+    sample_cnt = np.minimum(num_points.reshape(-1), num_sampled_points)
+    sample_start = np.concatenate(([0], np.cumsum(sample_cnt)[:-1]))
+    repeat_idxs = sample_start[:, None] + np.arange(num_sampled_points)[None, :] % sample_cnt[:, None]
+    sampled_points = sampled_points[torch.from_numpy(repeat_idxs.reshape(-1)).to(points.device)]
+
+    bs_idxs = torch.arange(batch_size, device=points.device).repeat_interleave(num_sampled_points)
+    keypoints = torch.cat((bs_idxs[:, None].float(), sampled_points), dim=1)
+    return keypoints
+
+
 class VoxelSetAbstraction(nn.Module):
     def __init__(self, model_cfg, voxel_size, point_cloud_range, num_bev_features=None,
                  num_rawpoint_features=None, **kwargs):
@@ -216,7 +377,8 @@ class VoxelSetAbstraction(nn.Module):
         sampled_points, _ = sample_points_with_roi(
             rois=roi_boxes, points=points,
             sample_radius_with_roi=self.model_cfg.SPC_SAMPLING.SAMPLE_RADIUS_WITH_ROI,
-            num_max_points_of_part=self.model_cfg.SPC_SAMPLING.get('NUM_POINTS_OF_EACH_SAMPLE_PART', 200000)
+            num_max_points_of_part=self.model_cfg.SPC_SAMPLING.get('NUM_POINTS_OF_EACH_SAMPLE_PART', 200000),
+            use_roi_grid=self.model_cfg.get('USE_ROI_GRID', False)
         )
         sampled_points = sector_fps(
             points=sampled_points, num_sampled_points=self.model_cfg.NUM_KEYPOINTS,
@@ -246,6 +408,17 @@ class VoxelSetAbstraction(nn.Module):
             batch_indices = batch_dict['voxel_coords'][:, 0].long()
         else:
             raise NotImplementedError
+
+        if self.model_cfg.SAMPLE_METHOD == 'VOXEL_FPS':
+            sampling_cfg = self.model_cfg.get('VOXEL_FPS_SAMPLING', {})
+            keypoints = voxel_sector_fps(
+                points=src_points, batch_indices=batch_indices, batch_size=batch_size,
+                num_sampled_points=self.model_cfg.NUM_KEYPOINTS,
+                voxel_size=sampling_cfg.get('VOXEL_SIZE', None),
+                num_sectors=sampling_cfg.get('NUM_SECTORS', 1)
+            )
+            return keypoints
+
         keypoints_list = []
         for bs_idx in range(batch_size):
             bs_mask = (batch_indices == bs_idx)
@@ -283,7 +456,8 @@ class VoxelSetAbstraction(nn.Module):
     @staticmethod
     def aggregate_keypoint_features_from_one_source(
             batch_size, aggregate_func, xyz, xyz_features, xyz_bs_idxs, new_xyz, new_xyz_batch_cnt,
-            filter_neighbors_with_roi=False, radius_of_neighbor=None, num_max_points_of_part=200000, rois=None
+            filter_neighbors_with_roi=False, radius_of_neighbor=None, num_max_points_of_part=200000, rois=None,
+            use_roi_grid=False
     ):
         """
 
@@ -299,6 +473,7 @@ class VoxelSetAbstraction(nn.Module):
             radius_of_neighbor: float
             num_max_points_of_part: int
             rois: (batch_size, num_rois, 7 + C)
+            use_roi_grid: True/False, see sample_points_with_roi
         Returns:
 
         """
@@ -311,6 +486,7 @@ class VoxelSetAbstraction(nn.Module):
                 _, valid_mask = sample_points_with_roi(
                     rois=rois[bs_idx], points=xyz[bs_mask],
                     sample_radius_with_roi=radius_of_neighbor, num_max_points_of_part=num_max_points_of_part,
+                    use_roi_grid=use_roi_grid
                 )
                 point_features_list.append(point_features[bs_mask][valid_mask])
                 xyz_batch_cnt[bs_idx] = valid_mask.sum()
@@ -377,7 +553,7 @@ class VoxelSetAbstraction(nn.Module):
                 new_xyz=new_xyz, new_xyz_batch_cnt=new_xyz_batch_cnt,
                 filter_neighbors_with_roi=self.model_cfg.SA_LAYER['raw_points'].get('FILTER_NEIGHBOR_WITH_ROI', False),
                 radius_of_neighbor=self.model_cfg.SA_LAYER['raw_points'].get('RADIUS_OF_NEIGHBOR_WITH_ROI', None),
-                rois=batch_dict.get('rois', None)
+                rois=batch_dict.get('rois', None), use_roi_grid=self.model_cfg.get('USE_ROI_GRID', False)
             )
             point_features_list.append(pooled_features)
 
@@ -396,7 +572,7 @@ class VoxelSetAbstraction(nn.Module):
                 new_xyz=new_xyz, new_xyz_batch_cnt=new_xyz_batch_cnt,
                 filter_neighbors_with_roi=self.model_cfg.SA_LAYER[src_name].get('FILTER_NEIGHBOR_WITH_ROI', False),
                 radius_of_neighbor=self.model_cfg.SA_LAYER[src_name].get('RADIUS_OF_NEIGHBOR_WITH_ROI', None),
-                rois=batch_dict.get('rois', None)
+                rois=batch_dict.get('rois', None), use_roi_grid=self.model_cfg.get('USE_ROI_GRID', False)
             )
 
             point_features_list.append(pooled_features)
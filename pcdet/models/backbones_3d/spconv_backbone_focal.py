@@ -125,6 +125,9 @@ class VoxelBackBone8xFocal(nn.Module):
         enlarge_voxel_channels = model_cfg.get('ENLARGE_VOXEL_CHANNELS', -1)
         img_pretrain = model_cfg.get('IMG_PRETRAIN', "checkpoints/deeplabv3_resnet50_coco-cd0a2569.pth")
         use_stages = model_cfg.get('USE_STAGES', [1, 2, 3])
+        batch_split = model_cfg.get('BATCH_SPLIT_VOXELS', False)
+        # per-stage time of the focal layers, logged by the train and eval loops with get_focal_time_report
+        self.focal_stage_time = model_cfg.get('FOCAL_STAGE_TIME', False)
         
         if use_img:
             model_cfg_seg=dict(
@@ -151,7 +154,7 @@ class VoxelBackBone8xFocal(nn.Module):
 
         special_spconv_fn = partial(FocalSparseConv, mask_multi=mask_multi, enlarge_voxel_channels=enlarge_voxel_channels, 
                                     topk=topk, threshold=threshold, kernel_size=kernel_size, padding=kernel_size//2, 
-                                    skip_mask_kernel=skip_mask_kernel)
+                                    skip_mask_kernel=skip_mask_kernel, batch_split=batch_split)
         self.use_img = use_img
 
         self.conv1 = SparseSequentialBatchdict(
@@ -199,6 +202,16 @@ class VoxelBackBone8xFocal(nn.Module):
             'x_conv4': 64
         }
 
+        for module in self.modules():
+            if isinstance(module, FocalSparseConv):
+                module.stage_timer.enabled = self.focal_stage_time
+
+    def get_focal_time_report(self):
+        if not self.focal_stage_time:
+            return None
+        return '\n'.join(['%s: %s' % (name, module.stage_timer.report()) for name, module in self.named_modules()
+                          if isinstance(module, FocalSparseConv)])
+
     def forward(self, batch_dict):
         """
         Args:
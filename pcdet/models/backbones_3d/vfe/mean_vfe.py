@@ -1,5 +1,6 @@
 import torch
 
+from ....utils import common_utils
 from .vfe_template import VFETemplate
 
 
@@ -17,11 +18,24 @@ class MeanVFE(VFETemplate):
             batch_dict:
                 voxels: (num_voxels, max_points_per_voxel, C)
                 voxel_num_points: optional (num_voxels)
+                or, with DYNAMIC_VOXELIZATION:
+                points: (N, 1 + C), [batch_idx, x, y, z, ...]
+                point_to_voxel: (N), -1 for the points out of the range
+                voxel_coords: (num_voxels, 4), [batch_idx, z_idx, y_idx, x_idx]
             **kwargs:
 
         Returns:
             vfe_features: (num_voxels, C)
         """
+        if 'point_to_voxel' in batch_dict:
+            point_to_voxel = batch_dict['point_to_voxel'].long()
+            mask = point_to_voxel >= 0
+            points_mean = common_utils.scatter_mean(
+                batch_dict['points'][mask, 1:], point_to_voxel[mask], batch_dict['voxel_coords'].shape[0]
+            )
+            batch_dict['voxel_features'] = points_mean.contiguous()
+            return batch_dict
+
         voxel_features, voxel_num_points = batch_dict['voxels'], batch_dict['voxel_num_points']
         points_mean = voxel_features[:, :, :].sum(dim=1, keepdim=False)
         normalizer = torch.clamp_min(voxel_num_points.view(-1, 1), min=1.0).type_as(voxel_features)
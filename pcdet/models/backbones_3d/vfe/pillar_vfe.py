@@ -2,6 +2,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from ....utils import common_utils
 from .vfe_template import VFETemplate
 
 
@@ -26,7 +27,7 @@ class PFNLayer(nn.Module):
 
         self.part = 50000
 
-    def forward(self, inputs):
+    def linear_in_parts(self, inputs):
         if inputs.shape[0] > self.part:
             # nn.Linear performs randomly when batch size is too large
             num_parts = inputs.shape[0] // self.part
@@ -35,6 +36,32 @@ class PFNLayer(nn.Module):
             x = torch.cat(part_linear_out, dim=0)
         else:
             x = self.linear(inputs)
+        return x
+
+    def forward_dynamic(self, inputs, point_to_voxel, num_voxels):
+        """
+        Args:
+            inputs: (N, C_in), features of the points
+            point_to_voxel: (N), voxel of each point
+            num_voxels: int
+
+        Returns:
+            features: (N, C_out) or (num_voxels, C_out) for the last layer
+        """
+        x = self.linear_in_parts(inputs)
+        torch.backends.cudnn.enabled = False
+        x = self.norm(x) if self.use_norm else x
+        torch.backends.cudnn.enabled = True
+        x = F.relu(x)
+        x_max = common_utils.scatter_max(x, point_to_voxel, num_voxels)
+
+        if self.last_vfe:
+            return x_max
+        else:
+            return torch.cat([x, x_max[point_to_voxel]], dim=1)
+
+    def forward(self, inputs):
+        x = self.linear_in_parts(inputs)
         torch.backends.cudnn.enabled = False
         x = self.norm(x.permute(0, 2, 1)).permute(0, 2, 1) if self.use_norm else x
         torch.backends.cudnn.enabled = True
@@ -91,8 +118,55 @@ class PillarVFE(VFETemplate):
         paddings_indicator = actual_num.int() > max_num
         return paddings_indicator
 
+    def forward_dynamic(self, batch_dict):
+        """
+        Same features as forward, computed on the points of each pillar and reduced with scatter max, instead of
+        on the voxels padded to max_points_per_voxel. The padding is not part of the max (nor of the batch norm
+        statistics) as it is in forward.
+
+        Args:
+            batch_dict:
+                points: (N, 1 + C), [batch_idx, x, y, z, ...]
+                point_to_voxel: (N), -1 for the points out of the range
+                voxel_coords: (num_voxels, 4), [batch_idx, z_idx, y_idx, x_idx]
+
+        Returns:
+            batch_dict:
+                pillar_features: (num_voxels, C_out)
+        """
+        point_to_voxel, coords = batch_dict['point_to_voxel'].long(), batch_dict['voxel_coords']
+        mask = point_to_voxel >= 0
+        point_features, point_to_voxel = batch_dict['points'][mask, 1:], point_to_voxel[mask]
+        num_voxels = coords.shape[0]
+
+        points_mean = common_utils.scatter_mean(point_features[:, :3], point_to_voxel, num_voxels)
+        f_cluster = point_features[:, :3] - points_mean[point_to_voxel]
+
+        point_coords = coords[point_to_voxel].to(point_features.dtype)
+        f_center = torch.zeros_like(point_features[:, :3])
+        f_center[:, 0] = point_features[:, 0] - (point_coords[:, 3] * self.voxel_x + self.x_offset)
+        f_center[:, 1] = point_features[:, 1] - (point_coords[:, 2] * self.voxel_y + self.y_offset)
+        f_center[:, 2] = point_features[:, 2] - (point_coords[:, 1] * self.voxel_z + self.z_offset)
+
+        if self.use_absolute_xyz:
+            features = [point_features, f_cluster, f_center]
+        else:
+            features = [point_features[:, 3:], f_cluster, f_center]
+
+        if self.with_distance:
+            points_dist = torch.norm(point_features[:, :3], 2, 1, keepdim=True)
+            features.append(points_dist)
+        features = torch.cat(features, dim=-1)
+
+        for pfn in self.pfn_layers:
+            features = pfn.forward_dynamic(features, point_to_voxel, num_voxels)
+        batch_dict['pillar_features'] = features
+        return batch_dict
+
     def forward(self, batch_dict, **kwargs):
-  
+        if 'point_to_voxel' in batch_dict:
+            return self.forward_dynamic(batch_dict)
+
         voxel_features, voxel_num_points, coords = batch_dict['voxels'], batch_dict['voxel_num_points'], batch_dict['voxel_coords']
         points_mean = voxel_features[:, :, :3].sum(dim=1, keepdim=True) / voxel_num_points.type_as(voxel_features).view(-1, 1, 1)
         f_cluster = voxel_features[:, :, :3] - points_mean
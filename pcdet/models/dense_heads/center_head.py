@@ -94,6 +94,7 @@ class CenterHead(nn.Module):
             )
         self.predict_boxes_when_training = predict_boxes_when_training
         self.forward_ret_dict = {}
+        self.gaussian_kernels = None
         self.build_losses()
 
     def build_losses(self):
@@ -169,6 +170,8 @@ class CenterHead(nn.Module):
         feature_map_size = feature_map_size[::-1]  # [H, W] ==> [x, y]
         target_assigner_cfg = self.model_cfg.TARGET_ASSIGNER_CONFIG
         # feature_map_size = self.grid_size[:2] // target_assigner_cfg.FEATURE_MAP_STRIDE
+        if target_assigner_cfg.get('BATCHED', False):
+            return self.assign_targets_batch(gt_boxes, feature_map_size)
 
         batch_size = gt_boxes.shape[0]
         ret_dict = {
@@ -218,6 +221,107 @@ class CenterHead(nn.Module):
             ret_dict['masks'].append(torch.stack(masks_list, dim=0))
         return ret_dict
 
+    def assign_targets_batch(self, gt_boxes, feature_map_size):
+        """
+        Same targets as assign_targets, computed on the device of gt_boxes for all the boxes, samples and heads at
+        once: the gaussians of all the heads are drawn in one op with the precomputed kernel of their radius.
+        The labels of gt_boxes are left as they are (assign_targets writes the class index in the head to them).
+        Enabled by TARGET_ASSIGNER_CONFIG.BATCHED.
+
+        Args:
+            gt_boxes: (B, M, 8 + C)
+            feature_map_size: (2), [x, y]
+
+        Returns:
+            ret_dict:
+                heatmaps: list of (B, num_classes_of_head, H, W)
+                target_boxes: list of (B, num_max_objs, 8 + C)
+                inds: list of (B, num_max_objs)
+                masks: list of (B, num_max_objs)
+        """
+        target_assigner_cfg = self.model_cfg.TARGET_ASSIGNER_CONFIG
+        feature_map_stride = target_assigner_cfg.FEATURE_MAP_STRIDE
+        num_max_objs = target_assigner_cfg.NUM_MAX_OBJS
+        batch_size, device = gt_boxes.shape[0], gt_boxes.device
+        size_x, size_y = int(feature_map_size[0]), int(feature_map_size[1])
+
+        x, y, z = gt_boxes[..., 0], gt_boxes[..., 1], gt_boxes[..., 2]
+        coord_x = (x - self.point_cloud_range[0]) / self.voxel_size[0] / feature_map_stride
+        coord_y = (y - self.point_cloud_range[1]) / self.voxel_size[1] / feature_map_stride
+        coord_x = torch.clamp(coord_x, min=0, max=size_x - 0.5)
+        coord_y = torch.clamp(coord_y, min=0, max=size_y - 0.5)
+        center = torch.stack((coord_x, coord_y), dim=-1)
+        center_int = center.int()
+
+        dx = gt_boxes[..., 3] / self.voxel_size[0] / feature_map_stride
+        dy = gt_boxes[..., 4] / self.voxel_size[1] / feature_map_stride
+        radius = centernet_utils.gaussian_radius(dx, dy, min_overlap=target_assigner_cfg.GAUSSIAN_OVERLAP)
+        radius = torch.clamp_min(radius.int(), min=target_assigner_cfg.MIN_RADIUS)
+        box_valid = (dx > 0) & (dy > 0)
+
+        target_boxes = [
+            center - center_int.float(), z[..., None], gt_boxes[..., 3:6].log(),
+            torch.cos(gt_boxes[..., 6:7]), torch.sin(gt_boxes[..., 6:7]), gt_boxes[..., 7:-1]
+        ]
+        target_boxes = torch.cat(target_boxes, dim=-1)
+        labels = gt_boxes[..., -1].long()
+
+        ret_dict = {
+            'heatmaps': [],
+            'target_boxes': [],
+            'inds': [],
+            'masks': [],
+            'heatmap_masks': []
+        }
+        heatmap_inds_list, heatmap_boxes_list = [], []
+        channel_offset = 0
+        for cur_class_names in self.class_names_each_head:
+            # class index in the head (from 1) of each class, 0 for the classes of the other heads
+            class_id_to_head = torch.zeros(len(self.class_names) + 1, dtype=torch.long, device=device)
+            for k, name in enumerate(cur_class_names):
+                class_id_to_head[self.class_names.index(name) + 1] = k + 1
+            head_labels = class_id_to_head[labels]
+
+            # the targets of each box are at its index among the boxes of the head in the sample
+            in_head = head_labels > 0
+            slots = torch.cumsum(in_head.long(), dim=1) - 1
+            selected = in_head & (slots < num_max_objs) & box_valid
+            bs_inds, box_inds = selected.nonzero(as_tuple=True)
+            slot_inds = slots[bs_inds, box_inds]
+
+            ret_boxes = gt_boxes.new_zeros((batch_size, num_max_objs, target_boxes.shape[-1]))
+            inds = gt_boxes.new_zeros((batch_size, num_max_objs)).long()
+            mask = gt_boxes.new_zeros((batch_size, num_max_objs)).long()
+            ret_boxes[bs_inds, slot_inds] = target_boxes[bs_inds, box_inds]
+            inds[bs_inds, slot_inds] = (center_int[bs_inds, box_inds, 1] * size_x + center_int[bs_inds, box_inds, 0]).long()
+            mask[bs_inds, slot_inds] = 1
+
+            heatmap_inds_list.append(torch.stack((bs_inds, head_labels[bs_inds, box_inds] - 1 + channel_offset), dim=-1))
+            heatmap_boxes_list.append((bs_inds, box_inds))
+            channel_offset += len(cur_class_names)
+
+            ret_dict['target_boxes'].append(ret_boxes)
+            ret_dict['inds'].append(inds)
+            ret_dict['masks'].append(mask)
+
+        bs_inds = torch.cat([x[0] for x in heatmap_boxes_list], dim=0)
+        box_inds = torch.cat([x[1] for x in heatmap_boxes_list], dim=0)
+        heatmap = gt_boxes.new_zeros((batch_size, channel_offset, size_y, size_x))
+        if bs_inds.shape[0] > 0:
+            cur_radius = radius[bs_inds, box_inds]
+            max_radius = int(cur_radius.max())
+            if self.gaussian_kernels is None or self.gaussian_kernels.shape[0] <= max_radius \
+                    or self.gaussian_kernels.device != device:
+                self.gaussian_kernels = torch.from_numpy(centernet_utils.get_gaussian_kernels(max_radius)).to(device)
+            centernet_utils.draw_gaussian_to_heatmap_batch(
+                heatmap, torch.cat(heatmap_inds_list, dim=0), center_int[bs_inds, box_inds], cur_radius,
+                self.gaussian_kernels
+            )
+        ret_dict['heatmaps'] = [
+            x.contiguous() for x in torch.split(heatmap, [len(x) for x in self.class_names_each_head], dim=1)
+        ]
+        return ret_dict
+
     def sigmoid(self, x):
         y = torch.clamp(x.sigmoid(), min=1e-4, max=1 - 1e-4)
         return y
@@ -258,7 +362,14 @@ class CenterHead(nn.Module):
             'pred_scores': [],
             'pred_labels': [],
         } for k in range(batch_size)]
+        use_circle_nms = post_process_cfg.NMS_CONFIG.NMS_TYPE == 'circle_nms'
         for idx, pred_dict in enumerate(pred_dicts):
+            min_radius = None
+            if use_circle_nms:
+                # MIN_RADIUS: one value for all the heads or one per head
+                min_radius = post_process_cfg.NMS_CONFIG.MIN_RADIUS
+                min_radius = min_radius[idx] if isinstance(min_radius, (list, tuple)) else min_radius
+
             batch_hm = pred_dict['hm'].sigmoid()
             batch_center = pred_dict['center']
             batch_center_z = pred_dict['center_z']
@@ -273,14 +384,16 @@ class CenterHead(nn.Module):
                 point_cloud_range=self.point_cloud_range, voxel_size=self.voxel_size,
                 feature_map_stride=self.feature_map_stride,
                 K=post_process_cfg.MAX_OBJ_PER_SAMPLE,
-                circle_nms=(post_process_cfg.NMS_CONFIG.NMS_TYPE == 'circle_nms'),
+                circle_nms=use_circle_nms,
                 score_thresh=post_process_cfg.SCORE_THRESH,
-                post_center_limit_range=post_center_limit_range
+                post_center_limit_range=post_center_limit_range,
+                min_radius=min_radius,
+                nms_post_max_size=post_process_cfg.NMS_CONFIG.NMS_POST_MAXSIZE
             )
 
             for k, final_dict in enumerate(final_pred_dicts):
                 final_dict['pred_labels'] = self.class_id_mapping_each_head[idx][final_dict['pred_labels'].long()]
-                if post_process_cfg.NMS_CONFIG.NMS_TYPE != 'circle_nms':
+                if not use_circle_nms:
                     selected, selected_scores = model_nms_utils.class_agnostic_nms(
                         box_scores=final_dict['pred_scores'], box_preds=final_dict['pred_boxes'],
                         nms_config=post_process_cfg.NMS_CONFIG,
@@ -193,6 +193,9 @@ class Detector3DTemplate(nn.Module):
 
         """
         post_process_cfg = self.model_cfg.POST_PROCESSING
+        if post_process_cfg.NMS_CONFIG.get('BATCHED_NMS', False) and batch_dict.get('batch_index', None) is None:
+            return self.batched_post_processing(batch_dict)
+
         batch_size = batch_dict['batch_size']
         recall_dict = {}
         pred_dicts = []
@@ -224,7 +227,7 @@ class Detector3DTemplate(nn.Module):
             if post_process_cfg.NMS_CONFIG.MULTI_CLASSES_NMS:
                 if not isinstance(cls_preds, list):
                     cls_preds = [cls_preds]
-                    multihead_label_mapping = [torch.arange(1, self.num_class, device=cls_preds[0].device)]
+                    multihead_label_mapping = [torch.arange(1, self.num_class + 1, device=cls_preds[0].device)]
                 else:
                     multihead_label_mapping = batch_dict['multihead_label_mapping']
 
@@ -283,6 +286,115 @@ class Detector3DTemplate(nn.Module):
 
         return pred_dicts, recall_dict
 
+    def batched_post_processing(self, batch_dict):
+        """
+        Same outputs as post_processing(), but the NMS of all the (sample, class) groups of the batch runs as
+        a single call of model_nms_utils.batched_nms() instead of one call per sample and class.
+        Enabled by POST_PROCESSING.NMS_CONFIG.BATCHED_NMS, only for dense (B, num_boxes, ...) predictions.
+
+        Args:
+            batch_dict: see post_processing(), without batch_index
+        Returns:
+
+        """
+        post_process_cfg = self.model_cfg.POST_PROCESSING
+        batch_size = batch_dict['batch_size']
+        batch_box_preds = batch_dict['batch_box_preds']
+        assert batch_box_preds.shape.__len__() == 3
+        num_boxes = batch_box_preds.shape[1]
+        box_preds = batch_box_preds.view(batch_size * num_boxes, -1)
+        box_batch_idx = torch.arange(batch_size, device=box_preds.device).repeat_interleave(num_boxes)
+
+        batch_cls_preds = batch_dict['batch_cls_preds']
+        if not isinstance(batch_cls_preds, list):
+            batch_cls_preds = [batch_cls_preds]
+        if not batch_dict['cls_preds_normalized']:
+            batch_cls_preds = [torch.sigmoid(x) for x in batch_cls_preds]
+
+        if post_process_cfg.NMS_CONFIG.MULTI_CLASSES_NMS:
+            if 'multihead_label_mapping' in batch_dict:
+                multihead_label_mapping = batch_dict['multihead_label_mapping']
+            else:
+                multihead_label_mapping = [torch.arange(1, self.num_class + 1, device=box_preds.device)]
+
+            # one candidate per (box, class) of every head, boxes of a head are contiguous in each sample
+            box_idx, box_scores, box_labels = [], [], []
+            cur_start_idx = 0
+            for cur_cls_preds, cur_label_mapping in zip(batch_cls_preds, multihead_label_mapping):
+                assert cur_cls_preds.shape[2] == len(cur_label_mapping)
+                cur_num_boxes, cur_num_class = cur_cls_preds.shape[1], cur_cls_preds.shape[2]
+                cur_box_idx = torch.arange(batch_size, device=box_preds.device)[:, None] * num_boxes + \
+                    torch.arange(cur_start_idx, cur_start_idx + cur_num_boxes, device=box_preds.device)[None, :]
+                box_idx.append(cur_box_idx[:, :, None].expand(-1, -1, cur_num_class).reshape(-1))
+                box_scores.append(cur_cls_preds.reshape(-1))
+                box_labels.append(cur_label_mapping[None, None, :].expand(batch_size, cur_num_boxes, -1).reshape(-1))
+                cur_start_idx += cur_num_boxes
+            box_idx = torch.cat(box_idx, dim=0)
+            box_scores = torch.cat(box_scores, dim=0)
+            box_labels = torch.cat(box_labels, dim=0)
+
+            selected = model_nms_utils.batched_nms(
+                box_scores=box_scores, box_preds=box_preds[box_idx],
+                group_ids=box_batch_idx[box_idx] * self.num_class + box_labels - 1,
+                num_groups=batch_size * self.num_class,
+                nms_config=post_process_cfg.NMS_CONFIG,
+                score_thresh=post_process_cfg.SCORE_THRESH
+            )
+            final_scores = box_scores[selected]
+            final_labels = box_labels[selected]
+            final_boxes = box_preds[box_idx[selected]]
+            final_batch_idx = box_batch_idx[box_idx[selected]]
+        else:
+            assert batch_cls_preds.__len__() == 1
+            cls_preds = batch_cls_preds[0].view(batch_size * num_boxes, -1)
+            assert cls_preds.shape[1] in [1, self.num_class]
+            cls_preds, label_preds = torch.max(cls_preds, dim=-1)
+            if batch_dict.get('has_class_labels', False):
+                label_key = 'roi_labels' if 'roi_labels' in batch_dict else 'batch_pred_labels'
+                label_preds = batch_dict[label_key].flatten(0, 1)
+            else:
+                label_preds = label_preds + 1
+            selected = model_nms_utils.batched_nms(
+                box_scores=cls_preds, box_preds=box_preds,
+                group_ids=box_batch_idx, num_groups=batch_size,
+                nms_config=post_process_cfg.NMS_CONFIG,
+                score_thresh=post_process_cfg.SCORE_THRESH
+            )
+
+            if post_process_cfg.OUTPUT_RAW_SCORE:
+                src_cls_preds = batch_dict['batch_cls_preds'].view(batch_size * num_boxes, -1)
+                max_cls_preds, _ = torch.max(src_cls_preds, dim=-1)
+                final_scores = max_cls_preds[selected]
+            else:
+                final_scores = cls_preds[selected]
+            final_labels = label_preds[selected]
+            final_boxes = box_preds[selected]
+            final_batch_idx = box_batch_idx[selected]
+
+        # selected is sorted by group, so the predictions of each sample are contiguous
+        num_preds_per_sample = torch.bincount(final_batch_idx, minlength=batch_size).tolist()
+        final_scores = torch.split(final_scores, num_preds_per_sample)
+        final_labels = torch.split(final_labels, num_preds_per_sample)
+        final_boxes = torch.split(final_boxes, num_preds_per_sample)
+
+        recall_dict = {}
+        pred_dicts = []
+        for index in range(batch_size):
+            recall_dict = self.generate_recall_record(
+                box_preds=final_boxes[index] if 'rois' not in batch_dict else batch_box_preds[index],
+                recall_dict=recall_dict, batch_index=index, data_dict=batch_dict,
+                thresh_list=post_process_cfg.RECALL_THRESH_LIST
+            )
+
+            record_dict = {
+                'pred_boxes': final_boxes[index],
+                'pred_scores': final_scores[index],
+                'pred_labels': final_labels[index]
+            }
+            pred_dicts.append(record_dict)
+
+        return pred_dicts, recall_dict
+
     @staticmethod
     def generate_recall_record(box_preds, recall_dict, batch_index, data_dict=None, thresh_list=None):
         if 'gt_boxes' not in data_dict:
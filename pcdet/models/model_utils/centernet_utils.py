@@ -5,6 +5,8 @@ import torch.nn.functional as F
 import numpy as np
 import numba
 
+from ...utils import common_utils
+
 
 def gaussian_radius(height, width, min_overlap=0.5):
     """
@@ -69,6 +71,56 @@ def draw_gaussian_to_heatmap(heatmap, center, radius, k=1, valid_mask=None):
     return heatmap
 
 
+def get_gaussian_kernels(max_radius):
+    """
+    Args:
+        max_radius: int
+
+    Returns:
+        kernels: (max_radius + 1, 2 * max_radius + 1, 2 * max_radius + 1), the gaussian2D of draw_gaussian_to_heatmap
+            for each radius in the center of the kernel, -1 outside of its diameter
+    """
+    size = 2 * max_radius + 1
+    kernels = np.full((max_radius + 1, size, size), -1, dtype=np.float32)
+    for radius in range(max_radius + 1):
+        diameter = 2 * radius + 1
+        kernels[radius, max_radius - radius:max_radius + radius + 1, max_radius - radius:max_radius + radius + 1] = \
+            gaussian2D((diameter, diameter), sigma=diameter / 6)
+    return kernels
+
+
+def draw_gaussian_to_heatmap_batch(heatmap, heatmap_inds, centers, radius, kernels):
+    """
+    Same as draw_gaussian_to_heatmap for all the boxes at once, the overlapping gaussians are reduced with max.
+
+    Args:
+        heatmap: (B, C, H, W)
+        heatmap_inds: (N, 2), [batch_idx, class_idx] of the heatmap of each box
+        centers: (N, 2), int [x, y]
+        radius: (N), int
+        kernels: (R, D, D) from get_gaussian_kernels, with R > radius.max()
+
+    Returns:
+        heatmap:
+    """
+    num_classes, height, width = heatmap.shape[1:]
+    max_radius = (kernels.shape[-1] - 1) // 2
+    offsets = torch.arange(-max_radius, max_radius + 1, device=heatmap.device)
+    centers, heatmap_inds = centers.long(), heatmap_inds.long()
+    xs = centers[:, 0, None, None] + offsets[None, None, :]
+    ys = centers[:, 1, None, None] + offsets[None, :, None]
+    values = kernels[radius.long()]
+
+    valid = (values >= 0) & (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    heatmap_offsets = (heatmap_inds[:, 0] * num_classes + heatmap_inds[:, 1])[:, None, None] * height * width
+    flat_inds = heatmap_offsets + ys * width + xs
+    unique_inds, pixel_idx = torch.unique(flat_inds[valid], return_inverse=True)
+    pixel_max = common_utils.scatter_max(values[valid].view(-1, 1), pixel_idx, unique_inds.shape[0]).view(-1)
+    heatmap_flat = heatmap.view(-1)
+    heatmap_flat[unique_inds] = torch.max(heatmap_flat[unique_inds], pixel_max)
+    return heatmap
+
+
 def _nms(heat, kernel=3):
     pad = (kernel - 1) // 2
 
@@ -82,7 +134,7 @@ def circle_nms(dets, thresh):
     x1 = dets[:, 0]
     y1 = dets[:, 1]
     scores = dets[:, 2]
-    order = scores.argsort()[::-1].astype(np.int32)  # highest->lowest
+    order = scores.argsort(kind='mergesort')[::-1].astype(np.int32)  # highest->lowest, ties by descending index
     ndets = dets.shape[0]
     suppressed = np.zeros((ndets), dtype=np.int32)
     keep = []
@@ -115,6 +167,72 @@ def _circle_nms(boxes, min_radius, post_max_size=83):
     return keep
 
 
+def circle_nms_batch(centers, scores, batch_idx, thresh, post_max_size=83):
+    """
+    Same selection as circle_nms for the boxes of all the samples at once, on their device. The boxes are
+    bucketed in a BEV grid of cell size sqrt(thresh) so that each box is only compared with the boxes of the 3x3
+    cells around it, and the greedy selection is resolved in parallel rounds: a box is kept once all its higher
+    scored neighbours are suppressed, and suppressed once one of them is kept. The boxes of equal score are
+    ranked by descending index, as in circle_nms.
+
+    Args:
+        centers: (N, 2), [x, y]
+        scores: (N)
+        batch_idx: (N)
+        thresh: squared center distance of suppression, as in circle_nms
+        post_max_size: max number of kept boxes of each sample
+
+    Returns:
+        keep: (K), indices of the kept boxes, by sample and then by descending score
+    """
+    num_boxes, device = centers.shape[0], centers.device
+    if num_boxes == 0:
+        return torch.zeros(0, dtype=torch.long, device=device)
+    batch_idx = batch_idx.long()
+    _, score_rank = torch.unique(scores, return_inverse=True)
+    order = torch.argsort(score_rank * num_boxes + torch.arange(num_boxes, device=device), descending=True)
+    rank = torch.empty_like(order)
+    rank[order] = torch.arange(num_boxes, device=device)
+
+    cell_size = float(np.sqrt(thresh)) if thresh > 0 else 1.0
+    cells = torch.floor((centers - centers.min(dim=0)[0]) / cell_size).long() + 1
+    num_cells_x, num_cells_y = int(cells[:, 0].max()) + 2, int(cells[:, 1].max()) + 2
+    keys = (batch_idx * num_cells_y + cells[:, 1]) * num_cells_x + cells[:, 0]
+    sorted_keys, key_order = keys.sort()
+
+    # all the (box, box in a neighbouring cell) pairs
+    cell_offsets = torch.tensor([dy * num_cells_x + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1)], device=device)
+    neighbor_keys = (keys[:, None] + cell_offsets[None, :]).view(-1)
+    starts = torch.searchsorted(sorted_keys, neighbor_keys)
+    counts = torch.searchsorted(sorted_keys, neighbor_keys, right=True) - starts
+    src = torch.arange(num_boxes, device=device).repeat_interleave(cell_offsets.shape[0]).repeat_interleave(counts)
+    pair_offsets = torch.arange(int(counts.sum()), device=device) - (torch.cumsum(counts, dim=0) - counts).repeat_interleave(counts)
+    dst = key_order[starts.repeat_interleave(counts) + pair_offsets]
+
+    dist = ((centers[src] - centers[dst]) ** 2).sum(dim=-1)
+    dominates = (rank[src] < rank[dst]) & (dist.double() <= thresh)
+    src, dst = src[dominates], dst[dominates]
+
+    # 1: kept, -1: suppressed, 0: undecided
+    state = torch.zeros(num_boxes, dtype=torch.int8, device=device)
+    while True:
+        undecided = state == 0
+        if not undecided.any():
+            break
+        num_kept_dominants = torch.bincount(dst[state[src] == 1], minlength=num_boxes)
+        num_open_dominants = torch.bincount(dst[state[src] != -1], minlength=num_boxes)
+        state[undecided & (num_kept_dominants > 0)] = -1
+        state[undecided & (num_open_dominants == 0)] = 1
+
+    keep = (state == 1).nonzero().view(-1)
+    keep = keep[torch.argsort(batch_idx[keep] * num_boxes + rank[keep])]
+    # first post_max_size kept boxes of each sample
+    batch_counts = torch.bincount(batch_idx[keep])
+    batch_starts = torch.cumsum(batch_counts, dim=0) - batch_counts
+    rank_in_batch = torch.arange(keep.shape[0], device=device) - batch_starts[batch_idx[keep]]
+    return keep[rank_in_batch < post_max_size]
+
+
 def _gather_feat(feat, ind, mask=None):
     dim = feat.size(2)
     ind = ind.unsqueeze(2).expand(ind.size(0), ind.size(1), dim)
@@ -153,12 +271,11 @@ def _topk(scores, K=40):
 
 def decode_bbox_from_heatmap(heatmap, rot_cos, rot_sin, center, center_z, dim,
                              point_cloud_range=None, voxel_size=None, feature_map_stride=None, vel=None, K=100,
-                             circle_nms=False, score_thresh=None, post_center_limit_range=None):
+                             circle_nms=False, score_thresh=None, post_center_limit_range=None,
+                             min_radius=None, nms_post_max_size=None):
     batch_size, num_class, _, _ = heatmap.size()
 
     if circle_nms:
-        # TODO: not checked yet
-        assert False, 'not checked yet'
         heatmap = _nms(heatmap)
 
     scores, inds, class_ids, ys, xs = _topk(heatmap, K=K)
@@ -191,6 +308,16 @@ def decode_bbox_from_heatmap(heatmap, rot_cos, rot_sin, center, center_z, dim,
     if score_thresh is not None:
         mask &= (final_scores > score_thresh)
 
+    if circle_nms:
+        # the boxes of each sample are in descending score order, so masking keeps the order of circle_nms
+        bs_idx, box_idx = mask.nonzero(as_tuple=True)
+        keep = circle_nms_batch(
+            final_box_preds[bs_idx, box_idx, 0:2], final_scores[bs_idx, box_idx], bs_idx,
+            thresh=min_radius, post_max_size=nms_post_max_size
+        )
+        mask = torch.zeros_like(mask)
+        mask[bs_idx[keep], box_idx[keep]] = True
+
     ret_pred_dicts = []
     for k in range(batch_size):
         cur_mask = mask[k]
@@ -198,16 +325,6 @@ def decode_bbox_from_heatmap(heatmap, rot_cos, rot_sin, center, center_z, dim,
         cur_scores = final_scores[k, cur_mask]
         cur_labels = final_class_ids[k, cur_mask]
 
-        if circle_nms:
-            assert False, 'not checked yet'
-            centers = cur_boxes[:, [0, 1]]
-            boxes = torch.cat((centers, scores.view(-1, 1)), dim=1)
-            keep = _circle_nms(boxes, min_radius=min_radius, post_max_size=nms_post_max_size)
-
-            cur_boxes = cur_boxes[keep]
-            cur_scores = cur_scores[keep]
-            cur_labels = cur_labels[keep]
-
         ret_pred_dicts.append({
             'pred_boxes': cur_boxes,
             'pred_scores': cur_scores,
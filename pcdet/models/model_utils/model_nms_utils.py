@@ -1,3 +1,5 @@
+import math
+
 import torch
 
 from ...ops.iou3d_nms import iou3d_nms_utils
@@ -64,3 +66,99 @@ def multi_classes_nms(cls_scores, box_preds, nms_config, score_thresh=None):
     pred_boxes = torch.cat(pred_boxes, dim=0)
 
     return pred_scores, pred_labels, pred_boxes
+
+
+def _rank_in_group(group_ids, num_groups):
+    """
+    Args:
+        group_ids: (N) sorted in ascending order
+        num_groups:
+
+    Returns:
+        rank: (N) position of each element inside its own group
+    """
+    group_counts = torch.bincount(group_ids, minlength=num_groups)
+    group_starts = torch.cumsum(group_counts, dim=0) - group_counts
+    return torch.arange(group_ids.shape[0], device=group_ids.device) - group_starts[group_ids]
+
+
+def _stable_sort_by_group(group_ids):
+    """
+    Args:
+        group_ids: (N)
+
+    Returns:
+        order: (N) sorts group_ids in ascending order and keeps the current order inside each group
+    """
+    num = group_ids.shape[0]
+    unique_keys = group_ids * num + torch.arange(num, device=group_ids.device)
+    return torch.argsort(unique_keys)
+
+
+def batched_nms(box_scores, box_preds, group_ids, num_groups, nms_config, score_thresh=None):
+    """
+    NMS of many independent groups (e.g. (sample, class) pairs) with few NMS launches. The boxes of each
+    group are shifted to their own BEV tile so that boxes of different groups never suppress each other,
+    which gives the same selection as running class_agnostic_nms() on every group separately.
+    The suppression mask of nms_gpu grows quadratically with the number of boxes, so consecutive groups are
+    packed into chunks of at most NMS_CONFIG.BATCHED_NMS_MAX_BOXES (default 16384) candidates and each chunk
+    gets its own NMS call.
+
+    Args:
+        box_scores: (N)
+        box_preds: (N, 7 + C)
+        group_ids: (N) int64 in [0, num_groups)
+        num_groups:
+        nms_config:
+        score_thresh:
+
+    Returns:
+        selected: (K) indices into box_preds, ordered by group id and then by descending score
+    """
+    candidates = torch.arange(box_scores.shape[0], device=box_scores.device)
+    if score_thresh is not None:
+        candidates = candidates[box_scores >= score_thresh]
+    if candidates.shape[0] == 0:
+        return candidates
+
+    # per-group topk(NMS_PRE_MAXSIZE)
+    candidates = candidates[torch.argsort(box_scores[candidates], descending=True)]
+    candidates = candidates[_stable_sort_by_group(group_ids[candidates])]
+    candidates = candidates[_rank_in_group(group_ids[candidates], num_groups) < nms_config.NMS_PRE_MAXSIZE]
+
+    boxes_for_nms = box_preds[candidates, 0:7].clone()
+    cur_group_ids = group_ids[candidates]
+    tile_size = (boxes_for_nms[:, 0:2].abs().max() + boxes_for_nms[:, 3:5].max()) * 2 + 1
+
+    # pack consecutive groups into chunks, a single group larger than the limit gets a chunk of its own
+    max_boxes_per_nms = nms_config.get('BATCHED_NMS_MAX_BOXES', 16384)
+    chunks = []  # (first candidate, number of candidates, first group, number of groups)
+    cur_start, cur_num, cur_first_group = 0, 0, 0
+    for k, count in enumerate(torch.bincount(cur_group_ids, minlength=num_groups).tolist()):
+        if cur_num > 0 and cur_num + count > max_boxes_per_nms:
+            chunks.append((cur_start, cur_num, cur_first_group, k - cur_first_group))
+            cur_start, cur_num, cur_first_group = cur_start + cur_num, 0, k
+        cur_num += count
+    chunks.append((cur_start, cur_num, cur_first_group, num_groups - cur_first_group))
+
+    selected = []
+    for start, num, first_group, chunk_num_groups in chunks:
+        if num == 0:
+            continue
+        chunk_boxes = boxes_for_nms[start:start + num]
+        chunk_group_ids = cur_group_ids[start:start + num] - first_group
+        # a 2D grid of tiles keeps the shifted coordinates small enough for float32
+        grid_width = int(math.ceil(math.sqrt(chunk_num_groups)))
+        chunk_boxes[:, 0] += (chunk_group_ids % grid_width).float() * tile_size
+        chunk_boxes[:, 1] += (chunk_group_ids // grid_width).float() * tile_size
+
+        keep_idx, _ = getattr(iou3d_nms_utils, nms_config.NMS_TYPE)(
+            chunk_boxes, box_scores[candidates[start:start + num]], nms_config.NMS_THRESH, **nms_config
+        )
+        selected.append(candidates[start:start + num][keep_idx])
+    selected = torch.cat(selected, dim=0)
+
+    # per-group [:NMS_POST_MAXSIZE], keep_idx is already sorted by descending score
+    selected = selected[_stable_sort_by_group(group_ids[selected])]
+    selected = selected[_rank_in_group(group_ids[selected], num_groups) < nms_config.NMS_POST_MAXSIZE]
+    return selected
@@ -0,0 +1,280 @@
+"""
+3D IoU Calculation and Rotated NMS in pure PyTorch, used for CPU tensors
+and when the iou3d_nms_cuda extension is not compiled.
+"""
+import numpy as np
+import torch
+
+# same margin as check_in_box2d() in src/iou3d_cpu.cpp and src/iou3d_nms_kernel.cu
+IN_BOX_MARGIN = 1e-2
+EPS = 1e-8
+
+
+def boxes_to_corners_bev(boxes):
+    """
+    Args:
+        boxes: (N, 7) [x, y, z, dx, dy, dz, heading]
+
+    Returns:
+        corners: (N, 4, 2) counter-clockwise BEV corners
+    """
+    template = boxes.new_tensor([[-1, -1], [1, -1], [1, 1], [-1, 1]]) / 2
+    corners = boxes[:, None, 3:5] * template[None, :, :]
+    cosa, sina = torch.cos(boxes[:, 6:7]), torch.sin(boxes[:, 6:7])
+    rot_x = corners[:, :, 0] * cosa - corners[:, :, 1] * sina
+    rot_y = corners[:, :, 0] * sina + corners[:, :, 1] * cosa
+    return torch.stack((rot_x, rot_y), dim=-1) + boxes[:, None, 0:2]
+
+
+def _corners_in_boxes(corners, boxes):
+    """
+    Args:
+        corners: (P, 4, 2)
+        boxes: (P, 7)
+
+    Returns:
+        in_flag: (P, 4)
+    """
+    shift = corners - boxes[:, None, 0:2]
+    cosa, sina = torch.cos(boxes[:, 6:7]), torch.sin(boxes[:, 6:7])
+    local_x = shift[..., 0] * cosa + shift[..., 1] * sina
+    local_y = -shift[..., 0] * sina + shift[..., 1] * cosa
+    return (local_x.abs() < boxes[:, 3:4] / 2 + IN_BOX_MARGIN) & (local_y.abs() < boxes[:, 4:5] / 2 + IN_BOX_MARGIN)
+
+
+def _edge_intersections(corners_a, corners_b):
+    """
+    Args:
+        corners_a: (P, 4, 2)
+        corners_b: (P, 4, 2)
+
+    Returns:
+        points: (P, 16, 2)
+        valid: (P, 16)
+    """
+    p0 = corners_a[:, :, None, :]
+    q0 = corners_b[:, None, :, :]
+    d_p = corners_a.roll(-1, dims=1)[:, :, None, :] - p0
+    d_q = corners_b.roll(-1, dims=1)[:, None, :, :] - q0
+    d_pq = q0 - p0
+
+    denom = d_p[..., 0] * d_q[..., 1] - d_p[..., 1] * d_q[..., 0]
+    safe_denom = torch.where(denom.abs() > EPS, denom, denom.new_ones(()))
+    t = (d_pq[..., 0] * d_q[..., 1] - d_pq[..., 1] * d_q[..., 0]) / safe_denom
+    u = (d_pq[..., 0] * d_p[..., 1] - d_pq[..., 1] * d_p[..., 0]) / safe_denom
+    valid = (denom.abs() > EPS) & (t > 0) & (t < 1) & (u > 0) & (u < 1)
+    points = p0 + t[..., None] * d_p
+
+    return points.reshape(-1, 16, 2), valid.reshape(-1, 16)
+
+
+def pairwise_overlap_bev(boxes_a, boxes_b):
+    """
+    Area of the intersection of each pair (boxes_a[i], boxes_b[i]).
+
+    Args:
+        boxes_a: (P, 7) [x, y, z, dx, dy, dz, heading]
+        boxes_b: (P, 7) [x, y, z, dx, dy, dz, heading]
+
+    Returns:
+        overlap: (P)
+    """
+    corners_a = boxes_to_corners_bev(boxes_a)
+    corners_b = boxes_to_corners_bev(boxes_b)
+    cross_pts, cross_valid = _edge_intersections(corners_a, corners_b)
+
+    vertices = torch.cat((corners_a, corners_b, cross_pts), dim=1)  # (P, 24, 2)
+    valid = torch.cat((
+        _corners_in_boxes(corners_a, boxes_b), _corners_in_boxes(corners_b, boxes_a), cross_valid
+    ), dim=1)  # (P, 24)
+    num_valid = valid.sum(dim=1)
+
+    # sort the vertices of the intersection polygon by angle around its center, the invalid
+    # vertices are moved to the end and collapsed onto the first one so they add no area
+    valid_f = valid.type_as(vertices)
+    center = (vertices * valid_f[..., None]).sum(dim=1) / num_valid.clamp(min=1)[:, None].type_as(vertices)
+    shift = vertices - center[:, None, :]
+    angle = torch.atan2(shift[..., 1], shift[..., 0])
+    angle = torch.where(valid, angle, angle.new_full((), 1e4))
+    order = angle.argsort(dim=1)
+    vertices = vertices.gather(1, order[..., None].expand(-1, -1, 2))
+    valid = valid.gather(1, order)
+    vertices = torch.where(valid[..., None], vertices, vertices[:, 0:1, :])
+
+    next_vertices = vertices.roll(-1, dims=1)
+    area = (vertices[..., 0] * next_vertices[..., 1] - vertices[..., 1] * next_vertices[..., 0]).sum(dim=1) / 2
+    return torch.where(num_valid > 2, area.abs(), area.new_zeros(()))
+
+
+def candidate_pairs(boxes_a, boxes_b, upper_triangle=False, rows_per_chunk=1024):
+    """
+    Pairs whose circumscribed BEV circles intersect, the others can not overlap. Both box sets are
+    sorted along x so that each chunk of rows is only compared with the columns inside its x-window.
+
+    Args:
+        boxes_a: (N, 7) [x, y, z, dx, dy, dz, heading]
+        boxes_b: (M, 7) [x, y, z, dx, dy, dz, heading]
+        upper_triangle: only keep the pairs with row < col (boxes_a is boxes_b)
+        rows_per_chunk:
+
+    Returns:
+        row_idx: (P)
+        col_idx: (P)
+    """
+    row_idx = [boxes_a.new_zeros(0, dtype=torch.long)]
+    col_idx = [boxes_a.new_zeros(0, dtype=torch.long)]
+    if boxes_a.shape[0] == 0 or boxes_b.shape[0] == 0:
+        return row_idx[0], col_idx[0]
+
+    radius_a = boxes_a[:, 3:5].norm(dim=1) / 2
+    radius_b = boxes_b[:, 3:5].norm(dim=1) / 2
+    x_a, order_a = boxes_a[:, 0].sort()
+    x_b, order_b = boxes_b[:, 0].sort()
+    max_radius_b = radius_b.max()
+    for start in range(0, boxes_a.shape[0], rows_per_chunk):
+        cur_rows = order_a[start:start + rows_per_chunk]
+        margin = radius_a[cur_rows].max() + max_radius_b
+        lo = torch.searchsorted(x_b, x_a[start:start + 1] - margin).item()
+        hi = torch.searchsorted(x_b, x_a[start + cur_rows.shape[0] - 1:start + cur_rows.shape[0]] + margin, right=True).item()
+        if hi <= lo:
+            continue
+        cur_cols = order_b[lo:hi]
+        dist = torch.cdist(boxes_a[cur_rows, 0:2], boxes_b[cur_cols, 0:2])
+        mask = dist < radius_a[cur_rows, None] + radius_b[None, cur_cols]
+        if upper_triangle:
+            mask &= cur_rows[:, None] < cur_cols[None, :]
+        pair_rows, pair_cols = mask.nonzero(as_tuple=True)
+        row_idx.append(cur_rows[pair_rows])
+        col_idx.append(cur_cols[pair_cols])
+    return torch.cat(row_idx), torch.cat(col_idx)
+
+
+def _chunked_pairwise(pairwise_func, boxes_a, boxes_b, row_idx, col_idx, max_pairs_per_chunk=262144):
+    ans = boxes_a.new_zeros(row_idx.shape[0])
+    for k in range(0, row_idx.shape[0], max_pairs_per_chunk):
+        cur_rows, cur_cols = row_idx[k:k + max_pairs_per_chunk], col_idx[k:k + max_pairs_per_chunk]
+        ans[k:k + max_pairs_per_chunk] = pairwise_func(boxes_a[cur_rows], boxes_b[cur_cols])
+    return ans
+
+
+def boxes_overlap_bev(boxes_a, boxes_b):
+    """
+    Args:
+        boxes_a: (N, 7) [x, y, z, dx, dy, dz, heading]
+        boxes_b: (M, 7) [x, y, z, dx, dy, dz, heading]
+
+    Returns:
+        ans_overlap: (N, M)
+    """
+    boxes_a, boxes_b = boxes_a.float(), boxes_b.float()
+    ans_overlap = boxes_a.new_zeros((boxes_a.shape[0], boxes_b.shape[0]))
+    if boxes_a.shape[0] == 0 or boxes_b.shape[0] == 0:
+        return ans_overlap
+
+    row_idx, col_idx = candidate_pairs(boxes_a, boxes_b)
+    ans_overlap[row_idx, col_idx] = _chunked_pairwise(pairwise_overlap_bev, boxes_a, boxes_b, row_idx, col_idx)
+    return ans_overlap
+
+
+def boxes_iou_bev(boxes_a, boxes_b):
+    """
+    Args:
+        boxes_a: (N, 7) [x, y, z, dx, dy, dz, heading]
+        boxes_b: (M, 7) [x, y, z, dx, dy, dz, heading]
+
+    Returns:
+        ans_iou: (N, M)
+    """
+    overlap = boxes_overlap_bev(boxes_a, boxes_b)
+    area_a = (boxes_a[:, 3] * boxes_a[:, 4]).view(-1, 1).float()
+    area_b = (boxes_b[:, 3] * boxes_b[:, 4]).view(1, -1).float()
+    return overlap / torch.clamp(area_a + area_b - overlap, min=EPS)
+
+
+def pairwise_iou_normal(boxes_a, boxes_b):
+    """
+    Args:
+        boxes_a: (P, 7) [x, y, z, dx, dy, dz, heading]
+        boxes_b: (P, 7) [x, y, z, dx, dy, dz, heading]
+
+    Returns:
+        iou: (P) axis-aligned BEV iou of each pair, heading is ignored
+    """
+    left = torch.max(boxes_a[:, 0] - boxes_a[:, 3] / 2, boxes_b[:, 0] - boxes_b[:, 3] / 2)
+    right = torch.min(boxes_a[:, 0] + boxes_a[:, 3] / 2, boxes_b[:, 0] + boxes_b[:, 3] / 2)
+    top = torch.max(boxes_a[:, 1] - boxes_a[:, 4] / 2, boxes_b[:, 1] - boxes_b[:, 4] / 2)
+    bottom = torch.min(boxes_a[:, 1] + boxes_a[:, 4] / 2, boxes_b[:, 1] + boxes_b[:, 4] / 2)
+    inter = (right - left).clamp(min=0) * (bottom - top).clamp(min=0)
+    return inter / torch.clamp(boxes_a[:, 3] * boxes_a[:, 4] + boxes_b[:, 3] * boxes_b[:, 4] - inter, min=EPS)
+
+
+def pairwise_iou_bev(boxes_a, boxes_b):
+    """
+    Args:
+        boxes_a: (P, 7) [x, y, z, dx, dy, dz, heading]
+        boxes_b: (P, 7) [x, y, z, dx, dy, dz, heading]
+
+    Returns:
+        iou: (P) rotated BEV iou of each pair
+    """
+    overlap = pairwise_overlap_bev(boxes_a, boxes_b)
+    return overlap / torch.clamp(boxes_a[:, 3] * boxes_a[:, 4] + boxes_b[:, 3] * boxes_b[:, 4] - overlap, min=EPS)
+
+
+def _greedy_nms(boxes, thresh, pairwise_iou_func):
+    """
+    Args:
+        boxes: (N, 7) sorted by descending score
+        thresh:
+        pairwise_iou_func: ((P, 7), (P, 7)) => (P)
+
+    Returns:
+        keep: (K) indices into boxes
+    """
+    boxes = boxes.float()
+    num_boxes = boxes.shape[0]
+    row_idx, col_idx = candidate_pairs(boxes, boxes, upper_triangle=True)
+    iou = _chunked_pairwise(pairwise_iou_func, boxes, boxes, row_idx, col_idx)
+    overlap_mask = iou > thresh
+    row_idx, col_idx = row_idx[overlap_mask].cpu().numpy(), col_idx[overlap_mask].cpu().numpy()
+
+    # group the pairs by row so that the boxes overlapped by box i are a contiguous slice of col_idx
+    order = np.argsort(row_idx, kind='stable')
+    row_idx, col_idx = row_idx[order], col_idx[order]
+    row_ptr = np.searchsorted(row_idx, np.arange(num_boxes + 1))
+    suppressed = np.zeros(num_boxes, dtype=np.bool_)
+    keep = []
+    for i in range(num_boxes):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed[col_idx[row_ptr[i]:row_ptr[i + 1]]] = True
+    return torch.tensor(keep, dtype=torch.long, device=boxes.device)
+
+
+def nms(boxes, thresh):
+    """
+    Rotated NMS with the same greedy semantics as iou3d_nms_cuda.nms_gpu.
+
+    Args:
+        boxes: (N, 7) [x, y, z, dx, dy, dz, heading], sorted by descending score
+        thresh:
+
+    Returns:
+        keep: (K) indices into boxes
+    """
+    return _greedy_nms(boxes, thresh, pairwise_iou_bev)
+
+
+def nms_normal(boxes, thresh):
+    """
+    Axis-aligned NMS with the same greedy semantics as iou3d_nms_cuda.nms_normal_gpu.
+
+    Args:
+        boxes: (N, 7) [x, y, z, dx, dy, dz, heading], sorted by descending score
+        thresh:
+
+    Returns:
+        keep: (K) indices into boxes
+    """
+    return _greedy_nms(boxes, thresh, pairwise_iou_normal)
@@ -6,7 +6,12 @@ All Rights Reserved 2019-2020.
 import torch
 
 from ...utils import common_utils
-from . import iou3d_nms_cuda
+from . import iou3d_nms_torch
+
+try:
+    from . import iou3d_nms_cuda
+except ImportError:
+    iou3d_nms_cuda = None
 
 
 def boxes_bev_iou_cpu(boxes_a, boxes_b):
@@ -22,6 +27,10 @@ def boxes_bev_iou_cpu(boxes_a, boxes_b):
     boxes_b, is_numpy = common_utils.check_numpy_to_torch(boxes_b)
     assert not (boxes_a.is_cuda or boxes_b.is_cuda), 'Only support CPU tensors'
     assert boxes_a.shape[1] == 7 and boxes_b.shape[1] == 7
+    if iou3d_nms_cuda is None:
+        ans_iou = iou3d_nms_torch.boxes_iou_bev(boxes_a, boxes_b)
+        return ans_iou.numpy() if is_numpy else ans_iou
+
     ans_iou = boxes_a.new_zeros(torch.Size((boxes_a.shape[0], boxes_b.shape[0])))
     iou3d_nms_cuda.boxes_iou_bev_cpu(boxes_a.contiguous(), boxes_b.contiguous(), ans_iou)
 
@@ -38,6 +47,9 @@ def boxes_iou_bev(boxes_a, boxes_b):
         ans_iou: (N, M)
     """
     assert boxes_a.shape[1] == boxes_b.shape[1] == 7
+    if not boxes_a.is_cuda:
+        return iou3d_nms_torch.boxes_iou_bev(boxes_a, boxes_b)
+
     ans_iou = torch.cuda.FloatTensor(torch.Size((boxes_a.shape[0], boxes_b.shape[0]))).zero_()
 
     iou3d_nms_cuda.boxes_iou_bev_gpu(boxes_a.contiguous(), boxes_b.contiguous(), ans_iou)
@@ -63,8 +75,11 @@ def boxes_iou3d_gpu(boxes_a, boxes_b):
     boxes_b_height_min = (boxes_b[:, 2] - boxes_b[:, 5] / 2).view(1, -1)
 
     # bev overlap
-    overlaps_bev = torch.cuda.FloatTensor(torch.Size((boxes_a.shape[0], boxes_b.shape[0]))).zero_()  # (N, M)
-    iou3d_nms_cuda.boxes_overlap_bev_gpu(boxes_a.contiguous(), boxes_b.contiguous(), overlaps_bev)
+    if boxes_a.is_cuda:
+        overlaps_bev = torch.cuda.FloatTensor(torch.Size((boxes_a.shape[0], boxes_b.shape[0]))).zero_()  # (N, M)
+        iou3d_nms_cuda.boxes_overlap_bev_gpu(boxes_a.contiguous(), boxes_b.contiguous(), overlaps_bev)
+    else:
+        overlaps_bev = iou3d_nms_torch.boxes_overlap_bev(boxes_a, boxes_b)  # (N, M)
 
     max_of_min = torch.max(boxes_a_height_min, boxes_b_height_min)
     min_of_max = torch.min(boxes_a_height_max, boxes_b_height_max)
@@ -94,6 +109,9 @@ def nms_gpu(boxes, scores, thresh, pre_maxsize=None, **kwargs):
         order = order[:pre_maxsize]
 
     boxes = boxes[order].contiguous()
+    if not boxes.is_cuda:
+        return order[iou3d_nms_torch.nms(boxes, thresh)].contiguous(), None
+
     keep = torch.LongTensor(boxes.size(0))
     num_out = iou3d_nms_cuda.nms_gpu(boxes, keep, thresh)
     return order[keep[:num_out].cuda()].contiguous(), None
@@ -110,6 +128,8 @@ def nms_normal_gpu(boxes, scores, thresh, **kwargs):
     order = scores.sort(0, descending=True)[1]
 
     boxes = boxes[order].contiguous()
+    if not boxes.is_cuda:
+        return order[iou3d_nms_torch.nms_normal(boxes, thresh)].contiguous(), None
 
     keep = torch.LongTensor(boxes.size(0))
     num_out = iou3d_nms_cuda.nms_normal_gpu(boxes, keep, thresh)
@@ -4,7 +4,12 @@ import torch
 import torch.nn as nn
 from torch.autograd import Function, Variable
 
-from . import pointnet2_batch_cuda as pointnet2
+from .. import pointnet2_cpu
+
+try:
+    from . import pointnet2_batch_cuda as pointnet2
+except ImportError:
+    pointnet2 = None
 
 
 class FarthestPointSampling(Function):
@@ -22,6 +27,12 @@ class FarthestPointSampling(Function):
         assert xyz.is_contiguous()
 
         B, N, _ = xyz.size()
+        if not xyz.is_cuda:
+            output = pointnet2_cpu.farthest_point_sample(
+                xyz.view(-1, 3), [N] * B, [npoint] * B, block_size=pointnet2_cpu.opt_n_threads(N)
+            )
+            return output.view(B, npoint)
+
         output = torch.cuda.IntTensor(B, npoint)
         temp = torch.cuda.FloatTensor(B, N).fill_(1e10)
 
@@ -52,17 +63,20 @@ class GatherOperation(Function):
 
         B, npoint = idx.size()
         _, C, N = features.size()
-        output = torch.cuda.FloatTensor(B, C, npoint)
+        ctx.for_backwards = (idx, C, N)
+        if not features.is_cuda:
+            return pointnet2_cpu.gather_points_batch(features, idx)
 
+        output = torch.cuda.FloatTensor(B, C, npoint)
         pointnet2.gather_points_wrapper(B, C, N, npoint, features, idx, output)
-
-        ctx.for_backwards = (idx, C, N)
         return output
 
     @staticmethod
     def backward(ctx, grad_out):
         idx, C, N = ctx.for_backwards
         B, npoint = idx.size()
+        if not grad_out.is_cuda:
+            return pointnet2_cpu.gather_points_grad_batch(grad_out, idx, N), None
 
         grad_features = Variable(torch.cuda.FloatTensor(B, C, N).zero_())
         grad_out_data = grad_out.data.contiguous()
@@ -91,6 +105,10 @@ class ThreeNN(Function):
 
         B, N, _ = unknown.size()
         m = known.size(1)
+        if not unknown.is_cuda:
+            dist2, idx = pointnet2_cpu.three_nn(unknown.view(-1, 3), [N] * B, known.view(-1, 3), [m] * B)
+            return torch.sqrt(dist2).view(B, N, 3), idx.view(B, N, 3)
+
         dist2 = torch.cuda.FloatTensor(B, N, 3)
         idx = torch.cuda.IntTensor(B, N, 3)
 
@@ -125,6 +143,9 @@ class ThreeInterpolate(Function):
         B, c, m = features.size()
         n = idx.size(1)
         ctx.three_interpolate_for_backward = (idx, weight, m)
+        if not features.is_cuda:
+            return pointnet2_cpu.three_interpolate_batch(features, idx, weight)
+
         output = torch.cuda.FloatTensor(B, c, n)
 
         pointnet2.three_interpolate_wrapper(B, c, m, n, features, idx, weight, output)
@@ -142,6 +163,8 @@ class ThreeInterpolate(Function):
         """
         idx, weight, m = ctx.three_interpolate_for_backward
         B, c, n = grad_out.size()
+        if not grad_out.is_cuda:
+            return pointnet2_cpu.three_interpolate_grad_batch(grad_out, idx, weight, m), None, None
 
         grad_features = Variable(torch.cuda.FloatTensor(B, c, m).zero_())
         grad_out_data = grad_out.data.contiguous()
@@ -169,11 +192,12 @@ class GroupingOperation(Function):
 
         B, nfeatures, nsample = idx.size()
         _, C, N = features.size()
-        output = torch.cuda.FloatTensor(B, C, nfeatures, nsample)
+        ctx.for_backwards = (idx, N)
+        if not features.is_cuda:
+            return pointnet2_cpu.gather_points_batch(features, idx)
 
+        output = torch.cuda.FloatTensor(B, C, nfeatures, nsample)
         pointnet2.group_points_wrapper(B, C, N, nfeatures, nsample, features, idx, output)
-
-        ctx.for_backwards = (idx, N)
         return output
 
     @staticmethod
@@ -187,6 +211,9 @@ class GroupingOperation(Function):
         idx, N = ctx.for_backwards
 
         B, C, npoint, nsample = grad_out.size()
+        if not grad_out.is_cuda:
+            return pointnet2_cpu.gather_points_grad_batch(grad_out, idx, N), None
+
         grad_features = Variable(torch.cuda.FloatTensor(B, C, N).zero_())
 
         grad_out_data = grad_out.data.contiguous()
@@ -215,6 +242,12 @@ class BallQuery(Function):
 
         B, N, _ = xyz.size()
         npoint = new_xyz.size(1)
+        if not xyz.is_cuda:
+            idx = pointnet2_cpu.ball_query(
+                radius, nsample, xyz.view(-1, 3), [N] * B, new_xyz.view(-1, 3), [npoint] * B, mark_empty=False
+            )
+            return idx.view(B, npoint, nsample)
+
         idx = torch.cuda.IntTensor(B, npoint, nsample).zero_()
 
         pointnet2.ball_query_wrapper(B, N, npoint, radius, nsample, new_xyz, xyz, idx)
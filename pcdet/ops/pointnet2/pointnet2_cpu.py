@@ -0,0 +1,410 @@
+"""
+CPU versions of the sampling, ball query and three-nn ops of pointnet2_stack and pointnet2_batch,
+used for CPU tensors and when the CUDA extensions are not compiled.
+The outputs are the same as the ones of the CUDA kernels in */src/ (including the order of the sampled
+points and of the grouped indices), the distances are computed with the same float32 operations.
+"""
+import math
+
+import numba
+import numpy as np
+import torch
+
+# same as TOTAL_THREADS in src/sampling_gpu.cu
+TOTAL_THREADS = 1024
+
+
+def opt_n_threads(work_size):
+    """
+    Block size of the (B, N, 3) farthest point sampling kernel, as opt_n_threads() in src/sampling_gpu.cu
+    """
+    pow_2 = int(math.log(work_size) / math.log(2.0))
+    return max(min(1 << pow_2, TOTAL_THREADS), 1)
+
+
+def get_lane_ranks(block_size):
+    """
+    The block-wide reduction of the farthest point sampling kernel keeps the lower half of the threads on ties,
+    so among the threads with the same max distance, the winner is the one with the smallest bit-reversed id.
+
+    Args:
+        block_size: power of 2
+
+    Returns:
+        lane_ranks: (block_size) tie-break rank of each thread
+    """
+    num_bits = int(block_size).bit_length() - 1
+    lanes = np.arange(block_size)
+    lane_ranks = np.zeros(block_size, dtype=np.int64)
+    for bit in range(num_bits):
+        lane_ranks |= ((lanes >> bit) & 1) << (num_bits - 1 - bit)
+    return lane_ranks
+
+
+@numba.jit(nopython=True, parallel=True)
+def _farthest_point_sample_kernel(xyz, xyz_batch_start, xyz_batch_cnt, idxs_batch_start, npoint,
+                                  lane_ranks, idxs):
+    block_size = lane_ranks.shape[0]
+    for bs_idx in numba.prange(xyz_batch_cnt.shape[0]):
+        start, n, m = xyz_batch_start[bs_idx], xyz_batch_cnt[bs_idx], npoint[bs_idx]
+        if m <= 0:
+            continue
+        x, y, z = xyz[0, start:start + n], xyz[1, start:start + n], xyz[2, start:start + n]
+        temp = np.full(n, 1e10, dtype=np.float32)
+        # the distances are >= 0, so their bits compare as the floats and the max reduction is vectorized
+        temp_bits = temp.view(np.int32)
+        out = idxs[idxs_batch_start[bs_idx]:idxs_batch_start[bs_idx] + m]
+
+        old = 0
+        out[0] = old
+        for j in range(1, m):
+            x1, y1, z1 = x[old], y[old], z[old]
+            for k in range(n):
+                dx = x[k] - x1
+                dy = y[k] - y1
+                dz = z[k] - z1
+                d = dx * dx + dy * dy + dz * dz
+                temp[k] = min(d, temp[k])
+
+            best_bits = np.int32(-1)
+            for k in range(n):
+                best_bits = max(best_bits, temp_bits[k])
+
+            # ties: first index of each thread, then the thread kept by the reduction
+            besti, best_rank = 0, block_size
+            for k in range(n):
+                if temp_bits[k] == best_bits and lane_ranks[k % block_size] < best_rank:
+                    besti, best_rank = k, lane_ranks[k % block_size]
+            old = besti
+            out[j] = old
+
+
+def farthest_point_sample(xyz, xyz_batch_cnt, npoint, block_size=TOTAL_THREADS):
+    """
+    Args:
+        xyz: (N1 + N2 ..., 3) float32 CPU tensor
+        xyz_batch_cnt: (batch_size), [N1, N2, ...]
+        npoint: (batch_size), [M1, M2, ...]
+        block_size: threads of the CUDA kernel to reproduce its choice on ties
+
+    Returns:
+        idxs: (M1 + M2 ...) int32 indices local to each sample
+    """
+    xyz_np = xyz.detach().t().contiguous().numpy()  # (3, N1 + N2 ...)
+    xyz_batch_cnt = np.asarray(xyz_batch_cnt, dtype=np.int64).reshape(-1)
+    npoint = np.asarray(npoint, dtype=np.int64).reshape(-1)
+    xyz_batch_start = np.concatenate(([0], np.cumsum(xyz_batch_cnt)[:-1])).astype(np.int64)
+    idxs_batch_start = np.concatenate(([0], np.cumsum(npoint)[:-1])).astype(np.int64)
+
+    idxs = np.zeros(int(npoint.sum()), dtype=np.int32)
+    _farthest_point_sample_kernel(
+        xyz_np, xyz_batch_start, xyz_batch_cnt, idxs_batch_start, npoint, get_lane_ranks(block_size), idxs
+    )
+    return torch.from_numpy(idxs)
+
+
+@numba.jit(nopython=True)
+def _build_grid(xyz, cell_size):
+    xyz_min = np.zeros(3, dtype=np.float64)
+    grid_size = np.ones(3, dtype=np.int64)
+    num_points = xyz.shape[0]
+    coords = np.zeros((num_points, 3), dtype=np.int64)
+    if num_points == 0:
+        return xyz_min, grid_size, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    for i in range(3):
+        xyz_min[i] = xyz[:, i].min()
+    for k in range(num_points):
+        for i in range(3):
+            coords[k, i] = int(np.floor((xyz[k, i] - xyz_min[i]) / cell_size))
+            grid_size[i] = max(grid_size[i], coords[k, i] + 1)
+
+    keys = (coords[:, 2] * grid_size[1] + coords[:, 1]) * grid_size[0] + coords[:, 0]
+    order = np.argsort(keys, kind='mergesort')
+    return xyz_min, grid_size, keys[order], order
+
+
+@numba.jit(nopython=True, parallel=True)
+def _ball_query_kernel(xyz, xyz_batch_start, xyz_batch_cnt, new_xyz, new_xyz_batch_start, new_xyz_batch_cnt,
+                       radius, nsample, mark_empty, idx):
+    radius2 = radius * radius
+    # the cells are slightly larger than the radius so that float32 rounding of d2 never reaches two cells away
+    cell_size = np.float64(radius) * 1.001
+    for bs_idx in range(xyz_batch_cnt.shape[0]):
+        start, n = xyz_batch_start[bs_idx], xyz_batch_cnt[bs_idx]
+        cur_xyz = xyz[start:start + n]
+        xyz_min, grid_size, sorted_keys, order = _build_grid(cur_xyz, cell_size)
+
+        new_start = new_xyz_batch_start[bs_idx]
+        for m in numba.prange(new_start, new_start + new_xyz_batch_cnt[bs_idx]):
+            new_x, new_y, new_z = new_xyz[m, 0], new_xyz[m, 1], new_xyz[m, 2]
+            center = np.zeros(3, dtype=np.int64)
+            for i in range(3):
+                center[i] = int(np.floor((new_xyz[m, i] - xyz_min[i]) / cell_size))
+
+            # smallest nsample indices inside the ball, the CUDA kernel takes the first ones in index order
+            hits = np.zeros(nsample, dtype=np.int64)
+            cnt = 0
+            if n > 0:
+                x_lo, x_hi = max(center[0] - 1, 0), min(center[0] + 1, grid_size[0] - 1)
+                for cz in range(max(center[2] - 1, 0), min(center[2] + 2, grid_size[2])):
+                    for cy in range(max(center[1] - 1, 0), min(center[1] + 2, grid_size[1])):
+                        if x_lo > x_hi:
+                            continue
+                        row_key = (cz * grid_size[1] + cy) * grid_size[0]
+                        lo = np.searchsorted(sorted_keys, row_key + x_lo, side='left')
+                        hi = np.searchsorted(sorted_keys, row_key + x_hi, side='right')
+                        for j in range(lo, hi):
+                            k = order[j]
+                            if cnt >= nsample and k >= hits[nsample - 1]:
+                                continue
+                            dx = new_x - cur_xyz[k, 0]
+                            dy = new_y - cur_xyz[k, 1]
+                            dz = new_z - cur_xyz[k, 2]
+                            d2 = dx * dx + dy * dy + dz * dz
+                            if d2 < radius2:
+                                pos = min(cnt, nsample - 1)
+                                while pos > 0 and hits[pos - 1] > k:
+                                    hits[pos] = hits[pos - 1]
+                                    pos -= 1
+                                hits[pos] = k
+                                cnt += 1
+
+            if cnt == 0:
+                if mark_empty:
+                    idx[m, 0] = -1
+                continue
+            for l in range(nsample):
+                idx[m, l] = hits[l] if l < cnt else hits[0]
+
+
+def ball_query(radius, nsample, xyz, xyz_batch_cnt, new_xyz, new_xyz_batch_cnt, mark_empty=True):
+    """
+    Args:
+        radius: float, radius of the balls
+        nsample: int, maximum number of features in the balls
+        xyz: (N1 + N2 ..., 3) float32 CPU tensor
+        xyz_batch_cnt: (batch_size), [N1, N2, ...]
+        new_xyz: (M1 + M2 ..., 3) float32 CPU tensor, centers of the ball query
+        new_xyz_batch_cnt: (batch_size), [M1, M2, ...]
+        mark_empty: set idx[:, 0] to -1 for the empty balls as the stack kernel
+
+    Returns:
+        idx: (M1 + M2 ..., nsample) int32 indices local to each sample
+    """
+    xyz_batch_cnt = np.asarray(xyz_batch_cnt, dtype=np.int64).reshape(-1)
+    new_xyz_batch_cnt = np.asarray(new_xyz_batch_cnt, dtype=np.int64).reshape(-1)
+    xyz_batch_start = np.concatenate(([0], np.cumsum(xyz_batch_cnt)[:-1])).astype(np.int64)
+    new_xyz_batch_start = np.concatenate(([0], np.cumsum(new_xyz_batch_cnt)[:-1])).astype(np.int64)
+
+    idx = np.zeros((new_xyz.shape[0], nsample), dtype=np.int32)
+    _ball_query_kernel(
+        xyz.detach().numpy(), xyz_batch_start, xyz_batch_cnt,
+        new_xyz.detach().numpy(), new_xyz_batch_start, new_xyz_batch_cnt,
+        np.float32(radius), nsample, mark_empty, idx
+    )
+    return torch.from_numpy(idx)
+
+
+@numba.jit(nopython=True, parallel=True)
+def _three_nn_kernel(unknown, unknown_batch_start, unknown_batch_cnt, known, known_batch_start, known_batch_cnt,
+                     dist2, idx):
+    for bs_idx in range(known_batch_cnt.shape[0]):
+        start, n = known_batch_start[bs_idx], known_batch_cnt[bs_idx]
+        x, y, z = known[0, start:start + n], known[1, start:start + n], known[2, start:start + n]
+
+        unknown_start = unknown_batch_start[bs_idx]
+        for pt_idx in numba.prange(unknown_start, unknown_start + unknown_batch_cnt[bs_idx]):
+            ux, uy, uz = unknown[pt_idx, 0], unknown[pt_idx, 1], unknown[pt_idx, 2]
+            # the distances to all the known points are computed first so that this loop is vectorized
+            d = np.empty(n, dtype=np.float32)
+            for k in range(n):
+                dx = ux - x[k]
+                dy = uy - y[k]
+                dz = uz - z[k]
+                d[k] = dx * dx + dy * dy + dz * dz
+
+            best1, best2, best3 = 1e40, 1e40, 1e40
+            besti1, besti2, besti3 = 0, 0, 0
+            for k in range(n):
+                if d[k] >= best3:
+                    continue
+                if d[k] < best1:
+                    best3, besti3 = best2, besti2
+                    best2, besti2 = best1, besti1
+                    best1, besti1 = d[k], k
+                elif d[k] < best2:
+                    best3, besti3 = best2, besti2
+                    best2, besti2 = d[k], k
+                else:
+                    best3, besti3 = d[k], k
+            dist2[pt_idx, 0], dist2[pt_idx, 1], dist2[pt_idx, 2] = best1, best2, best3
+            idx[pt_idx, 0], idx[pt_idx, 1], idx[pt_idx, 2] = besti1, besti2, besti3
+
+
+def three_nn(unknown, unknown_batch_cnt, known, known_batch_cnt):
+    """
+    Args:
+        unknown: (N1 + N2 ..., 3) float32 CPU tensor
+        unknown_batch_cnt: (batch_size), [N1, N2, ...]
+        known: (M1 + M2 ..., 3) float32 CPU tensor
+        known_batch_cnt: (batch_size), [M1, M2, ...]
+
+    Returns:
+        dist2: (N1 + N2 ..., 3) squared distance to the three nearest neighbors (inf if missing)
+        idx: (N1 + N2 ..., 3) int32 indices local to each sample
+    """
+    unknown_batch_cnt = np.asarray(unknown_batch_cnt, dtype=np.int64).reshape(-1)
+    known_batch_cnt = np.asarray(known_batch_cnt, dtype=np.int64).reshape(-1)
+    unknown_batch_start = np.concatenate(([0], np.cumsum(unknown_batch_cnt)[:-1])).astype(np.int64)
+    known_batch_start = np.concatenate(([0], np.cumsum(known_batch_cnt)[:-1])).astype(np.int64)
+
+    dist2 = np.zeros((unknown.shape[0], 3), dtype=np.float32)
+    idx = np.zeros((unknown.shape[0], 3), dtype=np.int32)
+    _three_nn_kernel(
+        unknown.detach().numpy(), unknown_batch_start, unknown_batch_cnt,
+        known.detach().t().contiguous().numpy(), known_batch_start, known_batch_cnt, dist2, idx
+    )
+    return torch.from_numpy(dist2), torch.from_numpy(idx)
+
+
+def get_stack_global_idx(idx, idx_batch_cnt, features_batch_cnt):
+    """
+    Args:
+        idx: (M1 + M2 ..., K) indices local to each sample
+        idx_batch_cnt: (batch_size), [M1, M2, ...]
+        features_batch_cnt: (batch_size), [N1, N2, ...]
+
+    Returns:
+        global_idx: (M1 + M2 ..., K) long indices of the stacked features
+    """
+    features_batch_cnt = features_batch_cnt.long().cpu()
+    features_batch_start = features_batch_cnt.cumsum(dim=0) - features_batch_cnt
+    idx_batch_start = torch.repeat_interleave(features_batch_start, idx_batch_cnt.long().cpu())
+    return idx.long() + idx_batch_start.view(-1, 1)
+
+
+def group_points_stack(features, features_batch_cnt, idx, idx_batch_cnt):
+    """
+    Args:
+        features: (N1 + N2 ..., C)
+        features_batch_cnt: (batch_size), [N1, N2, ...]
+        idx: (M1 + M2 ..., nsample) indices local to each sample
+        idx_batch_cnt: (batch_size), [M1, M2, ...]
+
+    Returns:
+        output: (M1 + M2 ..., C, nsample)
+    """
+    global_idx = get_stack_global_idx(idx, idx_batch_cnt, features_batch_cnt)
+    return features[global_idx].permute(0, 2, 1).contiguous()
+
+
+def group_points_grad_stack(grad_out, idx, idx_batch_cnt, features_batch_cnt, num_features):
+    """
+    Args:
+        grad_out: (M1 + M2 ..., C, nsample)
+        idx: (M1 + M2 ..., nsample) indices local to each sample
+        idx_batch_cnt: (batch_size), [M1, M2, ...]
+        features_batch_cnt: (batch_size), [N1, N2, ...]
+        num_features: N1 + N2 ...
+
+    Returns:
+        grad_features: (N1 + N2 ..., C)
+    """
+    global_idx = get_stack_global_idx(idx, idx_batch_cnt, features_batch_cnt)
+    grad_features = grad_out.new_zeros((num_features, grad_out.shape[1]))
+    grad_features.index_add_(0, global_idx.view(-1), grad_out.permute(0, 2, 1).reshape(-1, grad_out.shape[1]))
+    return grad_features
+
+
+def three_interpolate_stack(features, idx, weight):
+    """
+    Args:
+        features: (M1 + M2 ..., C)
+        idx: (N1 + N2 ..., 3) indices of the stacked features
+        weight: (N1 + N2 ..., 3)
+
+    Returns:
+        output: (N1 + N2 ..., C)
+    """
+    idx = idx.long()
+    return weight[:, 0:1] * features[idx[:, 0]] + weight[:, 1:2] * features[idx[:, 1]] + \
+        weight[:, 2:3] * features[idx[:, 2]]
+
+
+def three_interpolate_grad_stack(grad_out, idx, weight, num_features):
+    """
+    Args:
+        grad_out: (N1 + N2 ..., C)
+        idx: (N1 + N2 ..., 3) indices of the stacked features
+        weight: (N1 + N2 ..., 3)
+        num_features: M1 + M2 ...
+
+    Returns:
+        grad_features: (M1 + M2 ..., C)
+    """
+    weighted_grad_out = grad_out[:, None, :] * weight[:, :, None]  # (N1 + N2 ..., 3, C)
+    grad_features = grad_out.new_zeros((num_features, grad_out.shape[1]))
+    grad_features.index_add_(0, idx.long().view(-1), weighted_grad_out.view(-1, grad_out.shape[1]))
+    return grad_features
+
+
+def gather_points_batch(features, idx):
+    """
+    Args:
+        features: (B, C, N)
+        idx: (B, ...) indices of each sample
+
+    Returns:
+        output: (B, C, ...)
+    """
+    B, C, _ = features.shape
+    flat_idx = idx.long().view(B, 1, -1).expand(-1, C, -1)
+    return features.gather(2, flat_idx).view(B, C, *idx.shape[1:])
+
+
+def gather_points_grad_batch(grad_out, idx, num_features):
+    """
+    Args:
+        grad_out: (B, C, ...)
+        idx: (B, ...) indices of each sample
+        num_features: N
+
+    Returns:
+        grad_features: (B, C, N)
+    """
+    B, C = grad_out.shape[:2]
+    flat_idx = idx.long().view(B, 1, -1).expand(-1, C, -1)
+    grad_features = grad_out.new_zeros((B, C, num_features))
+    grad_features.scatter_add_(2, flat_idx, grad_out.reshape(B, C, -1))
+    return grad_features
+
+
+def three_interpolate_batch(features, idx, weight):
+    """
+    Args:
+        features: (B, C, M)
+        idx: (B, N, 3)
+        weight: (B, N, 3)
+
+    Returns:
+        output: (B, C, N)
+    """
+    return weight[:, None, :, 0] * gather_points_batch(features, idx[:, :, 0]) + \
+        weight[:, None, :, 1] * gather_points_batch(features, idx[:, :, 1]) + \
+        weight[:, None, :, 2] * gather_points_batch(features, idx[:, :, 2])
+
+
+def three_interpolate_grad_batch(grad_out, idx, weight, num_features):
+    """
+    Args:
+        grad_out: (B, C, N)
+        idx: (B, N, 3)
+        weight: (B, N, 3)
+        num_features: M
+
+    Returns:
+        grad_features: (B, C, M)
+    """
+    grad_out = grad_out[:, :, :, None] * weight[:, None, :, :]  # (B, C, N, 3)
+    return gather_points_grad_batch(grad_out, idx, num_features)
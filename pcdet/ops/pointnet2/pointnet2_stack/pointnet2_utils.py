@@ -2,7 +2,12 @@ import torch
 import torch.nn as nn
 from torch.autograd import Function, Variable
 
-from . import pointnet2_stack_cuda as pointnet2
+from .. import pointnet2_cpu
+
+try:
+    from . import pointnet2_stack_cuda as pointnet2
+except ImportError:
+    pointnet2 = None
 
 
 class BallQuery(Function):
@@ -30,9 +35,11 @@ class BallQuery(Function):
 
         B = xyz_batch_cnt.shape[0]
         M = new_xyz.shape[0]
-        idx = torch.cuda.IntTensor(M, nsample).zero_()
-
-        pointnet2.ball_query_wrapper(B, M, radius, nsample, new_xyz, new_xyz_batch_cnt, xyz, xyz_batch_cnt, idx)
+        if not xyz.is_cuda:
+            idx = pointnet2_cpu.ball_query(radius, nsample, xyz, xyz_batch_cnt, new_xyz, new_xyz_batch_cnt)
+        else:
+            idx = torch.cuda.IntTensor(M, nsample).zero_()
+            pointnet2.ball_query_wrapper(B, M, radius, nsample, new_xyz, new_xyz_batch_cnt, xyz, xyz_batch_cnt, idx)
         empty_ball_mask = (idx[:, 0] == -1)
         idx[empty_ball_mask] = 0
         return idx, empty_ball_mask
@@ -74,9 +81,11 @@ class GroupingOperation(Function):
         M, nsample = idx.size()
         N, C = features.size()
         B = idx_batch_cnt.shape[0]
-        output = torch.cuda.FloatTensor(M, C, nsample)
-
-        pointnet2.group_points_wrapper(B, M, C, nsample, features, features_batch_cnt, idx, idx_batch_cnt, output)
+        if not features.is_cuda:
+            output = pointnet2_cpu.group_points_stack(features, features_batch_cnt, idx, idx_batch_cnt)
+        else:
+            output = torch.cuda.FloatTensor(M, C, nsample)
+            pointnet2.group_points_wrapper(B, M, C, nsample, features, features_batch_cnt, idx, idx_batch_cnt, output)
 
         ctx.for_backwards = (B, N, idx, features_batch_cnt, idx_batch_cnt)
         return output
@@ -94,6 +103,12 @@ class GroupingOperation(Function):
         B, N, idx, features_batch_cnt, idx_batch_cnt = ctx.for_backwards
 
         M, C, nsample = grad_out.size()
+        if not grad_out.is_cuda:
+            grad_features = pointnet2_cpu.group_points_grad_stack(
+                grad_out, idx, idx_batch_cnt, features_batch_cnt, N
+            )
+            return grad_features, None, None, None
+
         grad_features = Variable(torch.cuda.FloatTensor(N, C).zero_())
 
         grad_out_data = grad_out.data.contiguous()
@@ -170,6 +185,12 @@ class FarthestPointSampling(Function):
         assert xyz.is_contiguous()
 
         B, N, _ = xyz.size()
+        if not xyz.is_cuda:
+            output = pointnet2_cpu.farthest_point_sample(
+                xyz.view(-1, 3), [N] * B, [npoint] * B, block_size=pointnet2_cpu.opt_n_threads(N)
+            )
+            return output.view(B, npoint)
+
         output = torch.cuda.IntTensor(B, npoint)
         temp = torch.cuda.FloatTensor(B, N).fill_(1e10)
 
@@ -207,6 +228,10 @@ class StackFarthestPointSampling(Function):
             npoint = torch.tensor(npoint, device=xyz.device).int()
 
         N, _ = xyz.size()
+        if not xyz.is_cuda:
+            output = pointnet2_cpu.farthest_point_sample(xyz, xyz_batch_cnt, npoint)
+            return pointnet2_cpu.get_stack_global_idx(output.view(-1, 1), npoint, xyz_batch_cnt).view(-1).int()
+
         temp = torch.cuda.FloatTensor(N).fill_(1e10)
         output = torch.cuda.IntTensor(npoint.sum().item())
 
@@ -240,6 +265,11 @@ class ThreeNN(Function):
         assert known.shape.__len__() == 2 and known.shape[1] == 3
         assert unknown_batch_cnt.__len__() == known_batch_cnt.__len__()
 
+        if not unknown.is_cuda:
+            dist2, idx = pointnet2_cpu.three_nn(unknown, unknown_batch_cnt, known, known_batch_cnt)
+            idx = pointnet2_cpu.get_stack_global_idx(idx, unknown_batch_cnt, known_batch_cnt).int()
+            return torch.sqrt(dist2), idx
+
         dist2 = unknown.new_zeros(unknown.shape)
         idx = unknown_batch_cnt.new_zeros(unknown.shape).int()
 
@@ -274,6 +304,9 @@ class ThreeInterpolate(Function):
         assert idx.shape[0] == weight.shape[0] and idx.shape[1] == weight.shape[1] == 3
 
         ctx.three_interpolate_for_backward = (idx, weight, features.shape[0])
+        if not features.is_cuda:
+            return pointnet2_cpu.three_interpolate_stack(features, idx, weight)
+
         output = features.new_zeros((idx.shape[0], features.shape[1]))
         pointnet2.three_interpolate_wrapper(features.contiguous(), idx.contiguous(), weight.contiguous(), output)
         return output
@@ -289,6 +322,9 @@ class ThreeInterpolate(Function):
             grad_features: (M1 + M2 ..., C)
         """
         idx, weight, M = ctx.three_interpolate_for_backward
+        if not grad_out.is_cuda:
+            return pointnet2_cpu.three_interpolate_grad_stack(grad_out, idx, weight, M), None, None
+
         grad_features = grad_out.new_zeros((M, grad_out.shape[1]))
         pointnet2.three_interpolate_grad_wrapper(
             grad_out.contiguous(), idx.contiguous(), weight.contiguous(), grad_features
@@ -3,7 +3,37 @@ import torch.nn as nn
 from torch.autograd import Function
 
 from ...utils import common_utils
-from . import roiaware_pool3d_cuda
+
+try:
+    from . import roiaware_pool3d_cuda
+except ImportError:
+    roiaware_pool3d_cuda = None
+
+
+def points_in_boxes_mask_torch(points, boxes, margin=1e-5, max_pairs_per_chunk=4194304):
+    """
+    Args:
+        points: (num_points, 3)
+        boxes: (N, 7) [x, y, z, dx, dy, dz, heading], (x, y, z) is the box center
+        margin: BEV margin of the boxes, 1e-5 in check_pt_in_box3d() of roiaware_pool3d_kernel.cu
+            and 1e-2 in check_pt_in_box3d_cpu() of roiaware_pool3d.cpp
+        max_pairs_per_chunk: bounds the size of the (num_points, N) buffers
+    Returns:
+        point_masks: (N, num_points) bool
+    """
+    boxes = boxes.float()
+    cosa, sina = torch.cos(-boxes[:, 6]), torch.sin(-boxes[:, 6])
+    point_masks = points.new_zeros((boxes.shape[0], points.shape[0]), dtype=torch.bool)
+    points_per_chunk = max(max_pairs_per_chunk // max(boxes.shape[0], 1), 1)
+    for start in range(0, points.shape[0], points_per_chunk):
+        cur_points = points[start:start + points_per_chunk].float()
+        shift = cur_points[:, None, :] - boxes[None, :, 0:3]  # (n, N, 3)
+        local_x = shift[..., 0] * cosa - shift[..., 1] * sina
+        local_y = shift[..., 0] * sina + shift[..., 1] * cosa
+        in_flag = (shift[..., 2].abs() <= boxes[:, 5] / 2) & \
+            (local_x.abs() < boxes[:, 3] / 2 + margin) & (local_y.abs() < boxes[:, 4] / 2 + margin)
+        point_masks[:, start:start + points_per_chunk] = in_flag.t()
+    return point_masks
 
 
 def points_in_boxes_cpu(points, boxes):
@@ -19,6 +49,10 @@ def points_in_boxes_cpu(points, boxes):
     points, is_numpy = common_utils.check_numpy_to_torch(points)
     boxes, is_numpy = common_utils.check_numpy_to_torch(boxes)
 
+    if roiaware_pool3d_cuda is None:
+        point_indices = points_in_boxes_mask_torch(points, boxes, margin=1e-2).int()
+        return point_indices.numpy() if is_numpy else point_indices
+
     point_indices = points.new_zeros((boxes.shape[0], points.shape[0]), dtype=torch.int)
     roiaware_pool3d_cuda.points_in_boxes_cpu(boxes.float().contiguous(), points.float().contiguous(), point_indices)
 
@@ -36,6 +70,14 @@ def points_in_boxes_gpu(points, boxes):
     batch_size, num_points, _ = points.shape
 
     box_idxs_of_pts = points.new_zeros((batch_size, num_points), dtype=torch.int).fill_(-1)
+    if not points.is_cuda:
+        for bs_idx in range(batch_size):
+            point_masks = points_in_boxes_mask_torch(points[bs_idx], boxes[bs_idx])  # (T, M)
+            # index of the first box containing each point, like points_in_boxes_kernel
+            in_any_box, first_box_idx = point_masks.t().max(dim=1)
+            box_idxs_of_pts[bs_idx][in_any_box] = first_box_idx[in_any_box].int()
+        return box_idxs_of_pts
+
     roiaware_pool3d_cuda.points_in_boxes_gpu(boxes.contiguous(), points.contiguous(), box_idxs_of_pts)
 
     return box_idxs_of_pts
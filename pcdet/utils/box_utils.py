@@ -109,6 +109,74 @@ def mask_boxes_outside_range_numpy(boxes, limit_range, min_num_corners=1):
     return mask
 
 
+def get_candidate_points_in_ranges(points, lower, upper, margin=0.):
+    """
+    Finds the points in axis-aligned ranges (e.g. the bounding boxes of rotated boxes) for all the ranges at once:
+    the x range of each range is found by a binary search on the points sorted by x, the other dims are checked
+    on these candidates only.
+
+    Args:
+        points: (num_points, 3 + C)
+        lower: (N, D) lower bounds along the first D (1 <= D <= 3) dims of the points
+        upper: (N, D)
+        margin: the ranges are enlarged by margin on both sides along all the D dims
+
+    Returns:
+        point_indices: (K), sorted by range, a point in several ranges appears once for each range
+        range_indices: (K)
+    """
+    lower, upper = lower - margin, upper + margin
+    sorted_indices = np.argsort(points[:, 0])
+    sorted_x = points[sorted_indices, 0]
+    starts = np.searchsorted(sorted_x, lower[:, 0], side='left')
+    num_candidates = np.maximum(np.searchsorted(sorted_x, upper[:, 0], side='right') - starts, 0)
+    range_indices = np.repeat(np.arange(lower.shape[0]), num_candidates)
+    candidate_offsets = np.cumsum(num_candidates) - num_candidates - starts
+    point_indices = sorted_indices[np.arange(num_candidates.sum()) - np.repeat(candidate_offsets, num_candidates)]
+
+    if lower.shape[1] > 1:
+        cur_points = points[point_indices, 1:lower.shape[1]]
+        in_range = np.logical_and(cur_points >= lower[range_indices, 1:],
+                                  cur_points <= upper[range_indices, 1:]).all(axis=1)
+        point_indices, range_indices = point_indices[in_range], range_indices[in_range]
+    return point_indices, range_indices
+
+
+def points_in_boxes3d(points, boxes3d, margin=0.):
+    """
+    Finds the points in all the boxes in one pass on CPU. The candidates of each box are the points in the BEV
+    square around its circumscribed circle (see get_candidate_points_in_ranges), and only they are checked in the
+    frame of the box.
+
+    Args:
+        points: (num_points, 3 + C)
+        boxes3d: (N, 7 + C) [x, y, z, dx, dy, dz, heading], (x, y, z) is the box center
+        margin: extra size of the boxes along dx and dy
+
+    Returns:
+        point_indices: (K), sorted by box, a point in several boxes appears once for each box
+        box_indices: (K)
+    """
+    if points.shape[0] == 0 or boxes3d.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    boxes3d = boxes3d.astype(np.float64)
+
+    # the circumscribed radius of a box enlarged by margin is at most sqrt(2) * margin larger
+    radius = np.linalg.norm(boxes3d[:, 3:5], axis=1)[:, None] / 2
+    point_indices, box_indices = get_candidate_points_in_ranges(
+        points, boxes3d[:, 0:2] - radius, boxes3d[:, 0:2] + radius, margin=margin * 1.5
+    )
+
+    cur_boxes = boxes3d[box_indices]
+    shift = points[point_indices, 0:3].astype(np.float64) - cur_boxes[:, 0:3]
+    cosa, sina = np.cos(-cur_boxes[:, 6]), np.sin(-cur_boxes[:, 6])
+    local_x = shift[:, 0] * cosa - shift[:, 1] * sina
+    local_y = shift[:, 0] * sina + shift[:, 1] * cosa
+    in_flag = (np.abs(shift[:, 2]) <= cur_boxes[:, 5] / 2) & \
+        (np.abs(local_x) <= cur_boxes[:, 3] / 2 + margin) & (np.abs(local_y) <= cur_boxes[:, 4] / 2 + margin)
+    return point_indices[in_flag], box_indices[in_flag]
+
+
 def remove_points_in_boxes3d(points, boxes3d):
     """
     Args:
@@ -120,8 +188,11 @@ def remove_points_in_boxes3d(points, boxes3d):
     """
     boxes3d, is_numpy = common_utils.check_numpy_to_torch(boxes3d)
     points, is_numpy = common_utils.check_numpy_to_torch(points)
-    point_masks = roiaware_pool3d_utils.points_in_boxes_cpu(points[:, 0:3], boxes3d)
-    points = points[point_masks.sum(dim=0) == 0]
+    # same margin as points_in_boxes_cpu of roiaware_pool3d
+    point_indices, _ = points_in_boxes3d(points[:, 0:3].cpu().numpy(), boxes3d.cpu().numpy(), margin=1e-2)
+    keep_mask = torch.ones(points.shape[0], dtype=torch.bool)
+    keep_mask[torch.from_numpy(point_indices)] = False
+    points = points[keep_mask.to(points.device)]
 
     return points.numpy() if is_numpy else points
 
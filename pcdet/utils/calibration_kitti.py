@@ -1,4 +1,7 @@
+import functools
+
 import numpy as np
+import torch
 from scipy.spatial.transform import Rotation as R
 import pdb
 
@@ -23,6 +26,20 @@ def get_calib_from_file(calib_file):
             'Tr_velo2cam': Tr_velo_to_cam.reshape(3, 4)}
 
 
+@functools.lru_cache(maxsize=16384)
+def get_calib_cached(calib_file):
+    """
+    Calibration of a calib file, parsed once per process and shared by all the calls (the Calibration is not
+    modified by its users)
+
+    Args:
+        calib_file: str
+    Returns:
+        calib: Calibration
+    """
+    return Calibration(calib_file)
+
+
 class Calibration(object):
     def __init__(self, calib_file):
         if not isinstance(calib_file, dict):
@@ -53,6 +70,30 @@ class Calibration(object):
         self.tx = self.P2[0, 3] / (-self.fu)
         self.ty = self.P2[1, 3] / (-self.fv)
 
+        # fused transforms, applied to (N, 3) points as pts @ M[:3] + M[3] without homogeneous coords
+        R0_ext = np.hstack((self.R0, np.zeros((3, 1), dtype=np.float32)))  # (3, 4)
+        R0_ext = np.vstack((R0_ext, np.zeros((1, 4), dtype=np.float32)))  # (4, 4)
+        R0_ext[3, 3] = 1
+        V2C_ext = np.vstack((self.V2C, np.zeros((1, 4), dtype=np.float32)))  # (4, 4)
+        V2C_ext[3, 3] = 1
+        self.V2R = np.dot(self.V2C.T, self.R0.T)  # (4, 3) lidar -> rect
+        self.R2V = np.linalg.inv(np.dot(R0_ext, V2C_ext).T)[:, 0:3]  # (4, 3) rect -> lidar
+        self.P2T = self.P2.T  # (4, 3) rect -> img
+        # (4, 4) lidar -> (u * z, v * z, depth + P2[2, 3], z) with z the depth in rect camera coord
+        self.V2I = np.concatenate([
+            np.dot(self.V2R, self.P2T[0:3]) + np.concatenate([np.zeros((3, 3), dtype=np.float32), self.P2T[3:4]]),
+            self.V2R[:, 2:3]
+        ], axis=1)
+
+    @staticmethod
+    def transform(pts, M):
+        """
+        :param pts: (N, 3)
+        :param M: (4, K)
+        :return: (N, K), [pts, 1] @ M
+        """
+        return np.dot(pts, M[0:3]) + M[3]
+
     def cart_to_hom(self, pts):
         """
         :param pts: (N, 3 or 2)
@@ -66,35 +107,23 @@ class Calibration(object):
         :param pts_lidar: (N, 3)
         :return pts_rect: (N, 3)
         """
-        pts_rect_hom = self.cart_to_hom(pts_rect)  # (N, 4)
-        R0_ext = np.hstack((self.R0, np.zeros((3, 1), dtype=np.float32)))  # (3, 4)
-        R0_ext = np.vstack((R0_ext, np.zeros((1, 4), dtype=np.float32)))  # (4, 4)
-        R0_ext[3, 3] = 1
-        V2C_ext = np.vstack((self.V2C, np.zeros((1, 4), dtype=np.float32)))  # (4, 4)
-        V2C_ext[3, 3] = 1
-
-        pts_lidar = np.dot(pts_rect_hom, np.linalg.inv(np.dot(R0_ext, V2C_ext).T))
-        return pts_lidar[:, 0:3]
+        return self.transform(pts_rect, self.R2V)
 
     def lidar_to_rect(self, pts_lidar):
         """
         :param pts_lidar: (N, 3)
         :return pts_rect: (N, 3)
         """
-        pts_lidar_hom = self.cart_to_hom(pts_lidar)
-        pts_rect = np.dot(pts_lidar_hom, np.dot(self.V2C.T, self.R0.T))
-        # pts_rect = reduce(np.dot, (pts_lidar_hom, self.V2C.T, self.R0.T))
-        return pts_rect
+        return self.transform(pts_lidar, self.V2R)
 
     def rect_to_img(self, pts_rect):
         """
         :param pts_rect: (N, 3)
         :return pts_img: (N, 2)
         """
-        pts_rect_hom = self.cart_to_hom(pts_rect)
-        pts_2d_hom = np.dot(pts_rect_hom, self.P2.T)
-        pts_img = (pts_2d_hom[:, 0:2].T / pts_rect_hom[:, 2]).T  # (N, 2)
-        pts_rect_depth = pts_2d_hom[:, 2] - self.P2.T[3, 2]  # depth in rect camera coord
+        pts_2d_hom = self.transform(pts_rect, self.P2T)
+        pts_img = pts_2d_hom[:, 0:2] / pts_rect[:, 2:3]  # (N, 2)
+        pts_rect_depth = pts_2d_hom[:, 2] - self.P2T[3, 2]  # depth in rect camera coord
         return pts_img, pts_rect_depth
 
     def lidar_to_img(self, pts_lidar):
@@ -102,8 +131,9 @@ class Calibration(object):
         :param pts_lidar: (N, 3)
         :return pts_img: (N, 2)
         """
-        pts_rect = self.lidar_to_rect(pts_lidar)
-        pts_img, pts_depth = self.rect_to_img(pts_rect)
+        pts_img_hom = self.transform(pts_lidar, self.V2I)
+        pts_img = pts_img_hom[:, 0:2] / pts_img_hom[:, 3:4]  # (N, 2)
+        pts_depth = pts_img_hom[:, 2] - self.P2T[3, 2]
         return pts_img, pts_depth
 
     def img_to_rect(self, u, v, depth_rect):
@@ -137,3 +167,70 @@ class Calibration(object):
         boxes_corner = np.concatenate((x.reshape(-1, 8, 1), y.reshape(-1, 8, 1)), axis=2)
 
         return boxes, boxes_corner
+
+
+class CalibrationTorch(object):
+    def __init__(self, calibs, device=None):
+        """
+        Calibrations of the samples of a batch stacked as tensors, to project the points of the whole batch at
+        once on their device instead of one sample at a time with numpy
+
+        Args:
+            calibs: list of Calibration, one per sample
+            device:
+        """
+        self.batch_size = len(calibs)
+        V2R = np.stack([calib.V2R for calib in calibs], axis=0)  # (B, 4, 3)
+        P2 = np.stack([calib.P2 for calib in calibs], axis=0)  # (B, 3, 4)
+        self.V2R = torch.from_numpy(V2R).float().to(device)
+        self.P2T = torch.from_numpy(P2).float().transpose(1, 2).contiguous().to(device)  # (B, 4, 3)
+
+    def batch_matmul(self, pts, mats, batch_idx):
+        """
+        :param pts: (N, 4)
+        :param mats: (B, 4, 3)
+        :param batch_idx: (N)
+        :return: (N, 3), pts[i] @ mats[batch_idx[i]]
+        """
+        # one matmul against the matrices of all the samples, cheaper than gathering one matrix per point
+        out = torch.matmul(pts, mats.permute(1, 0, 2).reshape(4, -1)).view(-1, self.batch_size, 3)
+        return out[torch.arange(pts.shape[0], device=pts.device), batch_idx]
+
+    def cart_to_hom(self, pts):
+        """
+        :param pts: (N, 3 or 2)
+        :return pts_hom: (N, 4 or 3)
+        """
+        return torch.cat([pts, pts.new_ones((pts.shape[0], 1))], dim=-1)
+
+    def lidar_to_rect(self, pts_lidar, batch_idx):
+        """
+        :param pts_lidar: (N, 3)
+        :param batch_idx: (N), sample of each point
+        :return pts_rect: (N, 3)
+        """
+        pts_lidar_hom = self.cart_to_hom(pts_lidar)
+        pts_rect = self.batch_matmul(pts_lidar_hom, self.V2R, batch_idx)
+        return pts_rect
+
+    def rect_to_img(self, pts_rect, batch_idx):
+        """
+        :param pts_rect: (N, 3)
+        :param batch_idx: (N), sample of each point
+        :return pts_img: (N, 2)
+        """
+        pts_rect_hom = self.cart_to_hom(pts_rect)
+        pts_2d_hom = self.batch_matmul(pts_rect_hom, self.P2T, batch_idx)
+        pts_img = pts_2d_hom[:, 0:2] / pts_rect_hom[:, 2:3]  # (N, 2)
+        pts_rect_depth = pts_2d_hom[:, 2] - self.P2T[batch_idx, 3, 2]  # depth in rect camera coord
+        return pts_img, pts_rect_depth
+
+    def lidar_to_img(self, pts_lidar, batch_idx):
+        """
+        :param pts_lidar: (N, 3)
+        :param batch_idx: (N), sample of each point
+        :return pts_img: (N, 2)
+        """
+        pts_rect = self.lidar_to_rect(pts_lidar, batch_idx)
+        pts_img, pts_depth = self.rect_to_img(pts_rect, batch_idx)
+        return pts_img, pts_depth
@@ -4,6 +4,7 @@ import pickle
 import random
 import shutil
 import subprocess
+import time
 import SharedArray
 
 import numpy as np
@@ -240,6 +241,59 @@ def generate_voxel2pinds(sparse_tensor):
     return v2pinds_tensor
 
 
+def scatter_mean(features, index, num_segments):
+    """
+    Args:
+        features: (N, C)
+        index: (N), segment of each row in [0, num_segments)
+        num_segments: int
+
+    Returns:
+        segment_mean: (num_segments, C), 0 for the empty segments
+    """
+    segment_sum = features.new_zeros((num_segments, features.shape[1])).index_add_(0, index, features)
+    segment_count = features.new_zeros(num_segments).index_add_(0, index, features.new_ones(features.shape[0]))
+    return segment_sum / torch.clamp_min(segment_count, min=1.0).view(-1, 1)
+
+
+def scatter_max(features, index, num_segments):
+    """
+    The rows are sorted by segment and reduced pairwise in log2(max rows of a segment) steps: in the step of size
+    s, the rows at a multiple of 2s from the start of their segment take the max with the row s rows after them,
+    if it is in the same segment. The first row of each segment then holds its max (Tensor.scatter_reduce would
+    need torch>=1.12).
+
+    Args:
+        features: (N, C)
+        index: (N), segment of each row in [0, num_segments)
+        num_segments: int
+
+    Returns:
+        segment_max: (num_segments, C), 0 for the empty segments
+    """
+    segment_max = features.new_zeros((num_segments, features.shape[1]))
+    if features.shape[0] == 0:
+        return segment_max
+
+    index, order = torch.sort(index)
+    values = features[order]
+    counts = torch.bincount(index, minlength=num_segments)
+    starts = torch.cumsum(counts, dim=0) - counts
+    rows = torch.arange(features.shape[0], device=features.device)
+    rank = rows - starts[index]
+    max_count, step = counts.max().item(), 1
+    while step < max_count:
+        rows = rows[rank[rows] % (2 * step) == 0]
+        pairs = rows[rows + step < features.shape[0]]
+        pairs = pairs[index[pairs + step] == index[pairs]]
+        values[pairs] = torch.max(values[pairs], values[pairs + step])
+        step *= 2
+
+    non_empty = counts > 0
+    segment_max[non_empty] = values[starts[non_empty]]
+    return segment_max
+
+
 def sa_create(name, var):
     x = SharedArray.create(name, var.shape, dtype=var.dtype)
     x[...] = var[...]
@@ -263,3 +317,38 @@ class AverageMeter(object):
         self.sum += val * n
         self.count += n
         self.avg = self.sum / self.count
+
+
+class StageTimer(object):
+    """
+    Average time of the stages of a function, with an AverageMeter for each stage:
+        timer = stage_timer.time()
+        ...
+        timer = stage_timer.update('stage_name', timer)
+    Nothing is measured if disabled. With cuda_sync the device is synchronized before reading the clock, so the
+    asynchronous kernels are counted in their own stage.
+    """
+    def __init__(self, enabled=True, cuda_sync=False):
+        self.enabled = enabled
+        self.cuda_sync = cuda_sync
+        self.stage_time = {}
+
+    def time(self):
+        if self.enabled and self.cuda_sync and torch.cuda.is_available():
+            torch.cuda.synchronize()
+        return time.time()
+
+    def update(self, stage, start_time):
+        if not self.enabled:
+            return start_time
+        cur_time = self.time()
+        if stage not in self.stage_time:
+            self.stage_time[stage] = AverageMeter()
+        self.stage_time[stage].update(cur_time - start_time)
+        return cur_time
+
+    def count(self, stage):
+        return self.stage_time[stage].count if stage in self.stage_time else 0
+
+    def report(self):
+        return ', '.join(['%s: %.2fms' % (stage, meter.avg * 1000) for stage, meter in self.stage_time.items()])
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+import torch
+
+
+@pytest.fixture
+def random_boxes():
+    """
+    Returns:
+        make_boxes: make_boxes(num_boxes, seed, extent, size_range) gives (num_boxes, 7) random boxes
+            [x, y, z, dx, dy, dz, heading], with x and y in [-extent, extent] and the sizes in size_range
+    """
+    def make_boxes(num_boxes, seed=0, extent=10.0, size_range=(1.0, 4.0)):
+        rng = np.random.RandomState(seed)
+        boxes = np.concatenate([
+            rng.uniform(-extent, extent, (num_boxes, 2)), rng.uniform(-1, 1, (num_boxes, 1)),
+            rng.uniform(size_range[0], size_range[1], (num_boxes, 3)), rng.uniform(-np.pi, np.pi, (num_boxes, 1))
+        ], axis=1)
+        return torch.from_numpy(boxes).float()
+    return make_boxes
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import torch
+from easydict import EasyDict
+
+from pcdet.models.model_utils import model_nms_utils
+
+
+def get_nms_config(**kwargs):
+    nms_config = EasyDict({
+        'NMS_TYPE': 'nms_gpu', 'NMS_THRESH': 0.3, 'NMS_PRE_MAXSIZE': 100, 'NMS_POST_MAXSIZE': 30
+    })
+    nms_config.update(kwargs)
+    return nms_config
+
+
+def per_group_nms(box_scores, box_preds, group_ids, num_groups, nms_config, score_thresh):
+    selected = []
+    for k in range(num_groups):
+        group_idx = (group_ids == k).nonzero().view(-1)
+        cur_selected, _ = model_nms_utils.class_agnostic_nms(
+            box_scores[group_idx], box_preds[group_idx], nms_config, score_thresh=score_thresh
+        )
+        if len(cur_selected) > 0:
+            selected.append(group_idx[cur_selected])
+    return torch.cat(selected, dim=0)
+
+
+@pytest.mark.parametrize('max_boxes', [16384, 150, 1])
+def test_batched_nms_matches_per_group_nms(max_boxes, random_boxes):
+    num_boxes, num_groups = 1200, 12
+    box_preds = random_boxes(num_boxes, seed=0)
+    box_scores = torch.from_numpy(np.random.RandomState(1).permutation(num_boxes) / num_boxes).float()
+    group_ids = torch.from_numpy(np.random.RandomState(2).randint(0, num_groups, num_boxes))
+    # an empty group in the middle of a chunk
+    group_ids[group_ids == 5] = 6
+
+    nms_config = get_nms_config(BATCHED_NMS_MAX_BOXES=max_boxes)
+    selected = model_nms_utils.batched_nms(
+        box_scores, box_preds, group_ids, num_groups, nms_config, score_thresh=0.1
+    )
+    expected = per_group_nms(box_scores, box_preds, group_ids, num_groups, nms_config, score_thresh=0.1)
+    assert torch.equal(selected, expected)
+
+
+def test_batched_nms_empty(random_boxes):
+    nms_config = get_nms_config()
+    box_preds = random_boxes(10)
+    selected = model_nms_utils.batched_nms(
+        torch.zeros(10), box_preds, torch.zeros(10, dtype=torch.long), 2, nms_config, score_thresh=0.5
+    )
+    assert selected.shape[0] == 0
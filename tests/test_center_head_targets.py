@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import torch
+from easydict import EasyDict
+
+from pcdet.models.dense_heads.center_head import CenterHead
+
+
+POINT_CLOUD_RANGE = [-75.2, -75.2, -2, 75.2, 75.2, 4]
+VOXEL_SIZE = [0.1, 0.1, 0.15]
+
+
+@pytest.fixture(autouse=True)
+def cpu_class_id_mapping(monkeypatch):
+    # CenterHead.__init__ moves the class id mappings to the GPU
+    if not torch.cuda.is_available():
+        monkeypatch.setattr(torch.Tensor, 'cuda', lambda self, *args, **kwargs: self)
+
+
+def build_center_head(class_names, class_names_each_head, num_max_objs, batched):
+    model_cfg = EasyDict({
+        'CLASS_NAMES_EACH_HEAD': class_names_each_head,
+        'SHARED_CONV_CHANNEL': 8,
+        'NUM_HM_CONV': 2,
+        'SEPARATE_HEAD_CFG': {
+            'HEAD_ORDER': ['center', 'center_z', 'dim', 'rot'],
+            'HEAD_DICT': {
+                'center': {'out_channels': 2, 'num_conv': 2},
+                'center_z': {'out_channels': 1, 'num_conv': 2},
+                'dim': {'out_channels': 3, 'num_conv': 2},
+                'rot': {'out_channels': 2, 'num_conv': 2},
+            }
+        },
+        'TARGET_ASSIGNER_CONFIG': {
+            'FEATURE_MAP_STRIDE': 8, 'NUM_MAX_OBJS': num_max_objs, 'GAUSSIAN_OVERLAP': 0.1, 'MIN_RADIUS': 2,
+            'BATCHED': batched
+        },
+    })
+    return CenterHead(
+        model_cfg=model_cfg, input_channels=8, num_class=len(class_names), class_names=class_names,
+        grid_size=np.array([1504, 1504, 40]), point_cloud_range=np.array(POINT_CLOUD_RANGE, dtype=np.float32),
+        voxel_size=VOXEL_SIZE, predict_boxes_when_training=False
+    )
+
+
+def random_gt_boxes(batch_size, max_num_boxes, num_class, seed=0):
+    rng = np.random.RandomState(seed)
+    gt_boxes = np.zeros((batch_size, max_num_boxes, 8), dtype=np.float32)
+    for bs_idx in range(batch_size):
+        num_boxes = rng.randint(max_num_boxes // 2, max_num_boxes + 1)
+        # some of the centers are out of the range and are clamped to the border of the feature map
+        gt_boxes[bs_idx, :num_boxes, 0:2] = rng.uniform(-77, 77, (num_boxes, 2))
+        gt_boxes[bs_idx, :num_boxes, 2] = rng.uniform(-2, 1, num_boxes)
+        gt_boxes[bs_idx, :num_boxes, 3:6] = rng.uniform(0.3, 12, (num_boxes, 3))
+        gt_boxes[bs_idx, :num_boxes, 6] = rng.uniform(-np.pi, np.pi, num_boxes)
+        gt_boxes[bs_idx, :num_boxes, 7] = rng.randint(1, num_class + 1, num_boxes)
+        gt_boxes[bs_idx, rng.rand(max_num_boxes) < 0.05, 4] = 0  # degenerated boxes are skipped
+    return torch.from_numpy(gt_boxes)
+
+
+@pytest.mark.parametrize('class_names, class_names_each_head, num_max_objs, max_num_boxes', [
+    (['Vehicle', 'Pedestrian', 'Cyclist'], [['Vehicle', 'Pedestrian', 'Cyclist']], 500, 200),
+    (['Vehicle', 'Pedestrian', 'Cyclist'], [['Vehicle'], ['Pedestrian', 'Cyclist']], 500, 200),
+    (['Vehicle', 'Pedestrian', 'Cyclist'], [['Vehicle'], ['Pedestrian', 'Cyclist']], 50, 300),
+])
+def test_assign_targets_batch_matches_loop(class_names, class_names_each_head, num_max_objs, max_num_boxes):
+    gt_boxes = random_gt_boxes(3, max_num_boxes, len(class_names))
+    feature_map_size = [188, 188]
+
+    loop_head = build_center_head(class_names, class_names_each_head, num_max_objs, batched=False)
+    batch_head = build_center_head(class_names, class_names_each_head, num_max_objs, batched=True)
+    # assign_targets writes the class index in the head to the labels of gt_boxes
+    expected = loop_head.assign_targets(gt_boxes.clone(), feature_map_size=feature_map_size)
+    batch_gt_boxes = gt_boxes.clone()
+    targets = batch_head.assign_targets(batch_gt_boxes, feature_map_size=feature_map_size)
+    assert torch.equal(batch_gt_boxes, gt_boxes)
+
+    for key in ['heatmaps', 'target_boxes', 'inds', 'masks']:
+        assert len(targets[key]) == len(class_names_each_head)
+        for target, expected_target in zip(targets[key], expected[key]):
+            assert target.shape == expected_target.shape
+            assert torch.allclose(target, expected_target, atol=1e-6), key
+    if max_num_boxes > num_max_objs:
+        # the boxes of the second head overflow NUM_MAX_OBJS in some samples
+        assert (gt_boxes[..., -1] >= 2).sum(dim=1).max() > num_max_objs
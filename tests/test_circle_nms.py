@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import torch
+
+from pcdet.models.model_utils import centernet_utils
+
+
+def clustered_scene(batch_size, num_objects, num_peaks=5, seed=0):
+    # several candidate centers around each object, a part of the scores tied
+    rng = np.random.RandomState(seed)
+    centers, scores, batch_idx = [], [], []
+    for k in range(batch_size):
+        object_centers = rng.uniform(-50, 50, (num_objects, 2))
+        cur_centers = np.repeat(object_centers, num_peaks, axis=0) + rng.randn(num_objects * num_peaks, 2) * 0.8
+        cur_scores = np.round(rng.rand(num_objects * num_peaks), 2)
+        centers.append(cur_centers)
+        scores.append(cur_scores)
+        batch_idx.append(np.full(cur_centers.shape[0], k))
+    return torch.from_numpy(np.concatenate(centers)).float(), torch.from_numpy(np.concatenate(scores)).float(), \
+        torch.from_numpy(np.concatenate(batch_idx))
+
+
+def per_sample_circle_nms(centers, scores, batch_idx, thresh, post_max_size):
+    keep = []
+    for k in range(int(batch_idx.max()) + 1):
+        sample_idx = (batch_idx == k).nonzero().view(-1)
+        dets = torch.cat([centers[sample_idx], scores[sample_idx, None]], dim=1)
+        keep.append(sample_idx[centernet_utils._circle_nms(dets, thresh, post_max_size=post_max_size)])
+    return torch.cat(keep, dim=0)
+
+
+@pytest.mark.parametrize('thresh', [0.175, 1.0, 4.0])
+@pytest.mark.parametrize('post_max_size', [500, 20])
+def test_circle_nms_batch_matches_circle_nms(thresh, post_max_size):
+    centers, scores, batch_idx = clustered_scene(batch_size=3, num_objects=60)
+    keep = centernet_utils.circle_nms_batch(centers, scores, batch_idx, thresh, post_max_size=post_max_size)
+    expected = per_sample_circle_nms(centers, scores, batch_idx, thresh, post_max_size)
+    assert torch.equal(keep, expected)
+    if post_max_size == 20:
+        assert torch.bincount(batch_idx[keep]).tolist() == [20, 20, 20]
+
+
+def test_circle_nms_batch_ties():
+    # equal scores: the box of the larger index is kept, as by circle_nms
+    centers = torch.tensor([[0.0, 0.0], [0.5, 0.0], [1.0, 0.0], [10.0, 0.0], [10.2, 0.0], [0.0, 0.0]])
+    scores = torch.tensor([0.5, 0.5, 0.5, 0.9, 0.9, 0.5])
+    batch_idx = torch.tensor([0, 0, 0, 0, 0, 1])
+    keep = centernet_utils.circle_nms_batch(centers, scores, batch_idx, thresh=0.3, post_max_size=83)
+    assert keep.tolist() == [4, 2, 0, 5]
+    assert torch.equal(keep, per_sample_circle_nms(centers, scores, batch_idx, 0.3, 83))
+
+
+def test_circle_nms_batch_empty():
+    keep = centernet_utils.circle_nms_batch(torch.zeros(0, 2), torch.zeros(0), torch.zeros(0).long(), thresh=1.0)
+    assert keep.shape[0] == 0
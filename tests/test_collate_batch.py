@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import torch
+
+from pcdet.datasets.dataset import DatasetTemplate
+
+
+def random_sample(rng, k):
+    # the keys of a multimodal KITTI sample, with sizes that differ between the samples
+    num_points, num_voxels, num_boxes = rng.randint(500, 1000), rng.randint(100, 200), rng.randint(0, 5)
+    h, w = rng.randint(370, 376), rng.randint(1224, 1243)
+    voxel_coords = np.stack([rng.randint(0, 40, num_voxels), rng.randint(0, 1600, num_voxels),
+                             rng.randint(0, 1408, num_voxels)], axis=1).astype(np.int32)
+    return {
+        'frame_id': '%06d' % k,
+        'calib': object(),
+        'points': rng.randn(num_points, 4).astype(np.float32),
+        'voxels': rng.randn(num_voxels, 5, 4).astype(np.float32),
+        'voxel_coords': voxel_coords,
+        'voxel_num_points': rng.randint(1, 6, num_voxels).astype(np.int32),
+        'point_to_voxel': rng.randint(-1, num_voxels, num_points).astype(np.int64),
+        'gt_boxes': rng.randn(num_boxes, 8).astype(np.float32),
+        'gt_boxes2d': rng.randn(num_boxes, 4).astype(np.float32),
+        'images': rng.rand(h, w, 3).astype(np.float32),
+        'depth_maps': rng.rand(h, w).astype(np.float32),
+        'points_2d': rng.randn(rng.randint(10, 20), 2).astype(np.float32),
+        'point2img': rng.randint(0, 1242, (num_points, 2)).astype(np.int64),
+        'image_shape': np.array([h, w], dtype=np.int32),
+        'use_lead_xyz': True,
+        'flip_x': bool(k % 2),
+        'noise_rot': rng.uniform(-0.78, 0.78),
+    }
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 5])
+def test_collate_batch_preallocated_matches_collate_batch(batch_size):
+    rng = np.random.RandomState(batch_size)
+    batch_list = [random_sample(rng, k) for k in range(batch_size)]
+
+    expected = DatasetTemplate.collate_batch(batch_list)
+    batch_dict = DatasetTemplate.collate_batch_preallocated(batch_list)
+
+    assert batch_dict.keys() == expected.keys()
+    assert batch_dict['batch_size'] == expected['batch_size'] == batch_size
+    assert batch_dict['calib'] == expected['calib']
+    for key, val in expected.items():
+        if not isinstance(val, np.ndarray):
+            continue
+        assert batch_dict[key].dtype == val.dtype, key
+        np.testing.assert_array_equal(batch_dict[key], val, err_msg=key)
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 5])
+def test_collate_batch_preallocated_to_torch_keeps_the_dtypes(batch_size):
+    rng = np.random.RandomState(batch_size)
+    batch_list = [random_sample(rng, k) for k in range(batch_size)]
+
+    expected = DatasetTemplate.collate_batch(batch_list)
+    batch_dict = DatasetTemplate.collate_batch_preallocated(batch_list, to_torch=True)
+
+    assert batch_dict.keys() == expected.keys()
+    assert batch_dict['calib'] == expected['calib']
+    for key, val in expected.items():
+        if not isinstance(val, np.ndarray):
+            continue
+        if val.dtype.kind in 'bif' or val.dtype == np.uint8:
+            assert isinstance(batch_dict[key], torch.Tensor), key
+            assert batch_dict[key].numpy().dtype == val.dtype, key
+            np.testing.assert_array_equal(batch_dict[key].numpy(), val, err_msg=key)
+        else:
+            # e.g. the frame ids stay numpy arrays
+            assert batch_dict[key].dtype == val.dtype, key
+            np.testing.assert_array_equal(batch_dict[key], val, err_msg=key)
@@ -0,0 +1,38 @@
+import threading
+import time
+
+import numpy as np
+
+from pcdet.models import DevicePrefetcher
+
+
+def get_prefetch_threads(timeout=2.0):
+    # the stopped threads exit after their next queue timeout (0.1s)
+    end_time = time.time() + timeout
+    while True:
+        threads = [x for x in threading.enumerate() if x.name == 'DevicePrefetcher' and x.is_alive()]
+        if len(threads) <= 1 or time.time() > end_time:
+            return threads
+        time.sleep(0.05)
+
+
+def test_prefetcher_yields_all_batches():
+    loader = [{'points': np.full((4, 4), k, dtype=np.float32), 'idx': k} for k in range(10)]
+    prefetcher = DevicePrefetcher(loader, num_prefetch=2, load_fn=None)
+    assert len(prefetcher) == 10
+    assert [batch['idx'] for batch in prefetcher] == list(range(10))
+
+
+def test_prefetcher_threads_of_train_model_loop():
+    loader = [{'idx': k} for k in range(5)]
+    prefetcher = DevicePrefetcher(loader, num_prefetch=2, load_fn=None)
+    # train_model keeps its first iterator for the whole run, train_one_epoch takes a new one in every epoch
+    dataloader_iter = iter(prefetcher)
+    assert dataloader_iter.thread is None
+    for _ in range(3):
+        cur_iter = iter(prefetcher)
+        assert [next(cur_iter)['idx'] for _ in range(len(prefetcher))] == list(range(5))
+        # the thread of the current epoch may still be waiting to put the end of the loader
+        assert len(get_prefetch_threads()) <= 1
+    del dataloader_iter, cur_iter
+    assert len(get_prefetch_threads()) == 0
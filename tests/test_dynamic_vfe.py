@@ -0,0 +1,171 @@
+import numpy as np
+import pytest
+import torch
+from easydict import EasyDict
+
+from pcdet.datasets.dataset import DatasetTemplate
+from pcdet.models.backbones_3d.vfe.mean_vfe import MeanVFE
+from pcdet.models.backbones_3d.vfe.pillar_vfe import PillarVFE
+from pcdet.utils import common_utils
+
+
+POINT_CLOUD_RANGE = [0, -8, -3, 16, 8, 1]
+VOXEL_SIZE = [0.8, 0.8, 4]
+
+
+def random_points(num_points, rng):
+    # clustered points, a part of them out of the range
+    centers = rng.uniform([-2, -10, -4], [18, 10, 2], (num_points // 20, 3))
+    xyz = np.repeat(centers, 20, axis=0) + rng.randn(num_points // 20 * 20, 3) * 0.5
+    return np.concatenate([xyz, rng.rand(xyz.shape[0], 1)], axis=1).astype(np.float32)
+
+
+def voxelize(points):
+    # point_to_voxel and voxel_coords of the dynamic voxelization, without the limits of the number of voxels and
+    # of the points of each voxel
+    pc_range, voxel_size = np.array(POINT_CLOUD_RANGE), np.array(VOXEL_SIZE)
+    grid = np.floor((points[:, :3] - pc_range[:3]) / voxel_size).astype(np.int64)
+    grid_size = np.round((pc_range[3:] - pc_range[:3]) / voxel_size).astype(np.int64)
+    in_range = ((grid >= 0) & (grid < grid_size)).all(axis=1)
+    keys = (grid[:, 2] * grid_size[1] + grid[:, 1]) * grid_size[0] + grid[:, 0]
+    unique_keys, inverse = np.unique(keys[in_range], return_inverse=True)
+    point_to_voxel = np.full(points.shape[0], -1, dtype=np.int64)
+    point_to_voxel[in_range] = inverse
+    voxel_coords = np.stack([
+        unique_keys // (grid_size[0] * grid_size[1]), unique_keys // grid_size[0] % grid_size[1],
+        unique_keys % grid_size[0]
+    ], axis=1).astype(np.int32)  # (z, y, x)
+    return point_to_voxel, voxel_coords
+
+
+def padded_voxels(points, point_to_voxel, num_voxels):
+    # the voxels of the hard voxelization without a limit of points, padded with zeros to the largest voxel
+    voxel_num_points = np.bincount(point_to_voxel[point_to_voxel >= 0], minlength=num_voxels)
+    voxels = np.zeros((num_voxels, voxel_num_points.max(), points.shape[1]), dtype=points.dtype)
+    fill = np.zeros(num_voxels, dtype=np.int64)
+    for k in np.nonzero(point_to_voxel >= 0)[0]:
+        voxels[point_to_voxel[k], fill[point_to_voxel[k]]] = points[k]
+        fill[point_to_voxel[k]] += 1
+    return voxels, voxel_num_points
+
+
+def dynamic_batch_dict(batch_size, num_points, seed=0):
+    rng = np.random.RandomState(seed)
+    samples = []
+    for k in range(batch_size):
+        points = random_points(num_points, rng)
+        point_to_voxel, voxel_coords = voxelize(points)
+        samples.append({'points': points, 'point_to_voxel': point_to_voxel, 'voxel_coords': voxel_coords})
+    batch_dict = DatasetTemplate.collate_batch(samples)
+    return batch_dict, samples
+
+
+def test_scatter_max_matches_the_segment_loop():
+    rng = np.random.RandomState(0)
+    num_segments = 50
+    # segments of one to a hundred rows, and empty segments
+    index = rng.geometric(0.08, 1000) - 1
+    index = index[index < num_segments - 5]
+    index[index == 10] = 11
+    index = torch.from_numpy(index)
+    features = torch.from_numpy(rng.randn(index.shape[0], 6)).float()
+
+    segment_max = common_utils.scatter_max(features, index, num_segments)
+
+    assert segment_max.shape == (num_segments, 6)
+    for k in range(num_segments):
+        if (index == k).any():
+            assert torch.equal(segment_max[k], features[index == k].max(dim=0)[0])
+        else:
+            assert torch.equal(segment_max[k], torch.zeros(6))
+
+
+def test_scatter_max_gradient_goes_to_the_max_rows():
+    features = torch.tensor([[1.0, 5.0], [3.0, 2.0], [-1.0, 4.0], [7.0, -2.0]], requires_grad=True)
+    index = torch.tensor([0, 0, 2, 2])
+
+    segment_max = common_utils.scatter_max(features, index, 3)
+    segment_max.sum().backward()
+
+    assert torch.equal(segment_max.detach(), torch.tensor([[3.0, 5.0], [0.0, 0.0], [7.0, 4.0]]))
+    assert torch.equal(features.grad, torch.tensor([[0.0, 1.0], [1.0, 0.0], [0.0, 1.0], [1.0, 0.0]]))
+
+
+def test_scatter_max_without_rows():
+    segment_max = common_utils.scatter_max(torch.zeros((0, 3)), torch.zeros(0).long(), 4)
+    assert torch.equal(segment_max, torch.zeros((4, 3)))
+
+
+def test_collate_point_to_voxel_offsets_the_voxels_of_each_sample():
+    batch_dict, samples = dynamic_batch_dict(batch_size=3, num_points=2000)
+
+    point_to_voxel, voxel_coords = batch_dict['point_to_voxel'], batch_dict['voxel_coords']
+    assert point_to_voxel.dtype == np.int64
+    assert point_to_voxel.shape[0] == batch_dict['points'].shape[0]
+    out_of_range = np.concatenate([x['point_to_voxel'] < 0 for x in samples])
+    assert np.array_equal(point_to_voxel < 0, out_of_range)
+    assert out_of_range.any() and not out_of_range.all()
+    # each point is in a voxel of its own sample, with the voxel coords of the sample
+    in_range = point_to_voxel >= 0
+    assert np.array_equal(voxel_coords[point_to_voxel[in_range], 0], batch_dict['points'][in_range, 0])
+    expected_coords = np.concatenate([
+        x['voxel_coords'][x['point_to_voxel'][x['point_to_voxel'] >= 0]] for x in samples
+    ])
+    assert np.array_equal(voxel_coords[point_to_voxel[in_range], 1:], expected_coords)
+
+
+def test_mean_vfe_dynamic_matches_the_padded_voxels():
+    batch_dict, _ = dynamic_batch_dict(batch_size=2, num_points=2000)
+    voxels, voxel_num_points = padded_voxels(
+        batch_dict['points'][:, 1:], batch_dict['point_to_voxel'], batch_dict['voxel_coords'].shape[0]
+    )
+    vfe = MeanVFE(model_cfg=EasyDict({}), num_point_features=4)
+
+    dynamic_features = vfe({
+        'points': torch.from_numpy(batch_dict['points']), 'point_to_voxel': torch.from_numpy(batch_dict['point_to_voxel']),
+        'voxel_coords': torch.from_numpy(batch_dict['voxel_coords'])
+    })['voxel_features']
+    padded_features = vfe({
+        'voxels': torch.from_numpy(voxels), 'voxel_num_points': torch.from_numpy(voxel_num_points).float()
+    })['voxel_features']
+
+    assert dynamic_features.shape == (batch_dict['voxel_coords'].shape[0], 4)
+    assert torch.allclose(dynamic_features, padded_features, atol=1e-5)
+
+
+@pytest.mark.parametrize('num_filters', [[64], [32, 64]])
+def test_pillar_vfe_dynamic_matches_the_unpadded_pillars(num_filters):
+    torch.manual_seed(0)
+    batch_dict, _ = dynamic_batch_dict(batch_size=2, num_points=2000)
+    points, point_to_voxel = batch_dict['points'], batch_dict['point_to_voxel']
+    voxel_coords = torch.from_numpy(batch_dict['voxel_coords'])
+    vfe = PillarVFE(
+        model_cfg=EasyDict({'USE_NORM': True, 'WITH_DISTANCE': False, 'USE_ABSLOTE_XYZ': True,
+                            'NUM_FILTERS': num_filters}),
+        num_point_features=4, voxel_size=VOXEL_SIZE, point_cloud_range=POINT_CLOUD_RANGE
+    )
+    for layer in vfe.pfn_layers:
+        layer.norm.running_mean.uniform_(-0.5, 0.5)
+        layer.norm.running_var.uniform_(0.5, 2)
+    vfe.eval()
+
+    with torch.no_grad():
+        dynamic_features = vfe({
+            'points': torch.from_numpy(points), 'voxel_coords': voxel_coords,
+            'point_to_voxel': torch.from_numpy(point_to_voxel)
+        })['pillar_features']
+
+        # the padding is part of the max of forward, so the reference runs it on the pillars with the same number
+        # of points, which are not padded
+        voxels, voxel_num_points = padded_voxels(points[:, 1:], point_to_voxel, voxel_coords.shape[0])
+        expected = torch.zeros_like(dynamic_features)
+        for num_points in np.unique(voxel_num_points):
+            pillar_idx = np.nonzero(voxel_num_points == num_points)[0]
+            expected[pillar_idx] = vfe({
+                'voxels': torch.from_numpy(voxels[pillar_idx, :num_points]),
+                'voxel_num_points': torch.from_numpy(voxel_num_points[pillar_idx]),
+                'voxel_coords': voxel_coords[pillar_idx]
+            })['pillar_features'].view(len(pillar_idx), -1)
+
+    assert dynamic_features.shape == (voxel_coords.shape[0], num_filters[-1])
+    assert torch.allclose(dynamic_features, expected, atol=1e-4)
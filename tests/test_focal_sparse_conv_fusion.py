@@ -0,0 +1,63 @@
+import torch
+
+from pcdet.models.backbones_3d.focal_sparse_conv.focal_sparse_conv import FUSION_PIXEL_OFFSETS, \
+    gather_fused_image_features
+
+
+def reference_calculate_cosine(tensorA, tensorB):
+    # calculate_cosine before it was made row-wise
+    dot = torch.diag(torch.matmul(tensorA, tensorB.t()))
+    norm_A = torch.norm(tensorA, dim=1, keepdim=True) + 1e-6
+    norm_B = torch.norm(tensorB, dim=1, keepdim=True) + 1e-6
+    norm = torch.diag(norm_A * norm_B.t())
+    return torch.clamp(dot / norm, min=-1.0, max=1.0)
+
+
+def reference_image_features(x_rgb_batch, voxels_2d):
+    # the per-sample loop of construct_multimodal_features that FUSION_PIXEL_OFFSETS replaces, kept verbatim:
+    # voxels_2d_int aliases voxels_2d_tmp, so the (i, j) steps accumulate
+    h, w = x_rgb_batch.shape[1:]
+    voxels_2d_tmp = voxels_2d.long()
+    kernel_point_features = []
+    for i in range(-1, 2):
+        for j in range(-1, 2):
+            voxels_2d_int = voxels_2d_tmp
+            voxels_2d_int[:, 1] += i
+            voxels_2d_int[:, 0] += j
+            filter_idx = (0 <= voxels_2d_int[:, 1]) * (voxels_2d_int[:, 1] < h) * \
+                (0 <= voxels_2d_int[:, 0]) * (voxels_2d_int[:, 0] < w)
+            voxels_2d_int = voxels_2d_int[filter_idx]
+            image_features_batch = torch.zeros((voxels_2d.shape[0], x_rgb_batch.shape[0]))
+            image_features_batch[filter_idx] = x_rgb_batch[:, voxels_2d_int[:, 1], voxels_2d_int[:, 0]].permute(1, 0)
+            kernel_point_features.append(image_features_batch)
+
+    for i in range(9):
+        similarity = reference_calculate_cosine(kernel_point_features[i], kernel_point_features[4])
+        kernel_point_features[i] = kernel_point_features[i] * similarity.unsqueeze(1)
+    return torch.mean(torch.stack(kernel_point_features), dim=0)
+
+
+def test_fusion_pixel_offsets_are_the_running_sums_of_the_loop():
+    offsets, pixel = [], [0, 0]
+    for i in range(-1, 2):
+        for j in range(-1, 2):
+            pixel = [pixel[0] + j, pixel[1] + i]
+            offsets.append(pixel)
+    assert offsets == FUSION_PIXEL_OFFSETS
+
+
+def test_gather_fused_image_features_matches_the_loop():
+    torch.manual_seed(0)
+    batch_size, num_channels, h, w = 2, 16, 40, 60
+    x_rgb = torch.randn(batch_size, num_channels, h, w)
+    # some of the voxels are near or outside of the image borders
+    voxels_2d = torch.stack([torch.randint(-4, w + 4, (500,)), torch.randint(-4, h + 4, (500,))], dim=1)
+    batch_index = torch.randint(0, batch_size, (500,))
+
+    image_features = gather_fused_image_features(
+        x_rgb, batch_index, voxels_2d, torch.tensor(FUSION_PIXEL_OFFSETS).long()
+    )
+    for b in range(batch_size):
+        mask = batch_index == b
+        expected = reference_image_features(x_rgb[b], voxels_2d[mask].clone())
+        assert torch.allclose(image_features[mask], expected, atol=1e-5)
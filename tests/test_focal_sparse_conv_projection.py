@@ -0,0 +1,128 @@
+from functools import partial
+
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+
+from pcdet.models.backbones_3d.focal_sparse_conv.focal_sparse_conv import FocalSparseConv
+from pcdet.utils import calibration_kitti, common_utils
+
+
+# calibration of the KITTI training frame 000000
+KITTI_CALIB = {
+    'P2': np.array([[7.215377e+02, 0, 6.095593e+02, 4.485728e+01],
+                    [0, 7.215377e+02, 1.728540e+02, 2.163791e-01],
+                    [0, 0, 1, 2.745884e-03]], dtype=np.float32),
+    'R0': np.array([[9.999239e-01, 9.837760e-03, -7.445048e-03],
+                    [-9.869795e-03, 9.999421e-01, -4.278459e-03],
+                    [7.402527e-03, 4.351614e-03, 9.999631e-01]], dtype=np.float32),
+    'Tr_velo2cam': np.array([[7.533745e-03, -9.999714e-01, -6.166020e-04, -4.069766e-03],
+                             [1.480249e-02, 7.280733e-04, -9.998902e-01, -7.631618e-02],
+                             [9.998621e-01, 7.523790e-03, 1.480755e-02, -2.717806e-01]], dtype=np.float32),
+}
+
+
+@pytest.fixture(autouse=True)
+def cpu_focal_sparse_conv(monkeypatch):
+    # FocalSparseConv.__init__ moves its constant tensors to the GPU
+    if not torch.cuda.is_available():
+        monkeypatch.setattr(torch.Tensor, 'cuda', lambda self, *args, **kwargs: self)
+
+
+def random_calibs(batch_size, rng):
+    # every sample has its own camera, so that a voxel projected with the calibration of another sample is caught
+    calibs = []
+    for _ in range(batch_size):
+        calib = {key: val.copy() for key, val in KITTI_CALIB.items()}
+        # focal lengths and principal point
+        calib['P2'][[0, 1, 0, 1], [0, 1, 2, 2]] += rng.uniform(-5, 5, 4).astype(np.float32)
+        calibs.append(calibration_kitti.Calibration(calib))
+    return calibs
+
+
+def random_voxels(module, batch_size, num_voxels, rng):
+    # (z, y, x) voxel centers of the non-empty voxels in front of the camera
+    indices = np.stack([
+        np.sort(rng.randint(0, batch_size, num_voxels)), rng.randint(0, 40, num_voxels),
+        rng.randint(0, 1600, num_voxels), rng.randint(100, 1408, num_voxels)
+    ], axis=1)
+    indices = torch.from_numpy(indices).int()
+    voxels_3d = indices[:, 1:] * module.voxel_stride * module.voxel_size + module.point_cloud_range[:3]
+    return voxels_3d, indices[:, 0].long()
+
+
+def reference_project_voxels_to_img(module, voxels_3d, batch_index, batch_dict):
+    # the per-sample un-augmentation and numpy Calibration projection of construct_multimodal_features that
+    # project_voxels_to_img replaces
+    voxels_2d = voxels_3d.new_zeros((voxels_3d.shape[0], 2))
+    for b in range(batch_dict['batch_size']):
+        calib = batch_dict['calib'][b]
+        voxels_3d_batch = voxels_3d[batch_index == b]
+
+        if 'noise_scale' in batch_dict:
+            voxels_3d_batch[:, :3] /= batch_dict['noise_scale'][b]
+        if 'noise_rot' in batch_dict:
+            voxels_3d_batch = common_utils.rotate_points_along_z(
+                voxels_3d_batch[:, module.inv_idx].unsqueeze(0), -batch_dict['noise_rot'][b].unsqueeze(0)
+            )[0, :, module.inv_idx]
+        if 'flip_x' in batch_dict:
+            voxels_3d_batch[:, 1] *= -1 if batch_dict['flip_x'][b] else 1
+        if 'flip_y' in batch_dict:
+            voxels_3d_batch[:, 2] *= -1 if batch_dict['flip_y'][b] else 1
+
+        voxels_2d_batch, _ = calib.lidar_to_img(voxels_3d_batch[:, module.inv_idx].cpu().numpy())
+        voxels_2d[batch_index == b] = torch.from_numpy(voxels_2d_batch).float()
+    return voxels_2d
+
+
+def build_focal_sparse_conv():
+    return FocalSparseConv(16, 16, voxel_stride=1, norm_fn=partial(nn.BatchNorm1d, eps=1e-3, momentum=0.01),
+                           indice_key='spconv_focal_multimodal', image_channel=16, use_img=True)
+
+
+@pytest.mark.parametrize('augmentations', [
+    ['noise_scale', 'noise_rot', 'flip_x', 'flip_y'], ['noise_rot', 'flip_x'], ['noise_scale', 'flip_y'], []
+])
+def test_project_voxels_to_img_matches_the_per_sample_calibration(augmentations):
+    rng = np.random.RandomState(0)
+    batch_size = 4
+    module = build_focal_sparse_conv()
+    voxels_3d, batch_index = random_voxels(module, batch_size, 5000, rng)
+    batch_dict = {
+        'batch_size': batch_size, 'calib': random_calibs(batch_size, rng),
+        'noise_scale': torch.from_numpy(rng.uniform(0.95, 1.05, batch_size)).float(),
+        'noise_rot': torch.from_numpy(rng.uniform(-np.pi / 4, np.pi / 4, batch_size)).float(),
+        # every combination of the two flips in the batch
+        'flip_x': torch.tensor([True, False, True, False]),
+        'flip_y': torch.tensor([False, True, True, False]),
+    }
+    for key in ['noise_scale', 'noise_rot', 'flip_x', 'flip_y']:
+        if key not in augmentations:
+            batch_dict.pop(key)
+
+    expected = reference_project_voxels_to_img(module, voxels_3d.clone(), batch_index, batch_dict)
+    voxels_2d = module.project_voxels_to_img(voxels_3d.clone(), batch_index, batch_dict)
+
+    assert voxels_2d.shape == (voxels_3d.shape[0], 2)
+    np.testing.assert_allclose(voxels_2d.numpy(), expected.numpy(), rtol=1e-4, atol=1e-2)
+    # the pixels the image features are gathered at, up to the float rounding of the voxels next to a pixel border
+    in_image = (expected[:, 0] >= 0) & (expected[:, 0] < 1242) & (expected[:, 1] >= 0) & (expected[:, 1] < 375)
+    assert in_image.sum() > 1000
+    different_pixel = (voxels_2d.long() != expected.long()).any(dim=1)
+    assert different_pixel[in_image].float().mean() < 1e-3
+
+
+def test_project_voxels_to_img_reuses_the_batch_calibration():
+    rng = np.random.RandomState(1)
+    batch_size = 2
+    module = build_focal_sparse_conv()
+    voxels_3d, batch_index = random_voxels(module, batch_size, 1000, rng)
+    batch_dict = {'batch_size': batch_size, 'calib': random_calibs(batch_size, rng)}
+
+    first = module.project_voxels_to_img(voxels_3d, batch_index, batch_dict)
+    calib_torch = batch_dict['calib_torch']
+    second = module.project_voxels_to_img(voxels_3d, batch_index, batch_dict)
+
+    assert batch_dict['calib_torch'] is calib_torch
+    assert torch.equal(first, second)
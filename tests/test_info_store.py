@@ -0,0 +1,57 @@
+import pickle
+
+import numpy as np
+
+from pcdet.datasets.info_store import InfoStore
+
+
+def waymo_like_infos(num_sequences=3, num_frames=7, seed=0):
+    rng = np.random.RandomState(seed)
+    infos = []
+    for sequence_idx in range(num_sequences):
+        for sample_idx in range(num_frames):
+            num_obj = rng.randint(0, 4)
+            infos.append({
+                'point_cloud': {'lidar_sequence': 'seq_%d' % sequence_idx, 'sample_idx': sample_idx},
+                'frame_id': 'seq_%d_%03d' % (sequence_idx, sample_idx),
+                'pose': rng.rand(4, 4).astype(np.float32),
+                'annos': {
+                    'name': np.array(['Vehicle'] * num_obj),
+                    # waymo_utils builds np.array([]) for the frames without objects
+                    'dimensions': rng.rand(num_obj, 3) if num_obj > 0 else np.array([]),
+                    'gt_boxes_lidar': rng.rand(num_obj, 7) if num_obj > 0 else np.zeros((0, 7)),
+                },
+                'num_points_of_each_lidar': [1, 2, 3, 4, 5],
+            })
+    return infos
+
+
+def test_info_store_round_trip(tmp_path):
+    infos = waymo_like_infos()
+    InfoStore.create(infos, tmp_path / 'store')
+    info_store = InfoStore(tmp_path / 'store')
+
+    kinds = {key: kind for key, kind, _ in info_store.column_infos}
+    assert kinds[('annos', 'dimensions')] == 'ragged'
+    assert kinds[('pose',)] == 'fixed'
+    assert len(info_store) == len(infos)
+    for info, ref_info in zip(info_store, infos):
+        assert info['frame_id'] == ref_info['frame_id']
+        assert info['point_cloud'] == ref_info['point_cloud']
+        assert np.array_equal(info['pose'], ref_info['pose'])
+        assert np.array_equal(info['annos']['name'], ref_info['annos']['name'])
+        assert np.allclose(info['annos']['dimensions'].reshape(-1, 3), ref_info['annos']['dimensions'].reshape(-1, 3))
+        assert np.allclose(info['annos']['gt_boxes_lidar'], ref_info['annos']['gt_boxes_lidar'])
+
+
+def test_info_store_slices(tmp_path):
+    infos = waymo_like_infos()
+    InfoStore.create(infos[:10], tmp_path / 'part_0')
+    InfoStore.create(infos[10:], tmp_path / 'part_1')
+    info_store = InfoStore([tmp_path / 'part_0', tmp_path / 'part_1'])
+
+    # SAMPLED_INTERVAL, then a pickled copy as in the dataloader workers, then a shared memory limit
+    subset = pickle.loads(pickle.dumps(info_store[::5]))[1:]
+    assert isinstance(subset, InfoStore)
+    assert [info['frame_id'] for info in subset] == [info['frame_id'] for info in infos[::5][1:]]
+    assert subset[-1]['frame_id'] == infos[::5][-1]['frame_id']
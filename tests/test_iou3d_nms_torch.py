@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+import torch
+
+from pcdet.ops.iou3d_nms import iou3d_nms_torch, iou3d_nms_utils
+from pcdet.ops.roiaware_pool3d import roiaware_pool3d_utils
+
+
+# sizes of the random boxes of the tests
+SIZE_RANGE = (0.5, 5.0)
+
+
+def axis_aligned_iou_bev(boxes_a, boxes_b):
+    min_a, max_a = boxes_a[:, None, 0:2] - boxes_a[:, None, 3:5] / 2, boxes_a[:, None, 0:2] + boxes_a[:, None, 3:5] / 2
+    min_b, max_b = boxes_b[None, :, 0:2] - boxes_b[None, :, 3:5] / 2, boxes_b[None, :, 0:2] + boxes_b[None, :, 3:5] / 2
+    overlap = (torch.min(max_a, max_b) - torch.max(min_a, min_b)).clamp(min=0).prod(dim=-1)
+    area_a = boxes_a[:, None, 3] * boxes_a[:, None, 4]
+    area_b = boxes_b[None, :, 3] * boxes_b[None, :, 4]
+    return overlap / (area_a + area_b - overlap)
+
+
+def reference_greedy_nms(iou, thresh):
+    keep, suppressed = [], torch.zeros(iou.shape[0], dtype=torch.bool)
+    for i in range(iou.shape[0]):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= iou[i] > thresh
+    return torch.tensor(keep, dtype=torch.long)
+
+
+def test_iou_bev_axis_aligned(random_boxes):
+    boxes_a = random_boxes(200, seed=0, extent=5.0, size_range=SIZE_RANGE)
+    boxes_b = random_boxes(150, seed=1, extent=5.0, size_range=SIZE_RANGE)
+    boxes_a[:, 6] = 0
+    boxes_b[:, 6] = 0
+    iou = iou3d_nms_torch.boxes_iou_bev(boxes_a, boxes_b)
+    # the 1e-2 in-box margin of the CUDA/C++ kernels is kept, so the IoU is not exact on touching edges
+    assert torch.allclose(iou, axis_aligned_iou_bev(boxes_a, boxes_b), atol=6e-3)
+
+
+def test_iou_bev_rotation_invariant(random_boxes):
+    boxes_a = random_boxes(100, seed=2, extent=5.0, size_range=SIZE_RANGE)
+    boxes_b = random_boxes(80, seed=3, extent=5.0, size_range=SIZE_RANGE)
+    angle = 0.7
+    rot = torch.tensor([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]).float()
+    rot_a, rot_b = boxes_a.clone(), boxes_b.clone()
+    rot_a[:, 0:2], rot_b[:, 0:2] = boxes_a[:, 0:2] @ rot.t(), boxes_b[:, 0:2] @ rot.t()
+    rot_a[:, 6] += angle
+    rot_b[:, 6] += angle
+    iou = iou3d_nms_torch.boxes_iou_bev(boxes_a, boxes_b)
+    assert torch.allclose(iou, iou3d_nms_torch.boxes_iou_bev(rot_a, rot_b), atol=1e-4)
+    assert torch.allclose(iou3d_nms_torch.boxes_iou_bev(boxes_a, boxes_a).diagonal(), torch.ones(100), atol=1e-4)
+
+
+@pytest.mark.skipif(iou3d_nms_utils.iou3d_nms_cuda is None, reason='iou3d_nms_cuda is not compiled')
+def test_iou_bev_matches_cpp_boxes_iou_bev_cpu(random_boxes):
+    boxes_a = random_boxes(300, seed=4, extent=8.0, size_range=SIZE_RANGE)
+    boxes_b = random_boxes(250, seed=5, extent=8.0, size_range=SIZE_RANGE)
+    ans_iou = boxes_a.new_zeros((300, 250))
+    iou3d_nms_utils.iou3d_nms_cuda.boxes_iou_bev_cpu(boxes_a.contiguous(), boxes_b.contiguous(), ans_iou)
+    assert torch.allclose(iou3d_nms_torch.boxes_iou_bev(boxes_a, boxes_b), ans_iou, atol=1e-4)
+
+
+@pytest.mark.parametrize('thresh', [0.1, 0.5, 0.8])
+def test_nms_matches_greedy_reference(thresh, random_boxes):
+    boxes = random_boxes(500, seed=6, extent=10.0, size_range=SIZE_RANGE)
+    scores = torch.from_numpy(np.random.RandomState(7).rand(500)).float()
+    keep, _ = iou3d_nms_utils.nms_gpu(boxes, scores, thresh)
+
+    order = scores.sort(descending=True)[1]
+    iou = iou3d_nms_torch.boxes_iou_bev(boxes[order], boxes[order])
+    assert torch.equal(keep, order[reference_greedy_nms(iou, thresh)])
+
+
+def test_nms_normal_matches_greedy_reference(random_boxes):
+    boxes = random_boxes(500, seed=8, extent=10.0, size_range=SIZE_RANGE)
+    scores = torch.from_numpy(np.random.RandomState(9).rand(500)).float()
+    keep, _ = iou3d_nms_utils.nms_normal_gpu(boxes, scores, 0.3)
+
+    order = scores.sort(descending=True)[1]
+    normal_boxes = boxes[order].clone()
+    normal_boxes[:, 6] = 0
+    iou = axis_aligned_iou_bev(normal_boxes, normal_boxes)
+    assert torch.equal(keep, order[reference_greedy_nms(iou, 0.3)])
+
+
+def test_points_in_boxes_margins():
+    boxes = torch.tensor([[0.0, 0.0, 0.0, 2.0, 2.0, 2.0, 0.0]])
+    # 5e-3 outside of the x edge: inside with the C++ margin (1e-2), outside with the CUDA one (1e-5)
+    points = torch.tensor([[1.005, 0.0, 0.0], [0.5, 0.5, 0.5], [1.5, 0.0, 0.0]])
+    point_indices = roiaware_pool3d_utils.points_in_boxes_cpu(points, boxes)
+    assert point_indices.tolist() == [[1, 1, 0]]
+    box_idxs_of_pts = roiaware_pool3d_utils.points_in_boxes_gpu(points[None], boxes[None])
+    assert box_idxs_of_pts.tolist() == [[-1, 0, -1]]
+
+
+@pytest.mark.skipif(roiaware_pool3d_utils.roiaware_pool3d_cuda is None, reason='roiaware_pool3d_cuda is not compiled')
+def test_points_in_boxes_cpu_matches_cpp(random_boxes):
+    boxes = random_boxes(20, seed=10, extent=5.0, size_range=SIZE_RANGE)
+    points = torch.from_numpy(np.random.RandomState(11).uniform(-6, 6, (5000, 3))).float()
+    point_indices = points.new_zeros((20, 5000), dtype=torch.int)
+    roiaware_pool3d_utils.roiaware_pool3d_cuda.points_in_boxes_cpu(boxes, points, point_indices)
+    point_masks = roiaware_pool3d_utils.points_in_boxes_mask_torch(points, boxes, margin=1e-2)
+    assert torch.equal(point_masks.int(), point_indices)
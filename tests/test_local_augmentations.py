@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+
+from pcdet.datasets.augmentor import augmentor_utils
+from pcdet.utils import common_utils
+
+
+def random_scene(seed, num_boxes=30, num_points=20000, overlap=False):
+    rng = np.random.RandomState(seed)
+    points = np.concatenate([
+        rng.uniform(0, 70, (num_points, 1)), rng.uniform(-40, 40, (num_points, 1)),
+        rng.uniform(-3, 1, (num_points, 1)), rng.rand(num_points, 1)
+    ], axis=1)
+    boxes = np.concatenate([
+        rng.uniform(0, 70, (num_boxes, 1)), rng.uniform(-40, 40, (num_boxes, 1)), rng.uniform(-2, 0, (num_boxes, 1)),
+        rng.uniform(1, 5, (num_boxes, 3)), rng.uniform(-3, 3, (num_boxes, 1))
+    ], axis=1)
+    if overlap:
+        boxes[1::2, 0:2] = boxes[0::2, 0:2][:num_boxes // 2] + 0.5
+    # points inside the boxes
+    box_points = []
+    for box in boxes:
+        local_points = (rng.rand(rng.randint(50, 500), 3) - 0.5) * box[3:6]
+        cosa, sina = np.cos(box[6]), np.sin(box[6])
+        box_points.append(np.stack([
+            local_points[:, 0] * cosa - local_points[:, 1] * sina + box[0],
+            local_points[:, 0] * sina + local_points[:, 1] * cosa + box[1],
+            local_points[:, 2] + box[2], rng.rand(local_points.shape[0])
+        ], axis=1))
+    points = np.concatenate([points] + box_points, axis=0)
+    return boxes.astype(np.float32), points.astype(np.float32)
+
+
+# the per-box loops replaced by the batched augmentations
+def loop_local_translation(gt_boxes, points, offset_range, axis):
+    for idx, box in enumerate(gt_boxes):
+        offset = np.random.uniform(offset_range[0], offset_range[1])
+        points_in_box, mask = augmentor_utils.get_points_in_box(points, box)
+        points[mask, axis] += offset
+        gt_boxes[idx, axis] += offset
+    return gt_boxes, points
+
+
+def loop_local_scaling(gt_boxes, points, scale_range):
+    if scale_range[1] - scale_range[0] < 1e-3:
+        return gt_boxes, points
+    for idx, box in enumerate(gt_boxes):
+        noise_scale = np.random.uniform(scale_range[0], scale_range[1])
+        points_in_box, mask = augmentor_utils.get_points_in_box(points, box)
+        points[mask, 0:3] -= box[0:3]
+        points[mask, :3] *= noise_scale
+        points[mask, 0:3] += box[0:3]
+        gt_boxes[idx, 3:6] *= noise_scale
+    return gt_boxes, points
+
+
+def loop_local_rotation(gt_boxes, points, rot_range):
+    for idx, box in enumerate(gt_boxes):
+        noise_rotation = np.random.uniform(rot_range[0], rot_range[1])
+        points_in_box, mask = augmentor_utils.get_points_in_box(points, box)
+        centroid = box[0:3].copy()
+        points[mask, 0:3] -= centroid
+        points[mask, :] = common_utils.rotate_points_along_z(points[np.newaxis, mask, :], np.array([noise_rotation]))[0]
+        points[mask, 0:3] += centroid
+        gt_boxes[idx, 6] += noise_rotation
+    return gt_boxes, points
+
+
+def loop_local_frustum_dropout(gt_boxes, points, intensity_range, direction):
+    for idx, box in enumerate(gt_boxes):
+        x, y, z, dx, dy, dz = box[0], box[1], box[2], box[3], box[4], box[5]
+        intensity = np.random.uniform(intensity_range[0], intensity_range[1])
+        points_in_box, mask = augmentor_utils.get_points_in_box(points, box)
+        if direction == 'top':
+            drop_mask = points[:, 2] >= (z + dz / 2) - intensity * dz
+        elif direction == 'bottom':
+            drop_mask = points[:, 2] <= (z - dz / 2) + intensity * dz
+        elif direction == 'left':
+            drop_mask = points[:, 1] >= (y + dy / 2) - intensity * dy
+        else:
+            drop_mask = points[:, 1] <= (y - dy / 2) + intensity * dy
+        points = points[np.logical_not(np.logical_and(mask, drop_mask))]
+    return gt_boxes, points
+
+
+AUGMENTATIONS = [
+    ('local_scaling', [0.8, 1.2], loop_local_scaling),
+    ('local_rotation', [-0.8, 0.8], loop_local_rotation),
+] + [
+    ('random_local_translation_along_%s' % axis_name, [-1, 1],
+     lambda gt_boxes, points, offset_range, axis=axis: loop_local_translation(gt_boxes, points, offset_range, axis))
+    for axis, axis_name in enumerate('xyz')
+] + [
+    ('local_frustum_dropout_%s' % direction, [0, 0.4],
+     lambda gt_boxes, points, intensity_range, direction=direction: loop_local_frustum_dropout(
+         gt_boxes, points, intensity_range, direction))
+    for direction in ['top', 'bottom', 'left', 'right']
+]
+
+
+def run_with_seed(func, gt_boxes, points, value_range, seed):
+    np.random.seed(seed)
+    gt_boxes, points = func(gt_boxes.copy(), points.copy(), value_range)
+    # the batched draws consume the random stream like the per-box draws
+    return gt_boxes, points, np.random.rand()
+
+
+@pytest.mark.parametrize('name, value_range, loop_func', AUGMENTATIONS, ids=[x[0] for x in AUGMENTATIONS])
+@pytest.mark.parametrize('overlap', [False, True])
+def test_batched_augmentation_matches_loop(name, value_range, loop_func, overlap):
+    for seed in range(5):
+        gt_boxes, points = random_scene(seed, overlap=overlap)
+        boxes_out, points_out, next_random = run_with_seed(
+            getattr(augmentor_utils, name), gt_boxes, points, value_range, seed
+        )
+        expected_boxes, expected_points, expected_next_random = run_with_seed(
+            loop_func, gt_boxes, points, value_range, seed
+        )
+        assert next_random == expected_next_random
+        assert np.array_equal(boxes_out, expected_boxes)
+        assert points_out.shape == expected_points.shape
+        if name == 'local_rotation':
+            # one rotation of all the points instead of one per box, up to float32 rounding
+            assert np.allclose(points_out, expected_points, atol=1e-4)
+        else:
+            assert np.array_equal(points_out, expected_points)
+
+
+def test_points_moved_into_a_later_box():
+    # the points of box 0 are moved into box 1 and moved again with it, as by the loop
+    gt_boxes = np.array([[0, 0, 0, 2, 2, 2, 0], [3, 0, 0, 2, 2, 2, 0], [20, 0, 0, 2, 2, 2, 0]], dtype=np.float32)
+    points = np.concatenate([
+        np.random.RandomState(0).uniform(-0.9, 0.9, (100, 3)), np.random.RandomState(1).uniform(-1, 25, (100, 3))
+    ], axis=0).astype(np.float32)
+    points[100:, 1:3] = np.clip(points[100:, 1:3], -0.9, 0.9)
+    for name, loop_func in [('random_local_translation_along_x', AUGMENTATIONS[2][2]), ('local_scaling', loop_local_scaling)]:
+        value_range = [3, 3] if name == 'random_local_translation_along_x' else [1.5, 2.5]
+        boxes_out, points_out, _ = run_with_seed(getattr(augmentor_utils, name), gt_boxes, points, value_range, 0)
+        expected_boxes, expected_points, _ = run_with_seed(loop_func, gt_boxes, points, value_range, 0)
+        assert np.array_equal(boxes_out, expected_boxes)
+        assert np.array_equal(points_out, expected_points)
+    # all the points of box 0 are translated twice
+    _, points_out, _ = run_with_seed(augmentor_utils.random_local_translation_along_x, gt_boxes, points, [3, 3], 0)
+    assert np.allclose(points_out[:100, 0], points[:100, 0] + 6)
+
+
+def test_local_rotation_with_velocity():
+    gt_boxes, points = random_scene(0, num_boxes=10, num_points=1000)
+    gt_boxes = np.concatenate([gt_boxes, np.tile([[1.0, 0.0]], (10, 1)).astype(np.float32)], axis=1)
+    np.random.seed(0)
+    boxes_out, _ = augmentor_utils.local_rotation(gt_boxes.copy(), points.copy(), [-0.8, 0.8])
+    np.random.seed(0)
+    noise_rotation = np.random.uniform(-0.8, 0.8, 10)
+    assert np.allclose(boxes_out[:, 6], gt_boxes[:, 6] + noise_rotation, atol=1e-6)
+    assert np.allclose(boxes_out[:, 7:9], np.stack([np.cos(noise_rotation), np.sin(noise_rotation)], axis=1), atol=1e-6)
@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+import torch
+
+from pcdet.ops.pointnet2 import pointnet2_cpu
+from pcdet.ops.pointnet2.pointnet2_batch import pointnet2_utils as batch_utils
+from pcdet.ops.pointnet2.pointnet2_stack import pointnet2_utils as stack_utils
+
+
+def cuda_farthest_point_sample(xyz, npoint, block_size):
+    """
+    Literal emulation of the farthest point sampling kernel of src/sampling_gpu.cu: every thread keeps the farthest
+    of its strided points (the first one on ties), then a tree reduction keeps the lower thread on ties.
+    """
+    num_points = xyz.shape[0]
+    temp = np.full(num_points, 1e10, dtype=np.float32)
+    idxs, old = [0], 0
+    for _ in range(1, npoint):
+        x1, y1, z1 = xyz[old]
+        d = ((xyz[:, 0] - x1) * (xyz[:, 0] - x1) + (xyz[:, 1] - y1) * (xyz[:, 1] - y1)) + \
+            (xyz[:, 2] - z1) * (xyz[:, 2] - z1)
+        temp = np.minimum(d.astype(np.float32), temp)
+        dists, dists_i = np.full(block_size, -1, dtype=np.float32), np.zeros(block_size, dtype=np.int64)
+        for tid in range(block_size):
+            thread_points = np.arange(tid, num_points, block_size)
+            if len(thread_points) > 0:
+                k = int(np.argmax(temp[thread_points]))
+                dists[tid], dists_i[tid] = temp[thread_points[k]], thread_points[k]
+        stride = block_size // 2
+        while stride >= 1:
+            for tid in range(stride):
+                if dists[tid + stride] > dists[tid]:
+                    dists[tid], dists_i[tid] = dists[tid + stride], dists_i[tid + stride]
+            stride //= 2
+        old = int(dists_i[0])
+        idxs.append(old)
+    return np.array(idxs)
+
+
+def test_farthest_point_sample_tie_break():
+    # points 1 and 2 are tied, the reduction of the kernel keeps thread 2 (point 2), not the first index
+    xyz = torch.tensor([[0, 0, 0], [-5, 0, 0], [5, 0, 0], [0.5, 0, 0]], dtype=torch.float32)
+    idx = pointnet2_cpu.farthest_point_sample(xyz, [4], [4], block_size=pointnet2_cpu.opt_n_threads(4))
+    assert idx.tolist() == [0, 2, 1, 3]
+    assert batch_utils.farthest_point_sample(xyz[None], 4).tolist() == [[0, 2, 1, 3]]
+
+    xyz = torch.tensor([[0, 0, 0], [1, 0, 0], [2, 0, 0], [3, 0, 0], [4, 0, 0]], dtype=torch.float32)
+    idx = pointnet2_cpu.farthest_point_sample(xyz, [5], [5], block_size=pointnet2_cpu.opt_n_threads(5))
+    assert idx.tolist() == [0, 4, 2, 1, 3]
+
+
+@pytest.mark.parametrize('num_points, block_size', [(300, 256), (777, 1024), (777, 64)])
+def test_farthest_point_sample_matches_kernel_with_ties(num_points, block_size):
+    rng = np.random.RandomState(num_points)
+    # integer coordinates give many equal distances
+    xyz = rng.randint(0, 6, (num_points, 3)).astype(np.float32)
+    idx = pointnet2_cpu.farthest_point_sample(torch.from_numpy(xyz), [num_points], [60], block_size=block_size)
+    assert idx.numpy().tolist() == cuda_farthest_point_sample(xyz, 60, block_size).tolist()
+
+
+def test_stack_farthest_point_sample():
+    rng = np.random.RandomState(0)
+    xyz = rng.randint(0, 6, (900, 3)).astype(np.float32)
+    idx = stack_utils.stack_farthest_point_sample(torch.from_numpy(xyz), torch.tensor([400, 500]).int(), 30)
+    # global indices, the stack kernel always runs with 1024 threads
+    expected = np.concatenate([cuda_farthest_point_sample(xyz[:400], 30, 1024),
+                               cuda_farthest_point_sample(xyz[400:], 30, 1024) + 400])
+    assert idx.tolist() == expected.tolist()
+
+
+def test_ball_query_conventions():
+    xyz = torch.tensor([
+        [0, 0, 0], [1, 0, 0], [0.5, 0, 0], [3, 0, 0],  # sample 0
+        [0, 0, 0], [0.2, 0, 0],  # sample 1
+    ], dtype=torch.float32)
+    new_xyz = torch.tensor([[0, 0, 0], [10, 0, 0], [0.5, 0, 0], [0.1, 0, 0]], dtype=torch.float32)
+    xyz_batch_cnt, new_xyz_batch_cnt = torch.tensor([4, 2]).int(), torch.tensor([3, 1]).int()
+
+    # in the order of the points, d2 < radius^2, the missing samples are filled with the first point found
+    idx = pointnet2_cpu.ball_query(1.01, 4, xyz, xyz_batch_cnt, new_xyz, new_xyz_batch_cnt)
+    assert idx.tolist() == [[0, 1, 2, 0], [-1, 0, 0, 0], [0, 1, 2, 0], [0, 1, 0, 0]]
+    # the distance has to be strictly smaller than the radius
+    idx = pointnet2_cpu.ball_query(0.5, 2, xyz, xyz_batch_cnt, new_xyz, new_xyz_batch_cnt)
+    assert idx[2].tolist() == [2, 2]
+
+    # the stack op returns indices local to each sample and the empty balls as a mask
+    idx, empty_ball_mask = stack_utils.ball_query(1.01, 4, xyz, xyz_batch_cnt, new_xyz, new_xyz_batch_cnt)
+    assert idx.tolist() == [[0, 1, 2, 0], [0, 0, 0, 0], [0, 1, 2, 0], [0, 1, 0, 0]]
+    assert empty_ball_mask.tolist() == [False, True, False, False]
+
+    # the batch kernel does not mark the empty balls
+    idx = batch_utils.ball_query(1.01, 4, xyz[None, 0:4].contiguous(), new_xyz[None, 0:3].contiguous())
+    assert idx.tolist() == [[[0, 1, 2, 0], [0, 0, 0, 0], [0, 1, 2, 0]]]
+
+
+def test_three_nn():
+    known = torch.tensor([
+        [0, 0, 0], [2, 0, 0], [0, 3, 0], [1, 0, 0],  # sample 0
+        [5, 5, 5], [6, 5, 5],  # sample 1, less than 3 points
+    ], dtype=torch.float32)
+    unknown = torch.tensor([[0.9, 0, 0], [1.5, 0, 0], [5, 5, 5]], dtype=torch.float32)
+    dist2, idx = pointnet2_cpu.three_nn(unknown, [2, 1], known, [4, 2])
+    # on ties (points 1 and 3 for [1.5, 0, 0]) the first point is the nearer one, as the strict < of the kernel
+    assert idx.tolist() == [[3, 0, 1], [1, 3, 0], [0, 1, 0]]
+    assert torch.allclose(dist2[0:2], torch.tensor([[0.01, 0.81, 1.21], [0.25, 0.25, 2.25]]))
+    assert dist2[2, 2] == float('inf')
+
+    dist, idx = stack_utils.three_nn(unknown, torch.tensor([2, 1]).int(), known, torch.tensor([4, 2]).int())
+    assert idx.tolist() == [[3, 0, 1], [1, 3, 0], [4, 5, 4]]
+    assert torch.allclose(dist[0], torch.tensor([0.1, 0.9, 1.1]))
+
+
+def test_grouping_gradients():
+    rng = np.random.RandomState(0)
+    features = torch.from_numpy(rng.randn(9, 5).astype(np.float32)).requires_grad_()
+    features_batch_cnt, idx_batch_cnt = torch.tensor([4, 5]).int(), torch.tensor([3, 2]).int()
+    # local indices, with repeats as in the filled balls
+    idx = torch.tensor([[0, 1, 1], [3, 3, 3], [2, 0, 1], [4, 0, 0], [1, 2, 3]]).int()
+    output = stack_utils.grouping_operation(features, features_batch_cnt, idx, idx_batch_cnt)
+    grad_out = torch.from_numpy(rng.randn(*output.shape).astype(np.float32))
+    output.backward(grad_out)
+
+    global_idx = idx.long() + torch.tensor([0, 0, 0, 4, 4])[:, None]
+    ref_features = features.detach().clone().requires_grad_()
+    ref_output = ref_features[global_idx].permute(0, 2, 1)  # (M, C, nsample)
+    ref_output.backward(grad_out)
+    assert torch.equal(output, ref_output)
+    assert torch.allclose(features.grad, ref_features.grad, atol=1e-6)
+
+    # batch grouping: (B, C, N) features, (B, npoint, nsample) indices
+    batch_features = features.detach()[None].permute(0, 2, 1).contiguous().requires_grad_()
+    batch_idx = torch.from_numpy(rng.randint(0, 9, (1, 4, 3))).int()
+    output = batch_utils.grouping_operation(batch_features, batch_idx)
+    output.backward(torch.ones_like(output))
+    counts = torch.bincount(batch_idx.long().view(-1), minlength=9).float()
+    assert torch.equal(output, batch_features.detach()[:, :, batch_idx[0].long()])
+    assert torch.allclose(batch_features.grad, counts[None, None, :].expand(1, 5, 9))
+
+
+def test_three_interpolate_gradients():
+    rng = np.random.RandomState(1)
+    features = torch.from_numpy(rng.randn(6, 4).astype(np.float32)).requires_grad_()
+    idx = torch.tensor([[0, 1, 2], [2, 2, 5], [5, 4, 3]]).int()
+    weight = torch.from_numpy(rng.rand(3, 3).astype(np.float32))
+    output = stack_utils.three_interpolate(features, idx, weight)
+    grad_out = torch.from_numpy(rng.randn(3, 4).astype(np.float32))
+    output.backward(grad_out)
+
+    ref_features = features.detach().clone().requires_grad_()
+    ref_output = (ref_features[idx.long()] * weight[..., None]).sum(dim=1)
+    ref_output.backward(grad_out)
+    assert torch.allclose(output, ref_output, atol=1e-6)
+    assert torch.allclose(features.grad, ref_features.grad, atol=1e-6)
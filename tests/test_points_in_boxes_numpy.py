@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from pcdet.datasets.augmentor import augmentor_utils
+from pcdet.utils import box_utils
+
+
+def random_scene(num_points, num_boxes, seed=0):
+    rng = np.random.RandomState(seed)
+    points = np.concatenate([
+        rng.uniform(0, 30, (num_points, 1)), rng.uniform(-15, 15, (num_points, 1)),
+        rng.uniform(-3, 1, (num_points, 1)), rng.rand(num_points, 1)
+    ], axis=1).astype(np.float32)
+    boxes = np.concatenate([
+        rng.uniform(0, 30, (num_boxes, 1)), rng.uniform(-15, 15, (num_boxes, 1)), rng.uniform(-2, 0, (num_boxes, 1)),
+        rng.uniform(1, 6, (num_boxes, 3)), rng.uniform(-np.pi, np.pi, (num_boxes, 1))
+    ], axis=1).astype(np.float32)
+    return points, boxes
+
+
+def brute_force_points_in_boxes(points, boxes, margin):
+    boxes = boxes.astype(np.float64)
+    shift = points[None, :, 0:3].astype(np.float64) - boxes[:, None, 0:3]
+    cosa, sina = np.cos(-boxes[:, 6])[:, None], np.sin(-boxes[:, 6])[:, None]
+    local_x = shift[..., 0] * cosa - shift[..., 1] * sina
+    local_y = shift[..., 0] * sina + shift[..., 1] * cosa
+    in_flag = (np.abs(shift[..., 2]) <= boxes[:, None, 5] / 2) & \
+        (np.abs(local_x) <= boxes[:, None, 3] / 2 + margin) & (np.abs(local_y) <= boxes[:, None, 4] / 2 + margin)
+    box_indices, point_indices = np.nonzero(in_flag)
+    return point_indices, box_indices
+
+
+def as_pairs(point_indices, box_indices):
+    return sorted(zip(box_indices.tolist(), point_indices.tolist()))
+
+
+def test_candidate_points_in_ranges():
+    points, _ = random_scene(3000, 0, seed=0)
+    rng = np.random.RandomState(1)
+    lower = np.concatenate([rng.uniform(0, 30, (20, 1)), rng.uniform(-15, 15, (20, 1)), rng.uniform(-3, 1, (20, 1))], 1)
+    upper = lower + rng.uniform(0, 5, (20, 3))
+    for num_dims in [1, 2, 3]:
+        point_indices, range_indices = box_utils.get_candidate_points_in_ranges(
+            points, lower[:, 0:num_dims], upper[:, 0:num_dims], margin=0.5
+        )
+        assert np.all(np.diff(range_indices) >= 0)
+        in_flag = np.logical_and(points[None, :, 0:num_dims] >= lower[:, None, 0:num_dims] - 0.5,
+                                 points[None, :, 0:num_dims] <= upper[:, None, 0:num_dims] + 0.5).all(axis=2)
+        expected_range_indices, expected_point_indices = np.nonzero(in_flag)
+        assert as_pairs(point_indices, range_indices) == as_pairs(expected_point_indices, expected_range_indices)
+
+
+@pytest.mark.parametrize('margin', [0.0, 1e-2, 0.5])
+def test_points_in_boxes3d(margin):
+    points, boxes = random_scene(5000, 30, seed=2)
+    point_indices, box_indices = box_utils.points_in_boxes3d(points, boxes, margin=margin)
+    assert np.all(np.diff(box_indices) >= 0)
+    assert as_pairs(point_indices, box_indices) == as_pairs(*brute_force_points_in_boxes(points, boxes, margin))
+
+
+def test_get_points_in_boxes_matches_per_box_loop():
+    points, boxes = random_scene(5000, 30, seed=3)
+    point_indices, box_indices = augmentor_utils.get_points_in_boxes(points, boxes)
+    expected = []
+    for box_idx in range(boxes.shape[0]):
+        _, mask = augmentor_utils.get_points_in_box(points, boxes[box_idx])
+        expected.extend([(box_idx, point_idx) for point_idx in np.flatnonzero(mask).tolist()])
+    assert as_pairs(point_indices, box_indices) == sorted(expected)
+
+
+def test_points_in_pyramids_matches_in_hull():
+    points, boxes = random_scene(5000, 10, seed=4)
+    pyramids = augmentor_utils.get_pyramids(boxes).reshape(-1, 5, 3)
+    point_indices, pyramid_indices = augmentor_utils.points_in_pyramids(points, pyramids)
+    expected = []
+    for pyramid_idx in range(pyramids.shape[0]):
+        in_flag = box_utils.in_hull(points[:, 0:3], pyramids[pyramid_idx])
+        expected.extend([(pyramid_idx, point_idx) for point_idx in np.flatnonzero(in_flag).tolist()])
+    assert as_pairs(point_indices, pyramid_indices) == sorted(expected)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import torch
+
+from pcdet.models.backbones_3d.pfe import voxel_set_abstraction
+
+
+def random_scene(num_points, num_rois, seed=0):
+    rng = np.random.RandomState(seed)
+    dist, angle = np.abs(rng.randn(num_points)) * 30, rng.uniform(-np.pi, np.pi, num_points)
+    points = np.stack([dist * np.cos(angle), dist * np.sin(angle), rng.uniform(-2, 4, num_points)], axis=1)
+    rois = np.concatenate([
+        rng.uniform(-75, 75, (num_rois, 2)), rng.uniform(-1, 2, (num_rois, 1)), rng.uniform(0.5, 5, (num_rois, 2)),
+        rng.uniform(1, 3, (num_rois, 1)), rng.uniform(-np.pi, np.pi, (num_rois, 1))
+    ], axis=1)
+    rois[:3, 3] = 16  # a few long trucks set the cell size
+    return torch.from_numpy(points).float(), torch.from_numpy(rois).float()
+
+
+def dense_point_mask(rois, points, sample_radius_with_roi):
+    distance = (points[:, None, :] - rois[None, :, 0:3]).norm(dim=-1)
+    min_dis, min_dis_roi_idx = distance.min(dim=-1)
+    roi_max_dim = (rois[min_dis_roi_idx, 3:6] / 2).norm(dim=-1)
+    return min_dis < roi_max_dim + sample_radius_with_roi
+
+
+@pytest.mark.parametrize('num_points, num_rois, num_max_points_of_part', [
+    (20000, 100, 200000), (20000, 100, 3000), (5000, 1, 200000)
+])
+def test_grid_mask_matches_dense_mask(num_points, num_rois, num_max_points_of_part):
+    points, rois = random_scene(num_points, num_rois)
+    point_mask = voxel_set_abstraction.get_point_mask_with_roi_grid(
+        rois, points, 1.6, num_max_points_of_part=num_max_points_of_part
+    )
+    expected = dense_point_mask(rois, points, 1.6)
+    assert expected.any() and not expected.all()
+    assert torch.equal(point_mask, expected)
+
+    sampled_points, sampled_mask = voxel_set_abstraction.sample_points_with_roi(
+        rois, points, 1.6, num_max_points_of_part=num_max_points_of_part, use_roi_grid=True
+    )
+    assert torch.equal(sampled_mask, expected) and torch.equal(sampled_points, points[expected])
+
+
+def test_grid_mask_tied_rois():
+    # rois of equal centers: the one of the lowest index decides, as the argmin of the dense path
+    points, rois = random_scene(5000, 40, seed=1)
+    rois[20:30, 0:3] = rois[10:20, 0:3]
+    rois[10:20, 3:6] = 0.2
+    rois[20:30, 3:6] = 10.0
+    points[:1000, 0:3] = rois[10:20, 0:3].repeat(100, 1) + torch.from_numpy(
+        np.random.RandomState(2).uniform(-4, 4, (1000, 3))).float()
+    point_mask = voxel_set_abstraction.get_point_mask_with_roi_grid(rois, points, 0.5)
+    expected = dense_point_mask(rois, points, 0.5)
+    assert not expected[:1000].all()
+    assert torch.equal(point_mask, expected)
+
+
+def test_grid_mask_without_rois():
+    points, rois = random_scene(100, 1)
+    assert not voxel_set_abstraction.get_point_mask_with_roi_grid(rois[:0], points, 1.6).any()
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from pcdet.datasets.kitti.kitti_object_eval_python import eval as kitti_eval
+from pcdet.datasets.kitti.kitti_object_eval_python.rotate_iou_cpu import rotate_iou_cpu_eval
+
+
+def box_corners(box):
+    # [x, y, dx, dy, angle], clockwise when positive as in rbbox_to_corners
+    cx, cy, dx, dy, angle = box
+    local_x, local_y = np.array([-dx, -dx, dx, dx]) / 2, np.array([-dy, dy, dy, -dy]) / 2
+    cosa, sina = np.cos(angle), np.sin(angle)
+    return np.stack([cosa * local_x + sina * local_y + cx, -sina * local_x + cosa * local_y + cy], axis=1)
+
+
+def polygon_area(polygon):
+    x, y = polygon[:, 0], polygon[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def cross(a, b):
+    return a[0] * b[1] - a[1] * b[0]
+
+
+def clip_polygon(subject, clip):
+    # Sutherland-Hodgman, the clip polygon is convex
+    orientation = np.sign(cross(clip[1] - clip[0], clip[2] - clip[1]))
+    output = list(subject)
+    for k in range(len(clip)):
+        edge_start, edge_end = clip[k], clip[(k + 1) % len(clip)]
+        inside = lambda p: orientation * cross(edge_end - edge_start, p - edge_start) >= 0
+        cur_input, output = output, []
+        for j in range(len(cur_input)):
+            cur_point, prev_point = cur_input[j], cur_input[j - 1]
+            if inside(cur_point) != inside(prev_point):
+                d1, d2 = cur_point - prev_point, edge_end - edge_start
+                t = cross(edge_start - prev_point, d2) / cross(d1, d2)
+                output.append(prev_point + t * d1)
+            if inside(cur_point):
+                output.append(cur_point)
+        if len(output) == 0:
+            break
+    return np.array(output)
+
+
+def reference_overlap(boxes, query_boxes, criterion):
+    overlap = np.zeros((boxes.shape[0], query_boxes.shape[0]))
+    for n, box in enumerate(boxes):
+        for k, query_box in enumerate(query_boxes):
+            intersection = clip_polygon(box_corners(box), box_corners(query_box))
+            area_inter = polygon_area(intersection) if len(intersection) >= 3 else 0.0
+            area_box, area_query = box[2] * box[3], query_box[2] * query_box[3]
+            overlap[n, k] = {-1: area_inter / (area_box + area_query - area_inter), 0: area_inter / area_query,
+                             1: area_inter / area_box}.get(criterion, area_inter)
+    return overlap
+
+
+def test_known_overlaps():
+    boxes = np.array([[0, 0, 2, 2, 0]], dtype=np.float32)
+    query_boxes = np.array([
+        [0, 0, 2, 2, 0],  # identical
+        [5, 0, 2, 2, 0.3],  # disjoint
+        [1, 0, 2, 2, 0],  # half overlap
+        [0, 0, 2, 2, np.pi / 4],  # rotated: octagon of area 8 * sqrt(2) - 8
+        [0, 0, 4, 4, 0],  # contains the box
+    ], dtype=np.float32)
+    octagon = 8 * np.sqrt(2) - 8
+    expected = {
+        -1: [1, 0, 2 / 6, octagon / (8 - octagon), 4 / 16],
+        0: [1, 0, 2 / 4, octagon / 4, 4 / 16],  # inter / area(query_boxes)
+        1: [1, 0, 2 / 4, octagon / 4, 4 / 4],  # inter / area(boxes)
+        2: [4, 0, 2, octagon, 4],  # intersection area
+    }
+    for criterion, values in expected.items():
+        overlap = rotate_iou_cpu_eval(boxes, query_boxes, criterion)
+        assert overlap.shape == (1, 5) and overlap.dtype == np.float32
+        assert np.allclose(overlap[0], values, atol=1e-5), criterion
+
+
+@pytest.mark.parametrize('criterion', [-1, 0, 1])
+def test_random_boxes_match_polygon_clipping(criterion):
+    rng = np.random.RandomState(0)
+    boxes = np.concatenate([rng.uniform(-3, 3, (40, 2)), rng.uniform(0.5, 4, (40, 2)),
+                            rng.uniform(-np.pi, np.pi, (40, 1))], axis=1).astype(np.float32)
+    query_boxes = np.concatenate([rng.uniform(-3, 3, (30, 2)), rng.uniform(0.5, 4, (30, 2)),
+                                  rng.uniform(-np.pi, np.pi, (30, 1))], axis=1).astype(np.float32)
+    overlap = rotate_iou_cpu_eval(boxes, query_boxes, criterion)
+    expected = reference_overlap(boxes.astype(np.float64), query_boxes.astype(np.float64), criterion)
+    assert (expected > 0).mean() > 0.3
+    assert np.allclose(overlap, expected, atol=1e-4)
+
+
+def test_empty_boxes():
+    boxes = np.zeros((0, 5), dtype=np.float32)
+    assert rotate_iou_cpu_eval(boxes, np.ones((3, 5), dtype=np.float32)).shape == (0, 3)
+    assert rotate_iou_cpu_eval(np.ones((3, 5), dtype=np.float32), boxes).shape == (3, 0)
+
+
+@pytest.mark.skipif(kitti_eval.rotate_iou_gpu_eval is None or not kitti_eval.cuda.is_available(),
+                    reason='numba.cuda is not available')
+def test_matches_gpu_eval():
+    rng = np.random.RandomState(1)
+    boxes = np.concatenate([rng.uniform(-10, 10, (200, 2)), rng.uniform(0.5, 4, (200, 2)),
+                            rng.uniform(-np.pi, np.pi, (200, 1))], axis=1).astype(np.float32)
+    for criterion in [-1, 0, 1]:
+        assert np.allclose(rotate_iou_cpu_eval(boxes, boxes[:150], criterion),
+                           kitti_eval.rotate_iou_gpu_eval(boxes, boxes[:150], criterion), atol=1e-5)
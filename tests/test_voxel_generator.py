@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from easydict import EasyDict
+
+from pcdet.datasets.processor.data_processor import DataProcessor, NumbaVoxelGenerator
+
+VOXEL_SIZE = [0.5, 0.5, 0.5]
+POINT_CLOUD_RANGE = [0, -5, -2, 10, 5, 2]
+
+
+def random_points(num_points, seed=0):
+    # a part of the points is out of the range
+    rng = np.random.RandomState(seed)
+    points = np.concatenate([
+        rng.uniform(-1, 11, (num_points, 1)), rng.uniform(-6, 6, (num_points, 1)),
+        rng.uniform(-2.5, 2.5, (num_points, 1)), rng.rand(num_points, 1)
+    ], axis=1).astype(np.float32)
+    # many points in few voxels to fill them up
+    points[:num_points // 4, 0:3] = np.round(points[:num_points // 4, 0:3] / 2) * 2 + 0.1
+    return points
+
+
+def reference_voxelization(points, voxel_size, point_cloud_range, max_points, max_voxels):
+    voxel_size = np.array(voxel_size, dtype=points.dtype)
+    point_cloud_range = np.array(point_cloud_range, dtype=points.dtype)
+    grid_size = np.round((point_cloud_range[3:6] - point_cloud_range[0:3]) / voxel_size).astype(np.int64)
+    coor_to_voxel, coordinates, voxel_points, point_to_voxel = {}, [], [], []
+    for point in points:
+        coor = np.floor((point[0:3] - point_cloud_range[0:3]) / voxel_size).astype(np.int64)
+        if np.any(coor < 0) or np.any(coor >= grid_size):
+            point_to_voxel.append(-1)
+            continue
+        key = tuple(coor[::-1])
+        if key not in coor_to_voxel:
+            if len(coordinates) >= max_voxels:
+                point_to_voxel.append(-1)
+                continue
+            coor_to_voxel[key] = len(coordinates)
+            coordinates.append(key)
+            voxel_points.append([])
+        voxel_idx = coor_to_voxel[key]
+        point_to_voxel.append(voxel_idx)
+        if len(voxel_points[voxel_idx]) < max_points:
+            voxel_points[voxel_idx].append(point)
+
+    voxels = np.zeros((len(coordinates), max_points, points.shape[1]), dtype=points.dtype)
+    for k, cur_points in enumerate(voxel_points):
+        voxels[k, :len(cur_points)] = cur_points
+    num_points = np.array([len(cur_points) for cur_points in voxel_points], dtype=np.int32)
+    coordinates = np.array(coordinates, dtype=np.int32).reshape(-1, 3)
+    return voxels, coordinates, num_points, np.array(point_to_voxel, dtype=np.int32)
+
+
+@pytest.mark.parametrize('max_points, max_voxels', [(32, 20000), (5, 20000), (5, 50), (1, 1)])
+def test_generate_matches_reference(max_points, max_voxels):
+    points = random_points(3000)
+    voxel_generator = NumbaVoxelGenerator(
+        vsize_xyz=VOXEL_SIZE, coors_range_xyz=POINT_CLOUD_RANGE, num_point_features=4,
+        max_num_points_per_voxel=max_points, max_num_voxels=max_voxels
+    )
+    voxels, coordinates, num_points = voxel_generator.generate(points)
+    expected_voxels, expected_coordinates, expected_num_points, _ = reference_voxelization(
+        points, VOXEL_SIZE, POINT_CLOUD_RANGE, max_points, max_voxels
+    )
+    assert coordinates.shape[0] == min(max_voxels, expected_coordinates.shape[0])
+    assert np.array_equal(coordinates, expected_coordinates)
+    assert np.array_equal(num_points, expected_num_points)
+    assert np.array_equal(voxels, expected_voxels)
+    assert coordinates.dtype == np.int32 and num_points.dtype == np.int32 and voxels.dtype == np.float32
+
+
+def test_generate_dynamic_matches_reference():
+    points = random_points(3000, seed=1)
+    voxel_generator = NumbaVoxelGenerator(
+        vsize_xyz=VOXEL_SIZE, coors_range_xyz=POINT_CLOUD_RANGE, num_point_features=4,
+        max_num_points_per_voxel=5, max_num_voxels=50
+    )
+    coordinates, num_points, point_to_voxel = voxel_generator.generate_dynamic(points)
+    # all the voxels and points are kept, whatever max_num_voxels and max_num_points_per_voxel
+    _, expected_coordinates, _, expected_point_to_voxel = reference_voxelization(
+        points, VOXEL_SIZE, POINT_CLOUD_RANGE, points.shape[0], points.shape[0]
+    )
+    assert coordinates.shape[0] > 50 and num_points.max() > 5
+    assert np.array_equal(coordinates, expected_coordinates)
+    assert np.array_equal(point_to_voxel, expected_point_to_voxel)
+    assert np.array_equal(num_points, np.bincount(expected_point_to_voxel[expected_point_to_voxel >= 0]))
+    assert (point_to_voxel == -1).any()
+
+
+def test_generate_without_points_in_range():
+    voxel_generator = NumbaVoxelGenerator(
+        vsize_xyz=VOXEL_SIZE, coors_range_xyz=POINT_CLOUD_RANGE, num_point_features=4,
+        max_num_points_per_voxel=5, max_num_voxels=50
+    )
+    points = np.full((10, 4), 100, dtype=np.float32)
+    voxels, coordinates, num_points = voxel_generator.generate(points)
+    assert voxels.shape == (0, 5, 4) and coordinates.shape == (0, 3) and num_points.shape == (0,)
+    coordinates, num_points, point_to_voxel = voxel_generator.generate_dynamic(points)
+    assert coordinates.shape == (0, 3) and num_points.shape == (0,) and (point_to_voxel == -1).all()
+
+
+@pytest.mark.parametrize('voxel_generator', ['numba', None, 'spconv'])
+def test_dynamic_voxelization_backend(voxel_generator):
+    processor_config = EasyDict({
+        'NAME': 'transform_points_to_voxels', 'VOXEL_SIZE': VOXEL_SIZE, 'MAX_POINTS_PER_VOXEL': 5,
+        'MAX_NUMBER_OF_VOXELS': {'train': 50, 'test': 50}, 'DYNAMIC_VOXELIZATION': True
+    })
+    if voxel_generator is not None:
+        processor_config.VOXEL_GENERATOR = voxel_generator
+    data_processor = DataProcessor(
+        [processor_config], point_cloud_range=np.array(POINT_CLOUD_RANGE, dtype=np.float32), training=False,
+        num_point_features=4
+    )
+    data_dict = {'points': random_points(100), 'use_lead_xyz': True}
+    if voxel_generator == 'spconv':
+        # an explicit spconv generator is not switched to numba silently
+        with pytest.raises(AssertionError):
+            data_processor.forward(data_dict)
+    else:
+        data_dict = data_processor.forward(data_dict)
+        assert data_dict['point_to_voxel'].shape[0] == 100
@@ -0,0 +1,103 @@
+"""
+Latency of the multi-class NMS of a whole batch versus the batch size: the per-sample loop of
+Detector3DTemplate.post_processing (one multi_classes_nms call per sample, one NMS per class) against
+model_nms_utils.batched_nms (all (sample, class) groups in chunks of at most BATCHED_NMS_MAX_BOXES boxes).
+
+    python benchmark_batched_nms.py --batch_sizes 1 2 4 8 --num_boxes 20000 --num_class 3
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+from easydict import EasyDict
+
+from pcdet.models.model_utils import model_nms_utils
+from pcdet.ops.iou3d_nms import iou3d_nms_utils
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 2, 4, 8], help='batch sizes to run')
+    parser.add_argument('--num_boxes', type=int, default=20000, help='predicted boxes per sample')
+    parser.add_argument('--num_class', type=int, default=3, help='number of classes')
+    parser.add_argument('--score_thresh', type=float, default=0.1, help='SCORE_THRESH of POST_PROCESSING')
+    parser.add_argument('--pre_maxsize', type=int, default=4096, help='NMS_PRE_MAXSIZE')
+    parser.add_argument('--post_maxsize', type=int, default=500, help='NMS_POST_MAXSIZE')
+    parser.add_argument('--max_boxes', type=int, default=16384, help='BATCHED_NMS_MAX_BOXES')
+    parser.add_argument('--extent', type=float, default=70.0, help='boxes are centered in [-extent, extent]^2')
+    parser.add_argument('--device', type=str, default=None, help='cpu or cuda, cuda if available by default')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each op')
+    return parser.parse_args()
+
+
+def random_predictions(batch_size, num_boxes, num_class, extent, device, seed=0):
+    rng = np.random.RandomState(seed)
+    boxes = np.concatenate([
+        rng.uniform(-extent, extent, (batch_size, num_boxes, 2)), rng.uniform(-1, 1, (batch_size, num_boxes, 1)),
+        rng.uniform(0.5, 5.0, (batch_size, num_boxes, 3)), rng.uniform(-np.pi, np.pi, (batch_size, num_boxes, 1))
+    ], axis=2)
+    cls_preds = rng.uniform(0, 1, (batch_size, num_boxes, num_class)) ** 4
+    return torch.from_numpy(boxes).float().to(device), torch.from_numpy(cls_preds).float().to(device)
+
+
+def per_sample_nms(batch_box_preds, batch_cls_preds, nms_config, score_thresh):
+    return [
+        model_nms_utils.multi_classes_nms(
+            cls_scores=batch_cls_preds[index], box_preds=batch_box_preds[index],
+            nms_config=nms_config, score_thresh=score_thresh
+        ) for index in range(batch_box_preds.shape[0])
+    ]
+
+
+def batched_nms(batch_box_preds, batch_cls_preds, nms_config, score_thresh):
+    batch_size, num_boxes, num_class = batch_cls_preds.shape
+    box_idx = torch.arange(batch_size * num_boxes, device=batch_box_preds.device).repeat_interleave(num_class)
+    labels = torch.arange(num_class, device=batch_box_preds.device).repeat(batch_size * num_boxes)
+    return model_nms_utils.batched_nms(
+        box_scores=batch_cls_preds.reshape(-1), box_preds=batch_box_preds.view(-1, batch_box_preds.shape[-1])[box_idx],
+        group_ids=(box_idx // num_boxes) * num_class + labels, num_groups=batch_size * num_class,
+        nms_config=nms_config, score_thresh=score_thresh
+    )
+
+
+def time_op(func, repeat, device):
+    func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = parse_config()
+    device = args.device
+    if device is None:
+        device = 'cuda' if iou3d_nms_utils.iou3d_nms_cuda is not None and torch.cuda.is_available() else 'cpu'
+    nms_config = EasyDict({
+        'NMS_TYPE': 'nms_gpu', 'NMS_THRESH': 0.1, 'NMS_PRE_MAXSIZE': args.pre_maxsize,
+        'NMS_POST_MAXSIZE': args.post_maxsize, 'BATCHED_NMS_MAX_BOXES': args.max_boxes
+    })
+
+    for batch_size in args.batch_sizes:
+        batch_box_preds, batch_cls_preds = random_predictions(
+            batch_size, args.num_boxes, args.num_class, args.extent, device
+        )
+        loop_time = time_op(
+            lambda: per_sample_nms(batch_box_preds, batch_cls_preds, nms_config, args.score_thresh), args.repeat, device
+        )
+        batched_time = time_op(
+            lambda: batched_nms(batch_box_preds, batch_cls_preds, nms_config, args.score_thresh), args.repeat, device
+        )
+        print('batch_size %2d (%s, %d groups): per-sample loop %8.2f ms, batched_nms %8.2f ms, speedup %.2fx' % (
+            batch_size, device, batch_size * args.num_class, loop_time * 1000, batched_time * 1000,
+            loop_time / batched_time
+        ))
+
+
+if __name__ == '__main__':
+    main()
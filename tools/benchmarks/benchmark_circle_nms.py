@@ -0,0 +1,115 @@
+"""
+Latency of the CenterHead NMS of the CenterPoint Waymo configs: the batched circle_nms_batch of all the samples,
+the per-sample numba _circle_nms and the per-sample rotated NMS (class_agnostic_nms with nms_gpu) on the same
+decoded boxes, on CPU and, when a GPU is available, on CUDA (the rotated NMS needs the compiled extension there).
+
+    python benchmark_circle_nms.py --batch_size 4 --num_boxes 500 4096
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+from easydict import EasyDict
+
+from pcdet.models.model_utils import centernet_utils, model_nms_utils
+from pcdet.ops.iou3d_nms import iou3d_nms_utils
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--batch_size', type=int, default=4, help='number of samples')
+    parser.add_argument('--num_boxes', type=int, nargs='+', default=[500, 4096],
+                        help='decoded boxes of each sample (MAX_OBJ_PER_SAMPLE)')
+    parser.add_argument('--min_radius', type=float, nargs='+', default=[4.0, 0.175, 0.85],
+                        help='MIN_RADIUS of circle_nms, see centerpoint_circle_nms.yaml')
+    parser.add_argument('--nms_thresh', type=float, default=0.7, help='NMS_THRESH of the rotated NMS')
+    parser.add_argument('--post_max_size', type=int, default=500, help='NMS_POST_MAXSIZE')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each NMS')
+    return parser.parse_args()
+
+
+def decoded_boxes(batch_size, num_boxes, seed=0):
+    # several peaks around each object, as decoded from the heatmap, in descending score order of each sample
+    rng = np.random.RandomState(seed)
+    num_objects = num_boxes // 5
+    box_list, score_list = [], []
+    for _ in range(batch_size):
+        centers = np.repeat(rng.uniform(-75, 75, (num_objects, 2)), 5, axis=0) + rng.randn(num_objects * 5, 2) * 0.8
+        dims = np.repeat(rng.uniform(0.5, 5.0, (num_objects, 3)), 5, axis=0)
+        boxes = np.concatenate([centers, rng.uniform(-1, 1, (num_objects * 5, 1)), dims,
+                                rng.uniform(-np.pi, np.pi, (num_objects * 5, 1))], axis=1)
+        box_list.append(boxes)
+        score_list.append(-np.sort(-rng.rand(num_objects * 5)))
+    batch_idx = np.repeat(np.arange(batch_size), num_objects * 5)
+    return torch.from_numpy(np.concatenate(box_list)).float(), torch.from_numpy(np.concatenate(score_list)).float(), \
+        torch.from_numpy(batch_idx)
+
+
+def time_op(func, repeat, device):
+    func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+def per_sample_circle_nms(boxes, scores, batch_idx, batch_size, min_radius, post_max_size):
+    keep = []
+    for k in range(batch_size):
+        sample_idx = (batch_idx == k).nonzero().view(-1)
+        dets = torch.cat([boxes[sample_idx, 0:2], scores[sample_idx, None]], dim=1)
+        keep.append(sample_idx[centernet_utils._circle_nms(dets, min_radius, post_max_size=post_max_size)])
+    return torch.cat(keep, dim=0)
+
+
+def per_sample_rotated_nms(boxes, scores, batch_idx, batch_size, nms_config):
+    for k in range(batch_size):
+        sample_idx = (batch_idx == k).nonzero().view(-1)
+        model_nms_utils.class_agnostic_nms(scores[sample_idx], boxes[sample_idx], nms_config)
+
+
+def main():
+    args = parse_config()
+    devices = ['cpu'] + (['cuda'] if torch.cuda.is_available() else [])
+    nms_config = EasyDict({
+        'NMS_TYPE': 'nms_gpu', 'NMS_THRESH': args.nms_thresh, 'NMS_PRE_MAXSIZE': 4096,
+        'NMS_POST_MAXSIZE': args.post_max_size
+    })
+
+    for num_boxes in args.num_boxes:
+        for device in devices:
+            boxes, scores, batch_idx = [x.to(device) for x in decoded_boxes(args.batch_size, num_boxes)]
+            for min_radius in args.min_radius:
+                keep = centernet_utils.circle_nms_batch(
+                    boxes[:, 0:2], scores, batch_idx, min_radius, post_max_size=args.post_max_size
+                )
+                expected = per_sample_circle_nms(
+                    boxes, scores, batch_idx, args.batch_size, min_radius, args.post_max_size
+                )
+                batched_time = time_op(lambda: centernet_utils.circle_nms_batch(
+                    boxes[:, 0:2], scores, batch_idx, min_radius, post_max_size=args.post_max_size
+                ), args.repeat, device)
+                numba_time = time_op(lambda: per_sample_circle_nms(
+                    boxes, scores, batch_idx, args.batch_size, min_radius, args.post_max_size
+                ), args.repeat, device)
+                print('%-4s B=%d %5d boxes/sample MIN_RADIUS %5.3f: circle_nms_batch %7.2f ms, per-sample '
+                      '_circle_nms %7.2f ms, kept %d, same: %s' % (
+                          device, args.batch_size, num_boxes, min_radius, batched_time * 1000, numba_time * 1000,
+                          keep.shape[0], torch.equal(keep, expected)))
+            if device == 'cuda' and iou3d_nms_utils.iou3d_nms_cuda is None:
+                continue
+            rotated_time = time_op(
+                lambda: per_sample_rotated_nms(boxes, scores, batch_idx, args.batch_size, nms_config),
+                args.repeat, device
+            )
+            print('%-4s B=%d %5d boxes/sample: per-sample rotated NMS (NMS_THRESH %.2f) %7.2f ms' % (
+                device, args.batch_size, num_boxes, args.nms_thresh, rotated_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Time of collate_batch followed by load_data_to_gpu against collate_batch_preallocated(to_torch=True), whose tensors
+are pinned as by the DataLoader (pin_memory=True) and copied with one asynchronous transfer per key. The samples
+have the keys and sizes of a multimodal KITTI sample. Without CUDA only the collate is timed.
+
+    python benchmark_collate_batch.py --batch_size 2 4 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from pcdet.datasets.dataset import DatasetTemplate
+from pcdet.models import load_data_to_gpu
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--batch_size', type=int, nargs='+', default=[2, 4, 8, 16, 32], help='samples of the batch')
+    parser.add_argument('--num_points', type=int, default=20000, help='points of each sample')
+    parser.add_argument('--num_voxels', type=int, default=16000, help='voxels of each sample')
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs of each collate')
+    return parser.parse_args()
+
+
+def random_sample(rng, k, num_points, num_voxels):
+    h, w = rng.randint(370, 376), rng.randint(1224, 1243)
+    num_boxes = rng.randint(5, 30)
+    return {
+        'frame_id': '%06d' % k,
+        'calib': None,
+        'points': rng.randn(num_points, 4).astype(np.float32),
+        'voxels': rng.randn(num_voxels, 5, 4).astype(np.float32),
+        'voxel_coords': rng.randint(0, 1408, (num_voxels, 3)).astype(np.int32),
+        'voxel_num_points': rng.randint(1, 6, num_voxels).astype(np.int32),
+        'gt_boxes': rng.randn(num_boxes, 8).astype(np.float32),
+        'images': rng.rand(h, w, 3).astype(np.float32),
+        'image_shape': np.array([h, w], dtype=np.int32),
+        'use_lead_xyz': True,
+    }
+
+
+def pin_batch(batch_dict):
+    # what the DataLoader does with pin_memory=True
+    return {key: val.pin_memory() if isinstance(val, torch.Tensor) else val for key, val in batch_dict.items()}
+
+
+def time_op(func, repeat, device):
+    func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = parse_config()
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    rng = np.random.RandomState(0)
+    for batch_size in args.batch_size:
+        batch_list = [random_sample(rng, k, args.num_points, args.num_voxels) for k in range(batch_size)]
+        collate_time = time_op(lambda: DatasetTemplate.collate_batch(batch_list), args.repeat, device)
+        preallocated_time = time_op(
+            lambda: DatasetTemplate.collate_batch_preallocated(batch_list, to_torch=True), args.repeat, device
+        )
+        print('batch %2d: collate_batch %8.2f ms, collate_batch_preallocated %8.2f ms' % (
+            batch_size, collate_time * 1000, preallocated_time * 1000))
+        if device != 'cuda':
+            continue
+
+        transfer_time = time_op(
+            lambda: load_data_to_gpu(DatasetTemplate.collate_batch(batch_list)), args.repeat, device
+        )
+        pinned_transfer_time = time_op(
+            lambda: load_data_to_gpu(pin_batch(DatasetTemplate.collate_batch_preallocated(batch_list, to_torch=True))),
+            args.repeat, device
+        )
+        print('batch %2d: collate_batch + load_data_to_gpu %8.2f ms, collate_batch_preallocated + pin + '
+              'load_data_to_gpu %8.2f ms' % (batch_size, transfer_time * 1000, pinned_transfer_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
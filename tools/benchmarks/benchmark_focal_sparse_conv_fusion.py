@@ -0,0 +1,135 @@
+"""
+Per-layer latency of the image fusion of FocalSparseConv (construct_multimodal_features) with the batched on-device
+projection of the voxels, against the former per-sample projection through the numpy Calibration, which copied
+the voxels of every sample to the host and back. Both gather the image features with gather_fused_image_features.
+
+    python benchmark_focal_sparse_conv_fusion.py --batch_size 2 4 8 --num_voxels 16000 32000
+"""
+import argparse
+import time
+from functools import partial
+
+import numpy as np
+import spconv.pytorch as spconv
+import torch
+import torch.nn as nn
+
+from pcdet.models.backbones_3d.focal_sparse_conv.focal_sparse_conv import FocalSparseConv, \
+    gather_fused_image_features
+from pcdet.utils import calibration_kitti, common_utils
+
+
+# calibration of the KITTI training frame 000000
+KITTI_CALIB = {
+    'P2': np.array([[7.215377e+02, 0, 6.095593e+02, 4.485728e+01],
+                    [0, 7.215377e+02, 1.728540e+02, 2.163791e-01],
+                    [0, 0, 1, 2.745884e-03]], dtype=np.float32),
+    'R0': np.array([[9.999239e-01, 9.837760e-03, -7.445048e-03],
+                    [-9.869795e-03, 9.999421e-01, -4.278459e-03],
+                    [7.402527e-03, 4.351614e-03, 9.999631e-01]], dtype=np.float32),
+    'Tr_velo2cam': np.array([[7.533745e-03, -9.999714e-01, -6.166020e-04, -4.069766e-03],
+                             [1.480249e-02, 7.280733e-04, -9.998902e-01, -7.631618e-02],
+                             [9.998621e-01, 7.523790e-03, 1.480755e-02, -2.717806e-01]], dtype=np.float32),
+}
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--batch_size', type=int, nargs='+', default=[2, 4, 8], help='samples of the batch')
+    parser.add_argument('--num_voxels', type=int, nargs='+', default=[16000, 32000], help='voxels of each sample')
+    parser.add_argument('--image_channel', type=int, default=16, help='channels of the image features')
+    parser.add_argument('--image_size', type=int, nargs=2, default=[375, 1242], help='height and width of the images')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs of each fusion')
+    return parser.parse_args()
+
+
+def random_batch(batch_size, num_voxels, image_channel, image_size, device, seed=0):
+    rng = np.random.RandomState(seed)
+    num_total = batch_size * num_voxels
+    indices = np.stack([
+        np.repeat(np.arange(batch_size), num_voxels), rng.randint(0, 40, num_total),
+        rng.randint(0, 1600, num_total), rng.randint(0, 1408, num_total)
+    ], axis=1)
+    x = spconv.SparseConvTensor(
+        features=torch.randn(num_total, 16, device=device), indices=torch.from_numpy(indices).int().to(device),
+        spatial_shape=[41, 1600, 1408], batch_size=batch_size
+    )
+    h, w = image_size
+    x_rgb = torch.randn(batch_size, image_channel, h, w, device=device)
+    batch_dict = {
+        'batch_size': batch_size, 'calib': [calibration_kitti.Calibration(KITTI_CALIB) for _ in range(batch_size)],
+        'images': torch.zeros(batch_size, 3, h, w, device=device),
+        'noise_scale': torch.from_numpy(rng.uniform(0.95, 1.05, batch_size)).float().to(device),
+        'noise_rot': torch.from_numpy(rng.uniform(-np.pi / 4, np.pi / 4, batch_size)).float().to(device),
+        'flip_x': torch.from_numpy(rng.rand(batch_size) < 0.5).to(device),
+    }
+    return x, x_rgb, batch_dict
+
+
+def per_sample_multimodal_features(module, x, x_rgb, batch_dict):
+    # construct_multimodal_features with the projection of every sample through the numpy Calibration
+    batch_index = x.indices[:, 0].long()
+    voxels_3d = x.indices[:, 1:] * module.voxel_stride * module.voxel_size + module.point_cloud_range[:3]
+    h, w = batch_dict['images'].shape[2:]
+    if not x_rgb.shape == batch_dict['images'].shape:
+        x_rgb = nn.functional.interpolate(x_rgb, (h, w), mode='bilinear')
+
+    voxels_2d = voxels_3d.new_zeros((voxels_3d.shape[0], 2), dtype=torch.long)
+    for b in range(batch_dict['batch_size']):
+        voxels_3d_batch = voxels_3d[batch_index == b]
+        voxels_3d_batch[:, :3] /= batch_dict['noise_scale'][b]
+        voxels_3d_batch = common_utils.rotate_points_along_z(
+            voxels_3d_batch[:, module.inv_idx].unsqueeze(0), -batch_dict['noise_rot'][b].unsqueeze(0)
+        )[0, :, module.inv_idx]
+        voxels_3d_batch[:, 1] *= -1 if batch_dict['flip_x'][b] else 1
+        voxels_2d_batch, _ = batch_dict['calib'][b].lidar_to_img(voxels_3d_batch[:, module.inv_idx].cpu().numpy())
+        voxels_2d[batch_index == b] = torch.Tensor(voxels_2d_batch).to(x_rgb.device).long()
+
+    image_features = gather_fused_image_features(x_rgb, batch_index, voxels_2d, module.pixel_offsets)
+    return torch.cat([image_features, x.features], dim=1)
+
+
+def time_op(func, repeat, device):
+    func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = parse_config()
+    if not torch.cuda.is_available():
+        # FocalSparseConv keeps its constant tensors on the GPU
+        print('FocalSparseConv needs CUDA, skipped')
+        return
+
+    module = FocalSparseConv(16, 16, voxel_stride=1, norm_fn=partial(nn.BatchNorm1d, eps=1e-3, momentum=0.01),
+                             indice_key='spconv_focal_multimodal', image_channel=args.image_channel, use_img=True)
+    module = module.cuda().eval()
+    with torch.no_grad():
+        for batch_size in args.batch_size:
+            for num_voxels in args.num_voxels:
+                x, x_rgb, batch_dict = random_batch(batch_size, num_voxels, args.image_channel, args.image_size, 'cuda')
+                per_sample_time = time_op(
+                    lambda: per_sample_multimodal_features(module, x, x_rgb, batch_dict), args.repeat, 'cuda'
+                )
+                batched_time = time_op(
+                    lambda: module.construct_multimodal_features(x, x_rgb, batch_dict), args.repeat, 'cuda'
+                )
+                # the voxels next to a pixel border may be rounded to the neighbouring pixel
+                same = torch.isclose(
+                    per_sample_multimodal_features(module, x, x_rgb, batch_dict),
+                    module.construct_multimodal_features(x, x_rgb, batch_dict), atol=1e-4
+                ).all(dim=1).float().mean().item()
+                print('batch %2d, %6d voxels per sample: per-sample projection %8.2f ms, batched projection '
+                      '%8.2f ms, voxels with the same features: %.2f%%' % (
+                          batch_size, num_voxels, per_sample_time * 1000, batched_time * 1000, same * 100))
+
+
+if __name__ == '__main__':
+    main()
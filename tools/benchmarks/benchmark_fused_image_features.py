@@ -0,0 +1,138 @@
+"""
+Latency and peak memory of the image features fused to the voxels by FocalSparseConv: gather_fused_image_features
+(one gather of the 9 pixels of all voxels and a row-wise cosine) against the former per-sample loop over the 9
+pixel offsets, whose cosine built an (N, N) matrix to take its diagonal. The peak memory is the CUDA peak on GPU
+and the peak RSS growth of a forked process on CPU.
+
+    python benchmark_fused_image_features.py --batch_size 2 --num_voxels 4000 16000
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import torch
+
+from pcdet.models.backbones_3d.focal_sparse_conv.focal_sparse_conv import FUSION_PIXEL_OFFSETS, \
+    gather_fused_image_features
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--batch_size', type=int, default=2, help='samples of the batch')
+    parser.add_argument('--num_voxels', type=int, nargs='+', default=[4000, 16000], help='voxels of each sample')
+    parser.add_argument('--image_channel', type=int, default=16, help='channels of the image features')
+    parser.add_argument('--image_size', type=int, nargs=2, default=[375, 1242], help='height and width of the images')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each gather')
+    return parser.parse_args()
+
+
+def random_voxels(batch_size, num_voxels, image_channel, image_size, device, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    h, w = image_size
+    x_rgb = torch.randn(batch_size, image_channel, h, w, generator=generator)
+    # some of the voxels are projected outside of the image
+    voxels_2d = torch.stack([
+        torch.randint(-20, w + 20, (batch_size * num_voxels,), generator=generator),
+        torch.randint(-20, h + 20, (batch_size * num_voxels,), generator=generator)
+    ], dim=1)
+    batch_index = torch.arange(batch_size).repeat_interleave(num_voxels)
+    return x_rgb.to(device), batch_index.to(device), voxels_2d.to(device)
+
+
+def diag_calculate_cosine(tensorA, tensorB):
+    dot = torch.diag(torch.matmul(tensorA, tensorB.t()))
+    norm_A = torch.norm(tensorA, dim=1, keepdim=True) + 1e-6
+    norm_B = torch.norm(tensorB, dim=1, keepdim=True) + 1e-6
+    norm = torch.diag(norm_A * norm_B.t())
+    return torch.clamp(dot / norm, min=-1.0, max=1.0)
+
+
+def per_sample_image_features(x_rgb, batch_index, voxels_2d):
+    # the former fusion loop of construct_multimodal_features, with its in-place accumulated pixel offsets
+    h, w = x_rgb.shape[2:]
+    image_features = []
+    for b in range(x_rgb.shape[0]):
+        x_rgb_batch = x_rgb[b]
+        voxels_2d_tmp = voxels_2d[batch_index == b].clone()
+        kernel_point_features = []
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                voxels_2d_int = voxels_2d_tmp
+                voxels_2d_int[:, 1] += i
+                voxels_2d_int[:, 0] += j
+                filter_idx = (0 <= voxels_2d_int[:, 1]) * (voxels_2d_int[:, 1] < h) * \
+                    (0 <= voxels_2d_int[:, 0]) * (voxels_2d_int[:, 0] < w)
+                voxels_2d_int = voxels_2d_int[filter_idx]
+                image_features_batch = x_rgb.new_zeros((voxels_2d_tmp.shape[0], x_rgb_batch.shape[0]))
+                image_features_batch[filter_idx] = \
+                    x_rgb_batch[:, voxels_2d_int[:, 1], voxels_2d_int[:, 0]].permute(1, 0)
+                kernel_point_features.append(image_features_batch)
+
+        for i in range(9):
+            similarity = diag_calculate_cosine(kernel_point_features[i], kernel_point_features[4])
+            kernel_point_features[i] = kernel_point_features[i] * similarity.unsqueeze(1)
+        image_features.append(torch.mean(torch.stack(kernel_point_features), dim=0))
+    return torch.cat(image_features, dim=0)
+
+
+def time_op(func, repeat, device):
+    func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+def _rss_growth(func, queue):
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func()
+    queue.put((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) / 2 ** 10)
+
+
+def peak_memory(func, device):
+    if device == 'cuda':
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+        base = torch.cuda.memory_allocated()
+        func()
+        torch.cuda.synchronize()
+        return (torch.cuda.max_memory_allocated() - base) / 2 ** 20
+    # the peak RSS of a process never goes down, so each run is measured in its own forked process
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_rss_growth, args=(func, queue))
+    process.start()
+    memory = queue.get()
+    process.join()
+    return memory
+
+
+def main():
+    args = parse_config()
+    devices = ['cpu'] + (['cuda'] if torch.cuda.is_available() else [])
+    with torch.no_grad():
+        for num_voxels in args.num_voxels:
+            for device in devices:
+                x_rgb, batch_index, voxels_2d = random_voxels(
+                    args.batch_size, num_voxels, args.image_channel, args.image_size, device
+                )
+                pixel_offsets = torch.tensor(FUSION_PIXEL_OFFSETS, device=device).long()
+                loop_func = lambda: per_sample_image_features(x_rgb, batch_index, voxels_2d)
+                gather_func = lambda: gather_fused_image_features(x_rgb, batch_index, voxels_2d, pixel_offsets)
+                loop_memory, gather_memory = peak_memory(loop_func, device), peak_memory(gather_func, device)
+                loop_time = time_op(loop_func, args.repeat, device)
+                gather_time = time_op(gather_func, args.repeat, device)
+                same = torch.allclose(loop_func(), gather_func(), atol=1e-5)
+                print('%-4s batch %d, %6d voxels per sample: 9-offset loop %8.2f ms %8.1f MB, single gather %8.2f ms '
+                      '%8.1f MB, same features: %s' % (
+                          device, args.batch_size, num_voxels, loop_time * 1000, loop_memory,
+                          gather_time * 1000, gather_memory, same))
+
+
+if __name__ == '__main__':
+    main()
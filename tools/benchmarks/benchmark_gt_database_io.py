@@ -0,0 +1,94 @@
+"""
+Read time of gt_sampling objects from a per-object database (one .bin file per object) against the packed
+database (one .npy file read through np.memmap, USE_PACKED_DB). A synthetic database is written to --data_path,
+packed with pack_gt_database() and both layouts are read by DataBaseSampler.load_sampled_points().
+
+    python benchmark_gt_database_io.py --num_objects 20000 --sample_num 35
+
+The page cache is warm after the first reads, drop it (echo 3 > /proc/sys/vm/drop_caches) to time cold reads.
+"""
+import argparse
+import pickle
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from easydict import EasyDict
+
+from pcdet.datasets.augmentor.database_sampler import DataBaseSampler, pack_gt_database
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--data_path', type=str, default=None, help='where the databases are written, a temp dir by default')
+    parser.add_argument('--num_objects', type=int, default=20000, help='objects in the database')
+    parser.add_argument('--max_points', type=int, default=1000, help='points of an object are in [5, max_points)')
+    parser.add_argument('--num_point_features', type=int, default=4, help='NUM_POINT_FEATURES')
+    parser.add_argument('--sample_num', type=int, default=35, help='objects read by each call')
+    parser.add_argument('--repeat', type=int, default=1000, help='timed calls of each layout')
+    return parser.parse_args()
+
+
+def create_database(root_path, num_objects, max_points, num_point_features):
+    rng = np.random.RandomState(0)
+    database_path = root_path / 'gt_database'
+    database_path.mkdir(parents=True, exist_ok=True)
+    db_infos = {'Car': []}
+    for k in range(num_objects):
+        gt_points = rng.randn(rng.randint(5, max_points), num_point_features).astype(np.float32)
+        filepath = database_path / ('%06d_Car_0.bin' % k)
+        with open(filepath, 'w') as f:
+            gt_points.tofile(f)
+        db_infos['Car'].append({
+            'name': 'Car', 'image_idx': '%06d' % k, 'gt_idx': 0, 'num_points_in_gt': gt_points.shape[0],
+            'path': str(filepath.relative_to(root_path))
+        })
+    with open(root_path / 'dbinfos.pkl', 'wb') as f:
+        pickle.dump(db_infos, f)
+
+
+def build_sampler(root_path, num_point_features, use_packed_db):
+    sampler_cfg = EasyDict({
+        'DB_INFO_PATH': ['dbinfos.pkl'], 'DB_DATA_PATH': ['gt_database_global.npy'], 'USE_PACKED_DB': use_packed_db,
+        'PREPARE': {}, 'SAMPLE_GROUPS': [], 'NUM_POINT_FEATURES': num_point_features
+    })
+    return DataBaseSampler(root_path=root_path, sampler_cfg=sampler_cfg, class_names=['Car'])
+
+
+def time_reads(sampler, sample_num, repeat):
+    rng = np.random.RandomState(1)
+    db_infos = sampler.db_infos['Car']
+    sampled_dicts = [[db_infos[i] for i in rng.choice(len(db_infos), sample_num)] for _ in range(repeat)]
+    num_points = 0
+    start = time.perf_counter()
+    for sampled_dict in sampled_dicts:
+        obj_points, _ = sampler.load_sampled_points(sampled_dict)
+        num_points += obj_points.shape[0]
+    return (time.perf_counter() - start) / repeat, num_points / repeat
+
+
+def main():
+    args = parse_config()
+    root_path = Path(args.data_path) if args.data_path is not None else Path(tempfile.mkdtemp())
+    try:
+        create_database(root_path, args.num_objects, args.max_points, args.num_point_features)
+        per_file_sampler = build_sampler(root_path, args.num_point_features, use_packed_db=False)
+        per_file_time, num_points = time_reads(per_file_sampler, args.sample_num, args.repeat)
+
+        pack_gt_database(root_path, 'dbinfos.pkl', 'gt_database_global.npy', args.num_point_features)
+        packed_sampler = build_sampler(root_path, args.num_point_features, use_packed_db=True)
+        packed_time, _ = time_reads(packed_sampler, args.sample_num, args.repeat)
+
+        print('%d objects, %d objects (%.0f points) per call' % (args.num_objects, args.sample_num, num_points))
+        print('per-file .bin: %.3f ms per call, packed memmap: %.3f ms per call, speedup %.2fx' % (
+            per_file_time * 1000, packed_time * 1000, per_file_time / packed_time
+        ))
+    finally:
+        if args.data_path is None:
+            shutil.rmtree(root_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Throughput of the iou3d_nms ops on CPU tensors (pure-PyTorch backend) and, when the extension is compiled
+and a GPU is available, of the CUDA kernels on the same boxes.
+
+    python benchmark_iou3d_nms.py --num_boxes 1000 10000 50000
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from pcdet.ops.iou3d_nms import iou3d_nms_utils
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--num_boxes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='number of boxes of each run')
+    parser.add_argument('--num_gt_boxes', type=int, default=100, help='boxes_b of boxes_iou_bev')
+    parser.add_argument('--extent', type=float, default=75.0, help='boxes are centered in [-extent, extent]^2')
+    parser.add_argument('--nms_thresh', type=float, default=0.7, help='threshold of nms_gpu')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each op')
+    return parser.parse_args()
+
+
+def random_boxes(num_boxes, extent, seed=0):
+    rng = np.random.RandomState(seed)
+    boxes = np.concatenate([
+        rng.uniform(-extent, extent, (num_boxes, 2)), rng.uniform(-1, 1, (num_boxes, 1)),
+        rng.uniform(0.5, 5.0, (num_boxes, 3)), rng.uniform(-np.pi, np.pi, (num_boxes, 1))
+    ], axis=1)
+    return torch.from_numpy(boxes).float()
+
+
+def time_op(func, repeat, device):
+    func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = parse_config()
+    devices = ['cpu']
+    if iou3d_nms_utils.iou3d_nms_cuda is not None and torch.cuda.is_available():
+        devices.append('cuda')
+
+    for num_boxes in args.num_boxes:
+        for device in devices:
+            boxes = random_boxes(num_boxes, args.extent, seed=0).to(device)
+            gt_boxes = random_boxes(args.num_gt_boxes, args.extent, seed=1).to(device)
+            scores = torch.rand(num_boxes, device=device)
+
+            iou_time = time_op(lambda: iou3d_nms_utils.boxes_iou_bev(boxes, gt_boxes), args.repeat, device)
+            iou3d_time = time_op(lambda: iou3d_nms_utils.boxes_iou3d_gpu(boxes, gt_boxes), args.repeat, device)
+            nms_time = time_op(lambda: iou3d_nms_utils.nms_gpu(boxes, scores, args.nms_thresh), args.repeat, device)
+            print('%6d boxes %-4s: boxes_iou_bev (x%d) %8.2f ms (%.2e pairs/s), boxes_iou3d_gpu %8.2f ms, '
+                  'nms_gpu %8.2f ms' % (
+                      num_boxes, device, args.num_gt_boxes, iou_time * 1000,
+                      num_boxes * args.num_gt_boxes / iou_time, iou3d_time * 1000, nms_time * 1000
+                  ))
+
+
+if __name__ == '__main__':
+    main()
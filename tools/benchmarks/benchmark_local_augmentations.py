@@ -0,0 +1,122 @@
+"""
+Time of the batched local augmentations of augmentor_utils against the per-box loops they replace, with the same
+random seed, on a lidar-like scene with points inside each box.
+
+    python benchmark_local_augmentations.py --num_points 120000 --num_boxes 10 40
+"""
+import argparse
+import time
+
+import numpy as np
+
+from pcdet.datasets.augmentor import augmentor_utils
+from pcdet.utils import common_utils
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--num_points', type=int, default=120000, help='points of the scene')
+    parser.add_argument('--num_boxes', type=int, nargs='+', default=[10, 40], help='gt boxes of the scene')
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs of each augmentation')
+    return parser.parse_args()
+
+
+def lidar_like_scene(num_points, num_boxes, seed=0):
+    rng = np.random.RandomState(seed)
+    dist, angle = rng.exponential(15, num_points) + 2, rng.uniform(-np.pi / 4, np.pi / 4, num_points)
+    points = np.stack([dist * np.cos(angle), dist * np.sin(angle), rng.uniform(-3, 1, num_points),
+                       rng.rand(num_points)], axis=1)
+    boxes = np.concatenate([
+        rng.uniform(5, 60, (num_boxes, 1)), rng.uniform(-30, 30, (num_boxes, 1)), rng.uniform(-2, 0, (num_boxes, 1)),
+        rng.uniform(1, 5, (num_boxes, 3)), rng.uniform(-np.pi, np.pi, (num_boxes, 1))
+    ], axis=1)
+    box_points = []
+    for box in boxes:
+        local_points = (rng.rand(300, 3) - 0.5) * box[3:6]
+        cosa, sina = np.cos(box[6]), np.sin(box[6])
+        box_points.append(np.stack([
+            local_points[:, 0] * cosa - local_points[:, 1] * sina + box[0],
+            local_points[:, 0] * sina + local_points[:, 1] * cosa + box[1],
+            local_points[:, 2] + box[2], rng.rand(300)
+        ], axis=1))
+    return boxes.astype(np.float32), np.concatenate([points] + box_points, axis=0).astype(np.float32)
+
+
+def loop_local_translation(gt_boxes, points, offset_range, axis=0):
+    for idx, box in enumerate(gt_boxes):
+        offset = np.random.uniform(offset_range[0], offset_range[1])
+        _, mask = augmentor_utils.get_points_in_box(points, box)
+        points[mask, axis] += offset
+        gt_boxes[idx, axis] += offset
+    return gt_boxes, points
+
+
+def loop_local_scaling(gt_boxes, points, scale_range):
+    for idx, box in enumerate(gt_boxes):
+        noise_scale = np.random.uniform(scale_range[0], scale_range[1])
+        _, mask = augmentor_utils.get_points_in_box(points, box)
+        points[mask, 0:3] = (points[mask, 0:3] - box[0:3]) * noise_scale + box[0:3]
+        gt_boxes[idx, 3:6] *= noise_scale
+    return gt_boxes, points
+
+
+def loop_local_rotation(gt_boxes, points, rot_range):
+    for idx, box in enumerate(gt_boxes):
+        noise_rotation = np.random.uniform(rot_range[0], rot_range[1])
+        _, mask = augmentor_utils.get_points_in_box(points, box)
+        centroid = box[0:3].copy()
+        points[mask, 0:3] -= centroid
+        points[mask, :] = common_utils.rotate_points_along_z(points[np.newaxis, mask, :], np.array([noise_rotation]))[0]
+        points[mask, 0:3] += centroid
+        gt_boxes[idx, 6] += noise_rotation
+    return gt_boxes, points
+
+
+def loop_local_frustum_dropout_top(gt_boxes, points, intensity_range):
+    for idx, box in enumerate(gt_boxes):
+        intensity = np.random.uniform(intensity_range[0], intensity_range[1])
+        _, mask = augmentor_utils.get_points_in_box(points, box)
+        threshold = (box[2] + box[5] / 2) - intensity * box[5]
+        points = points[np.logical_not(np.logical_and(mask, points[:, 2] >= threshold))]
+    return gt_boxes, points
+
+
+AUGMENTATIONS = [
+    ('random_local_translation_along_x', [-1, 1], loop_local_translation),
+    ('local_scaling', [0.8, 1.2], loop_local_scaling),
+    ('local_rotation', [-0.8, 0.8], loop_local_rotation),
+    ('local_frustum_dropout_top', [0, 0.4], loop_local_frustum_dropout_top),
+]
+
+
+def time_augmentation(func, gt_boxes, points, value_range, repeat):
+    total_time = 0
+    for k in range(repeat + 1):
+        cur_boxes, cur_points = gt_boxes.copy(), points.copy()
+        np.random.seed(k)
+        start = time.perf_counter()
+        output = func(cur_boxes, cur_points, value_range)
+        if k > 0:
+            total_time += time.perf_counter() - start
+    return total_time / repeat, output
+
+
+def main():
+    args = parse_config()
+    for num_boxes in args.num_boxes:
+        gt_boxes, points = lidar_like_scene(args.num_points, num_boxes)
+        for name, value_range, loop_func in AUGMENTATIONS:
+            batched_time, (batched_boxes, batched_points) = time_augmentation(
+                getattr(augmentor_utils, name), gt_boxes, points, value_range, args.repeat
+            )
+            loop_time, (loop_boxes, loop_points) = time_augmentation(
+                loop_func, gt_boxes, points, value_range, args.repeat
+            )
+            same = batched_points.shape == loop_points.shape and np.allclose(batched_points, loop_points, atol=1e-4) \
+                and np.allclose(batched_boxes, loop_boxes, atol=1e-6)
+            print('%6d points %3d boxes %-33s: per-box loop %8.2f ms, batched %8.2f ms, same: %s' % (
+                points.shape[0], num_boxes, name, loop_time * 1000, batched_time * 1000, same))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Time of the pointnet2_stack ops of the PV-RCNN keypoint and set abstraction path (farthest point sampling of the
+keypoints, ball query, grouping and three-nn interpolation) on CPU tensors (pointnet2_cpu backend) and, when the
+extension is compiled and a GPU is available, with the CUDA kernels on the same points.
+
+    python benchmark_pointnet2_ops.py --num_points 16384 --num_keypoints 2048 4096
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from pcdet.ops.pointnet2.pointnet2_stack import pointnet2_utils
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--batch_size', type=int, default=2, help='number of point clouds')
+    parser.add_argument('--num_points', type=int, default=16384, help='points of each point cloud')
+    parser.add_argument('--num_keypoints', type=int, nargs='+', default=[2048, 4096], help='sampled keypoints')
+    parser.add_argument('--radii', type=float, nargs='+', default=[0.4, 0.8, 1.6, 2.4, 4.8], help='ball radii')
+    parser.add_argument('--nsamples', type=int, nargs='+', default=[16, 16, 32, 32, 32], help='nsample of each radius')
+    parser.add_argument('--num_channels', type=int, default=128, help='channels of the grouped features')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each op')
+    return parser.parse_args()
+
+
+def lidar_like_points(num_points, seed=0):
+    # denser near the sensor, as the lidar scans
+    rng = np.random.RandomState(seed)
+    dist = rng.exponential(15, num_points) + 2
+    angle = rng.uniform(-np.pi / 4, np.pi / 4, num_points)
+    xyz = np.stack([dist * np.cos(angle), dist * np.sin(angle), rng.uniform(-2, 1, num_points)], axis=1)
+    return torch.from_numpy(xyz.astype(np.float32))
+
+
+def time_op(func, repeat, device):
+    func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = parse_config()
+    assert len(args.radii) == len(args.nsamples)
+    devices = ['cpu']
+    if pointnet2_utils.pointnet2 is not None and torch.cuda.is_available():
+        devices.append('cuda')
+
+    for device in devices:
+        xyz = torch.cat([lidar_like_points(args.num_points, seed=k) for k in range(args.batch_size)]).to(device)
+        xyz_batch_cnt = torch.tensor([args.num_points] * args.batch_size).int().to(device)
+        features = torch.randn(xyz.shape[0], args.num_channels, device=device)
+        for num_keypoints in args.num_keypoints:
+            fps_time = time_op(
+                lambda: pointnet2_utils.stack_farthest_point_sample(xyz, xyz_batch_cnt, num_keypoints),
+                args.repeat, device
+            )
+            keypoint_idx = pointnet2_utils.stack_farthest_point_sample(xyz, xyz_batch_cnt, num_keypoints).long()
+            keypoints = xyz[keypoint_idx].contiguous()
+            keypoints_batch_cnt = torch.tensor([num_keypoints] * args.batch_size).int().to(device)
+            print('%s B=%d N=%d K=%d: farthest_point_sample %8.2f ms' % (
+                device, args.batch_size, args.num_points, num_keypoints, fps_time * 1000))
+
+            for radius, nsample in zip(args.radii, args.nsamples):
+                ball_query_time = time_op(
+                    lambda: pointnet2_utils.ball_query(radius, nsample, xyz, xyz_batch_cnt, keypoints, keypoints_batch_cnt),
+                    args.repeat, device
+                )
+                idx, _ = pointnet2_utils.ball_query(radius, nsample, xyz, xyz_batch_cnt, keypoints, keypoints_batch_cnt)
+                grouping_time = time_op(
+                    lambda: pointnet2_utils.grouping_operation(features, xyz_batch_cnt, idx, keypoints_batch_cnt),
+                    args.repeat, device
+                )
+                print('    radius %.1f nsample %2d: ball_query %8.2f ms, grouping (C=%d) %8.2f ms' % (
+                    radius, nsample, ball_query_time * 1000, args.num_channels, grouping_time * 1000))
+
+            three_nn_time = time_op(
+                lambda: pointnet2_utils.three_nn(xyz, xyz_batch_cnt, keypoints, keypoints_batch_cnt), args.repeat, device
+            )
+            _, nn_idx = pointnet2_utils.three_nn(xyz, xyz_batch_cnt, keypoints, keypoints_batch_cnt)
+            keypoint_features = torch.randn(keypoints.shape[0], args.num_channels, device=device)
+            weight = torch.rand(xyz.shape[0], 3, device=device)
+            interpolate_time = time_op(
+                lambda: pointnet2_utils.three_interpolate(keypoint_features, nn_idx, weight), args.repeat, device
+            )
+            print('    three_nn %8.2f ms, three_interpolate (C=%d) %8.2f ms' % (
+                three_nn_time * 1000, args.num_channels, interpolate_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
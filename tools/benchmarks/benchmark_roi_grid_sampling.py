@@ -0,0 +1,96 @@
+"""
+Latency and peak memory of sample_points_with_roi (SAMPLE_METHOD: FPS with ROIs of the PV-RCNN++ keypoint sampling)
+with the dense (N, M) distance matrix and with the BEV grid of roi centers (USE_ROI_GRID: True), on Waymo-sized
+point clouds. The peak memory is the CUDA peak on GPU and the peak RSS growth of a forked process on CPU.
+
+    python benchmark_roi_grid_sampling.py --num_points 180000 --num_rois 128 512
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+import torch
+
+from pcdet.models.backbones_3d.pfe import voxel_set_abstraction
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--num_points', type=int, default=180000, help='points of the point cloud')
+    parser.add_argument('--num_rois', type=int, nargs='+', default=[128, 512], help='number of rois')
+    parser.add_argument('--sample_radius', type=float, default=1.6, help='SAMPLE_RADIUS_WITH_ROI')
+    parser.add_argument('--num_max_points_of_part', type=int, default=200000, help='NUM_POINTS_OF_EACH_SAMPLE_PART')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each mode')
+    return parser.parse_args()
+
+
+def waymo_like_scene(num_points, num_rois, seed=0):
+    rng = np.random.RandomState(seed)
+    dist, angle = np.abs(rng.randn(num_points)) * 30, rng.uniform(-np.pi, np.pi, num_points)
+    points = np.stack([dist * np.cos(angle), dist * np.sin(angle), rng.uniform(-2, 4, num_points)], axis=1)
+    rois = np.concatenate([
+        rng.uniform(-75, 75, (num_rois, 2)), rng.uniform(-1, 2, (num_rois, 1)), rng.uniform(0.5, 5, (num_rois, 2)),
+        rng.uniform(1, 3, (num_rois, 1)), rng.uniform(-np.pi, np.pi, (num_rois, 1))
+    ], axis=1)
+    return torch.from_numpy(points).float(), torch.from_numpy(rois).float()
+
+
+def time_op(func, repeat, device):
+    func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+def _rss_growth(func, queue):
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func()
+    queue.put((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) / 2 ** 10)
+
+
+def peak_memory(func, device):
+    if device == 'cuda':
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+        base = torch.cuda.memory_allocated()
+        func()
+        torch.cuda.synchronize()
+        return (torch.cuda.max_memory_allocated() - base) / 2 ** 20
+    # the peak RSS of a process never goes down, so each run is measured in its own forked process
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_rss_growth, args=(func, queue))
+    process.start()
+    memory = queue.get()
+    process.join()
+    return memory
+
+
+def main():
+    args = parse_config()
+    devices = ['cpu'] + (['cuda'] if torch.cuda.is_available() else [])
+    for num_rois in args.num_rois:
+        for device in devices:
+            points, rois = [x.to(device) for x in waymo_like_scene(args.num_points, num_rois)]
+            results = {}
+            for use_roi_grid in [True, False]:
+                func = lambda: voxel_set_abstraction.sample_points_with_roi(
+                    rois, points, args.sample_radius, num_max_points_of_part=args.num_max_points_of_part,
+                    use_roi_grid=use_roi_grid
+                )
+                memory = peak_memory(func, device)
+                results[use_roi_grid] = (time_op(func, args.repeat, device), memory, func()[1])
+            print('%-4s N=%d M=%d: dense %8.2f ms %8.1f MB, roi grid %8.2f ms %8.1f MB, same mask: %s' % (
+                device, args.num_points, num_rois, results[False][0] * 1000, results[False][1],
+                results[True][0] * 1000, results[True][1], torch.equal(results[False][2], results[True][2])))
+
+
+if __name__ == '__main__':
+    main()
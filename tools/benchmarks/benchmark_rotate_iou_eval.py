@@ -0,0 +1,80 @@
+"""
+Time of the rotated IoU of the KITTI evaluation (the bev and 3d overlaps of calculate_iou_partly) on val-set sized
+lists of boxes, with the numba CPU backend and, when numba.cuda finds a GPU, the numba CUDA kernel.
+
+    python benchmark_rotate_iou_eval.py --num_frames 3769 --num_parts 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from pcdet.datasets.kitti.kitti_object_eval_python import eval as kitti_eval
+from pcdet.datasets.kitti.kitti_object_eval_python.rotate_iou_cpu import rotate_iou_cpu_eval
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--num_frames', type=int, default=3769, help='frames of the split (KITTI val: 3769)')
+    parser.add_argument('--num_parts', type=int, default=50, help='num_parts of calculate_iou_partly')
+    parser.add_argument('--gt_per_frame', type=float, default=8, help='mean number of gt boxes of each frame')
+    parser.add_argument('--dt_per_frame', type=float, default=20, help='mean number of detections of each frame')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each backend')
+    return parser.parse_args()
+
+
+def camera_boxes(num_boxes, rng):
+    # [x, y, z, l, h, w, ry] in the camera frame, the bev box is [x, z, l, w, ry]
+    return np.concatenate([
+        rng.uniform(-30, 30, (num_boxes, 1)), rng.uniform(1, 2, (num_boxes, 1)), rng.uniform(5, 70, (num_boxes, 1)),
+        rng.uniform(0.5, 5, (num_boxes, 3)), rng.uniform(-np.pi, np.pi, (num_boxes, 1))
+    ], axis=1).astype(np.float32)
+
+
+def split_boxes(args, seed=0):
+    rng = np.random.RandomState(seed)
+    gt_boxes = [camera_boxes(n, rng) for n in rng.poisson(args.gt_per_frame, args.num_frames)]
+    dt_boxes = [camera_boxes(n, rng) for n in rng.poisson(args.dt_per_frame, args.num_frames)]
+    parts, example_idx = [], 0
+    for num_part in kitti_eval.get_split_parts(args.num_frames, args.num_parts):
+        parts.append((np.concatenate(gt_boxes[example_idx:example_idx + num_part]),
+                      np.concatenate(dt_boxes[example_idx:example_idx + num_part])))
+        example_idx += num_part
+    return parts
+
+
+def time_overlaps(rotate_iou_func, parts, repeat):
+    def overlaps():
+        for gt_boxes, dt_boxes in parts:
+            rotate_iou_func(gt_boxes[:, [0, 2, 3, 5, 6]], dt_boxes[:, [0, 2, 3, 5, 6]], -1)  # bev
+            rotate_iou_func(gt_boxes[:, [0, 2, 3, 5, 6]], dt_boxes[:, [0, 2, 3, 5, 6]], 2)  # 3d intersection
+    overlaps()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        overlaps()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = parse_config()
+    parts = split_boxes(args)
+    num_pairs = sum(gt_boxes.shape[0] * dt_boxes.shape[0] for gt_boxes, dt_boxes in parts)
+    backends = [('cpu', rotate_iou_cpu_eval)]
+    if kitti_eval.rotate_iou_gpu_eval is not None and kitti_eval.cuda.is_available():
+        backends.append(('cuda', kitti_eval.rotate_iou_gpu_eval))
+    else:
+        print('numba.cuda is not available, the CUDA kernel is skipped')
+
+    for name, rotate_iou_func in backends:
+        overlap_time = time_overlaps(rotate_iou_func, parts, args.repeat)
+        print('%-4s %d frames in %d parts (%d box pairs): bev + 3d overlaps %8.1f ms (%.2e pairs/s)' % (
+            name, args.num_frames, len(parts), num_pairs, overlap_time * 1000, 2 * num_pairs / overlap_time))
+    if len(backends) == 2:
+        gt_boxes, dt_boxes = parts[0]
+        max_diff = np.abs(rotate_iou_cpu_eval(gt_boxes[:, [0, 2, 3, 5, 6]], dt_boxes[:, [0, 2, 3, 5, 6]]) -
+                          kitti_eval.rotate_iou_gpu_eval(gt_boxes[:, [0, 2, 3, 5, 6]], dt_boxes[:, [0, 2, 3, 5, 6]]))
+        print('max |cpu - cuda| of the first part: %.2e' % max_diff.max())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Throughput of NumbaVoxelGenerator (generate and generate_dynamic) on KITTI- and Waymo-sized point clouds and,
+when spconv is installed, parity and throughput of the spconv VoxelGeneratorWrapper on the same points.
+
+    python benchmark_voxel_generator.py --datasets kitti waymo
+"""
+import argparse
+import time
+
+import numpy as np
+
+from pcdet.datasets.processor.data_processor import NumbaVoxelGenerator, VoxelGeneratorWrapper
+
+# num_points, voxel size, point cloud range, max points per voxel, max voxels (test mode)
+DATASET_SETTINGS = {
+    'kitti': (20000, [0.05, 0.05, 0.1], [0, -40, -3, 70.4, 40, 1], 5, 40000),
+    'waymo': (180000, [0.1, 0.1, 0.15], [-75.2, -75.2, -2, 75.2, 75.2, 4], 5, 150000),
+}
+
+
+def parse_config():
+    parser = argparse.ArgumentParser(description='arg parser')
+    parser.add_argument('--datasets', type=str, nargs='+', default=['kitti', 'waymo'], choices=DATASET_SETTINGS.keys())
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs of each generator')
+    return parser.parse_args()
+
+
+def lidar_like_points(num_points, point_cloud_range, seed=0):
+    # denser near the sensor, a few points out of the range
+    rng = np.random.RandomState(seed)
+    dist = rng.exponential(15, num_points) + 2
+    angle = rng.uniform(-np.pi, np.pi, num_points)
+    points = np.stack([
+        dist * np.cos(angle), dist * np.sin(angle),
+        rng.uniform(point_cloud_range[2] - 0.5, point_cloud_range[5], num_points), rng.rand(num_points)
+    ], axis=1)
+    return points.astype(np.float32)
+
+
+def time_op(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = parse_config()
+    for dataset in args.datasets:
+        num_points, voxel_size, point_cloud_range, max_points, max_voxels = DATASET_SETTINGS[dataset]
+        points = lidar_like_points(num_points, point_cloud_range)
+        generator_kwargs = dict(
+            vsize_xyz=voxel_size, coors_range_xyz=point_cloud_range, num_point_features=4,
+            max_num_points_per_voxel=max_points, max_num_voxels=max_voxels
+        )
+        numba_generator = NumbaVoxelGenerator(**generator_kwargs)
+        voxels, coordinates, num_voxel_points = numba_generator.generate(points)
+        numba_time = time_op(lambda: numba_generator.generate(points), args.repeat)
+        dynamic_time = time_op(lambda: numba_generator.generate_dynamic(points), args.repeat)
+        print('%-5s %6d points, %6d voxels: numba generate %7.2f ms, generate_dynamic %7.2f ms' % (
+            dataset, num_points, coordinates.shape[0], numba_time * 1000, dynamic_time * 1000))
+
+        try:
+            spconv_generator = VoxelGeneratorWrapper(**generator_kwargs)
+        except ImportError:
+            print('      spconv is not installed, skipped')
+            continue
+        spconv_voxels, spconv_coordinates, spconv_num_points = spconv_generator.generate(points)
+        # spconv 2.x does not keep the order of the voxels, compare them sorted by coordinate
+        order = np.lexsort(coordinates.T[::-1])
+        spconv_order = np.lexsort(spconv_coordinates.T[::-1])
+        same = coordinates.shape == spconv_coordinates.shape and \
+            np.array_equal(coordinates[order], spconv_coordinates[spconv_order]) and \
+            np.array_equal(num_voxel_points[order], spconv_num_points[spconv_order]) and \
+            np.array_equal(voxels[order], spconv_voxels[spconv_order])
+        spconv_time = time_op(lambda: spconv_generator.generate(points), args.repeat)
+        print('      spconv (v%d) generate %7.2f ms, same voxels: %s' % (
+            spconv_generator.spconv_ver, spconv_time * 1000, same))
+
+
+if __name__ == '__main__':
+    main()
@@ -16,7 +16,7 @@ import torch
 
 from pcdet.config import cfg, cfg_from_yaml_file
 from pcdet.datasets import DatasetTemplate
-from pcdet.models import build_network, load_data_to_gpu
+from pcdet.models import DevicePrefetcher, build_network, load_data_to_gpu
 from pcdet.utils import common_utils
 
 
@@ -68,6 +68,8 @@ def parse_config():
                         help='specify the point cloud data file or directory')
     parser.add_argument('--ckpt', type=str, default=None, help='specify the pretrained model')
     parser.add_argument('--ext', type=str, default='.bin', help='specify the extension of your point cloud data file')
+    parser.add_argument('--prefetch_batches', type=int, default=0,
+                        help='number of batches loaded to the GPU ahead of the current step, 0 to disable')
 
     args = parser.parse_args()
 
@@ -90,10 +92,12 @@ def main():
     model.load_params_from_file(filename=args.ckpt, logger=logger, to_cpu=True)
     model.cuda()
     model.eval()
+    batches = (demo_dataset.collate_batch([data_dict]) for data_dict in demo_dataset)
+    if args.prefetch_batches > 0:
+        batches = DevicePrefetcher(batches, num_prefetch=args.prefetch_batches)
     with torch.no_grad():
-        for idx, data_dict in enumerate(demo_dataset):
+        for idx, data_dict in enumerate(batches):
             logger.info(f'Visualized sample index: \t{idx + 1}')
-            data_dict = demo_dataset.collate_batch([data_dict])
             load_data_to_gpu(data_dict)
             pred_dicts, _ = model.forward(data_dict)
 
@@ -21,6 +21,13 @@ def statistics_info(cfg, ret_dict, metric, disp_dict):
         '(%d, %d) / %d' % (metric['recall_roi_%s' % str(min_thresh)], metric['recall_rcnn_%s' % str(min_thresh)], metric['gt_num'])
 
 
+def log_focal_time_report(model, logger):
+    backbone_3d = getattr(model.module if hasattr(model, 'module') else model, 'backbone_3d', None)
+    report = backbone_3d.get_focal_time_report() if hasattr(backbone_3d, 'get_focal_time_report') else None
+    if report is not None:
+        logger.info('Focal sparse conv stage time:\n%s' % report)
+
+
 def eval_one_epoch(cfg, model, dataloader, epoch_id, logger, dist_test=False, save_to_file=False, result_dir=None):
     result_dir.mkdir(parents=True, exist_ok=True)
 
@@ -89,6 +96,7 @@ def eval_one_epoch(cfg, model, dataloader, epoch_id, logger, dist_test=False, sa
     logger.info('*************** Performance of EPOCH %s *****************' % epoch_id)
     sec_per_example = (time.time() - start_time) / len(dataloader.dataset)
     logger.info('Generate label finished(sec_per_example: %.4f second).' % sec_per_example)
+    log_focal_time_report(model, logger)
 
     if cfg.LOCAL_RANK != 0:
         return {}
@@ -14,7 +14,7 @@ from tensorboardX import SummaryWriter
 from eval_utils import eval_utils
 from pcdet.config import cfg, cfg_from_list, cfg_from_yaml_file, log_config_to_file
 from pcdet.datasets import build_dataloader
-from pcdet.models import build_network
+from pcdet.models import DevicePrefetcher, build_network
 from pcdet.utils import common_utils
 
 
@@ -38,6 +38,8 @@ def parse_config():
     parser.add_argument('--eval_all', action='store_true', default=False, help='whether to evaluate all checkpoints')
     parser.add_argument('--ckpt_dir', type=str, default=None, help='specify a ckpt directory to be evaluated if needed')
     parser.add_argument('--save_to_file', action='store_true', default=False, help='')
+    parser.add_argument('--prefetch_batches', type=int, default=0,
+                        help='number of batches loaded to the GPU ahead of the current step, 0 to disable')
 
     args = parser.parse_args()
 
@@ -187,6 +189,8 @@ def main():
         batch_size=args.batch_size,
         dist=dist_test, workers=args.workers, logger=logger, training=False
     )
+    if args.prefetch_batches > 0:
+        test_loader = DevicePrefetcher(test_loader, num_prefetch=args.prefetch_batches)
 
     model = build_network(model_cfg=cfg.MODEL, num_class=len(cfg.CLASS_NAMES), dataset=test_set)
     with torch.no_grad():
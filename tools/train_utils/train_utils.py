@@ -134,6 +134,8 @@ def train_model(model, optimizer, train_loader, test_loader, args, cfg, model_fu
                 total_it_each_epoch=total_it_each_epoch,
                 dataloader_iter=dataloader_iter
             )
+            if rank == 0 and logger is not None:
+                eval_utils.log_focal_time_report(model, logger)
 
             # save trained model
             trained_epoch = cur_epoch + 1